@@ -0,0 +1,144 @@
+import os, time, random, argparse, logging
+from collections import Counter
+import harness, localAws
+from common import alarms
+
+'''
+benchAlarms
+
+The due-alarm lookup of the alarms module over ALARMS synthetic alarms
+(one per user, most of them early in the morning on weekdays, like real
+wake-up alarms):
+    - bucket entries per minute and per partition key, with and without
+      sharding (the hot partition of the busiest minute)
+    - the busiest minute and a median minute loaded into the local DynamoDB
+      stand-in and read with alarms.dueAlarms(): calls, read units, time
+    - the same minute answered by a scan of the bucket table, estimated from
+      the entry size (a Scan reads every item whatever the filter)
+    - putAlarm through the handler: calls and write units per alarm
+
+Usage (from the repository root):
+    python benchmarks/benchAlarms.py [--alarms 1000000] [--shards 16]
+'''
+
+TABLES = {
+    "ALARM_TABLE": ("Alarm-Bench", "email", "alarmId"),
+    "ALARM_BUCKET_TABLE": ("AlarmBucket-Bench", "bucket", "alarmKey"),
+}
+
+WEEKDAYS = [1, 2, 3, 4, 5]
+EVERY_DAY = [1, 2, 3, 4, 5, 6, 7]
+
+def emailOf(idx):
+    return "user%07d@luple.co.kr" % idx
+
+'''
+synthetic function
+
+@input parameter:
+    - idx: user number
+    - rng: random.Random
+@return:
+    - alarm fields as putAlarm receives them
+'''
+def synthetic(idx, rng):
+    draw = rng.random()
+    if draw < 0.6:
+        # wake-up alarms on the quarter hours between 05:30 and 08:30
+        minute = 330 + 15 * rng.randrange(13)
+    elif draw < 0.8:
+        minute = 330 + rng.randrange(180)
+    else:
+        minute = rng.randrange(24 * 60)
+    draw = rng.random()
+    if draw < 0.5:
+        days = WEEKDAYS
+    elif draw < 0.75:
+        days = EVERY_DAY
+    else:
+        days = sorted(rng.sample(EVERY_DAY, rng.randrange(1, 8)))
+    return {
+        'taskType': idx % 5,
+        'time': {'hh': minute // 60, 'mm': minute % 60},
+        'days': days,
+        'utcOffset': 540 if rng.random() < 0.9 else 60 * rng.randrange(-8, 13),
+    }
+
+def generate(count):
+    rng = random.Random(17)
+    return [synthetic(idx, rng) for idx in range(count)]
+
+def entrySize(idx, bucket):
+    entry = {'bucket': bucket, 'alarmKey': alarms.alarmKey(emailOf(idx), 'wake'),
+             'email': emailOf(idx), 'alarmId': 'wake', 'taskType': idx % 5}
+    return localAws.itemSize(entry)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Due-alarm lookup over synthetic alarms")
+    parser.add_argument('--alarms', type=int, default=1000000)
+    parser.add_argument('--shards', type=int, default=alarms.SHARDS)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+    alarms.SHARDS = args.shards
+
+    start = time.perf_counter()
+    fields = generate(args.alarms)
+    perMinute = Counter()
+    perPartition = Counter()
+    for idx, alarm in enumerate(fields):
+        email = emailOf(idx)
+        shard = alarms.shardOf(email)
+        for day in alarm['days']:
+            minute = alarms.minuteOfWeek(day, alarm['time']['hh'], alarm['time']['mm'], alarm['utcOffset'])
+            perMinute[minute] += 1
+            perPartition[(minute, shard)] += 1
+    entries = sum(perMinute.values())
+    print("alarms=%d bucket entries=%d minutes used=%d/%d (%.1fs to generate)" % (
+        args.alarms, entries, len(perMinute), alarms.MINUTES_PER_WEEK, time.perf_counter() - start))
+
+    busiest = perMinute.most_common(1)[0][0]
+    ranked = sorted(perMinute, key=lambda minute: perMinute[minute])
+    median = ranked[len(ranked) // 2]
+    print("busiest minute %d: %d entries, unsharded partition %d, largest of %d shards %d" % (
+        busiest, perMinute[busiest], perMinute[busiest], args.shards,
+        max(perPartition[(busiest, shard)] for shard in range(args.shards))))
+
+    # load only the entries of the two minutes measured
+    store = localAws.install(TABLES)
+    table = store.tables["AlarmBucket-Bench"]
+    sizes = []
+    for idx, alarm in enumerate(fields):
+        email = emailOf(idx)
+        for bucket in alarms.bucketsOf(email, alarm):
+            minute = int(bucket.split('#')[0])
+            if len(sizes) < 1000:
+                sizes.append(entrySize(idx, bucket))
+            if minute in (busiest, median):
+                table.put(localAws.normalize({'bucket': bucket, 'alarmKey': alarms.alarmKey(email, 'wake'),
+                                              'email': email, 'alarmId': 'wake', 'taskType': alarm['taskType']}))
+    averageSize = sum(sizes) / float(len(sizes))
+    scanUnits = entries * averageSize / 4096.0 * 0.5
+
+    print("")
+    print("%-22s %9s %7s %10s %10s" % ("lookup", "entries", "calls", "RCU", "ms"))
+    for label, minute in (("dueAlarms busiest", busiest), ("dueAlarms median", median)):
+        store.resetStats()
+        start = time.perf_counter()
+        found = alarms.dueAlarms(minute)
+        elapsed = time.perf_counter() - start
+        assert len(found) == perMinute[minute], (len(found), perMinute[minute])
+        print("%-22s %9d %7d %10.1f %10.1f" % (label, len(found), store.totalCalls(),
+                                                sum(store.capacity.values()), elapsed * 1e3))
+    print("%-22s %9d %7s %10.1f %10s" % ("scan (estimated)", perMinute[busiest],
+                                          "%d+" % (entries * averageSize // (1024 * 1024) + 1), scanUnits, "-"))
+
+    # writes through the handler, on a small sample
+    handler = harness.loadHandler("putAlarm")
+    store.resetStats()
+    sample = 200
+    for idx in range(sample):
+        handler.lambda_handler({'email': emailOf(idx), 'alarmId': 'wake', 'body-json': fields[idx]}, None)
+    print("")
+    print("putAlarm: %.2f calls, %.1f WCU+RCU per new alarm (%.1f days on average)" % (
+        store.totalCalls() / float(sample), sum(store.capacity.values()) / sample,
+        sum(len(fields[idx]['days']) for idx in range(sample)) / float(sample)))
@@ -0,0 +1,128 @@
+import os, sys, json, argparse, subprocess
+import harness
+
+'''
+benchColdStart
+
+Import cost of every lambda function, i.e. the init phase of a cold start:
+each function is imported in a fresh interpreter (python -X importtime)
+with its own directory and commonLayer/python on sys.path, like in lambda.
+Reports per function:
+    - import time of lambda_function (median of --runs, milliseconds)
+    - number of modules loaded by that import
+    - whether boto3 / botocore were loaded
+
+The results are compared with benchmarks/coldStart.json, and the script
+exits with status 1 when a function regresses:
+    - it loads boto3 / botocore while the baseline does not
+    - its import time exceeds the baseline by more than --tolerance
+      (relative) and --slack (milliseconds)
+
+Usage (from the repository root):
+    python benchmarks/benchColdStart.py [--runs 5] [--update]
+--update writes the current results as the new baseline.
+'''
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'coldStart.json')
+
+PROBE = '''
+import sys
+sys.path[:0] = [%r, %r]
+before = set(sys.modules)
+import lambda_function
+loaded = set(sys.modules) - before
+sys.stdout.write("%%d %%d\\n" %% (len(loaded), any(name.split('.')[0] in ('boto3', 'botocore') for name in loaded)))
+'''
+
+def listFunctions():
+    return sorted(name for name in os.listdir(harness.ROOT)
+                  if os.path.isfile(os.path.join(harness.ROOT, name, 'lambda_function.py')))
+
+'''
+probe function
+
+@input parameter:
+    - functionName: directory name of the lambda function
+@return:
+    - (import time in ms, modules loaded, bool: boto3 / botocore loaded)
+'''
+def probe(functionName):
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', PROBE % (os.path.join(harness.ROOT, functionName), harness.LAYER)],
+        cwd=harness.ROOT, env=env, capture_output=True, text=True, check=True)
+    importMs = None
+    for line in proc.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        parts = line.split('|')
+        if len(parts) == 3 and parts[2].strip() == 'lambda_function':
+            importMs = int(parts[1]) / 1000.0
+    modules, aws = proc.stdout.split()
+    return importMs, int(modules), aws == '1'
+
+def measure(functionName, runs):
+    samples = [probe(functionName) for _ in range(runs)]
+    return {
+        'importMs': round(harness.percentile([s[0] for s in samples], 50), 1),
+        'modules': samples[-1][1],
+        'aws': samples[-1][2],
+    }
+
+'''
+regressions function
+
+@input parameter:
+    - results: {function: measure()}
+    - baseline: {function: measure()} loaded from coldStart.json
+    - tolerance: allowed relative increase of the import time
+    - slack: allowed absolute increase of the import time (ms)
+@return:
+    - list of messages, empty when nothing regressed
+'''
+def regressions(results, baseline, tolerance, slack):
+    messages = []
+    for functionName, result in sorted(results.items()):
+        base = baseline.get(functionName)
+        if base is None:
+            continue
+        if result['aws'] and not base['aws']:
+            messages.append("%s now imports boto3/botocore at init" % functionName)
+        limit = base['importMs'] * (1 + tolerance) + slack
+        if result['importMs'] > limit:
+            messages.append("%s import time %.1f ms > %.1f ms (baseline %.1f ms)" % (
+                functionName, result['importMs'], limit, base['importMs']))
+    return messages
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Cold-start import cost per lambda function")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--tolerance', type=float, default=0.5)
+    parser.add_argument('--slack', type=float, default=20.0)
+    parser.add_argument('--update', action='store_true', help="write the results as the new baseline")
+    args = parser.parse_args()
+
+    baseline = dict()
+    if os.path.exists(BASELINE):
+        with open(BASELINE) as f:
+            baseline = json.load(f)
+
+    results = dict()
+    print("%-32s %10s %10s %8s %5s" % ("function", "import(ms)", "base(ms)", "modules", "aws"))
+    for functionName in listFunctions():
+        result = results[functionName] = measure(functionName, args.runs)
+        base = baseline.get(functionName, {})
+        print("%-32s %10.1f %10s %8d %5s" % (
+            functionName, result['importMs'],
+            "%.1f" % base['importMs'] if base else "-", result['modules'], "yes" if result['aws'] else "no"))
+
+    if args.update:
+        with open(BASELINE, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print("baseline written to %s" % BASELINE)
+        sys.exit(0)
+
+    messages = regressions(results, baseline, args.tolerance, args.slack)
+    for message in messages:
+        print("REGRESSION: %s" % message)
+    sys.exit(1 if messages else 0)
@@ -0,0 +1,76 @@
+import os, json, logging
+import harness, localAws
+
+'''
+benchConditionalWrites
+
+DynamoDB calls per request of the mutating handlers, for the usual case and
+for the case where the row is missing (or, for postUser, already there).
+Each handler used to read the row before writing it (BEFORE, counted from
+the previous code); now the existence check is the ConditionExpression of
+the write itself.
+'''
+
+EMAIL = "bench@luple.co.kr"
+MISSING = "nobody@luple.co.kr"
+TASK_ID = "bench-20201010-1602300000"
+
+USER = ("User-Bench", "email", None)
+RECORDS = ("Records-Bench", "email", "taskId")
+SETTINGS = ("Settings-Bench", "email", None)
+SLEEP = ("Sleep-Bench", "email", "diaryDate")
+
+SEED = {
+    "User-Bench": {"email": EMAIL, "userName": "bench", "age": 30,
+                   "profile": {"wakeUpTime": {"hh": 7, "mm": 0}}},
+    "Records-Bench": {"email": EMAIL, "taskId": TASK_ID, "taskType": 1,
+                      "startTime": 1602300000, "elapsedTime": 60},
+    "Settings-Bench": {"email": EMAIL, "lang": 0, "agreement": {}},
+    "Sleep-Bench": {"email": EMAIL, "diaryDate": 20201010, "sleepScore": 3},
+}
+
+USER_BODY = {"userName": "bench", "problems": [{"problem": 1, "priority": 1}], "age": 30,
+             "gps": {"latitude": 37.5, "longitude": 127.0}, "sex": 0, "profile": {}}
+
+# label, function, table, event, calls before (usual, miss)
+# putSleepDiary never called its existence check, so it had no extra read
+# (and silently created missing diaries).
+CASES = [
+    ("putUser (user)", "putUser", USER, {"url": "/user", "body-json": {"age": 31}}, (2, 1)),
+    ("putUser (+profile)", "putUser", USER,
+     {"url": "/user", "body-json": {"age": 31, "profile": {"sleepTime": {"hh": 23, "mm": 0}}}}, (4, 1)),
+    ("putUser (profile)", "putUser", USER,
+     {"url": "/user/profile", "body-json": {"sleepTime": {"hh": 23, "mm": 0}}}, (2, 1)),
+    ("postUser", "postUser", USER, {"body-json": USER_BODY}, (None, 1)),
+    ("deleteProfileId", "deleteProfileId", USER, {}, (2, 1)),
+    ("putTask", "putTask", RECORDS, {"taskId": TASK_ID, "body-json": {"elapsedTime": 120}}, (2, 1)),
+    ("putDevice", "putDevice", SETTINGS, {"body-json": {"lang": 1}}, (2, 2)),
+    ("putSleepDiary", "putSleepDiary", SLEEP, {"diaryDate": "20201010", "body-json": {"sleepScore": 4}}, (1, 1)),
+]
+
+def run(store, handler, event):
+    store.resetStats()
+    try:
+        res = handler.lambda_handler(event, None)
+        status = res["statusCode"]
+    except Exception as e:
+        status = json.loads(str(e))["statusCode"]
+    return status, store.totalCalls()
+
+if __name__ == '__main__':
+    logging.disable(logging.CRITICAL)
+    os.environ["URI_USER"] = "/user"
+    os.environ["URI_PROFILE"] = "/user/profile"
+
+    for label, functionName, table, event, before in CASES:
+        store = localAws.install({"TABLE_NAME": table})
+        store.tables[table[0]].put(localAws.normalize(SEED[table[0]]))
+        module = harness.loadHandler(functionName)
+
+        # postUser's usual case goes on to SNS, so only its conflict case is driven here
+        if before[0] is not None:
+            status, calls = run(store, module, dict(event, email=EMAIL))
+            print("%-18s usual: status=%d calls before=%d after=%d" % (label, status, before[0], calls))
+        email = EMAIL if functionName == "postUser" else MISSING
+        status, calls = run(store, module, dict(event, email=email))
+        print("%-18s miss : status=%d calls before=%d after=%d" % (label, status, before[1], calls))
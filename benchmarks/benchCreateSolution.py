@@ -0,0 +1,52 @@
+import json, logging
+import harness, localAws
+from common import bulk
+
+'''
+benchCreateSolution
+
+createSolution throughput for SQS events of 10 / 100 / 1000 records
+(5ms per DynamoDB call). The previous handler decoded only Records[0] and
+wrote nothing, so it handled 1 record per event whatever the batch size.
+The last run makes every 7th write come back unprocessed with retries
+disabled, and checks that exactly the failed records are reported.
+'''
+
+SIZES = [10, 100, 1000]
+REPEAT = 5
+
+def makeEvent(size, offset=0):
+    records = []
+    for idx in range(size):
+        # every 10th record repeats the previous user, only the last one is written
+        user = offset + idx - (1 if idx % 10 == 9 else 0)
+        message = {"email": "user-%d@luple.co.kr" % user, "userName": "user-%d" % user, "age": 30,
+                   "gps": {"latitude": 37.5, "longitude": 127.0}, "problems": [{"problem": 1, "priority": 1}]}
+        records.append({"messageId": "m-%d" % (offset + idx), "eventSource": "aws:sqs", "body": json.dumps(message)})
+    return {"Records": records}
+
+if __name__ == '__main__':
+    logging.disable(logging.CRITICAL)
+    store = localAws.install({"TABLE_NAME": ("Solution-Bench", "email", None)}, latency={"*": 0.005})
+    createSolution = harness.loadHandler("createSolution")
+
+    for size in SIZES:
+        events = [makeEvent(size, run * size) for run in range(REPEAT)]
+        it = iter(events)
+        store.resetStats()
+        samples = harness.timeit(lambda: createSolution.lambda_handler(next(it), None), REPEAT)
+        harness.report("%4d records/event" % size, samples)
+        print("     records/s=%.0f  BatchWriteItem calls/event=%d" % (
+            size / (sum(samples) / len(samples)), store.calls["BatchWriteItem"] // REPEAT))
+
+    store.unprocessedEvery = 7
+    bulk.MAX_RETRIES = 0
+    event = makeEvent(100, 10 ** 6)
+    res = createSolution.lambda_handler(event, None)
+    failed = set(f["itemIdentifier"] for f in res["batchItemFailures"])
+    missing = set()
+    for record in event["Records"]:
+        email = json.loads(record["body"])["email"]
+        if store.tables["Solution-Bench"].get(localAws.normalize({"email": email})) is None:
+            missing.add(record["messageId"])
+    print("partial: reported=%d  not written=%d  match=%s" % (len(failed), len(missing), failed == missing))
@@ -0,0 +1,114 @@
+import os, time, random, logging
+import harness, localAws
+from common import plans
+
+'''
+benchDailyPlan
+
+getSolutionTasksDaily for USERS users, each with task records over the
+last two weeks, replaying a day of traffic: READS plan reads and WRITES
+postTask calls per user, interleaved.
+    - computed : the plan is built from the user item and the task records
+                 on every read (get_item + query)
+    - materialized: the handler, reading PLAN_TABLE and rebuilding only
+                 after postTask invalidated the plan
+Reports DynamoDB calls and consumed capacity per read, and the cost the
+invalidation adds to each postTask.
+
+Usage (from the repository root):
+    python benchmarks/benchDailyPlan.py
+'''
+
+USERS = 200
+READS = 10
+WRITES = 3
+HISTORY = 14
+DAY = 24 * 60 * 60
+
+TABLES = {
+    "USER_TABLE": ("User-Bench", "email", None),
+    "RECORDS_TABLE": ("Records-Bench", "email", "taskId", {"startTime-index": ("email", "startTime")}),
+    "PLAN_TABLE": ("Plan-Bench", "email", "planDate"),
+}
+
+def seed(store, now):
+    rng = random.Random(3)
+    for idx in range(USERS):
+        email = "user-%d@luple.co.kr" % idx
+        store.tables["User-Bench"].put(localAws.normalize({
+            "email": email, "userName": "user-%d" % idx, "version": 1,
+            "problems": [{"problem": rng.randrange(8), "priority": 1}, {"problem": rng.randrange(8), "priority": 2}],
+            "profile": {"wakeUpTime": {"hh": 7, "mm": 0}, "sleepTime": {"hh": 23, "mm": 30}, "effectiveDays": [1, 2, 3, 4, 5, 6, 7]},
+        }))
+        for day in range(1, HISTORY + 1):
+            for taskType in range(5):
+                startTime = now - day * DAY + rng.randrange(DAY)
+                store.tables["Records-Bench"].put(localAws.normalize({
+                    "email": email, "taskId": "user%d-%d-%d-%d" % (idx, plans.dateOf(startTime), day, taskType),
+                    "taskType": taskType, "startTime": startTime, "elapsedTime": 600,
+                    "typeStart": "%d#%010d" % (taskType, startTime),
+                }))
+
+def workload():
+    rng = random.Random(5)
+    events = []
+    for idx in range(USERS):
+        events += [("read", idx)] * READS + [("write", idx)] * WRITES
+    rng.shuffle(events)
+    return events
+
+def costs(store, before):
+    calls = sum(store.calls.values()) - before[0]
+    capacity = sum(store.capacity.values()) - before[1]
+    return calls, capacity
+
+def snapshot(store):
+    return sum(store.calls.values()), sum(store.capacity.values())
+
+def run(store, events, materialized, daily, postTask, now):
+    readCost = [0, 0.0]
+    writeCost = [0, 0.0]
+    counter = [0]
+    for kind, idx in events:
+        email = "user-%d@luple.co.kr" % idx
+        before = snapshot(store)
+        if kind == "read":
+            if materialized:
+                daily.lambda_handler({"email": email}, None)
+            else:
+                user, records = plans.loadInputs(email, plans.dateOf(now))
+                plans.buildPlan(user, records, plans.dateOf(now))
+            cost = readCost
+        else:
+            counter[0] += 1
+            os.environ["TABLE_NAME"] = os.environ["RECORDS_TABLE"]
+            postTask.lambda_handler({"email": email, "body-json": {
+                "taskType": counter[0] % 5, "startTime": now - 60, "elapsedTime": 60}}, None)
+            cost = writeCost
+        calls, capacity = costs(store, before)
+        cost[0] += calls
+        cost[1] += capacity
+    reads = USERS * READS
+    writes = USERS * WRITES
+    return readCost[0] / reads, readCost[1] / reads, writeCost[0] / writes, writeCost[1] / writes
+
+if __name__ == '__main__':
+    logging.disable(logging.CRITICAL)
+    now = int(time.time())
+    results = []
+    for materialized in (False, True):
+        store = localAws.install(TABLES)
+        os.environ["START_TIME_INDEX"] = "startTime-index"
+        if not materialized:
+            del os.environ["PLAN_TABLE"]
+        seed(store, now)
+        daily = harness.loadHandler("getSolutionTasksDaily")
+        postTask = harness.loadHandler("postTask")
+        plans.SETTLE_MS = 0
+        start = time.perf_counter()
+        ret = run(store, workload(), materialized, daily, postTask, now)
+        results.append(("materialized" if materialized else "computed", ret, time.perf_counter() - start))
+
+    print("%-14s %10s %10s %11s %11s %9s" % ("", "calls/read", "RCU/read", "calls/write", "WCU/write", "total(s)"))
+    for name, (readCalls, readUnits, writeCalls, writeUnits), elapsed in results:
+        print("%-14s %10.2f %10.2f %11.2f %11.2f %9.2f" % (name, readCalls, readUnits, writeCalls, writeUnits, elapsed))
@@ -0,0 +1,31 @@
+import os
+import harness
+import boto3
+from common import db
+
+'''
+benchDb
+
+Per-invocation overhead of obtaining a Table handle.
+    - before: boto3.resource('dynamodb') + Table(...) inside every invocation
+    - after : db.getTable(...) reusing container-scoped objects
+No request is sent to AWS; only object construction is measured.
+'''
+
+REPEAT = 300
+
+os.environ.setdefault('TABLE_NAME', 'User-Bench')
+
+def before():
+    resource = boto3.resource('dynamodb')
+    return resource.Table(os.environ['TABLE_NAME'])
+
+def after():
+    return db.getTable('TABLE_NAME')
+
+if __name__ == '__main__':
+    # first call of each path pays the cold cost; keep it out of the warm numbers
+    before()
+    after()
+    harness.report("before: resource + Table per invocation", harness.timeit(before, REPEAT))
+    harness.report("after : db.getTable (warm)", harness.timeit(after, REPEAT))
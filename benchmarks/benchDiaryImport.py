@@ -0,0 +1,125 @@
+import os, json, time, random, datetime, argparse, logging
+import harness, localAws
+from common import bulk, diaryImport
+
+'''
+benchDiaryImport
+
+Import of DIARIES sleep diaries of one user (a newline-delimited JSON
+history, one day per line) against the local DynamoDB stand-in where every
+call takes --latency seconds:
+    - postSleepDiary : one request per diary, measured on the first
+                       --sample diaries and extrapolated
+    - import xN      : importSleepDiary streaming the whole history, with
+                       N BatchWriteItem calls in parallel
+    - resumed        : every 5th BatchWriteItem request comes back
+                       unprocessed and the first invocation runs out of
+                       time half way; the second one resumes from the
+                       checkpoint it returned
+Every BROKEN_EVERY-th line is out of range and must be rejected; every
+other diary must be stored exactly as postSleepDiary stores it.
+
+Usage (from the repository root):
+    python benchmarks/benchDiaryImport.py [--diaries 100000] [--latency 0.005]
+'''
+
+EMAIL = "import@luple.co.kr"
+FIRST_DAY = datetime.date(1750, 1, 1)
+BROKEN_EVERY = 10007
+
+TABLES = {
+    "SLEEP_TABLE": ("Sleep-Bench", "email", "diaryDate"),
+}
+
+def history(count):
+    rng = random.Random(7)
+    lines = []
+    for day in range(count):
+        diary = {
+            "diaryDate": (FIRST_DAY + datetime.timedelta(days=day)).strftime("%Y%m%d"),
+            "timeToSleep": rng.randrange(5), "numOfWakeUp": rng.randrange(5), "differenceTime": rng.randrange(6),
+            "disturbance": sorted(rng.sample(range(12), rng.randrange(4))),
+            "textMessage": "day %d" % day, "sleepScore": rng.randrange(11) / 2.0,
+        }
+        if day % BROKEN_EVERY == BROKEN_EVERY - 1:
+            diary["sleepScore"] = 7
+        lines.append(json.dumps(diary) + "\n")
+    return lines
+
+def setup(latency):
+    store = localAws.install(TABLES, latency={"*": latency})
+    os.environ["TABLE_NAME"] = os.environ["SLEEP_TABLE"]
+    return store
+
+def report(label, diaries, calls, elapsed, result=None):
+    print("%-16s %8d %8d %9.1f %10.0f %9s %s" % (
+        label, diaries, calls, elapsed, diaries / elapsed, "-" if result is None else result["checkpoint"],
+        "" if result is None else "rejected=%d failed=%d" % (result["rejected"], result["failed"])))
+
+def postOneByOne(lines, latency, sample):
+    store = setup(latency)
+    handler = harness.loadHandler("postSleepDiary")
+    start = time.perf_counter()
+    for line in lines[:sample]:
+        try:
+            handler.lambda_handler({"email": EMAIL, "body-json": json.loads(line)}, None)
+        except Exception:
+            pass
+    elapsed = (time.perf_counter() - start) * len(lines) / sample
+    report("postSleepDiary", len(lines), store.totalCalls() * len(lines) // sample, elapsed)
+    return store
+
+def importAll(label, lines, latency, workers, unprocessedEvery=0, cut=None):
+    store = setup(latency)
+    store.unprocessedEvery = unprocessedEvery
+    handler = harness.loadHandler("importSleepDiary")
+    # the handler writes on the shared executor of the container
+    bulk.WORKERS = workers
+    bulk._executor = None
+    diaryImport.WINDOW = 2 * workers
+    body = "".join(lines)
+    start = time.perf_counter()
+    context = None if cut is None else harness.Context(timeoutMs=handler.RESERVE_MS + cut * 1000)
+    result = handler.lambda_handler({"email": EMAIL, "body": body}, context)["body"]
+    total = result["imported"]
+    if cut is not None:
+        first = result
+        result = handler.lambda_handler({"email": EMAIL, "body": body, "checkpoint": str(first["checkpoint"])},
+                                        None)["body"]
+        assert not first["complete"] and result["skipped"] >= first["imported"], "resume skipped %d" % result["skipped"]
+        total += result["imported"]
+    elapsed = time.perf_counter() - start
+    report(label, total, store.totalCalls(), elapsed, result)
+    assert result["complete"], "%s: incomplete" % label
+    return store
+
+def check(store, reference, count):
+    stored = store.tables["Sleep-Bench"]
+    broken = count // BROKEN_EVERY
+    assert stored.count() == count - broken, "stored %d, expected %d" % (stored.count(), count - broken)
+    for date, item in reference.items():
+        assert stored.get({"email": EMAIL, "diaryDate": date}) == item, "diary %d differs" % date
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Bulk sleep diary import against one request per diary")
+    parser.add_argument('--diaries', type=int, default=100000)
+    parser.add_argument('--latency', type=float, default=0.005)
+    parser.add_argument('--sample', type=int, default=400)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    lines = history(args.diaries)
+    print("diaries=%d (%.1f MB), DynamoDB %.0fms per call" % (
+        args.diaries, sum(len(line) for line in lines) / 1e6, args.latency * 1e3))
+    print("%-16s %8s %8s %9s %10s %9s" % ("", "diaries", "calls", "wall(s)", "diaries/s", "checkpoint"))
+    sampled = postOneByOne(lines, args.latency, args.sample)
+    reference = dict((int(item["diaryDate"]), item)
+                     for item in (sampled.tables["Sleep-Bench"].get({"email": EMAIL, "diaryDate": int(json.loads(line)["diaryDate"])})
+                                  for line in lines[:args.sample]) if item is not None)
+    for workers in (1, 4, 16):
+        store = importAll("import x%d" % workers, lines, args.latency, workers)
+        check(store, reference, args.diaries)
+    store = importAll("resumed x16", lines, args.latency, 16, unprocessedEvery=5, cut=1.0)
+    check(store, reference, args.diaries)
+    print("")
+    print("every diary stored, %d broken line(s) rejected" % (args.diaries // BROKEN_EVERY))
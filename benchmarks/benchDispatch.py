@@ -0,0 +1,156 @@
+import json, time, argparse, logging, threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import harness, localAws
+from common import alarms, dispatch
+
+'''
+benchDispatch
+
+The alarm dispatcher (dispatch module) on ALARMS alarms due in the same
+minute, against the local DynamoDB and SNS stand-ins; PublishBatch takes
+--latency seconds. The clock of the dispatcher is shifted so the run starts
+--lead seconds before the minute, like the invocation of the minute before.
+Scenarios:
+    - on time   : pages loaded ahead, fired by the timing wheel at the
+                  deadline
+    - overlap   : a second dispatcher on the same window right after (an
+                  overlapping or retried invocation): must fire nothing
+    - late      : the run starts --late seconds after the deadline (a late
+                  or missed invocation): catch-up
+    - takeover  : a dispatcher dies after sending half of the alarms; the
+                  next one takes the slots over once their lease expired
+Reports the dispatch skew (notifier call done - deadline) p50 / p95 / p99 /
+max, the throughput (alarms per second from the first notifier call done to
+the last one) and the alarms delivered twice.
+
+Usage (from the repository root):
+    python benchmarks/benchDispatch.py [--alarms 100000] [--latency 0.02] [--concurrency 32]
+'''
+
+TABLES = {
+    "ALARM_TABLE": ("Alarm-Bench", "email", "alarmId"),
+    "ALARM_BUCKET_TABLE": ("AlarmBucket-Bench", "bucket", "alarmKey"),
+    "DISPATCH_TABLE": ("Dispatch-Bench", "slot", None),
+}
+TOPIC = "arn:aws:sns:ap-northeast-2:000000000000:alarmTopic"
+
+class Crash(Exception):
+    pass
+
+'''
+RecordingNotifier class
+
+SnsNotifier on the SNS stand-in, recording the skew of every alarm sent.
+'''
+class RecordingNotifier(dispatch.SnsNotifier):
+    def __init__(self, clock):
+        dispatch.SnsNotifier.__init__(self, TOPIC)
+        self.clock = clock
+        self.skews = []
+        self.lock = threading.Lock()
+
+    def send(self, entries):
+        failed = dispatch.SnsNotifier.send(self, entries)
+        now = self.clock()
+        with self.lock:
+            self.skews += [now - entry['deadline'] for entry in entries if entry not in failed]
+        return failed
+
+def setup(count, latency, dbLatency, unixMinute):
+    store = localAws.install(TABLES, latency={"*": dbLatency})
+    sns = localAws.installSns([TOPIC], latency={"PublishBatch": latency})
+    table = store.tables["AlarmBucket-Bench"]
+    for idx in range(count):
+        email = "user%07d@luple.co.kr" % idx
+        bucket = alarms.bucketKey(alarms.weekMinuteOf(unixMinute), alarms.shardOf(email))
+        table.put(localAws.normalize({"bucket": bucket, "alarmKey": alarms.alarmKey(email, "wake"),
+                                      "email": email, "alarmId": "wake", "taskType": idx % 5}))
+    return store, sns
+
+def delivered(sns):
+    return Counter(json.dumps([body["email"], body["alarmId"]])
+                   for body in (json.loads(message) for message in sns.messages[TOPIC]))
+
+def run(notifier, clock, sleep=time.sleep, executor=None):
+    dispatcher = dispatch.Dispatcher(notifier, clock=clock, sleep=sleep, executor=executor)
+    start = time.time()
+    try:
+        stats = dispatcher.run()
+    except Crash:
+        stats = dict(dispatcher.stats, crashed=1)
+    return stats, time.time() - start
+
+def report(label, notifier, stats):
+    skews = notifier.skews or [0.0]
+    # from the first alarm sent to the last one
+    rate = len(notifier.skews) / max(max(skews) - min(skews), 1e-3)
+    print("%-10s %8d %8.3f %8.3f %8.3f %8.3f %10.0f  %s" % (
+        label, len(notifier.skews), harness.percentile(skews, 50), harness.percentile(skews, 95),
+        harness.percentile(skews, 99), max(skews), rate,
+        " ".join("%s=%d" % (key, stats[key]) for key in sorted(stats) if key != 'fired')))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Alarm dispatch skew and throughput")
+    parser.add_argument('--alarms', type=int, default=100000)
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--db-latency', type=float, default=0.002)
+    parser.add_argument('--lead', type=float, default=3.0)
+    parser.add_argument('--late', type=float, default=40.0)
+    parser.add_argument('--concurrency', type=int, default=dispatch.CONCURRENCY)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+    dispatch.CONCURRENCY = args.concurrency
+
+    unixMinute = int(time.time() // 60) + 10
+    deadline = unixMinute * 60
+    print("alarms=%d in one minute, shards=%d, page=%d, concurrency=%d, PublishBatch %.0fms" % (
+        args.alarms, alarms.SHARDS, dispatch.PAGE_SIZE, dispatch.CONCURRENCY, args.latency * 1e3))
+    print("%-10s %8s %8s %8s %8s %8s %10s" % ("scenario", "fired", "p50(s)", "p95(s)", "p99(s)", "max(s)", "alarms/s"))
+
+    # on time, then an overlapping run on the same window
+    store, sns = setup(args.alarms, args.latency, args.db_latency, unixMinute)
+    offset = deadline - args.lead - time.time()
+    clock = lambda: time.time() + offset
+    notifier = RecordingNotifier(clock)
+    stats, _ = run(notifier, clock)
+    report("on time", notifier, stats)
+    again = RecordingNotifier(clock)
+    stats, _ = run(again, clock)
+    report("overlap", again, stats)
+    counts = delivered(sns)
+    assert len(counts) == args.alarms and max(counts.values()) == 1, "on time: %d delivered" % len(counts)
+
+    # late wakeup
+    store, sns = setup(args.alarms, args.latency, args.db_latency, unixMinute)
+    offset = deadline + args.late - time.time()
+    clock = lambda: time.time() + offset
+    notifier = RecordingNotifier(clock)
+    stats, _ = run(notifier, clock)
+    report("late", notifier, stats)
+    counts = delivered(sns)
+    assert len(counts) == args.alarms and max(counts.values()) == 1, "late: %d delivered" % len(counts)
+
+    # takeover: the first dispatcher dies half way, the second starts once the leases expired
+    store, sns = setup(args.alarms, args.latency, args.db_latency, unixMinute)
+    shift = [deadline - args.lead - time.time()]
+    clock = lambda: time.time() + shift[0]
+    notifier = RecordingNotifier(clock)
+    executor = ThreadPoolExecutor(max_workers=dispatch.CONCURRENCY)
+    def dying(seconds):
+        if len(notifier.skews) >= args.alarms // 2:
+            raise Crash()
+        time.sleep(seconds)
+    stats, _ = run(notifier, clock, dying, executor)
+    # the process dies: the chunks queued are lost, the ones running complete
+    executor.shutdown(wait=True, cancel_futures=True)
+    shift[0] += dispatch.LEASE + 1
+    successor = RecordingNotifier(clock)
+    resumed, _ = run(successor, clock)
+    report("crashed", notifier, stats)
+    report("takeover", successor, resumed)
+    counts = delivered(sns)
+    twice = sum(1 for value in counts.values() if value > 1)
+    assert len(counts) == args.alarms, "takeover: %d delivered" % len(counts)
+    print("")
+    print("takeover: %d alarm(s) delivered twice (the pages in flight at the crash), none lost" % twice)
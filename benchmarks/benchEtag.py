@@ -0,0 +1,48 @@
+import json, logging
+from decimal import Decimal
+import harness, localAws
+
+'''
+benchEtag
+
+Read endpoints polled by a client that already holds the current copy.
+    - before: no If-None-Match, the full body is built and serialized
+    - after : If-None-Match with the ETag of the previous response -> 304
+Reports handler + serialization time (what the runtime does with the
+result) and response bytes per request.
+'''
+
+REPEAT = 2000
+EMAIL = "bench@luple.co.kr"
+
+def serve(handler, event):
+    # returns the serialized response, as the runtime would send it
+    try:
+        return json.dumps(handler.lambda_handler(event, None), default=str)
+    except Exception as e:
+        return json.dumps({"errorMessage": str(e)})
+
+def measure(label, handler, event):
+    first = json.loads(serve(handler, event))
+    tag = first["headers"]["ETag"]
+    conditional = dict(event, params={"header": {"If-None-Match": tag}})
+    for name, ev in (("before", event), ("after ", conditional)):
+        size = len(serve(handler, ev))
+        samples = harness.timeit(lambda: serve(handler, ev), REPEAT)
+        harness.report("%s %-20s %5d bytes" % (name, label, size), samples)
+
+if __name__ == '__main__':
+    logging.disable(logging.CRITICAL)
+    store = localAws.install({"TABLE_NAME": ("User-Bench", "email", None)})
+    store.tables["User-Bench"].put(localAws.normalize({
+        "email": EMAIL, "userName": "bench", "age": 30, "sex": 0, "version": 1602300000000,
+        "gps": {"latitude": Decimal("37.5"), "longitude": Decimal("127.0")},
+        "problems": [{"problem": idx % 8, "priority": idx + 1} for idx in range(8)],
+        "profile": {"wakeUpTime": {"hh": 7, "mm": 0}, "sleepTime": {"hh": 23, "mm": 0},
+                    "effectiveDays": list(range(1, 8))},
+    }))
+    event = {"email": EMAIL}
+    measure("getUser", harness.loadHandler("getUser"), event)
+    measure("getProfileId", harness.loadHandler("getProfileId"), event)
+    measure("getDeviceCapabilities", harness.loadHandler("getDeviceCapabilities"), event)
+    measure("getNumberOfTasks", harness.loadHandler("getNumberOfTasks"), event)
@@ -0,0 +1,282 @@
+import os, json, time, datetime, argparse, logging
+from decimal import Decimal
+import harness, localAws
+from common import db, cache, tasks, outbox
+
+'''
+benchHandlers
+
+Drives fixture events through every lambda_handler against the local
+stand-ins (DynamoDB, SNS, Cognito, Lambda) and reports per endpoint:
+    - p50 / p95 / p99 latency of the handler call
+    - DynamoDB calls and other AWS calls per request
+    - bytes returned (the serialized result, or the error message)
+    - status codes seen
+
+Usage (from the repository root):
+    python benchmarks/benchHandlers.py [--repeat 200] [--latency 0.005] [--only getTask]
+--latency injects that many seconds into every AWS call.
+Per-request setup (seeding the row a DELETE removes, ...) is not timed.
+'''
+
+EMAIL = "bench@luple.co.kr"
+TASKS = 2000
+DIARIES = 400
+DAY = 24 * 60 * 60
+FIRST_START = 1577836800 + 9 * 60 * 60   # 2020-01-01 09:00 UTC
+
+TABLES = {
+    "USER_TABLE": ("User-Bench", "email", None),
+    "SETTINGS_TABLE": ("Settings-Bench", "email", None),
+    "RECORDS_TABLE": ("Records-Bench", "email", "taskId", {
+        "typeStart-index": ("email", "typeStart"),
+        "startTime-index": ("email", "startTime"),
+    }),
+    "SLEEP_TABLE": ("Sleep-Bench", "email", "diaryDate"),
+    "SOLUTION_TABLE": ("Solution-Bench", "email", None),
+    "PLAN_TABLE": ("Plan-Bench", "email", "planDate"),
+    "SCORE_TABLE": ("Score-Bench", "email", "scoreDate"),
+    "ALARM_TABLE": ("Alarm-Bench", "email", "alarmId"),
+    "ALARM_BUCKET_TABLE": ("AlarmBucket-Bench", "bucket", "alarmKey"),
+}
+
+ENVIRONMENT = {
+    "URI_USER": "/user",
+    "URI_PROFILE": "/user/profile",
+    "SNS_ARN": "arn:aws:sns:ap-northeast-2:000000000000:createUserTopic",
+    "COGNITO": "cognito-idp",
+    "COGNITIVE_USER_POOL": "ap-northeast-2_bench",
+    "LAMBDA_ARN": "arn:aws:lambda:ap-northeast-2:000000000000:function:deleteUser",
+    "TYPE_START_INDEX": "typeStart-index",
+    "START_TIME_INDEX": "startTime-index",
+}
+
+PROFILE = {"wakeUpTime": {"hh": 7, "mm": 0}, "sleepTime": {"hh": 23, "mm": 0}, "effectiveDays": [1, 2, 3, 4, 5]}
+
+def dateOf(unixtime):
+    return datetime.datetime.fromtimestamp(unixtime).strftime("%Y%m%d")
+
+def taskItem(email, idx):
+    startTime = FIRST_START + (idx // 5) * DAY + (idx % 5) * 600
+    taskType = idx % 5
+    return {
+        "email": email,
+        "taskId": "%s-%s-%d" % (email.split("@")[0], dateOf(startTime), idx),
+        "taskType": taskType,
+        "startTime": startTime,
+        "elapsedTime": 300 + idx % 900,
+        "typeStart": tasks.typeStartKey(taskType, startTime),
+    }
+
+def diaryItem(email, idx):
+    return {
+        "email": email,
+        "diaryDate": int(dateOf(FIRST_START + idx * DAY)),
+        "timeToSleep": idx % 5,
+        "numOfWakeUp": idx % 4,
+        "differenceTime": idx % 6,
+        "disturbance": [idx % 12],
+        "textMessage": "slept %d" % idx,
+        "sleepScore": Decimal("3.5"),
+    }
+
+def userItem(email):
+    return {
+        "email": email, "userName": email.split("@")[0], "age": 30, "sex": 0, "version": 1,
+        "gps": {"latitude": Decimal("37.5"), "longitude": Decimal("127.0")},
+        "problems": [{"problem": 1, "priority": 1}, {"problem": 3, "priority": 2}],
+        "profile": PROFILE,
+    }
+
+def put(store, envName, item):
+    store.tables[TABLES[envName][0]].put(localAws.normalize(item))
+
+def seed(store):
+    put(store, "USER_TABLE", userItem(EMAIL))
+    put(store, "SETTINGS_TABLE", {"email": EMAIL, "lang": 0, "version": 1, "agreement": {"gpsService": True}})
+    for idx in range(TASKS):
+        put(store, "RECORDS_TABLE", taskItem(EMAIL, idx))
+    for idx in range(DIARIES):
+        put(store, "SLEEP_TABLE", diaryItem(EMAIL, idx))
+
+'''
+Fixtures
+
+endpoint label -> (function directory, table environment variable or None,
+                   event(i), setup(i) or None)
+'''
+def fixtures(store, cognito):
+    someTask = taskItem(EMAIL, 10)
+
+    def seedTask(i):
+        put(store, "RECORDS_TABLE", dict(taskItem(EMAIL, 10), taskId="bench-20200101-del%d" % i))
+
+    def seedDiary(i):
+        put(store, "SLEEP_TABLE", dict(diaryItem(EMAIL, 0), diaryDate=int(dateOf(FIRST_START - (i + 1) * DAY))))
+
+    def seedProfile(i):
+        put(store, "USER_TABLE", userItem(EMAIL))
+
+    def seedCognito(i):
+        cognito.users["gone-%d" % i] = {"email": "gone-%d@luple.co.kr" % i}
+
+    def seedGoneUser(i):
+        email = "gone-%d@luple.co.kr" % i
+        seedCognito(i)
+        put(store, "USER_TABLE", userItem(email))
+        put(store, "SETTINGS_TABLE", {"email": email, "lang": 0})
+        for idx in range(50):
+            put(store, "RECORDS_TABLE", taskItem(email, idx))
+        for idx in range(30):
+            put(store, "SLEEP_TABLE", diaryItem(email, idx))
+
+    def solutionEvent(i):
+        return {"Records": [{
+            "messageId": "m-%d-%d" % (i, idx), "eventSource": "aws:sqs",
+            "body": json.dumps({"email": "new-%d-%d@luple.co.kr" % (i, idx), "userName": "new", "age": 30}),
+        } for idx in range(10)]}
+
+    def importEvent(i):
+        # 30 days of history per call, each call after the previous one
+        lines = [json.dumps(dict(diaryItem(EMAIL, idx), email=None, sleepScore=3.5,
+                                 diaryDate=dateOf(FIRST_START - (30 * (i + 1) - idx) * DAY))) for idx in range(30)]
+        return {"email": "import@luple.co.kr", "body": "\n".join(lines)}
+
+    since = FIRST_START + (TASKS // 5 - 30) * DAY
+    newUser = {"userName": "new", "problems": [{"problem": 1, "priority": 1}], "age": 30,
+               "gps": {"latitude": 37.5, "longitude": 127.0}, "sex": 0, "profile": PROFILE}
+
+    return [
+        ("getRoot", "getRoot", None, lambda i: {}, None),
+        ("getAlarm", "getAlarm", None, lambda i: {"email": EMAIL}, None),
+        ("putAlarm", "putAlarm", None, lambda i: {"email": EMAIL, "alarmId": "alarm%d" % (i % 10), "body-json": {
+            "taskType": i % 5, "time": {"hh": 7, "mm": i % 60}, "days": [1, 2, 3, 4, 5], "utcOffset": 540}}, None),
+        ("getSolutionTasksDaily", "getSolutionTasksDaily", None, lambda i: {"email": EMAIL}, None),
+        ("getSolutionTasksDailyScore", "getSolutionTasksDailyScore", None, lambda i: {"email": EMAIL}, None),
+        ("getSolutionTasksNumberOfTasks", "getSolutionTasksNumberOfTasks", None, lambda i: {"email": EMAIL}, None),
+        ("getSolutionTasksSchedule", "getSolutionTasksSchedule", "USER_TABLE", lambda i: {"email": EMAIL, "until": None}, None),
+        ("getSolutionTasksWeekly", "getSolutionTasksWeekly", "RECORDS_TABLE", lambda i: {"email": EMAIL, "weeks": 52}, None),
+        ("getDeviceCapabilities", "getDeviceCapabilities", None, lambda i: {"email": EMAIL}, None),
+        ("getNumberOfTasks", "getNumberOfTasks", None, lambda i: {"email": EMAIL}, None),
+        ("getUser", "getUser", "USER_TABLE", lambda i: {"email": EMAIL}, None),
+        ("getProfileId", "getProfileId", "USER_TABLE", lambda i: {"email": EMAIL}, None),
+        ("getNumberOfProfiles", "getNumberOfProfiles", "USER_TABLE", lambda i: {"emailFake": EMAIL}, None),
+        ("getDevice", "getDevice", "SETTINGS_TABLE", lambda i: {"email": EMAIL}, None),
+        ("postUser", "postUser", "USER_TABLE",
+         lambda i: {"email": "new-%d@luple.co.kr" % i, "body-json": newUser}, None),
+        ("putUser", "putUser", "USER_TABLE",
+         lambda i: {"email": EMAIL, "url": "/user", "body-json": {"age": 31, "profile": {"sleepTime": {"hh": 22, "mm": 30}}}}, None),
+        ("putUser /profile", "putUser", "USER_TABLE",
+         lambda i: {"email": EMAIL, "url": "/user/profile", "body-json": {"wakeUpTime": {"hh": 6, "mm": 30}}}, None),
+        ("deleteProfileId", "deleteProfileId", "USER_TABLE", lambda i: {"email": EMAIL}, seedProfile),
+        ("putDevice", "putDevice", "SETTINGS_TABLE", lambda i: {"email": EMAIL, "body-json": {"lang": 1}}, None),
+        ("getTask all", "getTask", "RECORDS_TABLE",
+         lambda i: {"email": EMAIL, "all": True, "taskId": "", "limit": 100}, None),
+        ("getTask taskId", "getTask", "RECORDS_TABLE",
+         lambda i: {"email": EMAIL, "all": False, "taskId": someTask["taskId"]}, None),
+        ("getTask taskType+since", "getTask", "RECORDS_TABLE",
+         lambda i: {"email": EMAIL, "all": False, "taskId": "", "taskType": 2, "since": since}, None),
+        ("postTask", "postTask", "RECORDS_TABLE",
+         lambda i: {"email": EMAIL, "body-json": {"taskType": 1, "startTime": FIRST_START + i, "elapsedTime": 60}}, None),
+        ("postTask batch x20", "postTask", "RECORDS_TABLE",
+         lambda i: {"email": EMAIL, "body-json": {"tasks": [{"taskType": n % 5, "startTime": FIRST_START + i * 20 + n,
+                                                             "elapsedTime": 60} for n in range(20)]}}, None),
+        ("putTask", "putTask", "RECORDS_TABLE",
+         lambda i: {"email": EMAIL, "taskId": someTask["taskId"], "body-json": {"elapsedTime": 100 + i}}, None),
+        ("deleteTask", "deleteTask", "RECORDS_TABLE",
+         lambda i: {"email": EMAIL, "taskId": "bench-20200101-del%d" % i}, seedTask),
+        ("getSleepDiary", "getSleepDiary", "SLEEP_TABLE",
+         lambda i: {"email": EMAIL, "since": FIRST_START + (DIARIES - 60) * DAY, "limit": 100}, None),
+        ("getSleepDiary stats", "getSleepDiary", "SLEEP_TABLE",
+         lambda i: {"email": EMAIL, "since": FIRST_START + (DIARIES - 90) * DAY, "stats": True}, None),
+        ("postSleepDiary", "postSleepDiary", "SLEEP_TABLE",
+         lambda i: {"email": EMAIL, "body-json": dict(diaryItem(EMAIL, 0), diaryDate=dateOf(FIRST_START + (DIARIES + i) * DAY),
+                                                       sleepScore=4.5, email=None)}, None),
+        ("putSleepDiary", "putSleepDiary", "SLEEP_TABLE",
+         lambda i: {"email": EMAIL, "diaryDate": dateOf(FIRST_START), "body-json": {"sleepScore": 4}}, None),
+        ("importSleepDiary x30", "importSleepDiary", "SLEEP_TABLE", importEvent, None),
+        ("deleteSleepDiary", "deleteSleepDiary", "SLEEP_TABLE",
+         lambda i: {"email": EMAIL, "diaryDate": dateOf(FIRST_START - (i + 1) * DAY)}, seedDiary),
+        ("deleteUserGateway", "deleteUserGateway", None,
+         lambda i: {"email": "gone-%d@luple.co.kr" % i, "userName": "gone-%d" % i}, seedCognito),
+        ("deleteUser", "deleteUser", None,
+         lambda i: {"email": "gone-%d@luple.co.kr" % i, "userName": "gone-%d" % i}, seedGoneUser),
+        ("createSolution x10", "createSolution", "SOLUTION_TABLE", solutionEvent, None),
+    ]
+
+def statusOf(result, error):
+    if error is None:
+        return result.get("statusCode", 200) if isinstance(result, dict) else 200
+    try:
+        return json.loads(str(error))["statusCode"]
+    except (ValueError, KeyError, TypeError):
+        try:
+            return error.args[0]["statusCode"]
+        except (IndexError, KeyError, TypeError):
+            return type(error).__name__
+
+def run(label, module, event, setup, repeat, services, functionName):
+    samples = []
+    ddbCalls = 0
+    otherCalls = 0
+    sizes = []
+    statuses = dict()
+    for i in range(repeat):
+        if setup is not None:
+            setup(i)
+        ev = event(i)
+        for service in services:
+            service.resetStats()
+        context = harness.Context(functionName)
+        result, error = None, None
+        start = time.perf_counter()
+        try:
+            result = module.lambda_handler(ev, context)
+        except Exception as e:
+            error = e
+        samples.append(time.perf_counter() - start)
+        # publishes of the background outbox belong to this request
+        outbox.flush(5)
+        ddbCalls += services[0].totalCalls()
+        otherCalls += sum(service.totalCalls() for service in services[1:])
+        sizes.append(len(json.dumps(result, default=str)) if error is None else len(str(error)))
+        status = statusOf(result, error)
+        statuses[status] = statuses.get(status, 0) + 1
+    return samples, ddbCalls / float(repeat), otherCalls / float(repeat), sum(sizes) / float(repeat), statuses
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run every lambda handler against the local stand-ins")
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every AWS call")
+    parser.add_argument('--only', default=None, help="run endpoints whose label starts with this")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    os.environ.update(ENVIRONMENT)
+    latency = {"*": args.latency} if args.latency else None
+    store = localAws.install(TABLES, latency)
+    sns = localAws.installSns([ENVIRONMENT["SNS_ARN"]], latency)
+    cognito = localAws.installCognito(None, latency)
+    lambdaClient = localAws.installLambda(latency)
+    services = [store, sns, cognito, lambdaClient]
+    seed(store)
+
+    print("%-30s %6s %10s %10s %10s %8s %8s %9s  %s" % (
+        "endpoint", "n", "p50(us)", "p95(us)", "p99(us)", "ddb/req", "aws/req", "bytes", "status"))
+    for label, functionName, envName, event, setup in fixtures(store, cognito):
+        if args.only and not label.startswith(args.only):
+            continue
+        if envName is not None:
+            # every handler reads TABLE_NAME: drop cached Table handles when it changes
+            os.environ["TABLE_NAME"] = os.environ[envName]
+            db.setResource("dynamodb", db.getResource("dynamodb"))
+        cache.clear()
+        module = harness.loadHandler(functionName)
+        samples, ddb, other, size, statuses = run(label, module, event, setup, args.repeat, services, functionName)
+        print("%-30s %6d %10.1f %10.1f %10.1f %8.2f %8.2f %9.0f  %s" % (
+            label, len(samples),
+            harness.percentile(samples, 50) * 1e6,
+            harness.percentile(samples, 95) * 1e6,
+            harness.percentile(samples, 99) * 1e6,
+            ddb, other, size,
+            " ".join("%s:%d" % (k, v) for k, v in sorted(statuses.items(), key=lambda kv: str(kv[0])))))
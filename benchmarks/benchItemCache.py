@@ -0,0 +1,70 @@
+import os, random, logging
+import harness, localAws
+from common import db, cache
+
+'''
+benchItemCache
+
+Repeated getUser / getDevice / getProfileId polls (app opens) from 500
+users with a skewed popularity, served by one warm container.
+    - before: CACHE_TTL=0, every poll is a get_item
+    - after : default TTL, polls within the TTL are served from the cache
+Time is simulated: READS polls spread evenly over SPAN seconds.
+Reports get_item calls, consumed read capacity and cache counters.
+'''
+
+USERS = 500
+READS = 20000
+SPAN = 600.0
+
+def seed(store):
+    for idx in range(USERS):
+        email = "user-%d@luple.co.kr" % idx
+        store.tables["User-Bench"].put(localAws.normalize({
+            "email": email, "userName": "user-%d" % idx, "age": 30, "version": 1,
+            "problems": [{"problem": 1, "priority": 1}],
+            "profile": {"wakeUpTime": {"hh": 7, "mm": 0}, "sleepTime": {"hh": 23, "mm": 0}, "effectiveDays": [1, 2, 3]},
+        }))
+        store.tables["Settings-Bench"].put(localAws.normalize({
+            "email": email, "lang": 0, "version": 1, "agreement": {"gpsService": True},
+        }))
+
+def workload():
+    rng = random.Random(7)
+    weights = [1.0 / (rank + 1) for rank in range(USERS)]
+    users = rng.choices(range(USERS), weights, k=READS)
+    functions = rng.choices(["getUser", "getDevice", "getProfileId"], k=READS)
+    return ["user-%d@luple.co.kr" % user for user in users], functions
+
+def run(store, handlers, emails, functions, ttl):
+    clock = [0.0]
+    cache._cache.ttl = ttl
+    cache._cache.clock = lambda: clock[0]
+    cache.clear()
+    store.resetStats()
+    current = None
+    for idx, (email, functionName) in enumerate(zip(emails, functions)):
+        clock[0] = idx * SPAN / READS
+        envName = "SETTINGS_TABLE" if functionName == "getDevice" else "USER_TABLE"
+        if envName != current:
+            # every handler reads TABLE_NAME: drop the cached Table handle when it changes
+            os.environ["TABLE_NAME"] = os.environ[envName]
+            db.setResource("dynamodb", db.getResource("dynamodb"))
+            current = envName
+        handlers[functionName].lambda_handler({"email": email}, None)
+    return store.calls["GetItem"], sum(store.capacity.values()), cache.stats()
+
+if __name__ == '__main__':
+    logging.disable(logging.CRITICAL)
+    store = localAws.install({
+        "USER_TABLE": ("User-Bench", "email", None),
+        "SETTINGS_TABLE": ("Settings-Bench", "email", None),
+    })
+    seed(store)
+    handlers = dict((name, harness.loadHandler(name)) for name in ["getUser", "getDevice", "getProfileId"])
+    emails, functions = workload()
+
+    calls, rcu, stats = run(store, handlers, emails, functions, 0)
+    print("before: get_item=%5d  rcu=%7.1f" % (calls, rcu))
+    calls, rcu, stats = run(store, handlers, emails, functions, cache.TTL)
+    print("after : get_item=%5d  rcu=%7.1f  ttl=%ds  %s" % (calls, rcu, cache.TTL, stats))
@@ -0,0 +1,137 @@
+import os, sys, json, time, argparse, subprocess, tempfile
+
+'''
+benchLogging
+
+Log volume and logging overhead of the handlers, with output going where
+lambda sends it: a root logger handler in the runtime format, and stdout.
+Each scenario runs in its own interpreter, since the log settings are read
+from the environment at import time:
+    - current tree, defaults
+    - current tree, LOG_SAMPLE_INFO=0.1
+    - --before REV: the same endpoints on another revision (git worktree)
+Reports per endpoint the p50 of the handler call and the log lines and
+bytes written per request.
+
+Usage (from the repository root):
+    python benchmarks/benchLogging.py [--repeat 300] [--before HEAD~1]
+'''
+
+ENDPOINTS = ["getUser", "getDevice", "getProfileId", "putUser", "putUser /profile",
+             "getTask all", "postTask", "deleteTask", "createSolution x10"]
+
+SCENARIOS = [
+    ("defaults", {}),
+    ("INFO 10%", {"LOG_SAMPLE_INFO": "0.1"}),
+]
+
+RUNTIME_FORMAT = "[%(levelname)s]\t%(asctime)s.%(msecs)03dZ\t00000000-0000-0000-0000-000000000000\t%(message)s\n"
+
+'''
+Sink class
+
+File-like object counting what the handlers write.
+'''
+class Sink(object):
+    def __init__(self):
+        self.bytes = 0
+        self.lines = 0
+
+    def write(self, text):
+        self.bytes += len(text)
+        self.lines += text.count("\n")
+
+    def flush(self):
+        pass
+
+def child(root, repeat):
+    # run inside the tree under test: its harness, stand-ins and handlers
+    sys.path.insert(0, os.path.join(root, 'benchmarks'))
+    import logging
+    import harness, localAws, benchHandlers
+    from common import db, cache, outbox
+
+    sink = Sink()
+    rootLogger = logging.getLogger()
+    for handler in list(rootLogger.handlers):
+        rootLogger.removeHandler(handler)
+    runtimeHandler = logging.StreamHandler(sink)
+    runtimeHandler.setFormatter(logging.Formatter(RUNTIME_FORMAT))
+    rootLogger.addHandler(runtimeHandler)
+
+    os.environ.update(benchHandlers.ENVIRONMENT)
+    store = localAws.install(benchHandlers.TABLES)
+    sns = localAws.installSns([benchHandlers.ENVIRONMENT["SNS_ARN"]])
+    cognito = localAws.installCognito(None)
+    services = [store, sns, cognito, localAws.installLambda()]
+    benchHandlers.seed(store)
+
+    results = dict()
+    stdout = sys.stdout
+    for label, functionName, envName, event, setup in benchHandlers.fixtures(store, cognito):
+        if label not in ENDPOINTS:
+            continue
+        os.environ["TABLE_NAME"] = os.environ[envName]
+        db.setResource("dynamodb", db.getResource("dynamodb"))
+        cache.clear()
+        module = harness.loadHandler(functionName)
+        sink.bytes = sink.lines = 0
+        sys.stdout = sink
+        try:
+            samples = benchHandlers.run(label, module, event, setup, repeat, services, functionName)[0]
+            outbox.flush(5)
+        finally:
+            sys.stdout = stdout
+        results[label] = {
+            'p50': harness.percentile(samples, 50),
+            'lines': sink.lines / float(repeat),
+            'bytes': sink.bytes / float(repeat),
+        }
+    return results
+
+def runScenario(root, repeat, env):
+    out = tempfile.NamedTemporaryFile(suffix='.json', delete=False)
+    out.close()
+    try:
+        subprocess.run([sys.executable, os.path.abspath(__file__), '--child', root,
+                        '--repeat', str(repeat), '--out', out.name],
+                       env=dict(os.environ, **env), check=True)
+        with open(out.name) as f:
+            return json.load(f)
+    finally:
+        os.unlink(out.name)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Log volume and logging overhead per endpoint")
+    parser.add_argument('--repeat', type=int, default=300)
+    parser.add_argument('--before', default=None, help="git revision to compare with")
+    parser.add_argument('--child', default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--out', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        with open(args.out, 'w') as f:
+            json.dump(child(args.child, args.repeat), f)
+        sys.exit(0)
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    runs = []
+    if args.before:
+        worktree = tempfile.mkdtemp(prefix='benchLogging-')
+        subprocess.run(['git', 'worktree', 'add', '--detach', worktree, args.before], cwd=root, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            runs.append(("before (%s)" % args.before, runScenario(worktree, args.repeat, {})))
+        finally:
+            subprocess.run(['git', 'worktree', 'remove', '--force', worktree], cwd=root, check=True)
+    for name, env in SCENARIOS:
+        runs.append((name, runScenario(root, args.repeat, env)))
+
+    print("%-20s" % "endpoint" + "".join(" | %-26s" % name for name, results in runs))
+    print("%-20s" % "" + "".join(" | %8s %7s %9s" % ("p50(us)", "lines", "bytes") for run in runs))
+    for label in ENDPOINTS:
+        row = "%-20s" % label
+        for name, results in runs:
+            result = results.get(label)
+            row += " | %8.1f %7.2f %9.0f" % (result['p50'] * 1e6, result['lines'], result['bytes']) if result else " | %26s" % "-"
+        print(row)
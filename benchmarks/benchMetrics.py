@@ -0,0 +1,67 @@
+import os, io, json, argparse, logging, contextlib
+import harness, localAws, benchHandlers
+from common import db, cache, metrics
+
+'''
+benchMetrics
+
+Runs the benchHandlers endpoints twice against fresh stand-ins:
+    - off: METRICS_ENABLED unset, handlers and clients are not wrapped
+    - on : every AWS call recorded, EMF lines emitted per invocation
+Reports the p50 of both runs and, from the emitted lines, the capacity,
+items, scanned items and pages per request of every endpoint.
+
+Usage (from the repository root):
+    python benchmarks/benchMetrics.py [--repeat 100] [--only getTask]
+'''
+
+def install():
+    os.environ.update(benchHandlers.ENVIRONMENT)
+    store = localAws.install(benchHandlers.TABLES)
+    sns = localAws.installSns([benchHandlers.ENVIRONMENT["SNS_ARN"]])
+    cognito = localAws.installCognito(None)
+    lambdaClient = localAws.installLambda()
+    benchHandlers.seed(store)
+    return store, cognito, [store, sns, cognito, lambdaClient]
+
+def runAll(enabled, repeat, only):
+    metrics.ENABLED = enabled
+    store, cognito, services = install()
+    results = dict()
+    for label, functionName, envName, event, setup in benchHandlers.fixtures(store, cognito):
+        if only and not label.startswith(only):
+            continue
+        if envName is not None:
+            os.environ["TABLE_NAME"] = os.environ[envName]
+            db.setResource("dynamodb", db.getResource("dynamodb"))
+        cache.clear()
+        module = harness.loadHandler(functionName)
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            samples = benchHandlers.run(label, module, event, setup, repeat, services, functionName)[0]
+        totals = dict((name, 0.0) for name, unit in metrics.METRICS)
+        for line in out.getvalue().splitlines():
+            document = json.loads(line)
+            for name in totals:
+                totals[name] += document[name]
+        results[label] = (harness.percentile(samples, 50), dict((k, v / repeat) for k, v in totals.items()))
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Overhead and output of the embedded metrics")
+    parser.add_argument('--repeat', type=int, default=100)
+    parser.add_argument('--only', default=None)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    off = runAll(False, args.repeat, args.only)
+    on = runAll(True, args.repeat, args.only)
+
+    print("%-30s %9s %9s %8s %7s %7s %8s %8s %6s" % (
+        "endpoint", "off(us)", "on(us)", "calls", "RCU", "WCU", "items", "scanned", "pages"))
+    for label, (p50Off, unused) in off.items():
+        p50On, perRequest = on[label]
+        print("%-30s %9.1f %9.1f %8.2f %7.2f %7.2f %8.1f %8.1f %6.2f" % (
+            label, p50Off * 1e6, p50On * 1e6, perRequest['Calls'],
+            perRequest['ReadCapacityUnits'], perRequest['WriteCapacityUnits'],
+            perRequest['Items'], perRequest['ScannedItems'], perRequest['Pages']))
@@ -0,0 +1,65 @@
+import json, time
+import harness, localAws
+from boto3.dynamodb.conditions import Key
+from common import db
+
+'''
+benchPagination
+
+getTask(all=true) over one partition of 50k tasks.
+    - single call: what the handler did before (one query, truncated at 1MB)
+    - paged walk : limit/nextToken pages until the end of the partition
+Reports per-call latency, response size and how many tasks were reachable.
+'''
+
+ITEMS = 50000
+LIMIT = 100
+EMAIL = "bench@luple.co.kr"
+
+def load(store):
+    table = store.tables["Records-Bench"]
+    for idx in range(ITEMS):
+        table.put(localAws.normalize({
+            "email": EMAIL,
+            "taskId": "bench-%08d-%d" % (idx // 5, idx),
+            "taskType": idx % 5,
+            "startTime": 1600000000 + idx * 600,
+            "elapsedTime": 300 + idx % 900,
+        }))
+
+def size(response):
+    return len(json.dumps(response, default=str))
+
+if __name__ == '__main__':
+    store = localAws.install({"TABLE_NAME": ("Records-Bench", "email", "taskId")})
+    load(store)
+    getTask = harness.loadHandler("getTask")
+
+    # before: one unbounded query (what the handler used to issue)
+    table = db.getTable("TABLE_NAME")
+    start = time.perf_counter()
+    res = table.query(ProjectionExpression="taskType, taskId, startTime, elapsedTime",
+                      KeyConditionExpression=Key("email").eq(EMAIL))
+    elapsed = time.perf_counter() - start
+    print("before: single query  items=%d of %d  bytes=%d  latency=%.1fms  truncated=%s" % (
+        len(res["Items"]), ITEMS, size({"body": res["Items"]}), elapsed * 1000, "LastEvaluatedKey" in res))
+
+    # after: walk every page
+    samples = []
+    sizes = []
+    seen = 0
+    token = None
+    while True:
+        event = {"email": EMAIL, "all": True, "taskId": "", "limit": LIMIT}
+        if token:
+            event["nextToken"] = token
+        start = time.perf_counter()
+        res = getTask.lambda_handler(event, None)
+        samples.append(time.perf_counter() - start)
+        sizes.append(size(res))
+        seen += len(res["body"])
+        token = res["nextToken"]
+        if token is None:
+            break
+    harness.report("after : page of %d" % LIMIT, samples)
+    print("after : pages=%d items=%d of %d  bytes/page max=%d" % (len(samples), seen, ITEMS, max(sizes)))
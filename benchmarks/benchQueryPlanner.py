@@ -0,0 +1,71 @@
+import os
+import harness, localAws
+from common import tasks
+
+'''
+benchQueryPlanner
+
+getTask filter combinations over one partition of 20k tasks, with and
+without the secondary indexes of tools/migrateTaskIndex.py.
+    - before: no index environment variables, every filter is a FilterExpression
+    - after : TYPE_START_INDEX / START_TIME_INDEX set, filters become key conditions
+Reports consumed read capacity and query calls for a full paged walk.
+'''
+
+ITEMS = 20000
+LIMIT = 500
+EMAIL = "bench@luple.co.kr"
+SINCE = 1600000000 + (ITEMS - 500) * 600
+
+CASES = [
+    ("taskType", {"taskType": 3}),
+    ("taskType+since", {"taskType": 3, "since": SINCE}),
+    ("since", {"since": SINCE}),
+]
+
+def load(store):
+    table = store.tables["Records-Bench"]
+    for idx in range(ITEMS):
+        taskType = idx % 5
+        startTime = 1600000000 + idx * 600
+        table.put(localAws.normalize({
+            "email": EMAIL,
+            "taskId": "bench-%08d-%d" % (idx // 5, idx),
+            "taskType": taskType,
+            "startTime": startTime,
+            "elapsedTime": 300 + idx % 900,
+            "typeStart": tasks.typeStartKey(taskType, startTime),
+        }))
+
+def walk(store, getTask, filters):
+    store.resetStats()
+    seen = 0
+    token = None
+    while True:
+        event = dict(filters, email=EMAIL, all=False, taskId="", limit=LIMIT)
+        if token:
+            event["nextToken"] = token
+        res = getTask.lambda_handler(event, None)
+        seen += len(res["body"])
+        token = res["nextToken"]
+        if token is None:
+            return seen, sum(store.capacity.values()), store.calls["Query"]
+
+if __name__ == '__main__':
+    store = localAws.install({"TABLE_NAME": ("Records-Bench", "email", "taskId", {
+        "typeStart-index": ("email", "typeStart"),
+        "startTime-index": ("email", "startTime"),
+    })})
+    load(store)
+    getTask = harness.loadHandler("getTask")
+
+    for label, filters in CASES:
+        os.environ.pop("TYPE_START_INDEX", None)
+        os.environ.pop("START_TIME_INDEX", None)
+        before = walk(store, getTask, filters)
+        os.environ["TYPE_START_INDEX"] = "typeStart-index"
+        os.environ["START_TIME_INDEX"] = "startTime-index"
+        after = walk(store, getTask, filters)
+        print("%-15s items=%5d  before: rcu=%8.1f queries=%3d  after: rcu=%8.1f queries=%3d" % (
+            label, before[0], before[1], before[2], after[1], after[2]))
+        assert before[0] == after[0]
@@ -0,0 +1,134 @@
+import json, logging
+import harness
+from common import schema
+
+'''
+benchSchema
+
+Validation cost of the compiled schema (after) against the checkCapability +
+checkNonExistCapability pair that used to be copied into putUser/postUser
+(before, reproduced below) on typical, large and adversarial user bodies.
+'''
+
+REPEAT = 200
+
+logger = logging.getLogger("legacy")
+logger.setLevel(logging.INFO)
+logger.addHandler(logging.NullHandler())
+logger.propagate = False
+
+def legacyCheckCapability(body):
+    items = ["userName", "age", "problems", "profile", "sex", "language"]
+    for item in items:
+        if item in body:
+            try:
+                if item == 'userName':
+                    assert type(body[item]) is str
+                    assert 1 <= len(body[item]) <= 255
+                elif item == 'age':
+                    assert type(body[item]) is int
+                    assert 0 <= body[item] <= 150
+                elif item == 'problems':
+                    checkPriority = False
+                    for problem in body[item]:
+                        assert type(problem['problem']) is int
+                        assert problem['problem'] in [0, 1, 2, 3, 4, 5, 6, 7]
+                        if problem['priority'] == 1:
+                            checkPriority = True
+                    assert checkPriority is True
+                elif item == 'profile':
+                    if 'wakeUpTime' in body[item]:
+                        assert type(body[item]['wakeUpTime']['hh']) is int
+                        assert 0 <= body[item]['wakeUpTime']['hh'] < 24
+                        assert type(body[item]['wakeUpTime']['mm']) is int
+                        assert 0 <= body[item]['wakeUpTime']['mm'] < 60
+                    if 'sleepTime' in body[item]:
+                        assert type(body[item]['sleepTime']['hh']) is int
+                        assert 0 <= body[item]['sleepTime']['hh'] < 24
+                        assert type(body[item]['sleepTime']['mm']) is int
+                        assert 0 <= body[item]['sleepTime']['mm'] < 60
+                elif item == 'sex':
+                    assert type(body[item]) is int
+                    assert body[item] in [0, 1, 2]
+            except:
+                raise Exception(json.dumps({
+                    'statusCode': 400,
+                    'message': 'Invalid Input: ' + item + " -> " + str(body[item])
+                }))
+    return True
+
+def legacyCheckItemsDfs(body, visited, userItems):
+    for key in body.keys():
+        if key not in visited:
+            logger.info(key)
+            if key not in userItems:
+                raise Exception(json.dumps({'statusCode': 400, 'message': "Bad Request"}))
+            visited.append(key)
+            if type(body[key]) == dict:
+                legacyCheckItemsDfs(body[key], visited, userItems)
+            elif type(body[key]) == list:
+                for item in body[key]:
+                    if type(item) == dict:
+                        legacyCheckItemsDfs(item, visited, userItems)
+    return True
+
+def legacy(body):
+    userItems = ["userName", "problems", "problem", "priority", "age", "gps", "latitude", "longitude", "sex", "profile", "wakeUpTime", "hh", "mm", "sleepTime", "effectiveDays"]
+    legacyCheckCapability(body)
+    legacyCheckItemsDfs(body, [], userItems)
+
+def compiled(body):
+    schema.validate('user', body)
+
+def typicalBody():
+    return {
+        "userName": "hero",
+        "age": 31,
+        "sex": 1,
+        "gps": {"latitude": 37.5, "longitude": 127.0},
+        "problems": [{"problem": 1, "priority": 1}, {"problem": 4, "priority": 2}],
+        "profile": {
+            "wakeUpTime": {"hh": 7, "mm": 0},
+            "sleepTime": {"hh": 23, "mm": 30},
+            "effectiveDays": [1, 2, 3, 4, 5],
+        },
+    }
+
+def largeBody():
+    body = typicalBody()
+    body["problems"] = [{"problem": i % 8, "priority": i + 1} for i in range(schema.MAX_LIST)]
+    return body
+
+def longListBody():
+    body = typicalBody()
+    body["problems"] = [{"problem": i % 8, "priority": 1} for i in range(20000)]
+    return body
+
+def deepBody():
+    body = typicalBody()
+    node = {"hh": 1}
+    for _ in range(500):
+        node = {"effectiveDays": node}
+    body["profile"]["effectiveDays"] = [node]
+    return body
+
+def wideBody():
+    body = typicalBody()
+    body["profile"]["effectiveDays"] = [{"hh": i, "mm": i} for i in range(20000)]
+    return body
+
+def run(label, validator, body):
+    def call():
+        try:
+            validator(body)
+        except Exception:
+            pass
+    harness.report(label, harness.timeit(call, REPEAT))
+
+if __name__ == '__main__':
+    for name, factory in [("typical", typicalBody), ("large", largeBody),
+                          ("20k problems", longListBody), ("500-deep", deepBody),
+                          ("20k opaque dicts", wideBody)]:
+        body = factory()
+        run("before %-16s" % name, legacy, body)
+        run("after  %-16s" % name, compiled, body)
@@ -0,0 +1,63 @@
+import os, json, time, logging
+import harness, localAws
+from common import db, outbox
+
+'''
+benchSignup
+
+postUser latency with simulated network round trips (5ms DynamoDB, 25ms SNS).
+    - before: get_item + put_item, a ListTopics sweep over every topic of the
+              account, then a synchronous Publish (replayed call for call)
+    - after : the handler (conditional put_item, publish through the outbox,
+              flushed before the response)
+Also checks that every queued message is delivered, with SNS failing every
+third entry.
+'''
+
+REPEAT = 50
+TOPICS = ["arn:aws:sns:ap-northeast-2:000000000000:topic-%d" % idx for idx in range(300)]
+SNS_ARN = TOPICS[0]
+BODY = {"userName": "bench", "problems": [{"problem": 1, "priority": 1}], "age": 30,
+        "gps": {"latitude": 37.5, "longitude": 127.0}, "sex": 0, "profile": {}}
+
+def legacySignup(email):
+    table = db.getTable("TABLE_NAME")
+    table.get_item(Key={"email": email})
+    table.put_item(Item={"email": email, "userName": BODY["userName"]})
+    sns = db.getClient("sns")
+    res = sns.list_topics()
+    while "NextToken" in res:
+        res = sns.list_topics(NextToken=res["NextToken"])
+    sns.publish(TopicArn=SNS_ARN, Message=json.dumps({"email": email}))
+
+def signup(postUser, email):
+    try:
+        postUser.lambda_handler({"email": email, "body-json": BODY}, None)
+    except Exception as e:
+        assert json.loads(str(e))["statusCode"] == 202, str(e)
+
+if __name__ == '__main__':
+    logging.disable(logging.CRITICAL)
+    os.environ["SNS_ARN"] = SNS_ARN
+    localAws.install({"TABLE_NAME": ("User-Bench", "email", None)}, latency={"*": 0.005})
+    sns = localAws.installSns(TOPICS, latency={"*": 0.025})
+    postUser = harness.loadHandler("postUser")
+
+    counter = iter(range(10 ** 6))
+    samples = harness.timeit(lambda: legacySignup("before-%d@luple.co.kr" % next(counter)), REPEAT)
+    harness.report("before: sync publish + ListTopics", samples)
+
+    sns.messages.clear()
+    sns.resetStats()
+    samples = harness.timeit(lambda: signup(postUser, "after-%d@luple.co.kr" % next(counter)), REPEAT)
+    harness.report("after : outbox", samples)
+    left = outbox.flush(10)
+    print("after : delivered=%d of %d  left=%d  sns calls=%s" % (
+        len(sns.messages[SNS_ARN]), REPEAT, left, dict(sns.calls)))
+
+    sns = localAws.installSns(TOPICS, latency={"*": 0.025}, failEvery=3)
+    for idx in range(REPEAT):
+        signup(postUser, "retry-%d@luple.co.kr" % idx)
+    left = outbox.flush(30)
+    print("retry : delivered=%d of %d  left=%d  sns calls=%s" % (
+        len(sns.messages[SNS_ARN]), REPEAT, left, dict(sns.calls)))
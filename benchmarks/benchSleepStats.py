@@ -0,0 +1,100 @@
+import os, json, time, random, argparse, logging
+from decimal import Decimal
+import harness, localAws
+from benchWeekly import Replay
+from common import db, plans, columns
+
+'''
+benchSleepStats
+
+getSleepDiary for a user with DAYS days of diaries (one missing now and
+then), over the whole range:
+    - rows   : every page of the diaries, what a client downloads today to
+               draw a trend line
+    - stats  : the stats mode (sleepStats module), with and without numpy
+Reports the calls and bytes of the bodies (json). For the stats mode, the
+query page is recorded once and replayed (benchWeekly.Replay) to report the
+p50 / p95 CPU time (process_time) of the summary alone; the numpy and the
+list summaries must agree.
+
+Usage (from the repository root):
+    python benchmarks/benchSleepStats.py [--repeat 50] [--days 365]
+'''
+
+EMAIL = "sleep@luple.co.kr"
+DAY = 24 * 60 * 60
+
+TABLES = {
+    "SLEEP_TABLE": ("Sleep-Bench", "email", "diaryDate"),
+}
+
+def seed(store, days, now):
+    rng = random.Random(5)
+    count = 0
+    for day in range(days):
+        if rng.random() < 0.15:
+            continue
+        store.tables["Sleep-Bench"].put(localAws.normalize({
+            "email": EMAIL, "diaryDate": plans.dateOf(now - day * DAY),
+            "timeToSleep": rng.randrange(5), "numOfWakeUp": rng.randrange(5), "differenceTime": rng.randrange(6),
+            "disturbance": sorted(rng.sample(range(12), rng.randrange(4))),
+            "textMessage": "slept %d" % day, "sleepScore": Decimal(str(rng.randrange(11) / 2.0)),
+        }))
+        count += 1
+    return count
+
+def rows(handler, since):
+    event = {"email": EMAIL, "since": since, "limit": 500}
+    body = []
+    while True:
+        res = handler.lambda_handler(event, None)
+        body += res["body"]
+        if not res["nextToken"]:
+            return body
+        event["nextToken"] = res["nextToken"]
+
+def cpuSamples(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.process_time()
+        func()
+        samples.append(time.process_time() - start)
+    return samples
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Sleep trends: raw rows against the stats mode")
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--days', type=int, default=365)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    now = time.time()
+    store = localAws.install(TABLES)
+    os.environ["TABLE_NAME"] = os.environ["SLEEP_TABLE"]
+    diaries = seed(store, args.days + 30, now)
+    since = now - (args.days - 1) * DAY
+    handler = harness.loadHandler("getSleepDiary")
+
+    numpy = columns.getNumpy()
+    store.resetStats()
+    body = rows(handler, since)
+    print("diaries=%d days=%d" % (diaries, args.days))
+    print("%-8s %7s %10s %10s %10s" % ("", "calls", "bytes", "p50(ms)", "p95(ms)"))
+    print("%-8s %7d %10d %10s %10s" % ("rows", store.totalCalls(), len(json.dumps(body, default=float)), "-", "-"))
+
+    replay = Replay(db.getResource("dynamodb").meta.client)
+    db.setClient("dynamodb", replay)
+    stats = lambda: handler.lambda_handler({"email": EMAIL, "since": since, "stats": True}, None)["body"]
+    results = dict()
+    for name in ("lists", "numpy") if numpy is not None else ("lists",):
+        columns._numpy = numpy if name == "numpy" else False
+        results[name] = stats()
+        calls = len(replay.pages)
+        samples = cpuSamples(stats, args.repeat)
+        print("%-8s %7d %10d %10.2f %10.2f" % (name, calls, len(json.dumps(results[name])),
+                                             harness.percentile(samples, 50) * 1e3, harness.percentile(samples, 95) * 1e3))
+    columns._numpy = None
+
+    if "numpy" in results:
+        assert results["numpy"] == results["lists"], "numpy disagrees with lists"
+        print("variants agree")
@@ -0,0 +1,77 @@
+import os, json, time, argparse, logging
+import harness, localAws
+
+'''
+benchTaskBatch
+
+A phone syncing TASKS tasks recorded offline, against the local DynamoDB
+stand-in where every call takes --latency seconds:
+    - single : one postTask request per task, back to back (what the app
+               does today)
+    - batch  : one postTask request with {"tasks": [...]}
+    - batch, throttled : the same with every 3rd BatchWriteItem request
+               coming back unprocessed (retried by bulk.tryBatchWrite)
+Reports the requests, the DynamoDB calls, the write units, the wall time and
+the tasks stored. All the tasks are posted within the same second, which
+used to overwrite one another: a single post now retries on the next
+suffix, and the failed conditional writes show in its calls and WCU.
+
+Usage (from the repository root):
+    python benchmarks/benchTaskBatch.py [--tasks 50] [--latency 0.005]
+'''
+
+EMAIL = "batch@luple.co.kr"
+FIRST_START = 1602300000
+DAY = 24 * 60 * 60
+
+TABLES = {
+    "RECORDS_TABLE": ("Records-Bench", "email", "taskId", {
+        "typeStart-index": ("email", "typeStart"),
+    }),
+    "PLAN_TABLE": ("Plan-Bench", "email", "planDate"),
+    "SCORE_TABLE": ("Score-Bench", "email", "scoreDate"),
+}
+
+def offlineTasks(count):
+    # a few days of tasks, several per day
+    return [{"taskType": idx % 5, "startTime": FIRST_START + (idx // 10) * DAY + idx * 600, "elapsedTime": 60 + idx}
+            for idx in range(count)]
+
+def single(handler, tasks):
+    for task in tasks:
+        handler.lambda_handler({"email": EMAIL, "body-json": task}, None)
+    return len(tasks), len(tasks)
+
+def batch(handler, tasks):
+    res = handler.lambda_handler({"email": EMAIL, "body-json": {"tasks": tasks}}, None)
+    return res["body"]["written"], 1
+
+def run(label, func, tasks, latency, unprocessedEvery=0):
+    store = localAws.install(TABLES, latency={"*": latency})
+    os.environ["TABLE_NAME"] = os.environ["RECORDS_TABLE"]
+    store.unprocessedEvery = unprocessedEvery
+    handler = harness.loadHandler("postTask")
+    start = time.perf_counter()
+    written, requests = func(handler, tasks)
+    elapsed = time.perf_counter() - start
+    stored = store.tables["Records-Bench"].count()
+    print("%-18s %8d %7d %7.1f %9.1f %7d %7d" % (
+        label, requests, store.totalCalls(), store.capacity["Records-Bench"], elapsed * 1e3, written, stored))
+    return stored
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Offline sync of tasks: one request per task against a batch")
+    parser.add_argument('--tasks', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.005)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    tasks = offlineTasks(args.tasks)
+    print("tasks=%d, DynamoDB %.0fms per call" % (args.tasks, args.latency * 1e3))
+    print("%-18s %8s %7s %7s %9s %7s %7s" % ("", "requests", "calls", "WCU", "wall(ms)", "written", "stored"))
+    stored = [
+        run("single", single, tasks, args.latency),
+        run("batch", batch, tasks, args.latency),
+        run("batch, throttled", batch, tasks, args.latency, unprocessedEvery=3),
+    ]
+    assert stored == [args.tasks] * 3, "tasks lost: %s" % json.dumps(stored)
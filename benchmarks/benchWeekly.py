@@ -0,0 +1,141 @@
+import os, time, random, argparse, logging
+import harness, localAws
+from boto3.dynamodb.types import TypeDeserializer
+from common import db, tasks, plans, columns
+
+'''
+benchWeekly
+
+getSolutionTasksWeekly for a user with DAYS days of tasks (about five a
+day), summarizing MAX_WEEKS weeks. The wire format query pages are
+recorded once from the local DynamoDB stand-in and replayed, so the
+timings are the CPU time of the function alone:
+    - items  : what a Table.query does on top of the low-level client
+               (TypeDeserializer, Decimal, dict per item) followed by a
+               per-item Python loop, the usual way of the handlers
+    - lists  : columns module without numpy (plain lists)
+    - numpy  : columns module, vectorized
+Reports the p50 / p95 CPU time (process_time) per request, and checks that
+the three variants agree.
+
+Usage (from the repository root):
+    python benchmarks/benchWeekly.py [--repeat 50] [--days 365]
+'''
+
+EMAIL = "weekly@luple.co.kr"
+DAY = 24 * 60 * 60
+
+TABLES = {
+    "RECORDS_TABLE": ("Records-Bench", "email", "taskId", {"startTime-index": ("email", "startTime")}),
+}
+
+def seed(store, days, now):
+    rng = random.Random(11)
+    today = plans.dayStart(plans.dateOf(now))
+    count = 0
+    for day in range(days):
+        for taskType in tasks.TASK_TYPES:
+            # a missed day now and then, so streaks break
+            if rng.random() < 0.1:
+                continue
+            startTime = today - day * DAY + rng.randrange(6 * 60 * 60, 22 * 60 * 60)
+            store.tables["Records-Bench"].put(localAws.normalize({
+                "email": EMAIL, "taskId": "weekly-%d-%d%d" % (plans.dateOf(startTime), startTime, taskType),
+                "taskType": taskType, "startTime": startTime, "elapsedTime": rng.randrange(60, 3600),
+            }))
+            count += 1
+    return count
+
+'''
+Replay class
+
+Low-level client answering each distinct query from the recorded page.
+'''
+class Replay(object):
+    def __init__(self, client):
+        self.client = client
+        self.pages = dict()
+
+    def query(self, **params):
+        key = repr(sorted(params.items()))
+        if key not in self.pages:
+            self.pages[key] = self.client.query(**params)
+        return self.pages[key]
+
+deserializer = TypeDeserializer()
+
+def itemsSummary(email, weeks, now):
+    client = db.getClient("dynamodb")
+    today = plans.dayStart(plans.dateOf(now))
+    first = today - (weeks * 7 - 1) * DAY
+    params = {
+        "TableName": os.environ["TABLE_NAME"],
+        "IndexName": os.environ["START_TIME_INDEX"],
+        "KeyConditionExpression": "email = :e AND startTime BETWEEN :low AND :high",
+        "ExpressionAttributeValues": {":e": {"S": email}, ":low": {"N": str(first)}, ":high": {"N": str(today + DAY - 1)}},
+        "ProjectionExpression": "taskType, startTime, elapsedTime",
+    }
+    items = []
+    while True:
+        res = client.query(**params)
+        items += [dict((name, deserializer.deserialize(value)) for name, value in item.items()) for item in res["Items"]]
+        if "LastEvaluatedKey" not in res:
+            break
+        params["ExclusiveStartKey"] = res["LastEvaluatedKey"]
+    days = weeks * 7
+    daily = dict((taskType, [0] * days) for taskType in tasks.TASK_TYPES)
+    elapsed = dict((taskType, [0] * days) for taskType in tasks.TASK_TYPES)
+    for item in items:
+        day = int((item["startTime"] - first) // DAY)
+        daily[int(item["taskType"])][day] += 1
+        elapsed[int(item["taskType"])][day] += item["elapsedTime"]
+    return dict((taskType, [sum(daily[taskType][week:week + 7]) for week in range(0, days, 7)])
+                for taskType in tasks.TASK_TYPES)
+
+def cpuSamples(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.process_time()
+        func()
+        samples.append(time.process_time() - start)
+    return samples
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="CPU time of the weekly rollups")
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--days', type=int, default=365)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    now = time.time()
+    store = localAws.install(TABLES)
+    os.environ["TABLE_NAME"] = os.environ["RECORDS_TABLE"]
+    os.environ["START_TIME_INDEX"] = "startTime-index"
+    records = seed(store, args.days, now)
+    weeks = columns.MAX_WEEKS
+
+    db.setClient("dynamodb", Replay(db.getResource("dynamodb").meta.client))
+
+    numpy = columns.getNumpy()
+    results = dict()
+    variants = [("items", lambda: itemsSummary(EMAIL, weeks, now))]
+    variants.append(("lists", lambda: columns.weeklySummary(EMAIL, weeks, now)))
+    if numpy is not None:
+        variants.append(("numpy", lambda: columns.weeklySummary(EMAIL, weeks, now)))
+    print("records=%d weeks=%d" % (records, weeks))
+    print("%-8s %10s %10s" % ("", "p50(ms)", "p95(ms)"))
+    for name, func in variants:
+        columns._numpy = numpy if name == "numpy" else False
+        results[name] = func()
+        samples = cpuSamples(func, args.repeat)
+        print("%-8s %10.2f %10.2f" % (name, harness.percentile(samples, 50) * 1e3, harness.percentile(samples, 95) * 1e3))
+    columns._numpy = None
+
+    for name in results:
+        if name == "items":
+            continue
+        counts = dict((entry["taskType"], [week["count"] for week in entry["weeks"]]) for entry in results[name]["tasks"])
+        assert counts == results["items"], "%s disagrees with items" % name
+    if "numpy" in results:
+        assert results["numpy"] == results["lists"], "numpy disagrees with lists"
+    print("variants agree")
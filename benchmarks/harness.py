@@ -0,0 +1,97 @@
+import os, sys, time, importlib.util
+
+'''
+harness module
+
+Helpers shared by the benchmark scripts in this directory.
+Run a benchmark from the repository root, e.g.
+    python benchmarks/benchDb.py
+'''
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAYER = os.path.join(ROOT, 'commonLayer', 'python')
+
+if LAYER not in sys.path:
+    sys.path.insert(0, LAYER)
+
+# boto3 needs a region and credentials to build clients, even offline.
+os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-northeast-2')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'benchmark')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'benchmark')
+
+'''
+loadHandler function
+
+@input parameter:
+    - functionName: directory name of the lambda function (ex: 'getUser')
+@return:
+    - module object of <functionName>/lambda_function.py
+
+Description: every function ships a module named lambda_function, so each
+             one is loaded under its own name to keep them apart.
+'''
+def loadHandler(functionName):
+    path = os.path.join(ROOT, functionName, 'lambda_function.py')
+    spec = importlib.util.spec_from_file_location(functionName, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+'''
+Context class
+
+Minimal lambda context: function name and remaining time of the invocation.
+'''
+class Context(object):
+    def __init__(self, functionName='local', timeoutMs=30000):
+        self.function_name = functionName
+        self.deadline = time.monotonic() + timeoutMs / 1000.0
+
+    def get_remaining_time_in_millis(self):
+        return max(0, int((self.deadline - time.monotonic()) * 1000))
+
+'''
+timeit function
+
+@input parameter:
+    - func: callable without arguments
+    - repeat: int
+@return:
+    - list of elapsed seconds, one per call
+'''
+def timeit(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+'''
+percentile function
+
+@input parameter:
+    - samples: list of numbers
+    - pct: float in [0, 100]
+@return:
+    - nearest-rank percentile of samples
+'''
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    idx = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[idx]
+
+'''
+report function
+
+Print one line with count, mean and p50/p95/p99 (in microseconds).
+'''
+def report(label, samples):
+    mean = sum(samples) / len(samples)
+    print("%-40s n=%-6d mean=%10.1fus p50=%10.1fus p95=%10.1fus p99=%10.1fus" % (
+        label, len(samples), mean * 1e6,
+        percentile(samples, 50) * 1e6,
+        percentile(samples, 95) * 1e6,
+        percentile(samples, 99) * 1e6))
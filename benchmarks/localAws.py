@@ -0,0 +1,1391 @@
+import copy, bisect, re, time, math, threading, json, io, zlib
+from decimal import Decimal
+from collections import defaultdict
+from boto3.dynamodb.types import TypeSerializer, TypeDeserializer
+from boto3.dynamodb.conditions import ConditionBase, ConditionExpressionBuilder
+from botocore.exceptions import ClientError
+
+'''
+localAws module
+
+In-memory stand-in for the subset of DynamoDB the lambda functions use, so
+handlers can be driven and measured without AWS.
+
+    - LocalDynamoDB: tables, items, expression engine, capacity accounting
+    - LocalResource / LocalTable: boto3 resource-level API (python types)
+    - LocalClient: boto3 low-level client API (wire format)
+    - LocalSns / LocalSnsResource: boto3 SNS client and resource API
+    - LocalCognito: boto3 cognito-idp client API (admin user calls)
+    - LocalLambda: boto3 lambda client API (invoke)
+
+Every call is counted per operation, and an artificial latency can be
+injected per operation to approximate network round trips.
+
+Usage:
+    local = localAws.install({'TABLE_NAME': ('User-Local', 'email', None)})
+    ... call handlers ...
+    print(local.calls)
+'''
+
+MAX_PAGE_BYTES = 1024 * 1024
+
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+
+def clientError(code, message, operation, item=None):
+    response = {'Error': {'Code': code, 'Message': message}}
+    if item is not None:
+        response['Item'] = item
+    return ClientError(response, operation)
+
+'''
+Serialization helpers
+'''
+def toWire(value):
+    return _serializer.serialize(value)
+
+def fromWire(value):
+    return _deserializer.deserialize(value)
+
+def itemToWire(item):
+    return dict((k, toWire(v)) for k, v in item.items())
+
+def itemFromWire(item):
+    return dict((k, fromWire(v)) for k, v in item.items())
+
+def normalize(value):
+    # what DynamoDB would store: numbers become Decimal, floats are rejected
+    return fromWire(toWire(value))
+
+'''
+itemSize function
+
+Approximate DynamoDB item size in bytes (names + values).
+'''
+def itemSize(item):
+    return sum(len(name.encode('utf-8')) + valueSize(value) for name, value in item.items())
+
+def valueSize(value):
+    if isinstance(value, str):
+        return len(value.encode('utf-8'))
+    if isinstance(value, bool) or value is None:
+        return 1
+    if isinstance(value, (int, Decimal, float)):
+        return int(len(str(value).lstrip('-').replace('.', '')) / 2) + 1
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, dict):
+        return 3 + sum(len(k.encode('utf-8')) + 1 + valueSize(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return 3 + sum(1 + valueSize(v) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return sum(valueSize(v) for v in value)
+    return len(str(value))
+
+
+'''
+Expression engine
+
+Parses condition, key condition, projection and update expressions into
+small tuple trees and evaluates them against python-typed items. Like
+DynamoDB, it rejects (ValidationException) an attribute name that is a
+reserved word unless it is given through a #placeholder.
+'''
+TOKEN = re.compile(r'\s*(?:(<=|>=|<>|[=<>(),.\[\]+\-])|(#[A-Za-z0-9_]+)|(:[A-Za-z0-9_]+)|([A-Za-z_][A-Za-z0-9_\-]*)|(\d+))')
+KEYWORDS = set(['AND', 'OR', 'NOT', 'BETWEEN', 'IN', 'SET', 'REMOVE', 'ADD', 'DELETE'])
+FUNCTIONS = set(['attribute_exists', 'attribute_not_exists', 'attribute_type', 'begins_with',
+                 'contains', 'size', 'if_not_exists', 'list_append'])
+# DynamoDB reserved words: an attribute name among them must go through a
+# #placeholder (ExpressionAttributeNames), or the request is rejected
+RESERVED_WORDS = frozenset([
+    'ABORT', 'ABSOLUTE', 'ACTION', 'ADD', 'AFTER', 'AGENT', 'AGGREGATE', 'ALL', 'ALLOCATE', 'ALTER',
+    'ANALYZE', 'AND', 'ANY', 'ARCHIVE', 'ARE', 'ARRAY', 'AS', 'ASC', 'ASCII', 'ASENSITIVE', 'ASSERTION',
+    'ASYMMETRIC', 'AT', 'ATOMIC', 'ATTACH', 'ATTRIBUTE', 'AUTH', 'AUTHORIZATION', 'AUTHORIZE', 'AUTO', 'AVG',
+    'BACK', 'BACKUP', 'BASE', 'BATCH', 'BEFORE', 'BEGIN', 'BETWEEN', 'BIGINT', 'BINARY', 'BIT', 'BLOB',
+    'BLOCK', 'BOOLEAN', 'BOTH', 'BREADTH', 'BUCKET', 'BULK', 'BY', 'BYTE', 'CALL', 'CALLED', 'CALLING',
+    'CAPACITY', 'CASCADE', 'CASCADED', 'CASE', 'CAST', 'CATALOG', 'CHAR', 'CHARACTER', 'CHECK', 'CLASS',
+    'CLOB', 'CLOSE', 'CLUSTER', 'CLUSTERED', 'CLUSTERING', 'CLUSTERS', 'COALESCE', 'COLLATE', 'COLLATION',
+    'COLLECTION', 'COLUMN', 'COLUMNS', 'COMBINE', 'COMMENT', 'COMMIT', 'COMPACT', 'COMPILE', 'COMPRESS',
+    'CONDITION', 'CONFLICT', 'CONNECT', 'CONNECTION', 'CONSISTENCY', 'CONSISTENT', 'CONSTRAINT',
+    'CONSTRAINTS', 'CONSTRUCTOR', 'CONSUMED', 'CONTINUE', 'CONVERT', 'COPY', 'CORRESPONDING', 'COUNT',
+    'COUNTER', 'CREATE', 'CROSS', 'CUBE', 'CURRENT', 'CURSOR', 'CYCLE', 'DATA', 'DATABASE', 'DATE',
+    'DATETIME', 'DAY', 'DEALLOCATE', 'DEC', 'DECIMAL', 'DECLARE', 'DEFAULT', 'DEFERRABLE', 'DEFERRED',
+    'DEFINE', 'DEFINED', 'DEFINITION', 'DELETE', 'DELIMITED', 'DEPTH', 'DEREF', 'DESC', 'DESCRIBE',
+    'DESCRIPTOR', 'DETACH', 'DETERMINISTIC', 'DIAGNOSTICS', 'DIRECTORIES', 'DISABLE', 'DISCONNECT',
+    'DISTINCT', 'DISTRIBUTE', 'DO', 'DOMAIN', 'DOUBLE', 'DROP', 'DUMP', 'DURATION', 'DYNAMIC', 'EACH',
+    'ELEMENT', 'ELSE', 'ELSEIF', 'EMPTY', 'ENABLE', 'END', 'EQUAL', 'EQUALS', 'ERROR', 'ESCAPE', 'ESCAPED',
+    'EVAL', 'EVALUATE', 'EXCEEDED', 'EXCEPT', 'EXCEPTION', 'EXCEPTIONS', 'EXCLUSIVE', 'EXEC', 'EXECUTE',
+    'EXISTS', 'EXIT', 'EXPLAIN', 'EXPLODE', 'EXPORT', 'EXPRESSION', 'EXTENDED', 'EXTERNAL', 'EXTRACT',
+    'FAIL', 'FALSE', 'FAMILY', 'FETCH', 'FIELDS', 'FILE', 'FILTER', 'FILTERING', 'FINAL', 'FINISH', 'FIRST',
+    'FIXED', 'FLATTERN', 'FLOAT', 'FOR', 'FORCE', 'FOREIGN', 'FORMAT', 'FORWARD', 'FOUND', 'FREE', 'FROM',
+    'FULL', 'FUNCTION', 'FUNCTIONS', 'GENERAL', 'GENERATE', 'GET', 'GLOB', 'GLOBAL', 'GO', 'GOTO', 'GRANT',
+    'GREATER', 'GROUP', 'GROUPING', 'HANDLER', 'HASH', 'HAVE', 'HAVING', 'HEAP', 'HIDDEN', 'HOLD', 'HOUR',
+    'IDENTIFIED', 'IDENTITY', 'IF', 'IGNORE', 'IMMEDIATE', 'IMPORT', 'IN', 'INCLUDING', 'INCLUSIVE',
+    'INCREMENT', 'INCREMENTAL', 'INDEX', 'INDEXED', 'INDEXES', 'INDICATOR', 'INFINITE', 'INITIALLY',
+    'INLINE', 'INNER', 'INNTER', 'INOUT', 'INPUT', 'INSENSITIVE', 'INSERT', 'INSTEAD', 'INT', 'INTEGER',
+    'INTERSECT', 'INTERVAL', 'INTO', 'INVALIDATE', 'IS', 'ISOLATION', 'ITEM', 'ITEMS', 'ITERATE', 'JOIN',
+    'KEY', 'KEYS', 'LAG', 'LANGUAGE', 'LARGE', 'LAST', 'LATERAL', 'LEAD', 'LEADING', 'LEAVE', 'LEFT',
+    'LENGTH', 'LESS', 'LEVEL', 'LIKE', 'LIMIT', 'LIMITED', 'LINES', 'LIST', 'LOAD', 'LOCAL', 'LOCALTIME',
+    'LOCALTIMESTAMP', 'LOCATION', 'LOCATOR', 'LOCK', 'LOCKS', 'LOG', 'LOGED', 'LONG', 'LOOP', 'LOWER', 'MAP',
+    'MATCH', 'MATERIALIZED', 'MAX', 'MAXLEN', 'MEMBER', 'MERGE', 'METHOD', 'METRICS', 'MIN', 'MINUS',
+    'MINUTE', 'MISSING', 'MOD', 'MODE', 'MODIFIES', 'MODIFY', 'MODULE', 'MONTH', 'MULTI', 'MULTISET', 'NAME',
+    'NAMES', 'NATIONAL', 'NATURAL', 'NCHAR', 'NCLOB', 'NEW', 'NEXT', 'NO', 'NONE', 'NOT', 'NULL', 'NULLIF',
+    'NUMBER', 'NUMERIC', 'OBJECT', 'OF', 'OFFLINE', 'OFFSET', 'OLD', 'ON', 'ONLINE', 'ONLY', 'OPAQUE',
+    'OPEN', 'OPERATOR', 'OPTION', 'OR', 'ORDER', 'ORDINALITY', 'OTHER', 'OTHERS', 'OUT', 'OUTER', 'OUTPUT',
+    'OVER', 'OVERLAPS', 'OVERRIDE', 'OWNER', 'PAD', 'PARALLEL', 'PARAMETER', 'PARAMETERS', 'PARTIAL',
+    'PARTITION', 'PARTITIONED', 'PARTITIONS', 'PATH', 'PERCENT', 'PERCENTILE', 'PERMISSION', 'PERMISSIONS',
+    'PIPE', 'PIPELINED', 'PLAN', 'POOL', 'POSITION', 'PRECISION', 'PREPARE', 'PRESERVE', 'PRIMARY', 'PRIOR',
+    'PRIVATE', 'PRIVILEGES', 'PROCEDURE', 'PROCESSED', 'PROJECT', 'PROJECTION', 'PROPERTY', 'PROVISIONING',
+    'PUBLIC', 'PUT', 'QUERY', 'QUIT', 'QUORUM', 'RAISE', 'RANDOM', 'RANGE', 'RANK', 'RAW', 'READ', 'READS',
+    'REAL', 'REBUILD', 'RECORD', 'RECURSIVE', 'REDUCE', 'REF', 'REFERENCE', 'REFERENCES', 'REFERENCING',
+    'REGEXP', 'REGION', 'RENAME', 'REPAIR', 'REPEAT', 'REPLACE', 'REQUEST', 'RESET', 'RESIGNAL', 'RESOURCE',
+    'RESPONSE', 'RESTORE', 'RESTRICT', 'RESULT', 'RETURN', 'RETURNING', 'RETURNS', 'REVERSE', 'REVOKE',
+    'RIGHT', 'ROLE', 'ROLES', 'ROLLBACK', 'ROLLUP', 'ROUTINE', 'ROW', 'ROWS', 'RULE', 'RULES', 'SAMPLE',
+    'SATISFIES', 'SAVE', 'SAVEPOINT', 'SCAN', 'SCHEMA', 'SCOPE', 'SCROLL', 'SEARCH', 'SECOND', 'SECTION',
+    'SEGMENT', 'SEGMENTS', 'SELECT', 'SELF', 'SEMI', 'SENSITIVE', 'SEPARATE', 'SEQUENCE', 'SERIALIZABLE',
+    'SESSION', 'SET', 'SETS', 'SHARD', 'SHARE', 'SHARED', 'SHORT', 'SHOW', 'SIGNAL', 'SIMILAR', 'SIZE',
+    'SKEWED', 'SMALLINT', 'SNAPSHOT', 'SOME', 'SOURCE', 'SPACE', 'SPACES', 'SPARSE', 'SPECIFIC',
+    'SPECIFICTYPE', 'SPLIT', 'SQL', 'SQLCODE', 'SQLERROR', 'SQLEXCEPTION', 'SQLSTATE', 'SQLWARNING', 'START',
+    'STATE', 'STATIC', 'STATUS', 'STORAGE', 'STORE', 'STORED', 'STREAM', 'STRING', 'STRUCT', 'STYLE', 'SUB',
+    'SUBMULTISET', 'SUBPARTITION', 'SUBSTRING', 'SUBTYPE', 'SUM', 'SUPER', 'SYMMETRIC', 'SYNONYM', 'SYSTEM',
+    'TABLE', 'TABLESAMPLE', 'TEMP', 'TEMPORARY', 'TERMINATED', 'TEXT', 'THAN', 'THEN', 'THROUGHPUT', 'TIME',
+    'TIMESTAMP', 'TIMEZONE', 'TINYINT', 'TO', 'TOKEN', 'TOTAL', 'TOUCH', 'TRAILING', 'TRANSACTION',
+    'TRANSFORM', 'TRANSLATE', 'TRANSLATION', 'TREAT', 'TRIGGER', 'TRIM', 'TRUE', 'TRUNCATE', 'TTL', 'TUPLE',
+    'TYPE', 'UNDER', 'UNDO', 'UNION', 'UNIQUE', 'UNIT', 'UNKNOWN', 'UNLOGGED', 'UNNEST', 'UNPROCESSED',
+    'UNSIGNED', 'UNTIL', 'UPDATE', 'UPPER', 'URL', 'USAGE', 'USE', 'USER', 'USERS', 'USING', 'UUID',
+    'VACUUM', 'VALUE', 'VALUED', 'VALUES', 'VARCHAR', 'VARIABLE', 'VARIANCE', 'VARINT', 'VARYING', 'VIEW',
+    'VIEWS', 'VIRTUAL', 'VOID', 'WAIT', 'WHEN', 'WHENEVER', 'WHERE', 'WHILE', 'WINDOW', 'WITH', 'WITHIN',
+    'WITHOUT', 'WORK', 'WRAPPED', 'WRITE', 'YEAR', 'ZONE'
+])
+MISSING = object()
+
+def tokenize(text):
+    tokens = []
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        m = TOKEN.match(text, pos)
+        if m is None:
+            raise ValueError("Invalid expression near: " + text[pos:])
+        pos = m.end()
+        sym, name, val, ident, num = m.groups()
+        if sym:
+            tokens.append(('sym', sym))
+        elif name:
+            tokens.append(('name', name))
+        elif val:
+            tokens.append(('val', val))
+        elif ident:
+            if ident.upper() in KEYWORDS:
+                tokens.append(('kw', ident.upper()))
+            else:
+                tokens.append(('ident', ident))
+        else:
+            tokens.append(('num', int(num)))
+    return tokens
+
+class ReservedKeyword(ValueError):
+    pass
+
+class Parser(object):
+    def __init__(self, text, names, values):
+        self.tokens = tokenize(text)
+        self.pos = 0
+        self.names = names or {}
+        self.values = values or {}
+
+    def peek(self, offset=0):
+        idx = self.pos + offset
+        return self.tokens[idx] if idx < len(self.tokens) else (None, None)
+
+    def take(self, kind=None, value=None):
+        tok = self.peek()
+        if (kind is not None and tok[0] != kind) or (value is not None and tok[1] != value):
+            raise ValueError("Unexpected token %s, expected %s %s" % (tok, kind, value))
+        self.pos += 1
+        return tok
+
+    def accept(self, kind, value=None):
+        tok = self.peek()
+        if tok[0] == kind and (value is None or tok[1] == value):
+            self.pos += 1
+            return True
+        return False
+
+    def done(self):
+        return self.pos >= len(self.tokens)
+
+    # paths and operands
+    def path(self):
+        parts = [self.pathPart()]
+        while True:
+            if self.accept('sym', '.'):
+                parts.append(self.pathPart())
+            elif self.accept('sym', '['):
+                parts.append(self.take('num')[1])
+                self.take('sym', ']')
+            else:
+                return ('path', parts)
+
+    def pathPart(self):
+        kind, value = self.take()
+        if kind == 'name':
+            if value not in self.names:
+                raise ValueError("Unknown attribute name placeholder " + value)
+            return self.names[value]
+        if kind in ('ident', 'kw'):
+            if value.upper() in RESERVED_WORDS:
+                raise ReservedKeyword(value)
+            return value
+        raise ValueError("Invalid path part " + str(value))
+
+    def operand(self):
+        kind, value = self.peek()
+        if kind == 'val':
+            self.pos += 1
+            if value not in self.values:
+                raise ValueError("Unknown attribute value placeholder " + value)
+            return ('value', self.values[value])
+        if kind == 'ident' and value in FUNCTIONS and self.peek(1) == ('sym', '('):
+            return self.function()
+        return self.path()
+
+    def function(self):
+        name = self.take('ident')[1]
+        self.take('sym', '(')
+        args = [self.updateValue() if name in ('if_not_exists', 'list_append') else self.operand()]
+        while self.accept('sym', ','):
+            args.append(self.updateValue() if name in ('if_not_exists', 'list_append') else self.operand())
+        self.take('sym', ')')
+        return ('fn', name, args)
+
+    # conditions
+    def condition(self):
+        node = self.conjunction()
+        while self.accept('kw', 'OR'):
+            node = ('or', node, self.conjunction())
+        return node
+
+    def conjunction(self):
+        node = self.negation()
+        while self.accept('kw', 'AND'):
+            node = ('and', node, self.negation())
+        return node
+
+    def negation(self):
+        if self.accept('kw', 'NOT'):
+            return ('not', self.negation())
+        return self.primary()
+
+    def primary(self):
+        if self.accept('sym', '('):
+            node = self.condition()
+            self.take('sym', ')')
+            return node
+        left = self.operand()
+        if left[0] == 'fn' and left[1] != 'size':
+            return left
+        if self.accept('kw', 'BETWEEN'):
+            low = self.operand()
+            self.take('kw', 'AND')
+            return ('between', left, low, self.operand())
+        if self.accept('kw', 'IN'):
+            self.take('sym', '(')
+            options = [self.operand()]
+            while self.accept('sym', ','):
+                options.append(self.operand())
+            self.take('sym', ')')
+            return ('in', left, options)
+        op = self.take('sym')[1]
+        if op not in ('=', '<>', '<', '<=', '>', '>='):
+            raise ValueError("Invalid comparator " + op)
+        return ('cmp', op, left, self.operand())
+
+    # update expressions
+    def update(self):
+        actions = []
+        while not self.done():
+            clause = self.take('kw')[1]
+            while True:
+                if clause == 'SET':
+                    target = self.path()
+                    self.take('sym', '=')
+                    actions.append(('SET', target, self.updateValue()))
+                elif clause == 'REMOVE':
+                    actions.append(('REMOVE', self.path(), None))
+                elif clause in ('ADD', 'DELETE'):
+                    target = self.path()
+                    actions.append((clause, target, self.operand()))
+                else:
+                    raise ValueError("Invalid update clause " + clause)
+                if not self.accept('sym', ','):
+                    break
+        return actions
+
+    def updateValue(self):
+        node = self.operand()
+        if self.accept('sym', '+'):
+            return ('add', node, self.operand())
+        if self.accept('sym', '-'):
+            return ('sub', node, self.operand())
+        return node
+
+    # projection
+    def projection(self):
+        paths = [self.path()]
+        while self.accept('sym', ','):
+            paths.append(self.path())
+        return paths
+
+def resolvePath(item, parts):
+    node = item
+    for part in parts:
+        if isinstance(part, int):
+            if not isinstance(node, list) or part >= len(node):
+                return MISSING
+            node = node[part]
+        else:
+            if not isinstance(node, dict) or part not in node:
+                return MISSING
+            node = node[part]
+    return node
+
+def operandValue(item, node):
+    kind = node[0]
+    if kind == 'value':
+        return node[1]
+    if kind == 'path':
+        return resolvePath(item, node[1])
+    if kind == 'fn':
+        name, args = node[1], node[2]
+        if name == 'size':
+            value = operandValue(item, args[0])
+            return MISSING if value is MISSING else Decimal(valueSize(value) if isinstance(value, (bytes, bytearray)) else len(value))
+        if name == 'if_not_exists':
+            value = operandValue(item, args[0])
+            return operandValue(item, args[1]) if value is MISSING else value
+        if name == 'list_append':
+            return list(operandValue(item, args[0])) + list(operandValue(item, args[1]))
+    if kind in ('add', 'sub'):
+        left, right = operandValue(item, node[1]), operandValue(item, node[2])
+        if left is MISSING or right is MISSING:
+            raise clientError('ValidationException', 'An operand in the update expression has an incorrect data type', 'UpdateItem')
+        return left + right if kind == 'add' else left - right
+    raise ValueError("Invalid operand " + str(node))
+
+def compare(op, left, right):
+    if left is MISSING or right is MISSING:
+        return op == '<>' and not (left is MISSING and right is MISSING)
+    try:
+        if op == '=':
+            return left == right
+        if op == '<>':
+            return left != right
+        if op == '<':
+            return left < right
+        if op == '<=':
+            return left <= right
+        if op == '>':
+            return left > right
+        if op == '>=':
+            return left >= right
+    except TypeError:
+        return False
+
+def evaluate(item, node):
+    kind = node[0]
+    if kind == 'and':
+        return evaluate(item, node[1]) and evaluate(item, node[2])
+    if kind == 'or':
+        return evaluate(item, node[1]) or evaluate(item, node[2])
+    if kind == 'not':
+        return not evaluate(item, node[1])
+    if kind == 'cmp':
+        return compare(node[1], operandValue(item, node[2]), operandValue(item, node[3]))
+    if kind == 'between':
+        value = operandValue(item, node[1])
+        return compare('>=', value, operandValue(item, node[2])) and compare('<=', value, operandValue(item, node[3]))
+    if kind == 'in':
+        value = operandValue(item, node[1])
+        return any(compare('=', value, operandValue(item, option)) for option in node[2])
+    if kind == 'fn':
+        name, args = node[1], node[2]
+        if name == 'attribute_exists':
+            return operandValue(item, args[0]) is not MISSING
+        if name == 'attribute_not_exists':
+            return operandValue(item, args[0]) is MISSING
+        if name == 'begins_with':
+            value = operandValue(item, args[0])
+            return isinstance(value, str) and value.startswith(operandValue(item, args[1]))
+        if name == 'contains':
+            value = operandValue(item, args[0])
+            return value is not MISSING and operandValue(item, args[1]) in value
+        if name == 'attribute_type':
+            value = operandValue(item, args[0])
+            return value is not MISSING and list(toWire(value).keys())[0] == operandValue(item, args[1])
+    raise ValueError("Invalid condition " + str(node))
+
+def project(item, paths):
+    result = dict()
+    for path in paths:
+        parts = path[1]
+        value = resolvePath(item, parts)
+        if value is MISSING:
+            continue
+        node = result
+        for idx, part in enumerate(parts[:-1]):
+            if isinstance(parts[idx + 1], int):
+                break
+            node = node.setdefault(part, dict())
+        else:
+            node[parts[-1]] = copy.deepcopy(value)
+            continue
+        # list element projections keep the whole list attribute
+        result[parts[0]] = copy.deepcopy(item[parts[0]])
+    return result
+
+def applyUpdate(item, actions, keyNames):
+    touched = set()
+    removes = []
+    for action, target, value in actions:
+        parts = target[1]
+        if parts[0] in keyNames:
+            raise clientError('ValidationException', 'Cannot update attribute %s. This attribute is part of the key' % parts[0], 'UpdateItem')
+        touched.add(parts[0])
+        if action == 'REMOVE':
+            removes.append(parts)
+            continue
+        newValue = operandValue(item, value)
+        if action == 'SET':
+            setPath(item, parts, copy.deepcopy(newValue))
+        elif action == 'ADD':
+            current = resolvePath(item, parts)
+            if current is MISSING:
+                setPath(item, parts, copy.deepcopy(newValue))
+            elif isinstance(current, set):
+                current |= newValue
+            else:
+                setPath(item, parts, current + newValue)
+        elif action == 'DELETE':
+            current = resolvePath(item, parts)
+            if isinstance(current, set):
+                current -= newValue
+                if not current:
+                    removes.append(parts)
+    # list removals use the original indexes, highest first
+    removes.sort(key=lambda parts: [p if isinstance(p, int) else -1 for p in parts], reverse=True)
+    for parts in removes:
+        parent = resolvePath(item, parts[:-1]) if len(parts) > 1 else item
+        if isinstance(parent, dict):
+            parent.pop(parts[-1], None)
+        elif isinstance(parent, list) and isinstance(parts[-1], int) and parts[-1] < len(parent):
+            del parent[parts[-1]]
+    return touched
+
+def setPath(item, parts, value):
+    parent = resolvePath(item, parts[:-1]) if len(parts) > 1 else item
+    last = parts[-1]
+    if isinstance(last, int):
+        if not isinstance(parent, list):
+            raise clientError('ValidationException', 'The document path provided in the update expression is invalid for update', 'UpdateItem')
+        if last < len(parent):
+            parent[last] = value
+        else:
+            parent.append(value)
+        return
+    if not isinstance(parent, dict):
+        raise clientError('ValidationException', 'The document path provided in the update expression is invalid for update', 'UpdateItem')
+    parent[last] = value
+
+_parseCache = dict()
+
+def parse(kind, text, names, values):
+    # expressions are re-parsed with their placeholders resolved; cache on the
+    # text + placeholders so repeated handler calls stay cheap
+    cacheKey = None
+    try:
+        cacheKey = (kind, text, tuple(sorted((names or {}).items())), repr(sorted((values or {}).items())))
+        if cacheKey in _parseCache:
+            return _parseCache[cacheKey]
+    except TypeError:
+        cacheKey = None
+    parser = Parser(text, names, values)
+    try:
+        if kind == 'condition':
+            tree = parser.condition()
+        elif kind == 'update':
+            tree = parser.update()
+        else:
+            tree = parser.projection()
+    except ReservedKeyword as e:
+        raise clientError('ValidationException', 'Invalid %sExpression: Attribute name is a reserved keyword; '
+                          'reserved keyword: %s' % (kind.capitalize(), e), kind.capitalize())
+    if not parser.done():
+        raise ValueError("Trailing tokens in expression: " + text)
+    if cacheKey is not None and len(_parseCache) < 10000:
+        _parseCache[cacheKey] = tree
+    return tree
+
+
+'''
+LocalDynamoDB class
+
+Table storage: one partition per hash key value, each holding its sort key
+values in a sorted list for range queries.
+'''
+class LocalTableData(object):
+    def __init__(self, name, hashKey, rangeKey=None, indexes=None):
+        self.name = name
+        self.hashKey = hashKey
+        self.rangeKey = rangeKey
+        self.indexes = indexes or {}
+        self.partitions = defaultdict(dict)
+        self.sortKeys = defaultdict(list)
+        self.version = 0
+        self.indexCache = dict()
+
+    def keyNames(self):
+        return [self.hashKey] + ([self.rangeKey] if self.rangeKey else [])
+
+    def keyOf(self, item):
+        return dict((name, item[name]) for name in self.keyNames())
+
+    def get(self, key):
+        partition = self.partitions.get(key.get(self.hashKey))
+        if partition is None:
+            return None
+        return partition.get(key.get(self.rangeKey) if self.rangeKey else None)
+
+    def put(self, item):
+        hashValue = item[self.hashKey]
+        rangeValue = item[self.rangeKey] if self.rangeKey else None
+        partition = self.partitions[hashValue]
+        if rangeValue not in partition and self.rangeKey:
+            bisect.insort(self.sortKeys[hashValue], rangeValue)
+        partition[rangeValue] = item
+        self.version += 1
+
+    def delete(self, key):
+        hashValue = key[self.hashKey]
+        rangeValue = key[self.rangeKey] if self.rangeKey else None
+        partition = self.partitions.get(hashValue)
+        if partition is None or rangeValue not in partition:
+            return None
+        old = partition.pop(rangeValue)
+        if self.rangeKey:
+            keys = self.sortKeys[hashValue]
+            del keys[bisect.bisect_left(keys, rangeValue)]
+        if not partition:
+            del self.partitions[hashValue]
+            self.sortKeys.pop(hashValue, None)
+        self.version += 1
+        return old
+
+    def count(self):
+        return sum(len(p) for p in self.partitions.values())
+
+    def indexEntries(self, indexName, hashValue):
+        # (index range values, (index range, table range) positions, entries)
+        # of one index partition, all sorted the same way
+        cached = self.indexCache.get(indexName)
+        if cached is None or cached[0] != self.version:
+            hashKey, rangeKey = self.indexes[indexName]
+            grouped = defaultdict(list)
+            for partition in self.partitions.values():
+                for item in partition.values():
+                    if hashKey in item and (rangeKey is None or rangeKey in item):
+                        grouped[item[hashKey]].append(
+                            (item.get(rangeKey), item.get(self.rangeKey) if self.rangeKey else None, item))
+            partitions = dict()
+            for value, entries in grouped.items():
+                entries.sort(key=lambda e: (e[0], e[1]))
+                partitions[value] = ([e[0] for e in entries], [(e[0], e[1]) for e in entries], entries)
+            cached = (self.version, partitions)
+            self.indexCache[indexName] = cached
+        return cached[1].get(hashValue, ([], [], []))
+
+class LocalDynamoDB(object):
+    def __init__(self, latency=None):
+        self.tables = dict()
+        self.calls = defaultdict(int)
+        self.capacity = defaultdict(float)
+        self.latency = latency or {}
+        # every n-th BatchWriteItem request comes back as unprocessed (0: never)
+        self.unprocessedEvery = 0
+        self.batchRequests = 0
+
+    def createTable(self, name, hashKey, rangeKey=None, indexes=None):
+        self.tables[name] = LocalTableData(name, hashKey, rangeKey, indexes)
+        return self.tables[name]
+
+    def table(self, name, operation):
+        if name not in self.tables:
+            raise clientError('ResourceNotFoundException', 'Requested resource not found: ' + name, operation)
+        return self.tables[name]
+
+    def record(self, operation, tableName=None, units=0.0):
+        self.calls[operation] += 1
+        if tableName is not None:
+            self.capacity[tableName] += units
+        delay = self.latency.get(operation, self.latency.get('*', 0))
+        if delay:
+            time.sleep(delay)
+
+    def resetStats(self):
+        self.calls.clear()
+        self.capacity.clear()
+
+    def totalCalls(self):
+        return sum(self.calls.values())
+
+    # operations, all python-typed
+    def getItem(self, TableName, Key, ProjectionExpression=None, ExpressionAttributeNames=None,
+                ConsistentRead=False, ReturnConsumedCapacity=None, **kwargs):
+        table = self.table(TableName, 'GetItem')
+        item = table.get(Key)
+        units = readUnits(itemSize(item) if item else 0, ConsistentRead)
+        self.record('GetItem', TableName, units)
+        res = dict()
+        if item is not None:
+            if ProjectionExpression:
+                res['Item'] = project(item, parse('projection', ProjectionExpression, ExpressionAttributeNames, None))
+            else:
+                res['Item'] = copy.deepcopy(item)
+        addCapacity(res, ReturnConsumedCapacity, TableName, units)
+        return res
+
+    def checkCondition(self, item, operation, ConditionExpression, names, values, returnOld):
+        if ConditionExpression is None:
+            return
+        if isinstance(ConditionExpression, ConditionBase):
+            built = ConditionExpressionBuilder().build_expression(ConditionExpression)
+            ConditionExpression = built.condition_expression
+            names = dict(names or {}, **built.attribute_name_placeholders)
+            values = dict(values or {}, **built.attribute_value_placeholders)
+        tree = parse('condition', ConditionExpression, names, values)
+        if not evaluate(item or {}, tree):
+            old = itemToWire(item) if (item is not None and returnOld == 'ALL_OLD') else None
+            raise clientError('ConditionalCheckFailedException', 'The conditional request failed', operation, old)
+
+    def putItem(self, TableName, Item, ConditionExpression=None, ExpressionAttributeNames=None,
+                ExpressionAttributeValues=None, ReturnValues='NONE', ReturnConsumedCapacity=None,
+                ReturnValuesOnConditionCheckFailure=None, **kwargs):
+        table = self.table(TableName, 'PutItem')
+        item = normalize(Item)
+        old = table.get(table.keyOf(item))
+        units = writeUnits(max(itemSize(item), itemSize(old) if old else 0))
+        self.record('PutItem', TableName, units)
+        self.checkCondition(old, 'PutItem', ConditionExpression, ExpressionAttributeNames,
+                            normalize(ExpressionAttributeValues or {}), ReturnValuesOnConditionCheckFailure)
+        table.put(item)
+        res = dict()
+        if ReturnValues == 'ALL_OLD' and old is not None:
+            res['Attributes'] = copy.deepcopy(old)
+        addCapacity(res, ReturnConsumedCapacity, TableName, units)
+        return res
+
+    def deleteItem(self, TableName, Key, ConditionExpression=None, ExpressionAttributeNames=None,
+                   ExpressionAttributeValues=None, ReturnValues='NONE', ReturnConsumedCapacity=None,
+                   ReturnValuesOnConditionCheckFailure=None, **kwargs):
+        table = self.table(TableName, 'DeleteItem')
+        Key = normalize(Key)
+        old = table.get(Key)
+        units = writeUnits(itemSize(old) if old else 0)
+        self.record('DeleteItem', TableName, units)
+        self.checkCondition(old, 'DeleteItem', ConditionExpression, ExpressionAttributeNames,
+                            normalize(ExpressionAttributeValues or {}), ReturnValuesOnConditionCheckFailure)
+        table.delete(Key)
+        res = dict()
+        if ReturnValues == 'ALL_OLD' and old is not None:
+            res['Attributes'] = old
+        addCapacity(res, ReturnConsumedCapacity, TableName, units)
+        return res
+
+    def updateItem(self, TableName, Key, UpdateExpression=None, ConditionExpression=None,
+                   ExpressionAttributeNames=None, ExpressionAttributeValues=None, ReturnValues='NONE',
+                   ReturnConsumedCapacity=None, ReturnValuesOnConditionCheckFailure=None, **kwargs):
+        table = self.table(TableName, 'UpdateItem')
+        Key = normalize(Key)
+        values = normalize(ExpressionAttributeValues or {})
+        old = table.get(Key)
+        if ConditionExpression is not None:
+            try:
+                self.checkCondition(old, 'UpdateItem', ConditionExpression, ExpressionAttributeNames,
+                                    values, ReturnValuesOnConditionCheckFailure)
+            except ClientError:
+                # a failed conditional write is still a call and still costs a write unit
+                self.record('UpdateItem', TableName, writeUnits(itemSize(old) if old else 0))
+                raise
+        item = copy.deepcopy(old) if old is not None else dict(Key)
+        touched = set()
+        if UpdateExpression:
+            actions = parse('update', UpdateExpression, ExpressionAttributeNames, values)
+            touched = applyUpdate(item, actions, table.keyNames())
+        units = writeUnits(max(itemSize(item), itemSize(old) if old else 0))
+        self.record('UpdateItem', TableName, units)
+        table.put(item)
+        res = dict()
+        if ReturnValues == 'ALL_NEW':
+            res['Attributes'] = copy.deepcopy(item)
+        elif ReturnValues == 'ALL_OLD' and old is not None:
+            res['Attributes'] = copy.deepcopy(old)
+        elif ReturnValues == 'UPDATED_NEW':
+            res['Attributes'] = dict((k, copy.deepcopy(item[k])) for k in touched if k in item)
+        elif ReturnValues == 'UPDATED_OLD' and old is not None:
+            res['Attributes'] = dict((k, copy.deepcopy(old[k])) for k in touched if k in old)
+        addCapacity(res, ReturnConsumedCapacity, TableName, units)
+        return res
+
+    def query(self, TableName, KeyConditionExpression, IndexName=None, FilterExpression=None,
+              ProjectionExpression=None, ExpressionAttributeNames=None, ExpressionAttributeValues=None,
+              ExclusiveStartKey=None, Limit=None, ScanIndexForward=True, ConsistentRead=False,
+              ReturnConsumedCapacity=None, Select=None, **kwargs):
+        table = self.table(TableName, 'Query')
+        names = dict(ExpressionAttributeNames or {})
+        values = normalize(ExpressionAttributeValues or {})
+        keyCondition, names, values = buildCondition(KeyConditionExpression, names, values, True)
+        filterTree = None
+        if FilterExpression is not None:
+            filterExpression, names, values = buildCondition(FilterExpression, names, values, False)
+            filterTree = parse('condition', filterExpression, names, values)
+        keyTree = parse('condition', keyCondition, names, values)
+
+        if IndexName is not None:
+            hashKey, rangeKey = table.indexes[IndexName]
+        else:
+            hashKey, rangeKey = table.hashKey, table.rangeKey
+        hashValue, rangeTree = splitKeyCondition(keyTree, hashKey)
+
+        if IndexName is None:
+            partition = table.partitions.get(hashValue, {})
+            if rangeKey:
+                ranges = table.sortKeys.get(hashValue, [])
+                positions = ranges
+                fetch = lambda idx: partition[ranges[idx]]
+            else:
+                ranges = positions = [None] if None in partition else []
+                fetch = lambda idx: partition[None]
+            marker = lambda key: key.get(rangeKey)
+        else:
+            ranges, positions, entries = table.indexEntries(IndexName, hashValue)
+            fetch = lambda idx: entries[idx][2]
+            marker = lambda key: (key.get(rangeKey), key.get(table.rangeKey) if table.rangeKey else None)
+
+        start, stop = 0, len(positions)
+        if rangeTree is not None:
+            low, high = rangeBounds(rangeTree)
+            if low is not None:
+                start = bisect.bisect_left(ranges, low)
+            if high is not None:
+                stop = bisect.bisect_right(ranges, high)
+        if ExclusiveStartKey is not None:
+            position = marker(normalize(ExclusiveStartKey))
+            if ScanIndexForward:
+                start = max(start, bisect.bisect_right(positions, position))
+            else:
+                stop = min(stop, bisect.bisect_left(positions, position))
+        order = range(start, stop) if ScanIndexForward else range(stop - 1, start - 1, -1)
+
+        projection = parse('projection', ProjectionExpression, names, None) if ProjectionExpression else None
+        items = []
+        scanned = 0
+        scannedBytes = 0
+        lastKey = None
+        for idx in order:
+            item = fetch(idx)
+            if rangeTree is not None and not evaluate(item, rangeTree):
+                continue
+            size = itemSize(item)
+            scanned += 1
+            scannedBytes += size
+            if filterTree is None or evaluate(item, filterTree):
+                items.append(project(item, projection) if projection else copy.deepcopy(item))
+            if (Limit is not None and scanned >= Limit) or scannedBytes >= MAX_PAGE_BYTES:
+                if idx != order[-1]:
+                    lastKey = table.keyOf(item)
+                    if IndexName is not None:
+                        lastKey[hashKey] = item[hashKey]
+                        if rangeKey:
+                            lastKey[rangeKey] = item[rangeKey]
+                break
+        units = readUnits(scannedBytes, ConsistentRead)
+        self.record('Query', TableName, units)
+        res = {'Items': items, 'Count': len(items), 'ScannedCount': scanned}
+        if Select == 'COUNT':
+            del res['Items']
+        if lastKey is not None:
+            res['LastEvaluatedKey'] = lastKey
+        addCapacity(res, ReturnConsumedCapacity, TableName, units)
+        return res
+
+    def scan(self, TableName, FilterExpression=None, ProjectionExpression=None, ExpressionAttributeNames=None,
+             ExpressionAttributeValues=None, ExclusiveStartKey=None, Limit=None, ReturnConsumedCapacity=None,
+             Segment=None, TotalSegments=None, **kwargs):
+        table = self.table(TableName, 'Scan')
+        names = dict(ExpressionAttributeNames or {})
+        values = normalize(ExpressionAttributeValues or {})
+        filterTree = None
+        if FilterExpression is not None:
+            filterExpression, names, values = buildCondition(FilterExpression, names, values, False)
+            filterTree = parse('condition', filterExpression, names, values)
+        projection = parse('projection', ProjectionExpression, names, None) if ProjectionExpression else None
+        everything = [item for hashValue in sorted(table.partitions, key=str)
+                      for _, item in sorted(table.partitions[hashValue].items(), key=lambda kv: (kv[0] is None, kv[0]))]
+        if TotalSegments:
+            # parallel scan: a partition belongs to one segment
+            everything = [item for item in everything
+                          if zlib.crc32(repr(item[table.hashKey]).encode('utf-8')) % TotalSegments == Segment]
+        startIdx = 0
+        if ExclusiveStartKey is not None:
+            startKey = normalize(ExclusiveStartKey)
+            for idx, item in enumerate(everything):
+                if table.keyOf(item) == startKey:
+                    startIdx = idx + 1
+                    break
+        items = []
+        scannedBytes = 0
+        lastKey = None
+        scanned = 0
+        for item in everything[startIdx:]:
+            scanned += 1
+            scannedBytes += itemSize(item)
+            if filterTree is None or evaluate(item, filterTree):
+                items.append(project(item, projection) if projection else copy.deepcopy(item))
+            if (Limit is not None and scanned >= Limit) or scannedBytes >= MAX_PAGE_BYTES:
+                if startIdx + scanned < len(everything):
+                    lastKey = table.keyOf(item)
+                break
+        units = readUnits(scannedBytes, False)
+        self.record('Scan', TableName, units)
+        res = {'Items': items, 'Count': len(items), 'ScannedCount': scanned}
+        if lastKey is not None:
+            res['LastEvaluatedKey'] = lastKey
+        addCapacity(res, ReturnConsumedCapacity, TableName, units)
+        return res
+
+    def batchWriteItem(self, RequestItems, ReturnConsumedCapacity=None, **kwargs):
+        if sum(len(v) for v in RequestItems.values()) > 25:
+            raise clientError('ValidationException', 'Too many items requested for the BatchWriteItem call', 'BatchWriteItem')
+        consumed = []
+        unprocessed = dict()
+        for tableName, requests in RequestItems.items():
+            table = self.table(tableName, 'BatchWriteItem')
+            units = 0.0
+            for request in requests:
+                self.batchRequests += 1
+                if self.unprocessedEvery and self.batchRequests % self.unprocessedEvery == 0:
+                    unprocessed.setdefault(tableName, []).append(request)
+                    continue
+                if 'PutRequest' in request:
+                    item = normalize(request['PutRequest']['Item'])
+                    units += writeUnits(itemSize(item))
+                    table.put(item)
+                else:
+                    key = normalize(request['DeleteRequest']['Key'])
+                    old = table.get(key)
+                    units += writeUnits(itemSize(old) if old else 0)
+                    table.delete(key)
+            self.capacity[tableName] += units
+            consumed.append({'TableName': tableName, 'CapacityUnits': units})
+        self.record('BatchWriteItem')
+        res = {'UnprocessedItems': unprocessed}
+        if ReturnConsumedCapacity in ('TOTAL', 'INDEXES'):
+            res['ConsumedCapacity'] = consumed
+        return res
+
+    def batchGetItem(self, RequestItems, ReturnConsumedCapacity=None, **kwargs):
+        responses = dict()
+        consumed = []
+        for tableName, request in RequestItems.items():
+            table = self.table(tableName, 'BatchGetItem')
+            found = []
+            units = 0.0
+            for key in request['Keys']:
+                item = table.get(normalize(key))
+                if item is not None:
+                    units += readUnits(itemSize(item), False)
+                    found.append(copy.deepcopy(item))
+            self.capacity[tableName] += units
+            responses[tableName] = found
+            consumed.append({'TableName': tableName, 'CapacityUnits': units})
+        self.record('BatchGetItem')
+        res = {'Responses': responses, 'UnprocessedKeys': {}}
+        if ReturnConsumedCapacity in ('TOTAL', 'INDEXES'):
+            res['ConsumedCapacity'] = consumed
+        return res
+
+    def transactWriteItems(self, TransactItems, ReturnConsumedCapacity=None, **kwargs):
+        if len(TransactItems) > 100:
+            raise clientError('ValidationException', 'Member must have length less than or equal to 100', 'TransactWriteItems')
+        # every condition is checked before anything is written
+        reasons = []
+        steps = []
+        for entry in TransactItems:
+            (kind, request), = entry.items()
+            table = self.table(request['TableName'], 'TransactWriteItems')
+            key = table.keyOf(normalize(request['Item'])) if kind == 'Put' else normalize(request['Key'])
+            old = table.get(key)
+            values = normalize(request.get('ExpressionAttributeValues', None) or {})
+            try:
+                self.checkCondition(old, 'TransactWriteItems', request.get('ConditionExpression', None),
+                                    request.get('ExpressionAttributeNames', None), values, None)
+                reasons.append({'Code': 'None'})
+            except ClientError:
+                reasons.append({'Code': 'ConditionalCheckFailed', 'Message': 'The conditional request failed'})
+            steps.append((kind, request, table, key, old, values))
+        self.record('TransactWriteItems')
+        if any(reason['Code'] != 'None' for reason in reasons):
+            raise ClientError({'Error': {'Code': 'TransactionCanceledException',
+                                         'Message': 'Transaction cancelled, please refer cancellation reasons for specific reasons'},
+                               'CancellationReasons': reasons}, 'TransactWriteItems')
+        consumed = defaultdict(float)
+        for kind, request, table, key, old, values in steps:
+            if kind == 'Put':
+                item = normalize(request['Item'])
+                table.put(item)
+            elif kind == 'Delete':
+                item = old
+                table.delete(key)
+            elif kind == 'Update':
+                item = copy.deepcopy(old) if old is not None else dict(key)
+                actions = parse('update', request['UpdateExpression'], request.get('ExpressionAttributeNames', None), values)
+                applyUpdate(item, actions, table.keyNames())
+                table.put(item)
+            else:
+                item = old
+            # transactions cost two write units per item
+            units = 2 * writeUnits(max(itemSize(item) if item else 0, itemSize(old) if old else 0))
+            consumed[table.name] += units
+            self.capacity[table.name] += units
+        res = dict()
+        if ReturnConsumedCapacity in ('TOTAL', 'INDEXES'):
+            res['ConsumedCapacity'] = [{'TableName': name, 'CapacityUnits': units} for name, units in consumed.items()]
+        return res
+
+    def describeTable(self, TableName, **kwargs):
+        table = self.table(TableName, 'DescribeTable')
+        self.record('DescribeTable')
+        keySchema = [{'AttributeName': table.hashKey, 'KeyType': 'HASH'}]
+        if table.rangeKey:
+            keySchema.append({'AttributeName': table.rangeKey, 'KeyType': 'RANGE'})
+        return {'Table': {'TableName': TableName, 'KeySchema': keySchema, 'ItemCount': table.count()}}
+
+def readUnits(size, consistent):
+    units = math.ceil(size / 4096.0) if size else 1
+    return float(units if consistent else units * 0.5)
+
+def writeUnits(size):
+    return float(max(1, math.ceil(size / 1024.0)))
+
+def addCapacity(res, mode, tableName, units):
+    if mode in ('TOTAL', 'INDEXES'):
+        res['ConsumedCapacity'] = {'TableName': tableName, 'CapacityUnits': units}
+
+def buildCondition(expression, names, values, isKey):
+    if isinstance(expression, ConditionBase):
+        builder = ConditionExpressionBuilder()
+        built = builder.build_expression(expression, is_key_condition=isKey)
+        # keep placeholders of several built expressions apart
+        suffix = 'k' if isKey else 'f'
+        text = built.condition_expression
+        for placeholder in sorted(built.attribute_name_placeholders, key=len, reverse=True):
+            text = text.replace(placeholder, placeholder + suffix)
+            names[placeholder + suffix] = built.attribute_name_placeholders[placeholder]
+        for placeholder in sorted(built.attribute_value_placeholders, key=len, reverse=True):
+            text = text.replace(placeholder, placeholder + suffix)
+            values[placeholder + suffix] = normalize(built.attribute_value_placeholders[placeholder])
+        return text, names, values
+    return expression, names, values
+
+def splitKeyCondition(tree, hashKey):
+    # returns (hash key value, range condition tree or None)
+    if tree[0] == 'cmp' and tree[1] == '=' and tree[2][0] == 'path' and tree[2][1] == [hashKey]:
+        return tree[3][1], None
+    if tree[0] == 'and':
+        for first, second in ((tree[1], tree[2]), (tree[2], tree[1])):
+            if first[0] == 'cmp' and first[1] == '=' and first[2][0] == 'path' and first[2][1] == [hashKey]:
+                return first[3][1], second
+    raise clientError('ValidationException', 'Query condition missed key schema element: ' + hashKey, 'Query')
+
+def rangeBounds(tree):
+    kind = tree[0]
+    if kind == 'cmp':
+        op, value = tree[1], tree[3][1]
+        if op == '=':
+            return value, value
+        if op in ('>', '>='):
+            return value, None
+        if op in ('<', '<='):
+            return None, value
+    if kind == 'between':
+        return tree[2][1], tree[3][1]
+    if kind == 'fn' and tree[1] == 'begins_with':
+        prefix = tree[2][1][1]
+        return prefix, prefix + u'\U0010ffff'
+    return None, None
+
+
+'''
+LocalResource / LocalTable classes
+
+boto3 resource-level facade over LocalDynamoDB. Conditions may be given as
+boto3.dynamodb.conditions objects or as expression strings.
+'''
+class LocalTable(object):
+    def __init__(self, store, name):
+        self.store = store
+        self.name = name
+        self.table_name = name
+        data = store.table(name, 'DescribeTable')
+        self.key_schema = [{'AttributeName': data.hashKey, 'KeyType': 'HASH'}]
+        if data.rangeKey:
+            self.key_schema.append({'AttributeName': data.rangeKey, 'KeyType': 'RANGE'})
+        self.meta = type('Meta', (), {'client': LocalClient(store)})()
+
+    def __repr__(self):
+        return "dynamodb.Table(name='%s')" % self.name
+
+    def get_item(self, **kwargs):
+        return self.store.getItem(TableName=self.name, **kwargs)
+
+    def put_item(self, **kwargs):
+        return self.store.putItem(TableName=self.name, **kwargs)
+
+    def delete_item(self, **kwargs):
+        return self.store.deleteItem(TableName=self.name, **kwargs)
+
+    def update_item(self, **kwargs):
+        return self.store.updateItem(TableName=self.name, **kwargs)
+
+    def query(self, **kwargs):
+        return self.store.query(TableName=self.name, **kwargs)
+
+    def scan(self, **kwargs):
+        return self.store.scan(TableName=self.name, **kwargs)
+
+class LocalResource(object):
+    def __init__(self, store):
+        self.store = store
+        self.meta = type('Meta', (), {'client': LocalClient(store)})()
+        self._tables = dict()
+
+    def Table(self, name):
+        if name not in self._tables:
+            self._tables[name] = LocalTable(self.store, name)
+        return self._tables[name]
+
+    def batch_write_item(self, **kwargs):
+        return self.store.batchWriteItem(**kwargs)
+
+    def batch_get_item(self, **kwargs):
+        return self.store.batchGetItem(**kwargs)
+
+
+'''
+LocalClient class
+
+boto3 low-level client facade: converts wire format in and out.
+'''
+class LocalClient(object):
+    def __init__(self, store):
+        self.store = store
+
+    def get_item(self, Key, **kwargs):
+        res = self.store.getItem(Key=itemFromWire(Key), **kwargs)
+        return wireResponse(res)
+
+    def put_item(self, Item, ExpressionAttributeValues=None, **kwargs):
+        res = self.store.putItem(Item=itemFromWire(Item), ExpressionAttributeValues=valuesFromWire(ExpressionAttributeValues), **kwargs)
+        return wireResponse(res)
+
+    def delete_item(self, Key, ExpressionAttributeValues=None, **kwargs):
+        res = self.store.deleteItem(Key=itemFromWire(Key), ExpressionAttributeValues=valuesFromWire(ExpressionAttributeValues), **kwargs)
+        return wireResponse(res)
+
+    def update_item(self, Key, ExpressionAttributeValues=None, **kwargs):
+        res = self.store.updateItem(Key=itemFromWire(Key), ExpressionAttributeValues=valuesFromWire(ExpressionAttributeValues), **kwargs)
+        return wireResponse(res)
+
+    def query(self, ExpressionAttributeValues=None, ExclusiveStartKey=None, **kwargs):
+        res = self.store.query(ExpressionAttributeValues=valuesFromWire(ExpressionAttributeValues),
+                               ExclusiveStartKey=itemFromWire(ExclusiveStartKey) if ExclusiveStartKey else None, **kwargs)
+        return wireResponse(res)
+
+    def scan(self, ExpressionAttributeValues=None, ExclusiveStartKey=None, **kwargs):
+        res = self.store.scan(ExpressionAttributeValues=valuesFromWire(ExpressionAttributeValues),
+                              ExclusiveStartKey=itemFromWire(ExclusiveStartKey) if ExclusiveStartKey else None, **kwargs)
+        return wireResponse(res)
+
+    def batch_write_item(self, RequestItems, **kwargs):
+        converted = dict()
+        for tableName, requests in RequestItems.items():
+            converted[tableName] = []
+            for request in requests:
+                if 'PutRequest' in request:
+                    converted[tableName].append({'PutRequest': {'Item': itemFromWire(request['PutRequest']['Item'])}})
+                else:
+                    converted[tableName].append({'DeleteRequest': {'Key': itemFromWire(request['DeleteRequest']['Key'])}})
+        res = self.store.batchWriteItem(RequestItems=converted, **kwargs)
+        for tableName, requests in res['UnprocessedItems'].items():
+            res['UnprocessedItems'][tableName] = [
+                {'PutRequest': {'Item': itemToWire(request['PutRequest']['Item'])}} if 'PutRequest' in request
+                else {'DeleteRequest': {'Key': itemToWire(request['DeleteRequest']['Key'])}}
+                for request in requests]
+        return res
+
+    def batch_get_item(self, RequestItems, **kwargs):
+        converted = dict((name, dict(request, Keys=[itemFromWire(k) for k in request['Keys']]))
+                         for name, request in RequestItems.items())
+        res = self.store.batchGetItem(RequestItems=converted, **kwargs)
+        res['Responses'] = dict((name, [itemToWire(i) for i in items]) for name, items in res['Responses'].items())
+        return res
+
+    def transact_write_items(self, TransactItems, **kwargs):
+        converted = []
+        for entry in TransactItems:
+            (kind, request), = entry.items()
+            request = dict(request)
+            for name in ('Item', 'Key', 'ExpressionAttributeValues'):
+                if name in request:
+                    request[name] = itemFromWire(request[name])
+            converted.append({kind: request})
+        return self.store.transactWriteItems(TransactItems=converted, **kwargs)
+
+    def describe_table(self, **kwargs):
+        return self.store.describeTable(**kwargs)
+
+def valuesFromWire(values):
+    if values is None:
+        return None
+    return dict((k, fromWire(v)) for k, v in values.items())
+
+def wireResponse(res):
+    for name in ('Item', 'Attributes', 'LastEvaluatedKey'):
+        if name in res:
+            res[name] = itemToWire(res[name])
+    if 'Items' in res:
+        res['Items'] = [itemToWire(item) for item in res['Items']]
+    return res
+
+
+'''
+LocalService class
+
+Base of the non-DynamoDB stand-ins: per-operation call counts (thread safe)
+and injectable latency.
+'''
+class LocalService(object):
+    def __init__(self, latency=None):
+        self.calls = defaultdict(int)
+        self.latency = latency or {}
+        self.lock = threading.Lock()
+
+    def record(self, operation):
+        with self.lock:
+            self.calls[operation] += 1
+        delay = self.latency.get(operation, self.latency.get('*', 0))
+        if delay:
+            time.sleep(delay)
+
+    def resetStats(self):
+        self.calls.clear()
+
+    def totalCalls(self):
+        return sum(self.calls.values())
+
+
+'''
+LocalSns class
+
+boto3 low-level SNS client stand-in: list_topics (100 topics per page),
+publish and publish_batch. Published messages are kept per topic arn.
+failEvery makes every n-th publish entry fail with a retryable error.
+'''
+class LocalSns(LocalService):
+    def __init__(self, topics=(), latency=None, failEvery=0):
+        LocalService.__init__(self, latency)
+        self.topics = list(topics)
+        self.messages = defaultdict(list)
+        self.failEvery = failEvery
+        self.entries = 0
+
+    def list_topics(self, NextToken=None, **kwargs):
+        self.record('ListTopics')
+        start = int(NextToken or 0)
+        res = {'Topics': [{'TopicArn': arn} for arn in self.topics[start:start + 100]]}
+        if start + 100 < len(self.topics):
+            res['NextToken'] = str(start + 100)
+        return res
+
+    def deliver(self, TopicArn, Message):
+        with self.lock:
+            self.entries += 1
+            if self.failEvery and self.entries % self.failEvery == 0:
+                return False
+            self.messages[TopicArn].append(Message)
+            return True
+
+    def publish(self, TopicArn, Message, **kwargs):
+        self.record('Publish')
+        if not self.deliver(TopicArn, Message):
+            raise clientError('InternalError', 'Internal error', 'Publish')
+        return {'MessageId': str(len(self.messages[TopicArn]))}
+
+    def publish_batch(self, TopicArn, PublishBatchRequestEntries, **kwargs):
+        self.record('PublishBatch')
+        if len(PublishBatchRequestEntries) > 10:
+            raise clientError('TooManyEntriesInBatchRequest', 'The batch request contains more entries than permissible.', 'PublishBatch')
+        res = {'Successful': [], 'Failed': []}
+        for entry in PublishBatchRequestEntries:
+            if self.deliver(TopicArn, entry['Message']):
+                res['Successful'].append({'Id': entry['Id'], 'MessageId': str(len(self.messages[TopicArn]))})
+            else:
+                res['Failed'].append({'Id': entry['Id'], 'Code': 'InternalError', 'SenderFault': False})
+        return res
+
+
+'''
+LocalSnsResource class
+
+boto3 SNS resource facade: Topic(arn).publish, topics.all().
+'''
+class LocalSnsResource(object):
+    def __init__(self, sns):
+        self.sns = sns
+        self.meta = type('Meta', (), {'client': sns})()
+        self.topics = type('Topics', (), {'all': lambda _: iter([self.Topic(arn) for arn in self.listAll()])})()
+
+    def listAll(self):
+        res = self.sns.list_topics()
+        arns = [topic['TopicArn'] for topic in res['Topics']]
+        while 'NextToken' in res:
+            res = self.sns.list_topics(NextToken=res['NextToken'])
+            arns += [topic['TopicArn'] for topic in res['Topics']]
+        return arns
+
+    def Topic(self, arn):
+        sns = self.sns
+        topic = type('Topic', (), {})()
+        topic.arn = arn
+        topic.publish = lambda Message, **kwargs: sns.publish(TopicArn=arn, Message=Message, **kwargs)
+        return topic
+
+
+'''
+LocalCognito class
+
+boto3 cognito-idp client stand-in: admin_get_user, admin_delete_user.
+users: {userName: attributes dict}
+'''
+class LocalCognito(LocalService):
+    def __init__(self, users=None, latency=None):
+        LocalService.__init__(self, latency)
+        self.users = dict(users or {})
+
+    def admin_get_user(self, UserPoolId, Username, **kwargs):
+        self.record('AdminGetUser')
+        if Username not in self.users:
+            raise clientError('UserNotFoundException', 'User does not exist.', 'AdminGetUser')
+        return {
+            'Username': Username,
+            'UserAttributes': [{'Name': k, 'Value': v} for k, v in self.users[Username].items()],
+            'Enabled': True,
+        }
+
+    def admin_delete_user(self, UserPoolId, Username, **kwargs):
+        self.record('AdminDeleteUser')
+        if self.users.pop(Username, None) is None:
+            raise clientError('UserNotFoundException', 'User does not exist.', 'AdminDeleteUser')
+        return {}
+
+
+'''
+LocalLambda class
+
+boto3 lambda client stand-in: invoke. Every invocation is kept in
+invocations as (function name, invocation type, decoded payload).
+RequestResponse invocations of a registered function run its handler.
+'''
+class LocalLambda(LocalService):
+    def __init__(self, latency=None):
+        LocalService.__init__(self, latency)
+        self.invocations = []
+        self.functions = dict()
+
+    def register(self, functionName, handler):
+        self.functions[functionName] = handler
+
+    def invoke(self, FunctionName, InvocationType='RequestResponse', Payload=b'{}', **kwargs):
+        self.record('Invoke')
+        payload = json.loads(Payload)
+        with self.lock:
+            self.invocations.append((FunctionName, InvocationType, payload))
+        if InvocationType == 'Event':
+            return {'StatusCode': 202, 'Payload': io.BytesIO(b'')}
+        if FunctionName not in self.functions:
+            raise clientError('ResourceNotFoundException', 'Function not found: ' + FunctionName, 'Invoke')
+        result = self.functions[FunctionName](payload, None)
+        return {'StatusCode': 200, 'Payload': io.BytesIO(json.dumps(result, default=str).encode('utf-8'))}
+
+
+'''
+install function
+
+@input parameter:
+    - tables: {envName: (tableName, hashKey, rangeKey[, indexes])}
+    - latency: {operationName or '*': seconds} (optional)
+@return:
+    - LocalDynamoDB wired into common.db for every handler
+'''
+def install(tables, latency=None):
+    import os
+    from common import db
+    store = LocalDynamoDB(latency)
+    for envName, spec in tables.items():
+        name, hashKey, rangeKey = spec[0], spec[1], spec[2]
+        indexes = spec[3] if len(spec) > 3 else None
+        store.createTable(name, hashKey, rangeKey, indexes)
+        os.environ[envName] = name
+    db.reset()
+    resource = LocalResource(store)
+    db.setResource('dynamodb', resource)
+    db.setClient('dynamodb', resource.meta.client)
+    return store
+
+'''
+installSns function
+
+@input parameter:
+    - topics: list of topic arns (optional)
+    - latency: {operationName or '*': seconds} (optional)
+    - failEvery: every n-th published entry fails (optional)
+@return:
+    - LocalSns wired into common.db as the 'sns' client
+'''
+def installSns(topics=(), latency=None, failEvery=0):
+    from common import db
+    sns = LocalSns(topics, latency, failEvery)
+    db.setResource('sns', LocalSnsResource(sns))
+    db.setClient('sns', sns)
+    return sns
+
+'''
+installCognito / installLambda functions
+
+@input parameter:
+    - users: {userName: attributes} (installCognito only)
+    - latency: {operationName or '*': seconds} (optional)
+@return:
+    - LocalCognito / LocalLambda wired into common.db as the client
+'''
+def installCognito(users=None, latency=None):
+    from common import db
+    cognito = LocalCognito(users, latency)
+    db.setClient('cognito-idp', cognito)
+    return cognito
+
+def installLambda(latency=None):
+    from common import db
+    local = LocalLambda(latency)
+    db.setClient('lambda', local)
+    return local
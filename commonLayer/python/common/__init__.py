@@ -0,0 +1,7 @@
+'''
+common package
+
+Code shared by the lambda functions of this repository.
+The directory commonLayer/ is deployed as a lambda layer, so every function
+that attaches the layer can import it as `from common import db`.
+'''
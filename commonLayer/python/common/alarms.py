@@ -0,0 +1,343 @@
+import os, json, zlib
+from common import db, bulk, plans, log
+
+'''
+alarms module
+
+Alarm storage answering two queries with key lookups only:
+    - the alarms of a user: ALARM_TABLE (email HASH, alarmId RANGE), one
+      item per alarm
+    - the alarms due at a minute, over every user: ALARM_BUCKET_TABLE
+      (bucket HASH, alarmKey RANGE), one entry per alarm and day of the week
+          bucket   = "<minute of the week, UTC>#<shard>"
+          alarmKey = "<email>#<alarmId>"
+      The shard is a hash of the email, so the alarms of a popular minute
+      (07:00 on Monday) are spread over SHARDS partitions instead of one hot
+      key; dueAlarms() reads the SHARDS partitions of the minute in parallel.
+
+putAlarm() writes the alarm item and adds / removes its bucket entries in
+one transaction, conditioned on the version of the alarm read before, so
+the two tables never disagree: a concurrent change of the same alarm
+cancels the transaction, and the write is retried from a fresh read.
+
+An alarm with followProfile = 1 rings at the wakeUpTime of the profile of
+the user, on its effectiveDays (every day when there are none): putAlarm()
+copies them from USER_TABLE, and syncProfile() rewrites the following
+alarms when the profile changes (putUser).
+
+SHARDS is part of the bucket keys: changing it needs a rebuild of
+ALARM_BUCKET_TABLE from ALARM_TABLE.
+'''
+
+ALARM_ENV = 'ALARM_TABLE'
+BUCKET_ENV = 'ALARM_BUCKET_TABLE'
+
+SHARDS = int(os.environ.get('ALARM_SHARDS', 16))
+DEFAULT_UTC_OFFSET = int(os.environ.get('ALARM_UTC_OFFSET', 0))
+MAX_ALARMS = 20
+MAX_RETRIES = 3
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+# the unix epoch is a Thursday: minute 0 is minute 3 days of the week
+EPOCH_MINUTE_OF_WEEK = 3 * MINUTES_PER_DAY
+
+# attributes of an alarm kept in the bucket entries, for the dispatcher
+BUCKET_ATTRIBUTES = ('taskType',)
+
+logger = log.getLogger(__name__)
+
+'''
+minuteOfWeek function
+
+@input parameter:
+    - isoweekday: 1 (Monday) to 7, on the user's clock
+    - hh, mm: time on the user's clock
+    - utcOffset: minutes east of UTC of the user's clock
+@return:
+    - int: minute of the week in UTC, 0 (Monday 00:00) to MINUTES_PER_WEEK - 1
+'''
+def minuteOfWeek(isoweekday, hh, mm, utcOffset=0):
+    return ((int(isoweekday) - 1) * MINUTES_PER_DAY + int(hh) * 60 + int(mm) - int(utcOffset)) % MINUTES_PER_WEEK
+
+def weekMinuteOf(unixMinute):
+    return (int(unixMinute) + EPOCH_MINUTE_OF_WEEK) % MINUTES_PER_WEEK
+
+def shardOf(email):
+    # crc32, not hash(): the shard must not change between processes
+    return zlib.crc32(email.encode('utf-8')) % SHARDS
+
+def bucketKey(minute, shard):
+    return "%05d#%02d" % (minute, shard)
+
+def alarmKey(email, alarmId):
+    return "%s#%s" % (email, alarmId)
+
+'''
+bucketsOf function
+
+@input parameter:
+    - email: PK of the user
+    - alarm: alarm item (or None)
+@return:
+    - set: bucket keys the alarm must be found in (empty when disabled)
+'''
+def bucketsOf(email, alarm):
+    if not alarm or not int(alarm.get('enabled', 1)):
+        return set()
+    shard = shardOf(email)
+    utcOffset = alarm.get('utcOffset', DEFAULT_UTC_OFFSET)
+    time = alarm['time']
+    return set(bucketKey(minuteOfWeek(day, time['hh'], time['mm'], utcOffset), shard)
+               for day in alarm.get('days', []))
+
+'''
+listAlarms function
+
+@input parameter:
+    - email: PK of the user
+@return:
+    - list: alarm items of the user, by alarmId
+'''
+def listAlarms(email):
+    table = db.getTable(ALARM_ENV)
+    params = {'KeyConditionExpression': db.Key('email').eq(email)}
+    items = []
+    while True:
+        res = table.query(**params)
+        items += res.get('Items', [])
+        if 'LastEvaluatedKey' not in res:
+            return items
+        params['ExclusiveStartKey'] = res['LastEvaluatedKey']
+
+def getAlarm(email, alarmId):
+    return db.getTable(ALARM_ENV).get_item(
+        Key={'email': email, 'alarmId': alarmId}, ConsistentRead=True).get('Item', None)
+
+'''
+putAlarm function
+
+@input parameter:
+    - email: PK of the user
+    - alarmId: sort key of the alarm
+    - fields: validated body (schema 'alarm') with time and days; with
+              followProfile = 1 they come from profileFields()
+@return:
+    - dict: the stored alarm item
+
+Description: raises the 400 response when the user already has
+             MAX_ALARMS alarms and alarmId is a new one.
+'''
+def putAlarm(email, alarmId, fields):
+    for attempt in range(MAX_RETRIES):
+        old = getAlarm(email, alarmId)
+        if old is None and countAlarms(email) >= MAX_ALARMS:
+            raise Exception(json.dumps({
+                'statusCode': 400,
+                'message': "Too many alarms: at most %d" % MAX_ALARMS
+            }))
+        alarm = {
+            'email': email,
+            'alarmId': alarmId,
+            'time': {'hh': fields['time']['hh'], 'mm': fields['time']['mm']},
+            'days': sorted(set(fields['days'])),
+            'enabled': fields.get('enabled', 1),
+            'utcOffset': fields.get('utcOffset', DEFAULT_UTC_OFFSET),
+            'version': int(old.get('version', 0)) + 1 if old else 1,
+        }
+        if fields.get('taskType', None) is not None:
+            alarm['taskType'] = fields['taskType']
+        if fields.get('followProfile', 0):
+            alarm['followProfile'] = 1
+        try:
+            writeAlarm(email, alarmId, old, alarm)
+            return alarm
+        except db.ClientError as e:
+            if not isCancelled(e):
+                raise
+            logger.info("Alarm changed concurrently, retry %d.", attempt + 1)
+    raise Exception(json.dumps({
+        'statusCode': 409,
+        'message': "Conflict"
+    }))
+
+def loadProfile(email):
+    user = db.getTable(plans.USER_ENV).get_item(Key={'email': email}, ConsistentRead=True).get('Item', {})
+    return user.get('profile', None)
+
+'''
+profileFields function
+
+@input parameter:
+    - profile: profile of the user item (may be None)
+@return:
+    - dict: time ({hh, mm} of wakeUpTime) and days (effectiveDays, or
+            every day) of an alarm following the profile
+
+Description: raises the 400 response when the profile has no wakeUpTime.
+'''
+def profileFields(profile):
+    if not profile or not profile.get('wakeUpTime', None):
+        raise Exception(json.dumps({
+            'statusCode': 400,
+            'message': "Profile wakeUpTime Not Found"
+        }))
+    wake, sleep, effectiveDays = plans.profileTimes(profile)
+    return {
+        'time': plans.clock(wake),
+        'days': effectiveDays or list(range(1, 8)),
+    }
+
+def followingAlarms(email):
+    return [alarm for alarm in listAlarms(email) if int(alarm.get('followProfile', 0))]
+
+'''
+syncProfile function
+
+@input parameter:
+    - email: PK of the user
+    - following: alarms following the profile (None: listed here)
+    - fields: profileFields() they move to (None: from the stored profile)
+@return:
+    - int: number of alarms rewritten
+
+Description: rewrites the alarms following the profile whose time or days
+             no longer match it (one consistent read of USER_TABLE, only
+             when the user has such alarms and no fields are given).
+'''
+def syncProfile(email, following=None, fields=None):
+    if following is None:
+        following = followingAlarms(email)
+    if not following:
+        return 0
+    if fields is None:
+        fields = profileFields(loadProfile(email))
+    changed = 0
+    for alarm in following:
+        if alarm['time'] == fields['time'] and [int(day) for day in alarm['days']] == fields['days']:
+            continue
+        putAlarm(email, alarm['alarmId'], dict(alarm, **fields))
+        changed += 1
+    return changed
+
+def countAlarms(email):
+    res = db.getTable(ALARM_ENV).query(KeyConditionExpression=db.Key('email').eq(email), Select='COUNT')
+    return res.get('Count', 0)
+
+def isCancelled(error):
+    if error.response['Error']['Code'] != 'TransactionCanceledException':
+        return False
+    reasons = error.response.get('CancellationReasons', [])
+    return any(reason.get('Code') == 'ConditionalCheckFailed' for reason in reasons)
+
+'''
+writeAlarm function
+
+@input parameter:
+    - email, alarmId: key of the alarm
+    - old: alarm item read before (None: new alarm)
+    - alarm: new alarm item (None: delete)
+@return:
+    - None
+
+Description: one TransactWriteItems call: the alarm item (conditioned on
+             the version of old) and the bucket entries that changed.
+'''
+def writeAlarm(email, alarmId, old, alarm):
+    serializer = db.TypeSerializer()
+    alarmTable = os.environ[ALARM_ENV]
+    bucketTable = os.environ[BUCKET_ENV]
+    key = {'email': {'S': email}, 'alarmId': {'S': alarmId}}
+
+    if old is None:
+        condition = {'ConditionExpression': 'attribute_not_exists(alarmId)'}
+    else:
+        condition = {
+            'ConditionExpression': 'version = :version',
+            'ExpressionAttributeValues': {':version': {'N': str(old['version'])}},
+        }
+    if alarm is None:
+        items = [{'Delete': dict(condition, TableName=alarmTable, Key=key)}]
+    else:
+        items = [{'Put': dict(condition, TableName=alarmTable,
+                              Item=dict((name, serializer.serialize(value)) for name, value in alarm.items()))}]
+
+    oldBuckets = bucketsOf(email, old)
+    newBuckets = bucketsOf(email, alarm)
+    entryKey = alarmKey(email, alarmId)
+    for bucket in sorted(oldBuckets - newBuckets):
+        items.append({'Delete': {'TableName': bucketTable,
+                                 'Key': {'bucket': {'S': bucket}, 'alarmKey': {'S': entryKey}}}})
+    # entries kept are rewritten when the attributes they carry changed
+    changed = alarm is not None and old is not None and any(
+        old.get(name) != alarm.get(name) for name in BUCKET_ATTRIBUTES)
+    for bucket in sorted(newBuckets if changed else newBuckets - oldBuckets):
+        entry = {'bucket': bucket, 'alarmKey': entryKey, 'email': email, 'alarmId': alarmId}
+        for name in BUCKET_ATTRIBUTES:
+            if alarm.get(name, None) is not None:
+                entry[name] = alarm[name]
+        items.append({'Put': {'TableName': bucketTable,
+                              'Item': dict((name, serializer.serialize(value)) for name, value in entry.items())}})
+
+    db.getClient('dynamodb').transact_write_items(TransactItems=items)
+
+'''
+dueAlarms function
+
+@input parameter:
+    - minute: minute of the week in UTC (see minuteOfWeek)
+    - executor: ThreadPoolExecutor (optional, defaults to bulk.getExecutor())
+@return:
+    - list: bucket entries of the minute (wire format: bucket, alarmKey,
+            email, alarmId and BUCKET_ATTRIBUTES)
+
+Description: SHARDS paginated key queries, run in parallel.
+'''
+def dueAlarms(minute, executor=None):
+    executor = executor or bulk.getExecutor()
+    client = db.getClient('dynamodb')
+    futures = [executor.submit(_queryBucket, client, bucketKey(minute, shard)) for shard in range(SHARDS)]
+    entries = []
+    for future in futures:
+        entries += future.result()
+    return entries
+
+def _queryBucket(client, bucket):
+    params = {
+        'TableName': os.environ[BUCKET_ENV],
+        # bucket is a reserved word
+        'KeyConditionExpression': '#bucket = :bucket',
+        'ExpressionAttributeNames': {'#bucket': 'bucket'},
+        'ExpressionAttributeValues': {':bucket': {'S': bucket}},
+    }
+    entries = []
+    while True:
+        res = client.query(**params)
+        entries += res.get('Items', [])
+        if 'LastEvaluatedKey' not in res:
+            return entries
+        params['ExclusiveStartKey'] = res['LastEvaluatedKey']
+
+'''
+purge function
+
+@input parameter:
+    - email: PK of the user
+@return:
+    - int: number of deleted alarms
+
+Description: removes the bucket entries, then the alarm items (deleteUser).
+'''
+def purge(email):
+    if not os.environ.get(ALARM_ENV, None):
+        return 0
+    alarms = listAlarms(email)
+    entries = set()
+    for alarm in alarms:
+        for bucket in bucketsOf(email, alarm):
+            entries.add((bucket, alarmKey(email, alarm['alarmId'])))
+    bulk.deleteKeys(os.environ[BUCKET_ENV], [{'bucket': {'S': bucket}, 'alarmKey': {'S': entryKey}}
+                                             for bucket, entryKey in sorted(entries)])
+    bulk.deleteKeys(os.environ[ALARM_ENV], [{'email': {'S': email}, 'alarmId': {'S': alarm['alarmId']}}
+                                            for alarm in alarms])
+    return len(alarms)
@@ -0,0 +1,191 @@
+import json, time, random
+from concurrent.futures import ThreadPoolExecutor
+from common import db, log
+
+'''
+bulk module
+
+Key-only paging and BatchWriteItem helpers for deleting (or writing) many
+items of one partition.
+
+Everything here talks to the low-level dynamodb client, which is thread safe,
+and keeps keys in wire format ({'S': ...}) from the query straight into the
+batch write, so nothing is (de)serialized on the way.
+'''
+
+BATCH_SIZE = 25
+MAX_RETRIES = 8
+BACKOFF_BASE = 0.05
+BACKOFF_CAP = 1.0
+WORKERS = 4
+
+logger = log.getLogger(__name__)
+
+_executor = None
+
+'''
+getExecutor function
+
+@input parameter:
+    - None
+@return:
+    - ThreadPoolExecutor shared by the container for batch writes
+'''
+def getExecutor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=WORKERS)
+    return _executor
+
+'''
+iterKeyPages function
+
+@input parameter:
+    - tableName: string
+    - keyNames: [partition key name, sort key name]
+    - partitionValue: string value of the partition key
+    - startKey: wire format LastEvaluatedKey to resume from (optional)
+    - pageSize: maximum keys per page (optional, default: up to 1MB)
+@return:
+    - generator of (keys, lastEvaluatedKey), one tuple per query page
+
+Description: projects only the key attributes, so every page carries as many
+             keys as fit in 1MB and nothing else.
+'''
+def iterKeyPages(tableName, keyNames, partitionValue, startKey=None, pageSize=None):
+    client = db.getClient('dynamodb')
+    names = dict(('#k%d' % idx, name) for idx, name in enumerate(keyNames))
+    params = {
+        'TableName': tableName,
+        'KeyConditionExpression': '#k0 = :pk',
+        'ProjectionExpression': ', '.join(names.keys()),
+        'ExpressionAttributeNames': names,
+        'ExpressionAttributeValues': {':pk': {'S': partitionValue}},
+    }
+    if pageSize is not None:
+        params['Limit'] = pageSize
+    while True:
+        if startKey is not None:
+            params['ExclusiveStartKey'] = startKey
+        res = client.query(**params)
+        startKey = res.get('LastEvaluatedKey')
+        yield res['Items'], startKey
+        if startKey is None:
+            return
+
+'''
+tryBatchWrite function
+
+@input parameter:
+    - tableName: string
+    - requests: list of wire format write requests
+                ({'DeleteRequest': {...}} or {'PutRequest': {...}}), <= 25
+@return:
+    - list: requests still unprocessed after MAX_RETRIES ([] on success)
+
+Description: UnprocessedItems are retried with capped, jittered exponential
+             backoff. Errors of the call itself are raised.
+'''
+def tryBatchWrite(tableName, requests):
+    client = db.getClient('dynamodb')
+    pending = requests
+    for attempt in range(MAX_RETRIES + 1):
+        res = client.batch_write_item(RequestItems={tableName: pending})
+        pending = res.get('UnprocessedItems', {}).get(tableName, [])
+        if not pending or attempt == MAX_RETRIES:
+            return pending
+        time.sleep(random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt))))
+
+'''
+batchWrite function
+
+@input parameter:
+    - tableName: string
+    - requests: list of wire format write requests, <= 25
+@return:
+    - int: number of requests applied
+
+Description: like tryBatchWrite, but raises the 503 response when
+             unprocessed items are still left after the retries: the
+             table is throttled and the (idempotent) request can be retried.
+'''
+def batchWrite(tableName, requests):
+    pending = tryBatchWrite(tableName, requests)
+    if pending:
+        logger.error("%d unprocessed item(s) left on %s after %d retries", len(pending), tableName, MAX_RETRIES)
+        raise Exception(json.dumps({
+            'statusCode': 503,
+            'message': "Service Unavailable"
+        }))
+    return len(requests)
+
+'''
+batchWriteAll function
+
+@input parameter:
+    - tableName: string
+    - requests: list of wire format write requests, any length
+    - executor: ThreadPoolExecutor (optional, defaults to getExecutor())
+@return:
+    - int: number of requests applied
+
+Description: splits requests into 25-item chunks and writes them through
+             the bounded worker pool.
+'''
+def batchWriteAll(tableName, requests, executor=None):
+    if not requests:
+        return 0
+    if len(requests) <= BATCH_SIZE:
+        return batchWrite(tableName, requests)
+    executor = executor or getExecutor()
+    futures = [executor.submit(batchWrite, tableName, requests[idx:idx + BATCH_SIZE])
+               for idx in range(0, len(requests), BATCH_SIZE)]
+    return sum(future.result() for future in futures)
+
+'''
+deleteKeys function
+
+@input parameter:
+    - tableName: string
+    - keys: list of wire format keys
+    - executor: ThreadPoolExecutor (optional)
+@return:
+    - int: number of deleted keys
+'''
+def deleteKeys(tableName, keys, executor=None):
+    requests = [{'DeleteRequest': {'Key': key}} for key in keys]
+    return batchWriteAll(tableName, requests, executor)
+
+'''
+purgePartition function
+
+@input parameter:
+    - tableName: string
+    - keyNames: [partition key name, sort key name]
+    - partitionValue: string value of the partition key
+    - startKey: wire format key to resume from (optional)
+    - hasTime: callable returning False when no new page should be started
+               (optional, default: run until the partition is empty)
+    - pageSize: maximum keys per page, bounds the work done between two
+                hasTime checks (optional)
+@return:
+    - dict: deleted, pages, elapsedMs, nextKey
+            nextKey is None when the partition has been fully purged
+'''
+def purgePartition(tableName, keyNames, partitionValue, startKey=None, hasTime=None, pageSize=None):
+    start = time.perf_counter()
+    deleted = 0
+    pages = 0
+    nextKey = startKey
+    for keys, lastKey in iterKeyPages(tableName, keyNames, partitionValue, startKey, pageSize):
+        pages += 1
+        deleted += deleteKeys(tableName, keys)
+        nextKey = lastKey
+        if nextKey is not None and hasTime is not None and not hasTime():
+            break
+    return {
+        'deleted': deleted,
+        'pages': pages,
+        'elapsedMs': int((time.perf_counter() - start) * 1000),
+        'nextKey': nextKey,
+    }
@@ -0,0 +1,168 @@
+import os, time, threading
+from collections import OrderedDict
+
+'''
+cache module
+
+Container-scoped read-through cache for single items (get_item by key),
+keyed by table name and key, with a TTL and size-bounded LRU eviction.
+
+Every write to a cached table bumps a numeric version attribute on the item
+(addVersion / VERSION). The version lets the cache:
+    - never replace a cached item with an older copy returned by an
+      eventually consistent read
+    - drop an entry as soon as a write from the same container is seen
+      (invalidate)
+Writes from other containers cannot reach this cache, so CACHE_TTL (seconds)
+is the bound on how stale a cached item can be.
+
+Usage:
+    from common import cache
+    res = cache.getItem(table, {'email': email})    # same shape as get_item
+'''
+
+TTL = float(os.environ.get('CACHE_TTL', 10))
+MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 1024))
+
+VERSION = 'version'
+
+'''
+ItemCache class
+
+LRU of (expiry, item) entries, thread safe.
+    - clock: callable returning seconds (default time.monotonic)
+'''
+class ItemCache(object):
+    def __init__(self, ttl=TTL, maxEntries=MAX_ENTRIES, clock=time.monotonic):
+        self.ttl = ttl
+        self.maxEntries = maxEntries
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        now = self.clock()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, item):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[1].get(VERSION, 0) > item.get(VERSION, 0):
+                # an eventually consistent read returned an older copy
+                return
+            self.entries[key] = (self.clock() + self.ttl, item)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxEntries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self.entries),
+            }
+
+_cache = ItemCache()
+
+def _cacheKey(table, key):
+    return (getattr(table, 'name', table), tuple(sorted(key.items())))
+
+'''
+getItem function
+
+@input parameter:
+    - table: dynamodb Table object
+    - key: dict, primary key of the item
+@return:
+    - dict: {'Item': item} or {} when there is no such item, like get_item
+
+Description: missing items are not cached, so a new item is visible at once.
+             The returned item is shared with the cache: do not modify it.
+'''
+def getItem(table, key):
+    cacheKey = _cacheKey(table, key)
+    item = _cache.get(cacheKey)
+    if item is not None:
+        return {'Item': item}
+    res = table.get_item(Key=key)
+    if 'Item' in res:
+        _cache.put(cacheKey, res['Item'])
+    return res
+
+'''
+invalidate function
+
+@input parameter:
+    - table: dynamodb Table object or table name
+    - key: dict, primary key of the item (python types)
+@return:
+    - None
+'''
+def invalidate(table, key):
+    _cache.invalidate(_cacheKey(table, key))
+
+'''
+newVersion function
+
+@input parameter:
+    - None
+@return:
+    - int: version of a newly created item (unix time in milliseconds)
+
+Description: starting from the clock instead of 1 keeps the versions of an
+             item that is deleted and created again from repeating.
+'''
+def newVersion():
+    return int(time.time() * 1000)
+
+'''
+addVersion function
+
+@input parameter:
+    - updateExpression: string (SET / REMOVE clauses, no ADD clause)
+    - names: dict of expression attribute names (may be None)
+    - values: dict of expression attribute values (may be None)
+@return:
+    - (updateExpression, names, values) that also increment the version
+'''
+def addVersion(updateExpression, names, values):
+    names = dict(names or {})
+    values = dict(values or {})
+    names['#version'] = VERSION
+    values[':versionStep'] = 1
+    return updateExpression + " ADD #version :versionStep", names, values
+
+'''
+stats / clear functions
+
+Hit, miss and eviction counters of the container cache, and a full reset.
+'''
+def stats():
+    return _cache.stats()
+
+def clear():
+    _cache.clear()
@@ -0,0 +1,225 @@
+import os, time
+from common import db, tasks, plans
+
+'''
+columns module
+
+Weekly rollups of the task records of one user, computed on columns
+instead of items:
+    - fetchColumns() reads the records of a time range with one paginated
+      key-range query on the low-level client, and keeps only the numbers
+      (taskType, startTime, elapsedTime) as three parallel columns: no
+      TypeDeserializer, no Decimal, no dict per task
+    - rollup() turns the columns into per taskType counts, elapsed time and
+      streaks with whole-array operations (numpy.bincount, reshape, diff)
+
+numpy is optional: the lambda runtime does not ship it, so it is imported
+on first use and the same rollup is computed with plain lists when it is
+missing (attach a layer providing numpy to get the vectorized path).
+'''
+
+DAY = 24 * 60 * 60
+WEEK_DAYS = 7
+MAX_WEEKS = 52
+PROJECTION = 'taskType, startTime, elapsedTime'
+
+_numpy = None
+
+def getNumpy():
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+            _numpy = numpy
+        except ImportError:
+            _numpy = False
+    return _numpy or None
+
+'''
+fetchColumns function
+
+@input parameter:
+    - email: PK of the user
+    - since, until: unixtime range of startTime, until excluded
+@return:
+    - dict: taskType, startTime, elapsedTime lists of the same length
+            (missing taskType is -1, missing elapsedTime is 0)
+
+Description: queries START_TIME_INDEX when it is configured, otherwise the
+             taskId range of the days (taskId is "<userName>-<yyyymmdd>-...",
+             see postTask) on the records table.
+'''
+def fetchColumns(email, since, until):
+    params = {
+        'TableName': os.environ['TABLE_NAME'],
+        'ProjectionExpression': PROJECTION,
+        'ExpressionAttributeNames': {'#e': 'email'},
+    }
+    index = os.environ.get('START_TIME_INDEX', None)
+    if index:
+        params['IndexName'] = index
+        params['KeyConditionExpression'] = '#e = :e AND startTime BETWEEN :low AND :high'
+        params['ExpressionAttributeValues'] = {
+            ':e': {'S': email}, ':low': {'N': str(since)}, ':high': {'N': str(until - 1)}}
+    else:
+        prefix = email.split('@')[0] + '-'
+        params['KeyConditionExpression'] = '#e = :e AND taskId BETWEEN :low AND :high'
+        params['ExpressionAttributeValues'] = {
+            ':e': {'S': email},
+            ':low': {'S': '%s%d' % (prefix, plans.dateOf(since))},
+            ':high': {'S': '%s%d~' % (prefix, plans.dateOf(until - 1))}}
+
+    client = db.getClient('dynamodb')
+    taskTypes, startTimes, elapsedTimes = [], [], []
+    while True:
+        res = client.query(**params)
+        items = res.get('Items', [])
+        taskTypes += [item['taskType']['N'] if 'taskType' in item else '-1' for item in items]
+        startTimes += [item['startTime']['N'] if 'startTime' in item else '-1' for item in items]
+        elapsedTimes += [item['elapsedTime']['N'] if 'elapsedTime' in item else '0' for item in items]
+        if 'LastEvaluatedKey' not in res:
+            break
+        params['ExclusiveStartKey'] = res['LastEvaluatedKey']
+    return {'taskType': taskTypes, 'startTime': startTimes, 'elapsedTime': elapsedTimes}
+
+'''
+rollup function
+
+@input parameter:
+    - columns: dict returned by fetchColumns
+    - first: unixtime of the start of the first day
+    - weeks: number of 7-day periods, the last one ending with today
+@return:
+    - dict taskType -> {
+          'counts': tasks per week, oldest first,
+          'elapsed': elapsedTime per week,
+          'activeDays': days with a task per week,
+          'currentStreak': days in a row with a task, up to today (or
+                           yesterday while today has no task yet),
+          'longestStreak': longest run of days with a task
+      }
+'''
+def rollup(columns, first, weeks):
+    numpy = getNumpy()
+    if numpy is None:
+        return _rollupLists(columns, first, weeks)
+    days = weeks * WEEK_DAYS
+    types = len(tasks.TASK_TYPES)
+
+    taskType = numpy.array(columns['taskType'], dtype=numpy.int64)
+    startTime = numpy.array(columns['startTime'], dtype=numpy.float64)
+    elapsed = numpy.array(columns['elapsedTime'], dtype=numpy.float64)
+    day = numpy.floor_divide(startTime - first, DAY).astype(numpy.int64)
+    keep = (day >= 0) & (day < days) & (taskType >= 0) & (taskType < types)
+    cell = taskType[keep] * days + day[keep]
+
+    daily = numpy.bincount(cell, minlength=types * days).reshape(types, days)
+    dailyElapsed = numpy.bincount(cell, weights=elapsed[keep], minlength=types * days).reshape(types, days)
+    active = daily > 0
+
+    counts = daily.reshape(types, weeks, WEEK_DAYS).sum(axis=2)
+    elapsedWeeks = dailyElapsed.reshape(types, weeks, WEEK_DAYS).sum(axis=2)
+    activeDays = active.reshape(types, weeks, WEEK_DAYS).sum(axis=2)
+
+    # runs of active days: +1 where a run starts, -1 after it ends
+    edges = numpy.diff(numpy.pad(active.astype(numpy.int8), ((0, 0), (1, 1))), axis=1)
+    startRows, starts = numpy.nonzero(edges == 1)
+    ends = numpy.nonzero(edges == -1)[1]
+    longest = numpy.zeros(types, dtype=numpy.int64)
+    numpy.maximum.at(longest, startRows, ends - starts)
+    # the run ending today, or yesterday when today is still empty
+    last = numpy.where(active[:, -1], days, days - 1)
+    current = numpy.zeros(types, dtype=numpy.int64)
+    ending = ends == last[startRows]
+    current[startRows[ending]] = (ends - starts)[ending]
+
+    return dict((taskType, {
+        'counts': counts[idx].tolist(),
+        'elapsed': elapsedWeeks[idx].tolist(),
+        'activeDays': activeDays[idx].tolist(),
+        'currentStreak': int(current[idx]),
+        'longestStreak': int(longest[idx]),
+    }) for idx, taskType in enumerate(tasks.TASK_TYPES))
+
+def _rollupLists(columns, first, weeks):
+    days = weeks * WEEK_DAYS
+    types = len(tasks.TASK_TYPES)
+    daily = [[0] * days for _ in range(types)]
+    dailyElapsed = [[0.0] * days for _ in range(types)]
+    for taskType, startTime, elapsed in zip(columns['taskType'], columns['startTime'], columns['elapsedTime']):
+        taskType = int(taskType)
+        day = int((float(startTime) - first) // DAY)
+        if 0 <= day < days and 0 <= taskType < types:
+            daily[taskType][day] += 1
+            dailyElapsed[taskType][day] += float(elapsed)
+
+    result = dict()
+    for idx, taskType in enumerate(tasks.TASK_TYPES):
+        row = daily[idx]
+        longest = run = 0
+        for count in row:
+            run = run + 1 if count else 0
+            longest = max(longest, run)
+        current = 0
+        for count in reversed(row[:-1] if not row[-1] else row):
+            if not count:
+                break
+            current += 1
+        result[taskType] = {
+            'counts': [sum(row[week:week + WEEK_DAYS]) for week in range(0, days, WEEK_DAYS)],
+            'elapsed': [sum(dailyElapsed[idx][week:week + WEEK_DAYS]) for week in range(0, days, WEEK_DAYS)],
+            'activeDays': [sum(1 for count in row[week:week + WEEK_DAYS] if count) for week in range(0, days, WEEK_DAYS)],
+            'currentStreak': current,
+            'longestStreak': longest,
+        }
+    return result
+
+'''
+weeklySummary function
+
+@input parameter:
+    - email: PK of the user
+    - weeks: number of 7-day periods (1 to MAX_WEEKS)
+    - now: unixtime (default: current time)
+@return:
+    - dict: since, until (yyyymmdd), weeks, tasks [{taskType, last7
+            {count, elapsedTime, activeDays}, weeks [{since, count,
+            elapsedTime, activeDays}] oldest first, currentStreak,
+            longestStreak}]
+            streaks are counted inside the requested weeks
+'''
+def weeklySummary(email, weeks, now=None):
+    now = time.time() if now is None else now
+    today = plans.dayStart(plans.dateOf(now))
+    first = today - (weeks * WEEK_DAYS - 1) * DAY
+    rollups = rollup(fetchColumns(email, first, today + DAY), first, weeks)
+
+    weekStarts = [plans.dateOf(first + week * WEEK_DAYS * DAY) for week in range(weeks)]
+    summary = []
+    for taskType in tasks.TASK_TYPES:
+        entry = rollups[taskType]
+        summary.append({
+            'taskType': taskType,
+            'last7': {
+                'count': entry['counts'][-1],
+                'elapsedTime': _number(entry['elapsed'][-1]),
+                'activeDays': entry['activeDays'][-1],
+            },
+            'weeks': [{
+                'since': weekStarts[week],
+                'count': entry['counts'][week],
+                'elapsedTime': _number(entry['elapsed'][week]),
+                'activeDays': entry['activeDays'][week],
+            } for week in range(weeks)],
+            'currentStreak': entry['currentStreak'],
+            'longestStreak': entry['longestStreak'],
+        })
+    return {
+        'since': plans.dateOf(first),
+        'until': plans.dateOf(today),
+        'weeks': weeks,
+        'tasks': summary,
+    }
+
+def _number(value):
+    return int(value) if float(value).is_integer() else round(float(value), 3)
@@ -0,0 +1,149 @@
+import json, base64
+
+'''
+cursor module
+
+Opaque continuation tokens. A token is the url-safe base64 of a wire format
+dynamodb key ({'email': {'S': ...}, 'taskId': {'S': ...}}), so it can be
+passed back as ExclusiveStartKey as is.
+
+A token can be bound to a scope (a string naming the query it pages, e.g.
+the index and the filters): it then only decodes for that same scope, so a
+token of another query is a 400 instead of a start key the query rejects.
+'''
+
+_serializer = None
+_deserializer = None
+
+def _types():
+    # boto3 (pulled in by boto3.dynamodb.types) is only loaded once a key is converted
+    global _serializer, _deserializer
+    if _serializer is None:
+        from boto3.dynamodb.types import TypeSerializer, TypeDeserializer
+        _serializer, _deserializer = TypeSerializer(), TypeDeserializer()
+    return _serializer, _deserializer
+
+'''
+encodeToken function
+
+@input parameter:
+    - key: wire format key (LastEvaluatedKey), or None
+    - scope: string the token is bound to (optional)
+@return:
+    - string token, or None when there is nothing left to read
+'''
+def encodeToken(key, scope=None):
+    if key is None:
+        return None
+    payload = key if scope is None else {'key': key, 'scope': scope}
+    raw = json.dumps(payload, separators=(',', ':'), sort_keys=True).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+'''
+decodeToken function
+
+@input parameter:
+    - token: string made by encodeToken, or None
+    - partitionKey: name of the partition key (ex: 'email')
+    - partitionValue: caller's partition key value
+    - scope: string the token must have been encoded with (optional)
+@return:
+    - wire format key, or None when token is None
+
+Description: a token that does not decode, that points into another
+             user's partition, or that was made for another scope, is
+             rejected with 400.
+'''
+def decodeToken(token, partitionKey, partitionValue, scope=None):
+    if token is None:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        key = json.loads(raw.decode('utf-8'))
+        if scope is not None:
+            assert type(key) is dict and sorted(key) == ['key', 'scope'] and key['scope'] == scope
+            key = key['key']
+        assert type(key) is dict
+        assert key.get(partitionKey) == {'S': partitionValue}
+        for value in key.values():
+            assert type(value) is dict and len(value) == 1
+    except Exception:
+        raise Exception(json.dumps({
+            'statusCode' : 400,
+            'message' : "Bad Request"
+        }))
+    return key
+
+'''
+encodeKey / decodeKey functions
+
+Same as encodeToken / decodeToken for keys in python types, as returned by
+the resource-level Table.query (LastEvaluatedKey / ExclusiveStartKey).
+'''
+def encodeKey(key, scope=None):
+    if key is None:
+        return None
+    serializer = _types()[0]
+    return encodeToken(dict((name, serializer.serialize(value)) for name, value in key.items()), scope)
+
+def decodeKey(token, partitionKey, partitionValue, scope=None):
+    key = decodeToken(token, partitionKey, partitionValue, scope)
+    if key is None:
+        return None
+    deserializer = _types()[1]
+    try:
+        return dict((name, deserializer.deserialize(value)) for name, value in key.items())
+    except Exception:
+        raise Exception(json.dumps({
+            'statusCode' : 400,
+            'message' : "Bad Request"
+        }))
+
+'''
+parseLimit function
+
+@input parameter:
+    - limit: page size from the request (int, numeric string or None)
+    - default: int used when limit is None
+    - maximum: int upper bound
+@return:
+    - int page size, or raises Exception with 400
+'''
+def parseLimit(limit, default, maximum):
+    if limit is None:
+        return default
+    try:
+        limit = int(limit)
+        assert 1 <= limit <= maximum
+    except Exception:
+        raise Exception(json.dumps({
+            'statusCode' : 400,
+            'message' : "Bad Request"
+        }))
+    return limit
+
+'''
+queryPage function
+
+@input parameter:
+    - table: dynamodb Table object
+    - limit: maximum number of items to return
+    - startKey: ExclusiveStartKey in python types, or None
+    - maxPages: maximum number of query calls (bounds latency when a
+                FilterExpression discards most items)
+    - params: every other Table.query argument
+@return:
+    - (items, lastEvaluatedKey); lastEvaluatedKey is None at the end
+'''
+def queryPage(table, limit, startKey=None, maxPages=5, **params):
+    items = []
+    for _ in range(maxPages):
+        if startKey is not None:
+            params['ExclusiveStartKey'] = startKey
+        params['Limit'] = limit - len(items)
+        res = table.query(**params)
+        items.extend(res['Items'])
+        startKey = res.get('LastEvaluatedKey')
+        if startKey is None or len(items) >= limit:
+            break
+    return items, startKey
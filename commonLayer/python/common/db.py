@@ -0,0 +1,179 @@
+import os, importlib
+from common import metrics
+
+'''
+db module
+
+Container-scoped data access for every lambda function.
+
+Lambda keeps the execution environment (and therefore this module) alive
+between warm invocations, so the session, resources, clients and Table
+handles are built once on first use and reused afterwards.
+Handlers must call the getters inside lambda_handler, never at import time,
+so that functions which do not touch AWS pay nothing for this module.
+Clients and Table handles go through metrics.instrument, which returns them
+unchanged unless METRICS_ENABLED is set.
+
+boto3 and botocore are imported on first use as well (about 250 ms of a
+cold start). The names handlers need from them are module attributes
+resolved lazily, so a handler never imports boto3 itself:
+    db.Key, db.Attr     boto3.dynamodb.conditions
+    db.ClientError      botocore.exceptions (except db.ClientError as e:)
+    db.TypeSerializer   boto3.dynamodb.types
+'''
+
+_LAZY_NAMES = {
+    'Key': 'boto3.dynamodb.conditions',
+    'Attr': 'boto3.dynamodb.conditions',
+    'ClientError': 'botocore.exceptions',
+    'TypeSerializer': 'boto3.dynamodb.types',
+}
+
+def __getattr__(name):
+    moduleName = _LAZY_NAMES.get(name)
+    if moduleName is None:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    value = getattr(importlib.import_module(moduleName), name)
+    # later lookups find the module global without calling __getattr__
+    globals()[name] = value
+    return value
+
+_config = None
+_session = None
+_resources = dict()
+_clients = dict()
+_tables = dict()
+
+'''
+getSession function
+
+@input parameter:
+    - None
+@return:
+    - boto3.session.Session shared by the whole container
+'''
+def getSession():
+    global _session
+    if _session is None:
+        import boto3
+        _session = boto3.session.Session()
+    return _session
+
+'''
+getConfig function
+
+@input parameter:
+    - None
+@return:
+    - botocore Config shared by every resource and client: keep-alive
+      sockets, a pool large enough for the thread pools used by bulk
+      operations, and standard-mode retries
+'''
+def getConfig():
+    global _config
+    if _config is None:
+        from botocore.config import Config
+        _config = Config(
+            max_pool_connections=int(os.environ.get('DB_MAX_POOL_CONNECTIONS', 32)),
+            tcp_keepalive=True,
+            connect_timeout=float(os.environ.get('DB_CONNECT_TIMEOUT', 2)),
+            read_timeout=float(os.environ.get('DB_READ_TIMEOUT', 5)),
+            retries={
+                'max_attempts': int(os.environ.get('DB_MAX_ATTEMPTS', 4)),
+                'mode': 'standard',
+            },
+        )
+    return _config
+
+'''
+getResource function
+
+@input parameter:
+    - serviceName: string (default 'dynamodb')
+@return:
+    - boto3 service resource, created once per container
+'''
+def getResource(serviceName='dynamodb'):
+    resource = _resources.get(serviceName)
+    if resource is None:
+        resource = getSession().resource(serviceName, config=getConfig())
+        _resources[serviceName] = resource
+    return resource
+
+'''
+getClient function
+
+@input parameter:
+    - serviceName: string (ex: 'dynamodb', 'cognito-idp', 'lambda')
+@return:
+    - boto3 low-level client, created once per container
+
+Description: the dynamodb client is taken from the shared resource so both
+             share one connection pool.
+'''
+def getClient(serviceName):
+    client = _clients.get(serviceName)
+    if client is None:
+        if serviceName in _resources or serviceName == 'dynamodb':
+            client = getResource(serviceName).meta.client
+        else:
+            client = getSession().client(serviceName, config=getConfig())
+        client = metrics.instrument(client, serviceName)
+        _clients[serviceName] = client
+    return client
+
+'''
+getTable function
+
+@input parameter:
+    - envName: name of the environment variable holding the table name
+@return:
+    - dynamodb.Table object, cached per environment variable
+'''
+def getTable(envName='TABLE_NAME'):
+    table = _tables.get(envName)
+    if table is None:
+        table = metrics.instrument(getResource('dynamodb').Table(os.environ[envName]), 'dynamodb')
+        _tables[envName] = table
+    return table
+
+'''
+isConditionFailed function
+
+@input parameter:
+    - error: botocore ClientError
+@return:
+    - bool: True when the ConditionExpression of a write was not met
+
+Description: lets handlers turn one conditional write into the 400 responses
+             they used to build from a read before the write.
+'''
+def isConditionFailed(error):
+    return error.response.get('Error', {}).get('Code') == 'ConditionalCheckFailedException'
+
+'''
+setResource / setClient functions
+
+Replace a cached resource or client, e.g. with a local stand-in.
+Cached Table handles are dropped so they are rebuilt from the new resource.
+'''
+def setResource(serviceName, resource):
+    _resources[serviceName] = resource
+    _clients.pop(serviceName, None)
+    if serviceName == 'dynamodb':
+        _tables.clear()
+
+def setClient(serviceName, client):
+    _clients[serviceName] = metrics.instrument(client, serviceName)
+
+'''
+reset function
+
+Forget every cached object. The next getter call builds them again.
+'''
+def reset():
+    global _session
+    _session = None
+    _resources.clear()
+    _clients.clear()
+    _tables.clear()
@@ -0,0 +1,185 @@
+import os, json, time, datetime
+from collections import deque
+from decimal import Decimal
+from common import db, bulk, schema, log
+
+logger = log.getLogger(__name__)
+
+'''
+diaryImport module
+
+Bulk import of the sleep diaries of one user from newline-delimited JSON,
+one diary per line (the body of postSleepDiary):
+    - every line is checked like postSleepDiary does (the 'sleepDiary'
+      schema and a yyyyMMdd diaryDate); bad lines are rejected and reported,
+      they do not stop the import
+    - the diaries are written with BatchWriteItem, bulk.BATCH_SIZE per
+      call, up to WINDOW calls in flight on the executor, while the next
+      lines are read: the input is never held in memory as a whole
+    - diaryDate must increase from one line to the next (a file sorted by
+      date, like every export), so the import can resume from a checkpoint:
+      the last diaryDate up to which every diary has been written. Lines up
+      to the checkpoint are skipped, so running an import again with the
+      checkpoint it returned carries on where it stopped; the diaries
+      written after the checkpoint are simply written again (puts).
+
+The import stops early, without losing the checkpoint, when hasTime()
+returns False (lambda timeout) or when a chunk could not be written
+(unprocessed items left after the bulk.tryBatchWrite retries, or an error).
+
+Usage:
+    from common import diaryImport
+    with open(path) as lines:
+        result = diaryImport.importDiaries(email, lines, checkpoint=20200101)
+'''
+
+ITEMS = ("timeToSleep", "numOfWakeUp", "differenceTime", "disturbance", "textMessage", "sleepScore")
+WINDOW = 2 * bulk.WORKERS
+MAX_ERRORS = 100
+
+'''
+parseLine function
+
+@input parameter:
+    - line: one line of the import (json object)
+@return:
+    - dict: diary item without the email (diaryDate int, numbers as Decimal)
+            raises schema.ValidationError when the line is not a valid diary
+'''
+def parseLine(line):
+    try:
+        body = json.loads(line)
+    except ValueError:
+        raise schema.ValidationError("Invalid Input: not a json object")
+    schema.validate("sleepDiary", body)
+    date = body.get("diaryDate", None)
+    try:
+        datetime.datetime.strptime(date, '%Y%m%d')
+    except (ValueError, TypeError):
+        raise schema.ValidationError("Invalid value error: 'diaryDate' must be 'yyyyMMdd' date format, input 'diaryDate': %s" % date)
+    if body.get("sleepScore", None) is None:
+        raise schema.ValidationError("Invalid Input: sleepScore is required")
+    item = {"diaryDate": int(date)}
+    for name in ITEMS:
+        value = body.get(name, None)
+        if value is not None:
+            item[name] = Decimal(str(value)) if isinstance(value, float) else value
+    return item
+
+'''
+wireItem function
+
+@input parameter:
+    - email: PK of the user
+    - item: diary item returned by parseLine
+@return:
+    - dict: wire format item, built straight from the known types of a
+            diary (numbers, strings, lists of numbers), which costs about
+            half of TypeSerializer on every line
+'''
+def wireItem(email, item):
+    wire = {"email": {"S": email}}
+    for name, value in item.items():
+        if isinstance(value, str):
+            wire[name] = {"S": value}
+        elif isinstance(value, list):
+            wire[name] = {"L": [{"N": str(code)} for code in value]}
+        else:
+            wire[name] = {"N": str(value)}
+    return wire
+
+'''
+importDiaries function
+
+@input parameter:
+    - email: PK of the user
+    - lines: iterable of the lines (a file, a list, ...), blank lines ignored
+    - checkpoint: int yyyymmdd returned by a previous import (optional)
+    - hasTime: callable returning False when no new chunk should be started
+               (optional, default: run to the end)
+    - executor: ThreadPoolExecutor (optional, defaults to bulk.getExecutor())
+@return:
+    - dict: read (lines), imported, skipped (up to the checkpoint), rejected,
+            failed (diaries of the chunks not written), errors (line,
+            message; the first MAX_ERRORS), checkpoint, complete, elapsedMs,
+            perSecond (diaries imported per second)
+            complete is False when the import stopped early: run it again
+            with the checkpoint
+'''
+def importDiaries(email, lines, checkpoint=None, hasTime=None, executor=None):
+    start = time.perf_counter()
+    executor = executor or bulk.getExecutor()
+    tableName = os.environ["TABLE_NAME"]
+    result = {"read": 0, "imported": 0, "skipped": 0, "rejected": 0, "failed": 0, "errors": [],
+              "checkpoint": checkpoint, "complete": False}
+    state = {"stopped": False}
+    inFlight = deque()
+    chunk = []
+    lastDate = checkpoint or 0
+
+    def reject(number, message):
+        result["rejected"] += 1
+        if len(result["errors"]) < MAX_ERRORS:
+            result["errors"].append({"line": number, "message": message})
+
+    def settle(limit):
+        # in input order, so the checkpoint only moves over chunks fully written
+        while len(inFlight) > limit:
+            date, count, future = inFlight.popleft()
+            try:
+                pending = future.result()
+            except db.ClientError as e:
+                logger.error(e.response["Error"]["Message"])
+                pending = [None]
+            if pending:
+                if not state["stopped"]:
+                    logger.error("Import of %s stopped after %s: %d unprocessed item(s)", email, result["checkpoint"], len(pending))
+                state["stopped"] = True
+                result["failed"] += count
+                continue
+            if state["stopped"]:
+                # written, but after a chunk that was not: written again on resume
+                continue
+            result["imported"] += count
+            result["checkpoint"] = date
+
+    def submit():
+        requests = [{"PutRequest": {"Item": wireItem(email, item)}} for item in chunk]
+        inFlight.append((chunk[-1]["diaryDate"], len(chunk), executor.submit(bulk.tryBatchWrite, tableName, requests)))
+        settle(WINDOW)
+
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        result["read"] += 1
+        try:
+            item = parseLine(line)
+        except schema.ValidationError as e:
+            reject(number, e.message)
+            continue
+        if checkpoint is not None and item["diaryDate"] <= checkpoint:
+            result["skipped"] += 1
+            continue
+        if item["diaryDate"] <= lastDate:
+            reject(number, "Invalid Input: diaryDate %d is not after %d" % (item["diaryDate"], lastDate))
+            continue
+        lastDate = item["diaryDate"]
+        chunk.append(item)
+        if len(chunk) == bulk.BATCH_SIZE:
+            if state["stopped"] or (hasTime is not None and not hasTime()):
+                break
+            submit()
+            chunk = []
+    else:
+        if chunk and not state["stopped"]:
+            submit()
+        chunk = []
+        result["complete"] = True
+    settle(0)
+    if chunk or state["stopped"]:
+        result["complete"] = False
+
+    elapsed = time.perf_counter() - start
+    result["elapsedMs"] = int(elapsed * 1000)
+    result["perSecond"] = int(result["imported"] / elapsed) if elapsed > 0 else 0
+    return result
@@ -0,0 +1,384 @@
+import os, json, time, math, random, uuid, queue
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from common import db, alarms, timingWheel, log
+
+'''
+dispatch module
+
+Fires the alarms of ALARM_BUCKET_TABLE at their minute, once per occurrence,
+from a dispatcher invoked every minute (EventBridge schedule):
+    - window: the minutes due in the last MAX_LATENESS seconds (catch-up of
+      a late or missed invocation) and the next LOOKAHEAD minutes, loaded
+      before their deadline so they fire on time
+    - claims: every (unix minute, shard) slot of the window is claimed in
+      DISPATCH_TABLE (slot HASH) by a conditional update; a slot done, or
+      leased by another dispatcher, is skipped, and a slot whose lease
+      expired is taken over from the cursor its last owner left
+    - batches: a slot is read PAGE_SIZE bucket entries at a time, and every
+      page waits in a timing wheel (timingWheel module) for the deadline of
+      its minute
+    - bounded concurrency: the pages fired are sent by CONCURRENCY workers,
+      notifier.BATCH_SIZE alarms per notifier call
+    - progress: once the pages 0..n of a slot are sent, the cursor of the
+      slot moves to the last alarmKey of page n (conditioned on the lease),
+      and the last page marks the slot done
+
+An occurrence is fired once, except when a dispatcher dies (or loses its
+lease) between sending pages and moving the cursor: the pages in flight at
+that moment are sent again by the dispatcher taking over. Alarms more than
+MAX_LATENESS seconds late are dropped (logged at ERROR level), not fired.
+
+The claims expire by TTL (expiresAt) RETENTION seconds after their minute.
+
+Usage:
+    from common import dispatch
+    notifier = dispatch.SnsNotifier(os.environ['ALARM_TOPIC_ARN'])
+    stats = dispatch.Dispatcher(notifier).run()
+'''
+
+CLAIM_ENV = 'DISPATCH_TABLE'
+
+LOOKAHEAD = int(os.environ.get('DISPATCH_LOOKAHEAD', 1))
+MAX_LATENESS = int(os.environ.get('DISPATCH_MAX_LATENESS', 300))
+CONCURRENCY = int(os.environ.get('DISPATCH_CONCURRENCY', 32))
+PAGE_SIZE = 1000
+LEASE = 120
+TICK = 0.05
+RETENTION = 7 * 24 * 60 * 60
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.1
+BACKOFF_CAP = 1.0
+
+logger = log.getLogger(__name__)
+
+_executor = None
+
+'''
+getExecutor function
+
+@input parameter:
+    - None
+@return:
+    - ThreadPoolExecutor of CONCURRENCY workers shared by the container
+'''
+def getExecutor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=CONCURRENCY)
+    return _executor
+
+def slotKey(unixMinute, shard):
+    return "%d#%02d" % (unixMinute, shard)
+
+'''
+message function
+
+@input parameter:
+    - entry: alarm fired ({email, alarmId, taskType, deadline})
+@return:
+    - dict: the notification body
+'''
+def message(entry):
+    return {
+        'email': entry['email'],
+        'alarmId': entry['alarmId'],
+        'taskType': entry.get('taskType', None),
+        'deadline': entry['deadline'],
+    }
+
+'''
+SnsNotifier class
+
+Publishes one message (see message function) per alarm to a topic,
+BATCH_SIZE messages per PublishBatch call. Any object with BATCH_SIZE and
+send(entries) returning the entries that failed is a notifier.
+'''
+class SnsNotifier(object):
+    BATCH_SIZE = 10
+
+    def __init__(self, topicArn):
+        self.topicArn = topicArn
+        # build the client here: creating it from the worker threads is not thread safe
+        self.client = db.getClient('sns')
+
+    def send(self, entries):
+        request = [{'Id': str(idx), 'Message': json.dumps(message(entry))} for idx, entry in enumerate(entries)]
+        try:
+            res = self.client.publish_batch(TopicArn=self.topicArn, PublishBatchRequestEntries=request)
+        except db.ClientError as e:
+            logger.warning("PublishBatch failed: %s", e.response['Error']['Message'])
+            return list(entries)
+        return [entries[int(failure['Id'])] for failure in res.get('Failed', [])]
+
+'''
+Slot class
+
+Progress of one claimed slot: the pages read so far ([lastAlarmKey, number
+of notifier calls still running]), how many of them are committed, and
+whether every page was read.
+'''
+class Slot(object):
+    def __init__(self, unixMinute, shard, cursor):
+        self.key = slotKey(unixMinute, shard)
+        self.bucket = alarms.bucketKey(alarms.weekMinuteOf(unixMinute), shard)
+        self.deadline = unixMinute * 60
+        self.cursor = cursor
+        self.pages = []
+        self.committed = 0
+        self.loaded = False
+        self.lost = False
+
+    def finished(self):
+        return self.lost or (self.loaded and self.committed == len(self.pages))
+
+'''
+Dispatcher class
+
+@input parameter:
+    - notifier: see SnsNotifier
+    - clock, sleep: time source and wait (optional, default time.time and
+                    time.sleep)
+    - owner: name of the dispatcher in the claims (optional, random)
+    - executor: ThreadPoolExecutor the pages are sent by (optional,
+                default getExecutor())
+'''
+class Dispatcher(object):
+    def __init__(self, notifier, clock=time.time, sleep=time.sleep, owner=None, executor=None):
+        self.notifier = notifier
+        self.clock = clock
+        self.sleep = sleep
+        self.owner = owner or uuid.uuid4().hex
+        self.executor = executor or getExecutor()
+        self.table = db.getTable(CLAIM_ENV)
+        self.client = db.getClient('dynamodb')
+        self.sent = queue.Queue()
+        self.stats = Counter()
+        self.wheel = None
+        self.slots = []
+
+    '''
+    run function
+
+    @input parameter:
+        - None
+    @return:
+        - dict: counts of the run: claimed / skipped slots, pages, fired /
+                failed / dropped alarms
+    '''
+    def run(self):
+        start = self.clock()
+        first = int(math.ceil((start - MAX_LATENESS) / 60.0))
+        last = int(start // 60) + LOOKAHEAD
+        self.wheel = timingWheel.TimingWheel(TICK, start)
+        for unixMinute in range(first, last + 1):
+            for shard in range(alarms.SHARDS):
+                self.load(unixMinute, shard)
+                self.pump()
+        while self.slots:
+            self.pump()
+            if self.slots:
+                self.sleep(TICK)
+        return dict(self.stats)
+
+    '''
+    load function
+
+    @input parameter:
+        - unixMinute: minute of the occurrence (unix time // 60)
+        - shard: shard of the bucket
+    @return:
+        - None
+
+    Description: claims the slot, then reads it page by page into the
+                 wheel; the pages already due are fired between two reads.
+    '''
+    def load(self, unixMinute, shard):
+        slot = self.claim(unixMinute, shard)
+        if slot is None:
+            return
+        self.slots.append(slot)
+        params = {
+            'TableName': os.environ[alarms.BUCKET_ENV],
+            'KeyConditionExpression': '#bucket = :bucket',
+            'ExpressionAttributeNames': {'#bucket': 'bucket'},
+            'ExpressionAttributeValues': {':bucket': {'S': slot.bucket}},
+            'Limit': PAGE_SIZE,
+        }
+        if slot.cursor:
+            params['ExclusiveStartKey'] = {'bucket': {'S': slot.bucket}, 'alarmKey': {'S': slot.cursor}}
+        while True:
+            res = self.client.query(**params)
+            entries = [self.entryOf(item, slot.deadline) for item in res.get('Items', [])]
+            if entries:
+                slot.pages.append([res['Items'][-1]['alarmKey']['S'], None])
+                self.wheel.add(slot.deadline, (slot, len(slot.pages) - 1, entries))
+            if 'LastEvaluatedKey' not in res:
+                break
+            params['ExclusiveStartKey'] = res['LastEvaluatedKey']
+            self.pump()
+        slot.loaded = True
+        self.commit(slot)
+
+    def entryOf(self, item, deadline):
+        entry = {'email': item['email']['S'], 'alarmId': item['alarmId']['S'], 'deadline': deadline}
+        if 'taskType' in item:
+            entry['taskType'] = int(item['taskType']['N'])
+        return entry
+
+    '''
+    claim function
+
+    @input parameter:
+        - unixMinute, shard: the slot
+    @return:
+        - Slot, or None when the slot is done or leased by another dispatcher
+    '''
+    def claim(self, unixMinute, shard):
+        now = int(self.clock())
+        deadline = unixMinute * 60
+        try:
+            res = self.table.update_item(
+                Key={'slot': slotKey(unixMinute, shard)},
+                UpdateExpression="SET #owner = :owner, leaseUntil = :lease, expiresAt = :expires",
+                ConditionExpression="attribute_not_exists(#slot) OR (attribute_not_exists(#done) AND leaseUntil < :now)",
+                ExpressionAttributeNames={'#owner': 'owner', '#slot': 'slot', '#done': 'done'},
+                ExpressionAttributeValues={
+                    ':owner': self.owner,
+                    ':lease': max(now, deadline) + LEASE,
+                    ':expires': deadline + RETENTION,
+                    ':now': now,
+                },
+                ReturnValues='ALL_NEW'
+            )
+        except db.ClientError as e:
+            if db.isConditionFailed(e):
+                self.stats['skipped'] += 1
+                return None
+            raise
+        cursor = res['Attributes'].get('cursor', None)
+        if cursor:
+            logger.warning("Slot %s taken over after %s.", slotKey(unixMinute, shard), cursor)
+        self.stats['claimed'] += 1
+        return Slot(unixMinute, shard, cursor)
+
+    '''
+    pump function
+
+    @input parameter:
+        - None
+    @return:
+        - None
+
+    Description: fires the pages the wheel has due, then commits the slots
+                 whose pages were sent meanwhile.
+    '''
+    def pump(self):
+        now = self.clock()
+        for deadline, (slot, index, entries) in self.wheel.advance(now):
+            self.fire(slot, index, entries, now)
+        touched = set()
+        while True:
+            try:
+                slot, index, sent, failed = self.sent.get_nowait()
+            except queue.Empty:
+                break
+            slot.pages[index][1] -= 1
+            self.stats['fired'] += sent
+            self.stats['failed'] += failed
+            touched.add(slot)
+        for slot in touched:
+            self.commit(slot)
+
+    def fire(self, slot, index, entries, now):
+        if slot.lost:
+            return
+        self.stats['pages'] += 1
+        if now - slot.deadline > MAX_LATENESS:
+            logger.error("Dropped %d alarm(s) of %s, %d seconds late: %s", len(entries), slot.key,
+                         now - slot.deadline, json.dumps([message(entry) for entry in entries]))
+            self.stats['dropped'] += len(entries)
+            slot.pages[index][1] = 0
+            self.commit(slot)
+            return
+        size = self.notifier.BATCH_SIZE
+        chunks = [entries[start:start + size] for start in range(0, len(entries), size)]
+        slot.pages[index][1] = len(chunks)
+        for chunk in chunks:
+            self.executor.submit(self.send, slot, index, chunk)
+
+    '''
+    send function
+
+    @input parameter:
+        - slot, index: page the chunk belongs to
+        - chunk: at most notifier.BATCH_SIZE entries
+    @return:
+        - None (reports (slot, index, sent, failed) to the dispatcher)
+
+    Description: runs on a worker; failed entries are retried MAX_RETRIES
+                 times with capped, jittered exponential backoff, then
+                 logged at ERROR level.
+    '''
+    def send(self, slot, index, chunk):
+        pending = chunk
+        try:
+            for attempt in range(MAX_RETRIES + 1):
+                if attempt:
+                    time.sleep(random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt)))
+                pending = self.notifier.send(pending)
+                if not pending:
+                    break
+        except Exception as e:
+            logger.error("Notifier failed: %s", e)
+        if pending:
+            logger.error("Gave up %d alarm(s): %s", len(pending), json.dumps([message(entry) for entry in pending]))
+        self.sent.put((slot, index, len(chunk) - len(pending), len(pending)))
+
+    '''
+    commit function
+
+    @input parameter:
+        - slot: Slot
+    @return:
+        - None
+
+    Description: moves the cursor over the pages sent in order, and marks
+                 the slot done after the last one; a slot whose lease was
+                 taken over stops there.
+    '''
+    def commit(self, slot):
+        committed = slot.committed
+        while committed < len(slot.pages) and slot.pages[committed][1] == 0:
+            committed += 1
+        done = slot.loaded and committed == len(slot.pages)
+        if slot.lost or (committed == slot.committed and not done):
+            return
+        now = int(self.clock())
+        actions = ["leaseUntil = :lease"]
+        names = {'#owner': 'owner'}
+        values = {':owner': self.owner, ':lease': max(now, slot.deadline) + LEASE}
+        if committed > slot.committed:
+            actions.append("#cursor = :cursor")
+            names['#cursor'] = 'cursor'
+            values[':cursor'] = slot.pages[committed - 1][0]
+        if done:
+            actions.append("#done = :done")
+            names['#done'] = 'done'
+            values[':done'] = 1
+        try:
+            self.table.update_item(
+                Key={'slot': slot.key},
+                UpdateExpression="SET " + ", ".join(actions),
+                ConditionExpression="#owner = :owner",
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues=values
+            )
+            slot.committed = committed
+        except db.ClientError as e:
+            if not db.isConditionFailed(e):
+                raise
+            logger.error("Lost the lease of slot %s.", slot.key)
+            slot.lost = True
+        if slot.finished():
+            self.slots.remove(slot)
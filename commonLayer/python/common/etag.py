@@ -0,0 +1,105 @@
+import json, hashlib
+from common import cache
+
+'''
+etag module
+
+Strong ETags and conditional GET (If-None-Match) for the read endpoints.
+
+    - user data: the tag is derived from the item version maintained by the
+      write handlers (cache.VERSION), so it is known before the body is built
+    - static data: the tag is a hash of the body, computed once per container
+
+The request header is read from the passthrough mapping template
+(event['params']['header']). Responses carry the headers in 'headers',
+for the integration response to map (integration.response.body.headers.ETag).
+A match is raised like the other non-200 statuses:
+    Exception('{"statusCode": 304, "message": "Not Modified", "headers": {...}}')
+'''
+
+PRIVATE = "private, no-cache"
+STATIC = "public, max-age=86400"
+
+'''
+ifNoneMatch function
+
+@input parameter:
+    - event: lambda event
+@return:
+    - string: If-None-Match request header, or None
+'''
+def ifNoneMatch(event):
+    params = event.get('params', None) or {}
+    headers = params.get('header', None) or {}
+    for name, value in headers.items():
+        if name.lower() == 'if-none-match':
+            return value
+    return None
+
+'''
+forItem function
+
+@input parameter:
+    - resource: name of the representation (ex: 'user', 'profile')
+    - email: PK of the item
+    - item: dynamodb item
+@return:
+    - string: strong ETag, or None when the item has no version yet
+'''
+def forItem(resource, email, item):
+    version = item.get(cache.VERSION, None)
+    if version is None:
+        return None
+    digest = hashlib.sha1(("%s|%s|%d" % (resource, email, version)).encode('utf-8')).hexdigest()
+    return '"%s"' % digest[:20]
+
+'''
+forBody function
+
+@input parameter:
+    - body: json serializable response body
+@return:
+    - string: strong ETag of the serialized body
+'''
+def forBody(body):
+    digest = hashlib.sha1(json.dumps(body, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    return '"%s"' % digest[:20]
+
+'''
+check function
+
+@input parameter:
+    - event: lambda event
+    - tag: ETag of the current representation (None: never matches)
+    - cacheControl: Cache-Control header value
+@return:
+    - dict: response headers for the 200 response
+
+Description: raises the 304 response when If-None-Match matches the tag,
+             so the caller never builds the body in that case.
+'''
+def check(event, tag, cacheControl=PRIVATE):
+    headers = {'Cache-Control': cacheControl}
+    if tag is None:
+        return headers
+    headers['ETag'] = tag
+    condition = ifNoneMatch(event)
+    if condition is not None and _matches(condition, tag):
+        raise Exception(json.dumps({
+            'statusCode': 304,
+            'message': "Not Modified",
+            'headers': headers
+        }))
+    return headers
+
+def _matches(condition, tag):
+    # If-None-Match uses the weak comparison: W/ prefixes are ignored
+    for candidate in condition.split(','):
+        candidate = candidate.strip()
+        if candidate == '*':
+            return True
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == tag:
+            return True
+    return False
@@ -0,0 +1,210 @@
+import os, sys, json, time, random, hashlib, logging, functools
+
+'''
+log module
+
+Structured, sampled logging shared by every lambda function.
+
+    - every logger returned by getLogger() is a child of one 'app' logger,
+      which writes one json object per line to stdout:
+          {"level", "logger", "message", "requestId", "emailHash", "route", ...}
+    - messages are formatted only when the record is written: pass the
+      values as arguments (logger.info("deleted %d item(s)", count)), never
+      build the string in the call
+    - @log.handler starts the request context, and writes one 'request'
+      record per invocation with the route, status and duration
+    - sampling is decided once per request and level, so a sampled request
+      keeps all of its lines. Rates come from the environment:
+          LOG_LEVEL            lowest level written (default INFO)
+          LOG_SAMPLE_<LEVEL>   fraction of requests whose <LEVEL> lines are
+                               kept (default 1, ex: LOG_SAMPLE_INFO=0.05)
+          LOG_SAMPLE_REQUEST   same, for the per-request record (default 1);
+                               requests failing with a 5xx are always written
+    - LOG_DEBUG_USERS: comma-separated emails or email hashes (emailHash)
+      whose requests are logged at DEBUG level without sampling
+
+Usage:
+    from common import log
+    logger = log.getLogger(__name__)
+
+    @log.handler
+    def lambda_handler(event, context):
+        ...
+'''
+
+ROOT = 'app'
+LEVEL = logging.getLevelName(os.environ.get('LOG_LEVEL', 'INFO').upper())
+LEVELS = (logging.DEBUG, logging.INFO, logging.WARNING, logging.ERROR, logging.CRITICAL)
+
+def _rate(name, default=1.0):
+    return min(1.0, max(0.0, float(os.environ.get('LOG_SAMPLE_' + name, default))))
+
+def emailHash(email):
+    return hashlib.sha256(email.encode('utf-8')).hexdigest()[:16]
+
+def _debugUsers():
+    users = set()
+    for entry in os.environ.get('LOG_DEBUG_USERS', '').split(','):
+        entry = entry.strip()
+        if entry:
+            users.add(entry if '@' not in entry else emailHash(entry))
+    return users
+
+RATES = dict((level, _rate(logging.getLevelName(level))) for level in LEVELS)
+REQUEST_RATE = _rate('REQUEST')
+DEBUG_USERS = _debugUsers()
+
+_random = random.Random()
+_context = {'requestId': None, 'emailHash': None, 'route': None}
+_kept = set(level for level in LEVELS if level >= LEVEL)
+
+'''
+JsonFormatter class
+
+One json object per record. Values passed in extra={'fields': {...}}
+are added to the object as is.
+'''
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        document = {
+            'level': record.levelname,
+            'logger': record.name[len(ROOT) + 1:] if record.name.startswith(ROOT + '.') else record.name,
+            'message': record.getMessage(),
+        }
+        for name, value in _context.items():
+            if value is not None:
+                document[name] = value
+        fields = getattr(record, 'fields', None)
+        if fields:
+            document.update(fields)
+        if record.exc_info:
+            document['exception'] = self.formatException(record.exc_info)
+        return json.dumps(document, default=str)
+
+class _StdoutHandler(logging.StreamHandler):
+    # resolve sys.stdout on every write, so redirections are honored
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+class _SampleFilter(logging.Filter):
+    def filter(self, record):
+        return record.levelno in _kept or getattr(record, 'always', False)
+
+_root = logging.getLogger(ROOT)
+_root.propagate = False
+if not _root.handlers:
+    _root.addHandler(_StdoutHandler())
+    _root.handlers[0].setFormatter(JsonFormatter())
+    _root.handlers[0].addFilter(_SampleFilter())
+_handler = _root.handlers[0]
+_root.setLevel(min(_kept) if _kept else logging.CRITICAL + 1)
+
+'''
+getLogger function
+
+@input parameter:
+    - name: logger name (usually __name__)
+@return:
+    - logging.Logger writing through the structured, sampled handler
+'''
+def getLogger(name):
+    return logging.getLogger(ROOT + '.' + name)
+
+'''
+begin function
+
+@input parameter:
+    - requestId: lambda request id (or None)
+    - email: email of the caller (or None), only its hash is logged
+    - route: function name or resource path
+@return:
+    - bool: True when the request is logged in debug mode
+
+Description: draws the sampling decisions of the request and sets the
+             level of the 'app' logger, so dropped levels cost one
+             isEnabledFor check per call.
+'''
+def begin(requestId, email, route):
+    global _kept
+    _context['requestId'] = requestId
+    _context['emailHash'] = emailHash(email) if isinstance(email, str) else None
+    _context['route'] = route
+
+    debug = _context['emailHash'] in DEBUG_USERS
+    if debug:
+        _kept = set(LEVELS)
+    else:
+        _kept = set(level for level in LEVELS
+                    if level >= LEVEL and (RATES[level] >= 1.0 or _random.random() < RATES[level]))
+    _root.setLevel(min(_kept) if _kept else logging.CRITICAL + 1)
+    return debug
+
+'''
+end function
+
+@input parameter:
+    - status: status code of the response
+    - elapsed: seconds spent in the handler
+@return:
+    - None
+
+Description: writes the per-request record, whatever the level sampling.
+'''
+def end(status, elapsed):
+    if _root.manager.disable >= logging.INFO:
+        return
+    if not (REQUEST_RATE >= 1.0 or _random.random() < REQUEST_RATE
+            or (isinstance(status, int) and status >= 500)):
+        return
+    record = _root.makeRecord(ROOT + '.request', logging.INFO, __file__, 0, "request", (), None,
+                              extra={'always': True, 'fields': {'status': status, 'ms': round(elapsed * 1000.0, 1)}})
+    _handler.handle(record)
+
+'''
+handler decorator
+
+@input parameter:
+    - func: lambda_handler function
+@return:
+    - function running func inside begin() / end()
+'''
+def handler(func):
+    @functools.wraps(func)
+    def wrapper(event, context):
+        begin(getattr(context, 'aws_request_id', None),
+              event.get('email', None) if isinstance(event, dict) else None,
+              routeOf(event, context, func))
+        start = time.perf_counter()
+        status = 500
+        try:
+            ret = func(event, context)
+            status = ret.get('statusCode', 200) if isinstance(ret, dict) else 200
+            return ret
+        except Exception as e:
+            status = statusOf(e)
+            raise
+        finally:
+            end(status, time.perf_counter() - start)
+    return wrapper
+
+def routeOf(event, context, func):
+    if isinstance(event, dict) and isinstance(event.get('url', None), str):
+        return event['url']
+    return getattr(context, 'function_name', None) or os.environ.get('AWS_LAMBDA_FUNCTION_NAME', func.__module__)
+
+def statusOf(error):
+    # handlers raise Exception(json.dumps({'statusCode': ...})) or Exception({'statusCode': ...})
+    payload = error.args[0] if error.args else None
+    if isinstance(payload, str):
+        try:
+            payload = json.loads(payload)
+        except ValueError:
+            payload = None
+    if isinstance(payload, dict) and 'statusCode' in payload:
+        return payload['statusCode']
+    return 500
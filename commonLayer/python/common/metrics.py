@@ -0,0 +1,270 @@
+import os, sys, json, time, threading, functools
+
+'''
+metrics module
+
+Per-invocation instrumentation of the AWS calls made through common.db,
+emitted as CloudWatch embedded metric format (EMF) log lines.
+
+When METRICS_ENABLED is set, db hands out Table objects and clients wrapped
+by instrument(); every call records, per operation and table:
+    - calls, errors and latency (milliseconds)
+    - consumed read / write capacity units (ReturnConsumedCapacity='TOTAL'
+      is added to DynamoDB calls that do not ask for it already)
+    - items returned or written, items scanned, pages read (query / scan)
+At the end of the invocation (handler decorator) one line per operation is
+printed with the dimensions [Function, Operation] and [Function], so the
+same lines give the per-endpoint totals and the per-operation breakdown.
+
+When METRICS_ENABLED is not set, instrument() and handler() return their
+argument unchanged: the handlers run exactly the uninstrumented code.
+
+Usage:
+    from common import metrics
+
+    @metrics.handler
+    def lambda_handler(event, context):
+        ...
+'''
+
+ENABLED = os.environ.get('METRICS_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'Luple')
+
+READ_OPERATIONS = frozenset(['get_item', 'query', 'scan', 'batch_get_item', 'transact_get_items'])
+WRITE_OPERATIONS = frozenset(['put_item', 'update_item', 'delete_item', 'batch_write_item', 'transact_write_items'])
+PAGED_OPERATIONS = frozenset(['query', 'scan'])
+# client helpers that are not API calls
+NOT_CALLS = frozenset(['get_paginator', 'get_waiter', 'can_paginate', 'generate_presigned_url', 'close'])
+
+METRICS = (
+    ('Calls', 'Count'),
+    ('Errors', 'Count'),
+    ('Latency', 'Milliseconds'),
+    ('ReadCapacityUnits', 'Count'),
+    ('WriteCapacityUnits', 'Count'),
+    ('Items', 'Count'),
+    ('ScannedItems', 'Count'),
+    ('Pages', 'Count'),
+)
+
+_lock = threading.Lock()
+_operations = dict()
+
+'''
+Instrumented class
+
+Proxy of a boto3 Table object or client. API calls are timed and recorded,
+every other attribute (name, meta, ...) is the one of the wrapped object.
+    - target: Table object or client
+    - serviceName: string (ex: 'dynamodb', 'sns')
+'''
+class Instrumented(object):
+    def __init__(self, target, serviceName):
+        self._target = target
+        self._serviceName = serviceName
+        self._tableName = getattr(target, 'name', None) if serviceName == 'dynamodb' else None
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if name.startswith('_') or name in NOT_CALLS or not callable(attr):
+            return attr
+        if self._serviceName == 'dynamodb' and name not in READ_OPERATIONS and name not in WRITE_OPERATIONS:
+            return attr
+        call = self._wrap(name, attr)
+        # later lookups find the wrapper without going through __getattr__
+        self.__dict__[name] = call
+        return call
+
+    def _wrap(self, name, method):
+        capacity = self._serviceName == 'dynamodb'
+        tableName = self._tableName
+        operation = operationName(name)
+
+        @functools.wraps(method)
+        def call(*args, **kwargs):
+            if capacity and 'ReturnConsumedCapacity' not in kwargs:
+                kwargs['ReturnConsumedCapacity'] = 'TOTAL'
+            start = time.perf_counter()
+            try:
+                res = method(*args, **kwargs)
+            except Exception:
+                record(operation, tableName or kwargs.get('TableName'),
+                       (time.perf_counter() - start) * 1000.0, None, name, error=True)
+                raise
+            record(operation, tableName or requestTable(kwargs),
+                   (time.perf_counter() - start) * 1000.0, res, name, kwargs)
+            return res
+        return call
+
+'''
+instrument function
+
+@input parameter:
+    - target: Table object or client
+    - serviceName: string
+@return:
+    - Instrumented proxy, or target itself when metrics are disabled
+'''
+def instrument(target, serviceName):
+    if not ENABLED or isinstance(target, Instrumented):
+        return target
+    return Instrumented(target, serviceName)
+
+'''
+handler decorator
+
+@input parameter:
+    - func: lambda_handler function
+@return:
+    - function emitting the metrics of each invocation when it ends,
+      or func itself when metrics are disabled
+'''
+def handler(func):
+    if not ENABLED:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(event, context):
+        try:
+            return func(event, context)
+        finally:
+            flush(getattr(context, 'function_name', None)
+                  or os.environ.get('AWS_LAMBDA_FUNCTION_NAME', func.__module__))
+    return wrapper
+
+'''
+record function
+
+@input parameter:
+    - operation: API name (ex: 'Query')
+    - tableName: string or None
+    - latency: milliseconds
+    - res: response dict (None on error)
+    - method: boto3 method name (ex: 'query')
+    - request: request parameters (optional)
+    - error: bool
+@return:
+    - None
+'''
+def record(operation, tableName, latency, res, method=None, request=None, error=False):
+    read, write = consumedUnits(method, res)
+    items, scanned, pages = itemCounts(method, res, request)
+    with _lock:
+        stats = _operations.get((operation, tableName))
+        if stats is None:
+            stats = _operations[(operation, tableName)] = dict((name, 0) for name, unit in METRICS)
+        stats['Calls'] += 1
+        stats['Errors'] += 1 if error else 0
+        stats['Latency'] += latency
+        stats['ReadCapacityUnits'] += read
+        stats['WriteCapacityUnits'] += write
+        stats['Items'] += items
+        stats['ScannedItems'] += scanned
+        stats['Pages'] += pages
+
+'''
+flush function
+
+@input parameter:
+    - functionName: value of the Function dimension
+    - stream: file object the lines are written to (default stdout)
+@return:
+    - list: the emitted EMF documents
+
+Description: EMF lines must be the whole log event, so they are printed
+             instead of going through logging (which adds a prefix).
+'''
+def flush(functionName, stream=None):
+    with _lock:
+        operations = sorted(_operations.items(), key=lambda entry: (entry[0][0], entry[0][1] or ''))
+        _operations.clear()
+    if not operations:
+        return []
+
+    timestamp = int(time.time() * 1000)
+    documents = []
+    for (operation, tableName), stats in operations:
+        document = {
+            '_aws': {
+                'Timestamp': timestamp,
+                'CloudWatchMetrics': [{
+                    'Namespace': NAMESPACE,
+                    'Dimensions': [['Function', 'Operation'], ['Function']],
+                    'Metrics': [{'Name': name, 'Unit': unit} for name, unit in METRICS],
+                }],
+            },
+            'Function': functionName,
+            'Operation': operation,
+        }
+        if tableName:
+            document['TableName'] = tableName
+        for name, unit in METRICS:
+            document[name] = round(stats[name], 3)
+        documents.append(document)
+
+    stream = stream or sys.stdout
+    for document in documents:
+        stream.write(json.dumps(document) + "\n")
+    stream.flush()
+    return documents
+
+'''
+snapshot function
+
+@input parameter:
+    - None
+@return:
+    - dict: (operation, tableName) -> counters recorded since the last flush
+'''
+def snapshot():
+    with _lock:
+        return dict((key, dict(stats)) for key, stats in _operations.items())
+
+def operationName(method):
+    return ''.join(part.capitalize() for part in method.split('_'))
+
+def requestTable(request):
+    if 'TableName' in request:
+        return request['TableName']
+    tables = request.get('RequestItems', None)
+    if tables and len(tables) == 1:
+        return next(iter(tables))
+    return None
+
+def consumedUnits(method, res):
+    # (read units, write units) of one response
+    if not res or 'ConsumedCapacity' not in res:
+        return 0.0, 0.0
+    consumed = res['ConsumedCapacity']
+    if isinstance(consumed, dict):
+        consumed = [consumed]
+    read = write = 0.0
+    for entry in consumed:
+        if 'ReadCapacityUnits' in entry or 'WriteCapacityUnits' in entry:
+            read += float(entry.get('ReadCapacityUnits', 0))
+            write += float(entry.get('WriteCapacityUnits', 0))
+        elif method in READ_OPERATIONS:
+            read += float(entry.get('CapacityUnits', 0))
+        else:
+            write += float(entry.get('CapacityUnits', 0))
+    return read, write
+
+def itemCounts(method, res, request):
+    # (items, scanned items, pages) of one response
+    if not res:
+        return 0, 0, 0
+    if method in PAGED_OPERATIONS:
+        return res.get('Count', 0), res.get('ScannedCount', 0), 1
+    if method == 'get_item':
+        return (1 if 'Item' in res else 0), 0, 0
+    if method == 'batch_get_item':
+        return sum(len(items) for items in res.get('Responses', {}).values()), 0, 0
+    if method == 'batch_write_item':
+        sent = sum(len(requests) for requests in (request or {}).get('RequestItems', {}).values())
+        left = sum(len(requests) for requests in res.get('UnprocessedItems', {}).values())
+        return sent - left, 0, 0
+    if method == 'transact_write_items':
+        return len((request or {}).get('TransactItems', [])), 0, 0
+    if method in WRITE_OPERATIONS:
+        return 1, 0, 0
+    return 0, 0, 0
@@ -0,0 +1,144 @@
+import json, time, random, threading
+from collections import deque
+from common import db, log
+
+'''
+outbox module
+
+Container-scoped SNS publisher. publish() only queues the message; a daemon
+thread sends queued messages with PublishBatch (up to 10 per call) and
+retries failed entries with capped, jittered exponential backoff, so several
+messages share one call and publish() never waits on SNS.
+
+Lambda freezes the execution environment as soon as the handler returns:
+    - a publish still in flight at that moment resumes on the next
+      invocation of the same container
+    - messages still queued are lost if the container is reclaimed before
+      that, so a handler calls flush(timeout) before returning and fails
+      the request when messages are still pending after it
+    - messages dropped after MAX_RETRIES are logged with their body at
+      ERROR level, so they can be replayed from the logs
+
+Usage:
+    from common import outbox
+    outbox.publish(os.environ['SNS_ARN'], message)
+'''
+
+BATCH_SIZE = 10
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.1
+BACKOFF_CAP = 2.0
+
+logger = log.getLogger(__name__)
+
+_queue = deque()
+_cond = threading.Condition()
+_worker = None
+_inflight = 0
+
+'''
+publish function
+
+@input parameter:
+    - topicArn: string
+    - message: dict (sent as json) or string
+@return:
+    - int: number of messages waiting to be sent
+'''
+def publish(topicArn, message):
+    global _worker
+    if not isinstance(message, str):
+        message = json.dumps(message)
+    # build the client here: creating it from the worker thread is not thread safe
+    db.getClient('sns')
+    with _cond:
+        _queue.append((topicArn, message, 0))
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name='outbox', daemon=True)
+            _worker.start()
+        _cond.notify_all()
+        return len(_queue) + _inflight
+
+'''
+flush function
+
+@input parameter:
+    - timeout: seconds to wait at most
+@return:
+    - int: number of messages still not sent (0 when everything went out)
+'''
+def flush(timeout):
+    deadline = time.monotonic() + timeout
+    with _cond:
+        while _queue or _inflight:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            _cond.wait(remaining)
+        return len(_queue) + _inflight
+
+'''
+pending function
+
+@input parameter:
+    - None
+@return:
+    - int: number of queued or in-flight messages
+'''
+def pending():
+    with _cond:
+        return len(_queue) + _inflight
+
+def _take():
+    # up to BATCH_SIZE queued messages of the first queued topic
+    global _inflight
+    with _cond:
+        while not _queue:
+            _cond.wait()
+        topicArn = _queue[0][0]
+        batch = []
+        others = []
+        while _queue and len(batch) < BATCH_SIZE:
+            entry = _queue.popleft()
+            (batch if entry[0] == topicArn else others).append(entry)
+        _queue.extendleft(reversed(others))
+        _inflight += len(batch)
+        return topicArn, batch
+
+def _run():
+    global _inflight
+    while True:
+        topicArn, batch = _take()
+        try:
+            retry = _send(topicArn, batch)
+        except Exception as e:
+            logger.warning("PublishBatch to %s failed: %s", topicArn, e)
+            retry = batch
+
+        attempts = 0
+        with _cond:
+            _inflight -= len(batch)
+            for entry in retry:
+                if entry[2] >= MAX_RETRIES:
+                    logger.error("Dropped message to %s after %d retries: %s", topicArn, MAX_RETRIES, entry[1])
+                    continue
+                _queue.append((entry[0], entry[1], entry[2] + 1))
+                attempts = max(attempts, entry[2] + 1)
+            _cond.notify_all()
+        if attempts:
+            time.sleep(random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempts))))
+
+def _send(topicArn, batch):
+    # returns the entries worth retrying
+    res = db.getClient('sns').publish_batch(
+        TopicArn=topicArn,
+        PublishBatchRequestEntries=[{'Id': str(idx), 'Message': entry[1]} for idx, entry in enumerate(batch)]
+    )
+    retry = []
+    for failure in res.get('Failed', []):
+        entry = batch[int(failure['Id'])]
+        if failure.get('SenderFault'):
+            logger.error("Rejected message to %s (%s): %s", topicArn, failure.get('Code'), entry[1])
+        else:
+            retry.append(entry)
+    return retry
@@ -0,0 +1,366 @@
+import os, json, time, datetime
+from decimal import Decimal
+from common import db, bulk, log
+
+'''
+plans module
+
+Daily solution plans, materialized per user and day in PLAN_TABLE
+(email HASH, planDate RANGE N yyyymmdd; TTL attribute expiresAt).
+
+A plan is derived from:
+    - the user item: problems (by priority) and profile wakeUpTime,
+      sleepTime, effectiveDays
+    - the task records of the last HISTORY_DAYS days and of the plan day
+so every handler that changes one of them calls invalidate(), which
+replaces the plan items of the affected days with tombstones
+({email, planDate, invalidatedAt}). getPlan() answers with one get_item
+while the plan is current, and rebuilds and stores it after a tombstone
+(or on the first request of the day).
+
+A rebuild racing with a write must not store a plan made from the inputs
+before the write: the plan is stored only if the tombstone is older than
+the start of the rebuild minus SETTLE_MS (which also covers the lag of
+the START_TIME_INDEX global secondary index). Otherwise the fresh plan is
+returned without being stored, and the next request builds it again.
+
+Plans are served for the days of window() only (yesterday, today and
+tomorrow in the time of the functions, which covers the users' time zone).
+'''
+
+PLAN_ENV = 'PLAN_TABLE'
+USER_ENV = 'USER_TABLE'
+RECORDS_ENV = 'RECORDS_TABLE'
+
+HISTORY_DAYS = 7
+WINDOW_DAYS = 1
+RETENTION_DAYS = 3
+SETTLE_MS = int(os.environ.get('PLAN_SETTLE_MS', 2000))
+
+DEFAULT_WAKE = {'hh': 7, 'mm': 0}
+DEFAULT_SLEEP = {'hh': 23, 'mm': 0}
+DEFAULT_TASKS = (0, 4)
+
+# taskType -> (anchor, offset from the anchor in minutes, duration in minutes)
+SLOTS = {
+    0: ('wake', 30, 30),         # sunshine
+    1: ('sleep', -8 * 60, 0),    # caffeine: last cup of the day
+    2: ('sleep', -60, 0),        # olly
+    3: ('sleep', -3 * 60, 60),   # eating: last meal
+    4: ('sleep', -5 * 60, 45),   # exercise
+}
+
+# problem -> task types that address it, most effective first
+PROBLEM_TASKS = {
+    0: (0, 4),
+    1: (1, 0),
+    2: (3, 1),
+    3: (4, 0),
+    4: (2, 3),
+    5: (0, 2),
+    6: (1, 4),
+    7: (3, 2),
+}
+
+# a task done at a steady time on HABIT_DAYS days is planned at that time,
+# if it is within HABIT_WINDOW minutes of the slot
+HABIT_DAYS = 3
+HABIT_WINDOW = 90
+
+DAY = 24 * 60 * 60
+
+logger = log.getLogger(__name__)
+
+'''
+dateOf function
+
+@input parameter:
+    - unixtime: int, float or Decimal
+@return:
+    - int: yyyymmdd, in the time of the functions like the task ids
+'''
+def dateOf(unixtime):
+    return int(datetime.datetime.fromtimestamp(int(unixtime)).strftime('%Y%m%d'))
+
+'''
+dayStart function
+
+@input parameter:
+    - planDate: int yyyymmdd
+@return:
+    - int: unixtime of the start of the day
+'''
+def dayStart(planDate):
+    return int(datetime.datetime.strptime(str(planDate), '%Y%m%d').timestamp())
+
+'''
+window function
+
+@input parameter:
+    - now: unixtime (default: current time)
+@return:
+    - list: planDate of the days plans are served for
+'''
+def window(now=None):
+    now = time.time() if now is None else now
+    return [dateOf(now + offset * DAY) for offset in range(-WINDOW_DAYS, WINDOW_DAYS + 1)]
+
+'''
+taskDate function
+
+@input parameter:
+    - taskId: "<userName>-<yyyymmdd>-<serverTime>" (see postTask)
+@return:
+    - int: planDate of the task, or None when the id has another format
+'''
+def taskDate(taskId):
+    parts = taskId.rsplit('-', 2) if isinstance(taskId, str) else []
+    if len(parts) != 3 or len(parts[1]) != 8 or not parts[1].isdigit():
+        return None
+    return int(parts[1])
+
+def _minutes(value, default):
+    value = value if isinstance(value, dict) else default
+    return int(value.get('hh', default['hh'])) * 60 + int(value.get('mm', default['mm']))
+
+def clock(minutes):
+    minutes %= 24 * 60
+    return {'hh': minutes // 60, 'mm': minutes % 60}
+
+'''
+profileTimes function
+
+@input parameter:
+    - profile: profile of the user item (may be None)
+@return:
+    - (wake, sleep, effectiveDays): minutes after midnight, sleep after
+      wake (+24h when past midnight), isoweekdays or None (every day)
+
+Description: profiles stored before effectiveDays was validated may hold
+             anything: a value that is not a list of isoweekdays raises
+             the 400 response instead of failing later.
+'''
+def profileTimes(profile):
+    profile = profile or {}
+    wake = _minutes(profile.get('wakeUpTime', None), DEFAULT_WAKE)
+    sleep = _minutes(profile.get('sleepTime', None), DEFAULT_SLEEP)
+    if sleep <= wake:
+        sleep += 24 * 60
+    effectiveDays = profile.get('effectiveDays', None)
+    if effectiveDays is not None:
+        effectiveDays = _isoweekdays(effectiveDays)
+    return wake, sleep, effectiveDays
+
+def _isoweekdays(value):
+    # ints from a request, Decimals from dynamodb; bool is an int too
+    if isinstance(value, list) and len(value) <= 7:
+        days = set()
+        for day in value:
+            if isinstance(day, bool) or not isinstance(day, (int, Decimal)):
+                break
+            if isinstance(day, Decimal) and not (day.is_finite() and day == day.to_integral_value()):
+                break
+            if not 1 <= day <= 7:
+                break
+            days.add(int(day))
+        else:
+            return sorted(days)
+    raise Exception(json.dumps({
+        'statusCode': 400,
+        'message': "Invalid Input: effectiveDays"
+    }))
+
+'''
+slotStart function
+
+@input parameter:
+    - taskType: key of SLOTS
+    - wake, sleep: see profileTimes
+@return:
+    - int: minutes after midnight of the slot, between wake and sleep
+'''
+def slotStart(taskType, wake, sleep):
+    anchor, offset, duration = SLOTS[taskType]
+    return min(max((wake if anchor == 'wake' else sleep) + offset, wake), sleep)
+
+'''
+buildPlan function
+
+@input parameter:
+    - user: user item (may be empty)
+    - records: task items of the plan day and the HISTORY_DAYS before it
+    - planDate: int yyyymmdd
+@return:
+    - dict: activeDay, wakeUpTime, sleepTime, tasks (ordered by priority)
+            each task: taskType, priority, start {hh, mm}, duration (minutes),
+            done (a record exists on the plan day), recentDays
+'''
+def buildPlan(user, records, planDate):
+    wake, sleep, effectiveDays = profileTimes(user.get('profile', None))
+    weekday = datetime.datetime.strptime(str(planDate), '%Y%m%d').isoweekday()
+    activeDay = effectiveDays is None or weekday in effectiveDays
+
+    taskTypes = []
+    for problem in sorted(user.get('problems', None) or [], key=lambda p: int(p.get('priority', 0))):
+        for taskType in PROBLEM_TASKS.get(int(problem.get('problem', -1)), ()):
+            if taskType not in taskTypes:
+                taskTypes.append(taskType)
+    if not taskTypes:
+        taskTypes = list(DEFAULT_TASKS)
+
+    planStart = dayStart(planDate)
+    history = dict((taskType, {'days': set(), 'minutes': [], 'done': False}) for taskType in taskTypes)
+    for record in records:
+        entry = history.get(int(record.get('taskType', -1)))
+        if entry is None or 'startTime' not in record:
+            continue
+        startTime = int(record['startTime'])
+        if planStart <= startTime < planStart + DAY:
+            entry['done'] = True
+        elif planStart - HISTORY_DAYS * DAY <= startTime < planStart:
+            entry['days'].add((startTime - planStart) // DAY)
+            entry['minutes'].append((startTime - planStart) % DAY // 60)
+
+    plan = []
+    for priority, taskType in enumerate(taskTypes, 1):
+        start = slotStart(taskType, wake, sleep)
+        entry = history[taskType]
+        if len(entry['days']) >= HABIT_DAYS:
+            habit = sorted(entry['minutes'])[len(entry['minutes']) // 2]
+            # compare on the same day as the slot (sleep may be past midnight)
+            habit += 24 * 60 if habit < wake else 0
+            if abs(habit - start) <= HABIT_WINDOW:
+                start = habit
+        plan.append({
+            'taskType': taskType,
+            'priority': priority,
+            'start': clock(start),
+            'duration': SLOTS[taskType][2],
+            'done': entry['done'],
+            'recentDays': len(entry['days']),
+        })
+
+    return {
+        'activeDay': activeDay,
+        'wakeUpTime': clock(wake),
+        'sleepTime': clock(sleep),
+        'tasks': plan if activeDay else [],
+    }
+
+'''
+loadInputs function
+
+@input parameter:
+    - email: PK of the user
+    - planDate: int yyyymmdd
+@return:
+    - (user item or {}, task records of the plan day and the days before)
+'''
+def loadInputs(email, planDate):
+    user = db.getTable(USER_ENV).get_item(Key={'email': email}, ConsistentRead=True).get('Item', {})
+
+    planStart = dayStart(planDate)
+    low, high = planStart - HISTORY_DAYS * DAY, planStart + DAY - 1
+    records = db.getTable(RECORDS_ENV)
+    params = {'ProjectionExpression': 'taskType, startTime'}
+    index = os.environ.get('START_TIME_INDEX', None)
+    if index:
+        params['IndexName'] = index
+        params['KeyConditionExpression'] = db.Key('email').eq(email) & db.Key('startTime').between(low, high)
+    else:
+        params['KeyConditionExpression'] = db.Key('email').eq(email)
+        params['FilterExpression'] = db.Attr('startTime').between(low, high)
+        params['ConsistentRead'] = True
+
+    items = []
+    while True:
+        res = records.query(**params)
+        items += res.get('Items', [])
+        if 'LastEvaluatedKey' not in res:
+            return user, items
+        params['ExclusiveStartKey'] = res['LastEvaluatedKey']
+
+'''
+getPlan function
+
+@input parameter:
+    - email: PK of the user
+    - planDate: int yyyymmdd
+@return:
+    - dict: plan built by buildPlan
+'''
+def getPlan(email, planDate):
+    table = db.getTable(PLAN_ENV)
+    item = table.get_item(Key={'email': email, 'planDate': planDate}).get('Item', None)
+    if item is not None and 'tasks' in item:
+        return _body(item)
+
+    started = int(time.time() * 1000)
+    user, records = loadInputs(email, planDate)
+    plan = buildPlan(user, records, planDate)
+    item = dict(plan, email=email, planDate=planDate, builtAt=started, expiresAt=_expiresAt(planDate))
+    try:
+        table.put_item(
+            Item=item,
+            ConditionExpression=db.Attr('invalidatedAt').not_exists() | db.Attr('invalidatedAt').lt(started - SETTLE_MS)
+        )
+    except db.ClientError as e:
+        if not db.isConditionFailed(e):
+            raise
+        logger.debug("Plan %d invalidated while it was built, not stored.", planDate)
+    return plan
+
+def _body(item):
+    return dict((name, item[name]) for name in ('activeDay', 'wakeUpTime', 'sleepTime', 'tasks'))
+
+def _expiresAt(planDate):
+    return dayStart(planDate) + (RETENTION_DAYS + 1) * DAY
+
+'''
+invalidate function
+
+@input parameter:
+    - email: PK of the user
+    - dates: planDate values whose plan depends on the change
+@return:
+    - None
+
+Description: no-op until PLAN_TABLE is configured, so the write handlers
+             can be deployed before the plan table exists.
+'''
+def invalidate(email, dates):
+    tableName = os.environ.get(PLAN_ENV, None)
+    dates = sorted(set(date for date in dates if date is not None))
+    if not tableName or not dates or email is None:
+        return
+    invalidatedAt = int(time.time() * 1000)
+    # a task counts for the plans of the next HISTORY_DAYS days too: only
+    # the days a plan can be served for are concerned
+    served = set(window())
+    dates = [date for date in dates if date in served]
+    if not dates:
+        return
+    bulk.batchWrite(tableName, [{
+        'PutRequest': {'Item': {
+            'email': {'S': email},
+            'planDate': {'N': str(date)},
+            'invalidatedAt': {'N': str(invalidatedAt)},
+            'expiresAt': {'N': str(_expiresAt(date))},
+        }}
+    } for date in dates])
+
+'''
+invalidateTask function
+
+@input parameter:
+    - email: PK of the user
+    - planDate: day of the task (None: every served day)
+@return:
+    - None
+
+Description: a task record changes the plan of its day and of the days
+             after it (recentDays, habits).
+'''
+def invalidateTask(email, planDate):
+    served = window()
+    invalidate(email, served if planDate is None else [date for date in served if date >= planDate])
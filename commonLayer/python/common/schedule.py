@@ -0,0 +1,131 @@
+import json, hashlib, threading, datetime
+from collections import OrderedDict
+from common import plans
+
+'''
+schedule module
+
+Time-slotted schedule of the task types for a range of days, derived from
+the profile of the user only (wakeUpTime, sleepTime, effectiveDays):
+    - every task type gets its slot of plans.SLOTS, anchored on wake up or
+      bed time, on the effective days of the profile
+    - the week of slots is built once per distinct profile and cached
+      under profileHash(): a profile that did not change is never
+      recomputed, whatever the range asked for
+    - iterSchedule() yields the days one by one, so a range of several
+      weeks is only generated as far as it is consumed
+
+Usage:
+    from common import schedule
+    for day in schedule.iterSchedule(profile, 20240101):
+        ...
+'''
+
+# bump when the slots or the day format change: cached weeks are keyed by it
+ENGINE_VERSION = 1
+MAX_TEMPLATES = 256
+
+NAMES = {
+    0: 'sunshine',
+    1: 'caffeine',
+    2: 'olly',
+    3: 'eating',
+    4: 'exercise',
+}
+
+_templates = OrderedDict()
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+'''
+profileHash function
+
+@input parameter:
+    - profile: profile of the user item (may be None)
+@return:
+    - string: hash of the fields the schedule depends on, the same for
+              equal profiles whatever their types (Decimal or int)
+
+Description: an invalid stored effectiveDays raises the 400 response of
+             plans.profileTimes, before anything is built or cached.
+'''
+def profileHash(profile):
+    wake, sleep, effectiveDays = plans.profileTimes(profile)
+    canonical = json.dumps([ENGINE_VERSION, wake, sleep, effectiveDays])
+    return hashlib.sha1(canonical.encode('utf-8')).hexdigest()[:20]
+
+'''
+buildWeek function
+
+@input parameter:
+    - profile: profile of the user item (may be None)
+@return:
+    - dict: isoweekday -> list of slots ({taskType, name, start, end} with
+            {hh, mm} times), empty on the days outside effectiveDays
+'''
+def buildWeek(profile):
+    wake, sleep, effectiveDays = plans.profileTimes(profile)
+    starts = sorted((plans.slotStart(taskType, wake, sleep), taskType) for taskType in plans.SLOTS)
+    slots = [{
+        'taskType': taskType,
+        'name': NAMES[taskType],
+        'start': plans.clock(start),
+        'end': plans.clock(min(start + plans.SLOTS[taskType][2], sleep)),
+    } for start, taskType in starts]
+    return dict((weekday, slots if effectiveDays is None or weekday in effectiveDays else [])
+                for weekday in range(1, 8))
+
+'''
+getWeek function
+
+@input parameter:
+    - profile: profile of the user item (may be None)
+@return:
+    - (profileHash, week built by buildWeek), shared: do not modify it
+'''
+def getWeek(profile):
+    key = profileHash(profile)
+    with _lock:
+        week = _templates.get(key)
+        if week is not None:
+            _templates.move_to_end(key)
+            _stats['hits'] += 1
+            return key, week
+        _stats['misses'] += 1
+    week = buildWeek(profile)
+    with _lock:
+        _templates[key] = week
+        while len(_templates) > MAX_TEMPLATES:
+            _templates.popitem(last=False)
+    return key, week
+
+def stats():
+    with _lock:
+        return dict(_stats, size=len(_templates))
+
+def clear():
+    with _lock:
+        _templates.clear()
+        _stats['hits'] = _stats['misses'] = 0
+
+'''
+iterSchedule function
+
+@input parameter:
+    - profile: profile of the user item (may be None)
+    - since: first day, int yyyymmdd
+    - until: last day, int yyyymmdd (optional, default: no end)
+@return:
+    - generator of {date, activeDay, tasks} in date order
+'''
+def iterSchedule(profile, since, until=None):
+    week = getWeek(profile)[1]
+    day = datetime.datetime.strptime(str(since), '%Y%m%d').date()
+    oneDay = datetime.timedelta(days=1)
+    while True:
+        date = int(day.strftime('%Y%m%d'))
+        if until is not None and date > until:
+            return
+        tasks = week[day.isoweekday()]
+        yield {'date': date, 'activeDay': bool(tasks), 'tasks': tasks}
+        day += oneDay
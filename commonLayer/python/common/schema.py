@@ -0,0 +1,322 @@
+import json
+
+'''
+schema module
+
+Declarative request-body schemas for every endpoint, compiled once at import
+into validator closures.
+
+A compiled validator walks the body exactly once, checks keys against a
+frozenset of allowed names, validates values on the way, and stops at the
+first error. Depth and total node count are capped so oversized or
+adversarial payloads are rejected before they cost real CPU.
+
+Usage:
+    from common import schema
+    schema.check('user', body)
+'''
+
+MAX_DEPTH = 8
+MAX_NODES = 512
+MAX_STRING = 1024
+MAX_LIST = 64
+MAX_TASK_BATCH = 100
+
+TASK_TYPES = (0, 1, 2, 3, 4)
+PROBLEMS = (0, 1, 2, 3, 4, 5, 6, 7)
+LANGUAGES = (0, 1, 2)
+SEXES = (0, 1, 2)
+
+BAD_REQUEST = "Bad Request"
+
+'''
+ValidationError class
+
+Raised by compiled validators. check() turns it into the error format used
+by the handlers (Exception carrying a json string with statusCode/message).
+'''
+class ValidationError(Exception):
+    def __init__(self, message):
+        Exception.__init__(self, message)
+        self.message = message
+
+'''
+Spec builders
+
+Each builder returns a plain dict describing one node of a body.
+    - message: optional error message; '%(key)s' and '%(value)s' are filled in
+'''
+def obj(fields, required=(), strict=True, message=None):
+    return {'type': 'object', 'fields': fields, 'required': required, 'strict': strict, 'message': message}
+
+def integer(minimum=None, maximum=None, choices=None, message=None):
+    return {'type': 'int', 'min': minimum, 'max': maximum, 'choices': choices, 'message': message}
+
+def number(minimum=None, maximum=None, message=None):
+    return {'type': 'number', 'min': minimum, 'max': maximum, 'message': message}
+
+def string(minLen=0, maxLen=MAX_STRING, message=None):
+    return {'type': 'string', 'minLen': minLen, 'maxLen': maxLen, 'message': message}
+
+def listOf(item, maxLen=MAX_LIST, check=None, message=None):
+    return {'type': 'list', 'item': item, 'maxLen': maxLen, 'check': check, 'message': message}
+
+def anyValue():
+    return {'type': 'any', 'message': None}
+
+'''
+Endpoint schemas
+'''
+def _hasFirstPriority(problems):
+    for problem in problems:
+        if problem['priority'] == 1:
+            return True
+    return False
+
+TIME = obj({
+    'hh': integer(0, 23),
+    'mm': integer(0, 59),
+}, required=('hh', 'mm'))
+
+PROFILE = obj({
+    'wakeUpTime': TIME,
+    'sleepTime': TIME,
+    # isoweekdays, 1 (Monday) to 7
+    'effectiveDays': listOf(integer(1, 7), maxLen=7),
+})
+
+USER = obj({
+    'userName': string(1, 255),
+    'age': integer(0, 150),
+    'problems': listOf(obj({
+        'problem': integer(choices=PROBLEMS),
+        'priority': integer(),
+    }, required=('problem', 'priority')), check=_hasFirstPriority),
+    'gps': obj({
+        'latitude': number(-90, 90),
+        'longitude': number(-180, 180),
+    }, required=('latitude', 'longitude')),
+    'sex': integer(choices=SEXES),
+    'profile': PROFILE,
+})
+
+DEVICE = obj({
+    'lang': integer(choices=LANGUAGES),
+    'agreement': obj({
+        'termsAndCondition': anyValue(),
+        'userInfoPrivacy': anyValue(),
+        'userInfoCollectPrivacy': anyValue(),
+        'gpsService': anyValue(),
+        'marketingPolicy': anyValue(),
+    }),
+})
+
+TASK = obj({
+    'taskType': integer(choices=TASK_TYPES),
+    'startTime': number(0),
+    'elapsedTime': number(0),
+})
+
+# the tasks themselves are checked one by one against TASK (per-item results)
+TASK_BATCH = obj({
+    'tasks': listOf(anyValue(), maxLen=MAX_TASK_BATCH),
+}, required=('tasks',))
+
+ALARM = obj({
+    'taskType': integer(choices=TASK_TYPES),
+    'time': TIME,
+    'days': listOf(integer(1, 7), maxLen=7),
+    'enabled': integer(choices=(0, 1)),
+    # minutes east of UTC of the user's clock
+    'utcOffset': integer(-12 * 60, 14 * 60),
+    # time and days come from the profile (wakeUpTime, effectiveDays)
+    'followProfile': integer(choices=(0, 1)),
+})
+
+RANGE_MESSAGE = "Invalid value error: '%(key)s'(body) must be 0 to %(max)s"
+
+def _ranged(maximum):
+    return number(0, maximum, message=RANGE_MESSAGE.replace('%(max)s', '%d' % maximum))
+
+# Unknown keys have always been ignored for sleep diaries, so it is not strict.
+SLEEP_DIARY = obj({
+    'diaryDate': string(8, 8),
+    'timeToSleep': _ranged(4),
+    'numOfWakeUp': _ranged(4),
+    'differenceTime': _ranged(5),
+    'disturbance': listOf(integer(0, 11), maxLen=12,
+        message="Invalid value error: '%(key)s'(body) must be 0 to 11 int array"),
+    'textMessage': string(0, 255,
+        message="Invalid value error: 'textMessage'(body) must not exceed 255 characters."),
+    'sleepScore': _ranged(5.0),
+}, strict=False)
+
+SCHEMAS = {
+    'user': USER,
+    'profile': PROFILE,
+    'device': DEVICE,
+    'task': TASK,
+    'taskBatch': TASK_BATCH,
+    'sleepDiary': SLEEP_DIARY,
+    'alarm': ALARM,
+}
+
+'''
+compileSchema function
+
+@input parameter:
+    - spec: dict built by the spec builders
+@return:
+    - validator(value, key, depth, budget): raises ValidationError
+
+Description: budget is a one-element list holding the remaining node count,
+             shared by the whole walk.
+'''
+def compileSchema(spec):
+    kind = spec['type']
+    message = spec['message']
+
+    def fail(key, value):
+        if message is None:
+            raise ValidationError('Invalid Input: %s -> %s' % (key, _preview(value)))
+        raise ValidationError(message % {'key': key, 'value': _preview(value)})
+
+    if kind == 'object':
+        children = dict((name, compileSchema(child)) for name, child in spec['fields'].items())
+        required = frozenset(spec['required'])
+        strict = spec['strict']
+
+        def validateObject(value, key, depth, budget):
+            if type(value) is not dict:
+                fail(key, value)
+            if depth > MAX_DEPTH:
+                raise ValidationError(BAD_REQUEST)
+            budget[0] -= len(value)
+            if budget[0] < 0:
+                raise ValidationError(BAD_REQUEST)
+            for name, child in value.items():
+                validator = children.get(name)
+                if validator is None:
+                    if strict:
+                        raise ValidationError(BAD_REQUEST)
+                    continue
+                validator(child, name, depth + 1, budget)
+            if required and not required.issubset(value.keys()):
+                fail(key, value)
+        return validateObject
+
+    if kind == 'list':
+        itemValidator = compileSchema(spec['item'])
+        maxLen = spec['maxLen']
+        check = spec['check']
+
+        def validateList(value, key, depth, budget):
+            if type(value) is not list or len(value) > maxLen:
+                fail(key, value)
+            budget[0] -= len(value)
+            if budget[0] < 0:
+                raise ValidationError(BAD_REQUEST)
+            try:
+                for item in value:
+                    itemValidator(item, key, depth + 1, budget)
+            except ValidationError:
+                if message is None:
+                    raise
+                fail(key, value)
+            if check is not None and not check(value):
+                fail(key, value)
+        return validateList
+
+    if kind == 'int':
+        minimum, maximum = spec['min'], spec['max']
+        choices = frozenset(spec['choices']) if spec['choices'] is not None else None
+
+        def validateInt(value, key, depth, budget):
+            if type(value) is not int:
+                fail(key, value)
+            if choices is not None and value not in choices:
+                fail(key, value)
+            if (minimum is not None and value < minimum) or (maximum is not None and value > maximum):
+                fail(key, value)
+        return validateInt
+
+    if kind == 'number':
+        minimum, maximum = spec['min'], spec['max']
+
+        def validateNumber(value, key, depth, budget):
+            if type(value) is not int and type(value) is not float:
+                fail(key, value)
+            if (minimum is not None and value < minimum) or (maximum is not None and value > maximum):
+                fail(key, value)
+        return validateNumber
+
+    if kind == 'string':
+        minLen, maxLen = spec['minLen'], spec['maxLen']
+
+        def validateString(value, key, depth, budget):
+            if type(value) is not str or not (minLen <= len(value) <= maxLen):
+                fail(key, value)
+        return validateString
+
+    if kind == 'any':
+        def validateAny(value, key, depth, budget):
+            # opaque values still count against the depth and size caps
+            if type(value) is dict or type(value) is list:
+                _measure(value, depth + 1, budget)
+        return validateAny
+
+    raise ValueError("Unknown schema type: " + str(kind))
+
+def _measure(value, depth, budget):
+    if depth > MAX_DEPTH:
+        raise ValidationError(BAD_REQUEST)
+    budget[0] -= len(value)
+    if budget[0] < 0:
+        raise ValidationError(BAD_REQUEST)
+    children = value.values() if type(value) is dict else value
+    for child in children:
+        if type(child) is dict or type(child) is list:
+            _measure(child, depth + 1, budget)
+        elif type(child) is str and len(child) > MAX_STRING:
+            raise ValidationError(BAD_REQUEST)
+
+def _preview(value):
+    # never stringify a whole oversized container just to build a message
+    if (type(value) is list or type(value) is dict) and len(value) > 8:
+        return "%s of %d items" % (type(value).__name__, len(value))
+    text = str(value)
+    return text if len(text) <= 64 else text[:64] + "..."
+
+VALIDATORS = dict((name, compileSchema(spec)) for name, spec in SCHEMAS.items())
+
+'''
+validate function
+
+@input parameter:
+    - name: schema name ('user', 'profile', 'device', 'task', 'taskBatch',
+            'sleepDiary', 'alarm')
+    - body: request body (dict)
+@return:
+    - None, raises ValidationError on the first problem
+'''
+def validate(name, body):
+    VALIDATORS[name](body, name, 0, [MAX_NODES])
+
+'''
+check function
+
+@input parameter:
+    - name: schema name
+    - body: request body (dict)
+@return:
+    - True, or raises Exception with a json 400 response like the handlers do
+'''
+def check(name, body):
+    try:
+        validate(name, body)
+    except ValidationError as e:
+        raise Exception(json.dumps({
+            'statusCode': 400,
+            'message': e.message
+        }))
+    return True
@@ -0,0 +1,194 @@
+import os, time
+from common import db, bulk, plans, schema
+
+'''
+scores module
+
+Daily task aggregates, one item per user and day in SCORE_TABLE
+(email HASH, scoreDate RANGE N yyyymmdd):
+    - completed, elapsedTime: task records of the day, sum of elapsedTime
+    - completed<taskType>, elapsedTime<taskType>: the same per task type
+      (top-level attributes, so ADD works on an item that does not exist yet)
+
+postTask, putTask and deleteTask keep them up to date with one ADD update
+carrying the difference between the task before and after the write, so
+the score endpoint reads one item instead of the day's records.
+A write that succeeded on the records table but not on SCORE_TABLE leaves
+the aggregate off by that task: tools/rebuildDailyScores.py recomputes the
+aggregates from the records table.
+'''
+
+SCORE_ENV = 'SCORE_TABLE'
+TOTALS = ('completed', 'elapsedTime')
+
+'''
+contribution function
+
+@input parameter:
+    - task: task item (or None)
+@return:
+    - (scoreDate, dict attribute -> value) the task adds to its day,
+      (None, {}) for None
+'''
+def contribution(task):
+    if not task:
+        return None, {}
+    scoreDate = plans.taskDate(task.get('taskId', None))
+    if scoreDate is None and 'startTime' in task:
+        scoreDate = plans.dateOf(task['startTime'])
+    elapsedTime = task.get('elapsedTime', None) or 0
+    values = {'completed': 1, 'elapsedTime': elapsedTime}
+    if task.get('taskType', None) is not None:
+        taskType = int(task['taskType'])
+        values['completed%d' % taskType] = 1
+        values['elapsedTime%d' % taskType] = elapsedTime
+    return scoreDate, values
+
+'''
+delta function
+
+@input parameter:
+    - old: task item before the write (None for a new task)
+    - new: task item after the write (None for a deleted task)
+@return:
+    - dict: scoreDate -> dict attribute -> value to ADD (zeros left out)
+'''
+def delta(old, new):
+    changes = dict()
+    for task, sign in ((old, -1), (new, 1)):
+        scoreDate, values = contribution(task)
+        if scoreDate is None:
+            continue
+        day = changes.setdefault(scoreDate, dict())
+        for name, value in values.items():
+            day[name] = day.get(name, 0) + sign * value
+    for scoreDate in list(changes):
+        changes[scoreDate] = dict((name, value) for name, value in changes[scoreDate].items() if value != 0)
+        if not changes[scoreDate]:
+            del changes[scoreDate]
+    return changes
+
+'''
+record function
+
+@input parameter:
+    - email: PK of the user
+    - old, new: task item before and after the write (see delta)
+@return:
+    - None
+
+Description: no-op until SCORE_TABLE is configured, so the task handlers
+             can be deployed before the score table exists.
+'''
+def record(email, old=None, new=None):
+    if not os.environ.get(SCORE_ENV, None) or email is None:
+        return
+    apply(email, delta(old, new))
+
+'''
+recordMany function
+
+@input parameter:
+    - email: PK of the user
+    - tasks: new task items written together (batch post)
+@return:
+    - None
+
+Description: one ADD update per day for all the tasks, no-op until
+             SCORE_TABLE is configured.
+'''
+def recordMany(email, tasks):
+    if not os.environ.get(SCORE_ENV, None) or email is None:
+        return
+    changes = dict()
+    for task in tasks:
+        for scoreDate, values in delta(None, task).items():
+            day = changes.setdefault(scoreDate, dict())
+            for name, value in values.items():
+                day[name] = day.get(name, 0) + value
+    apply(email, changes)
+
+'''
+apply function
+
+@input parameter:
+    - email: PK of the user
+    - changes: scoreDate -> dict attribute -> value to ADD (see delta)
+@return:
+    - None
+'''
+def apply(email, changes):
+    if not changes:
+        return
+    table = db.getTable(SCORE_ENV)
+    for scoreDate, values in sorted(changes.items()):
+        names = dict()
+        attributeValues = dict()
+        clauses = []
+        for idx, (name, value) in enumerate(sorted(values.items())):
+            names['#a%d' % idx] = name
+            attributeValues[':a%d' % idx] = value
+            clauses.append('#a%d :a%d' % (idx, idx))
+        attributeValues[':now'] = int(time.time())
+        table.update_item(
+            Key={'email': email, 'scoreDate': scoreDate},
+            UpdateExpression='ADD %s SET updatedAt=:now' % ', '.join(clauses),
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=attributeValues
+        )
+
+'''
+purge function
+
+@input parameter:
+    - email: PK of the user
+@return:
+    - int: number of deleted aggregates
+'''
+def purge(email):
+    tableName = os.environ.get(SCORE_ENV, None)
+    if not tableName or email is None:
+        return 0
+    return bulk.purgePartition(tableName, ['email', 'scoreDate'], email)['deleted']
+
+'''
+summarize function
+
+@input parameter:
+    - item: aggregate item (or None)
+    - scoreDate: int yyyymmdd
+@return:
+    - dict: date, completed, elapsedTime, score (0-100, share of the task
+            types done that day), tasks [{taskType, completed, elapsedTime}]
+'''
+def summarize(item, scoreDate):
+    item = item or {}
+    tasks = []
+    for taskType in schema.TASK_TYPES:
+        completed = int(item.get('completed%d' % taskType, 0))
+        if completed > 0:
+            tasks.append({
+                'taskType': taskType,
+                'completed': completed,
+                'elapsedTime': item.get('elapsedTime%d' % taskType, 0),
+            })
+    return {
+        'date': scoreDate,
+        'completed': int(item.get('completed', 0)),
+        'elapsedTime': item.get('elapsedTime', 0),
+        'score': len(tasks) * 100 // len(schema.TASK_TYPES),
+        'tasks': tasks,
+    }
+
+'''
+getScore function
+
+@input parameter:
+    - email: PK of the user
+    - scoreDate: int yyyymmdd
+@return:
+    - dict: see summarize
+'''
+def getScore(email, scoreDate):
+    item = db.getTable(SCORE_ENV).get_item(Key={'email': email, 'scoreDate': scoreDate}).get('Item', None)
+    return summarize(item, scoreDate)
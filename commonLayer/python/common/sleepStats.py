@@ -0,0 +1,235 @@
+import os, time, datetime
+from common import db, plans, columns
+
+'''
+sleepStats module
+
+Sleep trends of the diaries of one user over a range of days, computed on
+columns, like the columns module does for the tasks:
+    - fetchColumns() reads the diaries with one paginated key-range query
+      on the low-level client and keeps one list per attribute (diaryDate,
+      sleepScore, timeToSleep, numOfWakeUp, disturbance)
+    - summarize() lays the metrics out per day (a value and a "has a diary"
+      mask) and computes with whole-array operations:
+          - the rolling 7 and 30-day means of every METRICS (cumulative
+            sums of the values and of the mask, so a mean is over the
+            diaries of its window, days without a diary do not count)
+          - the histogram of the disturbance codes (bincount)
+          - the week-over-week deltas: mean of the last 7 days against the
+            7 days before
+
+The rolling means are sampled at most MAX_POINTS times, every 7 days or
+every multiple of 7 days back from today, so the body stays under about a
+kilobyte whatever the range. The diaries of the 29 days before the range are read
+too, so the first 30-day mean covers a whole window.
+
+numpy is optional (see columns.getNumpy): without it the same summary is
+computed with plain lists.
+'''
+
+WEEK_DAYS = 7
+WINDOWS = (7, 30)
+MAX_DAYS = 366
+MAX_POINTS = 12
+METRICS = ('sleepScore', 'timeToSleep', 'numOfWakeUp')
+DISTURBANCES = 12
+PROJECTION = 'diaryDate, sleepScore, timeToSleep, numOfWakeUp, disturbance'
+EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+'''
+fetchColumns function
+
+@input parameter:
+    - email: PK of the user
+    - since, until: int yyyymmdd, both included
+@return:
+    - dict: diaryDate (ints), METRICS (floats, None when missing) and
+            disturbance (lists of ints) of the same length
+'''
+def fetchColumns(email, since, until):
+    params = {
+        'TableName': os.environ['TABLE_NAME'],
+        'KeyConditionExpression': '#e = :e AND diaryDate BETWEEN :low AND :high',
+        'ProjectionExpression': PROJECTION,
+        'ExpressionAttributeNames': {'#e': 'email'},
+        'ExpressionAttributeValues': {':e': {'S': email}, ':low': {'N': str(since)}, ':high': {'N': str(until)}},
+    }
+    client = db.getClient('dynamodb')
+    result = dict((name, []) for name in ('diaryDate',) + METRICS + ('disturbance',))
+    while True:
+        res = client.query(**params)
+        for item in res.get('Items', []):
+            result['diaryDate'].append(int(item['diaryDate']['N']))
+            for name in METRICS:
+                result[name].append(float(item[name]['N']) if 'N' in item.get(name, {}) else None)
+            result['disturbance'].append([int(code['N']) for code in item.get('disturbance', {}).get('L', [])
+                                          if 'N' in code])
+        if 'LastEvaluatedKey' not in res:
+            return result
+        params['ExclusiveStartKey'] = res['LastEvaluatedKey']
+
+'''
+summarize function
+
+@input parameter:
+    - diaries: dict returned by fetchColumns
+    - first: first day of the range, datetime.date
+    - days: days in the range, the last one being today
+@return:
+    - dict: diaries (in the range), dates (yyyymmdd of the trend points),
+            trend {metric: {mean7: [...], mean30: [...]}}, latest {metric:
+            {mean7, mean30}}, weekOverWeek {metric: {last7, previous7,
+            delta}}, disturbance (count per code, 0 to DISTURBANCES - 1)
+            a mean without any diary in its window is None
+'''
+def summarize(diaries, first, days):
+    numpy = columns.getNumpy()
+    if numpy is None:
+        return _summarizeLists(diaries, first, days)
+    lead = max(WINDOWS) - 1
+    span = lead + days
+    origin = first.toordinal() - lead
+
+    dates = numpy.array(diaries['diaryDate'], dtype=numpy.int64)
+    # yyyymmdd -> day number, on the whole column
+    years = (dates // 10000 - 1970).astype('datetime64[Y]')
+    months = years.astype('datetime64[M]') + (dates // 100 % 100 - 1)
+    ordinals = (months.astype('datetime64[D]') + (dates % 100 - 1)).astype(numpy.int64) + EPOCH_ORDINAL
+    day = ordinals - origin
+    keep = (day >= 0) & (day < span)
+    inRange = day >= lead
+
+    summary = {'diaries': int(numpy.count_nonzero(keep & inRange))}
+    points = numpy.array(_points(lead, span), dtype=numpy.int64)
+    trend, latest, weekOverWeek = dict(), dict(), dict()
+    for name in METRICS:
+        raw = numpy.array([numpy.nan if value is None else value for value in diaries[name]], dtype=numpy.float64)
+        valid = keep & ~numpy.isnan(raw)
+        sums = numpy.bincount(day[valid], weights=raw[valid], minlength=span)
+        counts = numpy.bincount(day[valid], minlength=span).astype(numpy.float64)
+        sumTotals = numpy.concatenate(([0.0], numpy.cumsum(sums)))
+        countTotals = numpy.concatenate(([0.0], numpy.cumsum(counts)))
+        means = dict()
+        for window in WINDOWS:
+            ends = numpy.arange(1, span + 1)
+            starts = numpy.maximum(ends - window, 0)
+            windowCounts = countTotals[ends] - countTotals[starts]
+            with numpy.errstate(invalid='ignore', divide='ignore'):
+                means[window] = (sumTotals[ends] - sumTotals[starts]) / windowCounts
+        trend[name] = dict(('mean%d' % window, [_number(value) for value in means[window][points]]) for window in WINDOWS)
+        latest[name] = dict(('mean%d' % window, _number(means[window][-1])) for window in WINDOWS)
+        last7 = means[WEEK_DAYS][-1]
+        previous7 = means[WEEK_DAYS][-1 - WEEK_DAYS] if span > WEEK_DAYS else numpy.nan
+        weekOverWeek[name] = _weekOverWeek(last7, previous7)
+
+    lengths = numpy.array([len(codes) for codes in diaries['disturbance']], dtype=numpy.int64)
+    codes = numpy.array([code for entry in diaries['disturbance'] for code in entry], dtype=numpy.int64)
+    codes = codes[numpy.repeat(keep & inRange, lengths)]
+    codes = codes[(codes >= 0) & (codes < DISTURBANCES)]
+    summary.update({
+        'dates': [_dateOf(origin + int(point)) for point in points],
+        'trend': trend,
+        'latest': latest,
+        'weekOverWeek': weekOverWeek,
+        'disturbance': numpy.bincount(codes, minlength=DISTURBANCES).tolist(),
+    })
+    return summary
+
+def _summarizeLists(diaries, first, days):
+    lead = max(WINDOWS) - 1
+    span = lead + days
+    origin = first.toordinal() - lead
+
+    day = [_ordinalOf(date) - origin for date in diaries['diaryDate']]
+    keep = [0 <= value < span for value in day]
+    inRange = [kept and value >= lead for kept, value in zip(keep, day)]
+
+    summary = {'diaries': sum(inRange)}
+    points = _points(lead, span)
+    trend, latest, weekOverWeek = dict(), dict(), dict()
+    for name in METRICS:
+        sums = [0.0] * span
+        counts = [0] * span
+        for value, index, kept in zip(diaries[name], day, keep):
+            if kept and value is not None:
+                sums[index] += value
+                counts[index] += 1
+        means = dict()
+        for window in WINDOWS:
+            total = count = 0
+            means[window] = []
+            for index in range(span):
+                total += sums[index]
+                count += counts[index]
+                if index >= window:
+                    total -= sums[index - window]
+                    count -= counts[index - window]
+                means[window].append(total / count if count else None)
+        trend[name] = dict(('mean%d' % window, [_number(means[window][point]) for point in points]) for window in WINDOWS)
+        latest[name] = dict(('mean%d' % window, _number(means[window][-1])) for window in WINDOWS)
+        last7 = means[WEEK_DAYS][-1]
+        previous7 = means[WEEK_DAYS][-1 - WEEK_DAYS] if span > WEEK_DAYS else None
+        weekOverWeek[name] = _weekOverWeek(last7, previous7)
+
+    histogram = [0] * DISTURBANCES
+    for codes, counted in zip(diaries['disturbance'], inRange):
+        if counted:
+            for code in codes:
+                if 0 <= code < DISTURBANCES:
+                    histogram[code] += 1
+    summary.update({
+        'dates': [_dateOf(origin + point) for point in points],
+        'trend': trend,
+        'latest': latest,
+        'weekOverWeek': weekOverWeek,
+        'disturbance': histogram,
+    })
+    return summary
+
+'''
+sleepSummary function
+
+@input parameter:
+    - email: PK of the user
+    - since: unixtime, first day of the range (at most MAX_DAYS days ago)
+    - now: unixtime (default: current time)
+@return:
+    - dict: since, until (yyyymmdd) and the summary (see summarize)
+'''
+def sleepSummary(email, since, now=None):
+    now = time.time() if now is None else now
+    today = _date(plans.dateOf(now))
+    first = max(_date(plans.dateOf(since)), today - datetime.timedelta(days=MAX_DAYS - 1))
+    days = (today - first).days + 1
+    lead = first - datetime.timedelta(days=max(WINDOWS) - 1)
+    diaries = fetchColumns(email, int(lead.strftime('%Y%m%d')), int(today.strftime('%Y%m%d')))
+    summary = {
+        'since': int(first.strftime('%Y%m%d')),
+        'until': int(today.strftime('%Y%m%d')),
+    }
+    summary.update(summarize(diaries, first, days))
+    return summary
+
+def _weekOverWeek(last7, previous7):
+    last7, previous7 = _number(last7), _number(previous7)
+    # the delta of the rounded means, so the three numbers add up
+    delta = _number(last7 - previous7) if last7 is not None and previous7 is not None else None
+    return {'last7': last7, 'previous7': previous7, 'delta': delta}
+
+def _points(lead, span):
+    weeks = -(-(span - lead) // (WEEK_DAYS * MAX_POINTS))
+    return list(range(span - 1, lead - 1, -WEEK_DAYS * weeks))[::-1]
+
+def _date(yyyymmdd):
+    return datetime.date(yyyymmdd // 10000, yyyymmdd // 100 % 100, yyyymmdd % 100)
+
+def _ordinalOf(yyyymmdd):
+    return _date(yyyymmdd).toordinal()
+
+def _dateOf(ordinal):
+    return int(datetime.date.fromordinal(ordinal).strftime('%Y%m%d'))
+
+def _number(value):
+    if value is None or value != value:
+        return None
+    return round(float(value), 2)
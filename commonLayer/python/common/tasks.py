@@ -0,0 +1,107 @@
+import datetime
+from decimal import Decimal
+
+'''
+tasks module
+
+Helpers for task records shared by the task handlers and tools.
+
+Task items carry a derived attribute typeStart = "<taskType>#<startTime>"
+(startTime zero padded to 10 digits). It is the sort key of the
+TYPE_START_INDEX global secondary index (email + typeStart), which lets
+getTask answer taskType (+ since) filters with a key condition.
+
+taskId = "<userName>-<startDate yyyymmdd>-<serverTime>[_<suffix>]": the
+suffix tells apart the tasks of one user and day written in the same
+second, and keeps the three '-' separated parts other code parses
+(plans.taskDate, putTask).
+'''
+
+TASK_TYPES = (0, 1, 2, 3, 4)
+
+TYPE_START_FORMAT = "%d#%010d"
+TYPE_START_MAX = 9999999999
+
+'''
+typeStartKey function
+
+@input parameter:
+    - taskType: int
+    - startTime: unixtime (int, float, Decimal or a wire format number
+                 string such as '1700000000.5')
+@return:
+    - string: sort key value for TYPE_START_INDEX, startTime truncated to
+              the second
+'''
+def typeStartKey(taskType, startTime):
+    # int('1700000000.5') raises: go through Decimal
+    return TYPE_START_FORMAT % (int(Decimal(str(taskType))), int(Decimal(str(startTime))))
+
+'''
+typeStartRange function
+
+@input parameter:
+    - taskType: int
+    - since: unixtime or None
+@return:
+    - (low, high) strings bounding every typeStart of taskType from since on
+
+Description: typeStart keeps whole seconds, so for a fractional since the
+             range starts at the second since falls in and also holds the
+             tasks of that second started before since (see sinceIsExact).
+'''
+def typeStartRange(taskType, since=None):
+    return typeStartKey(taskType, since or 0), typeStartKey(taskType, TYPE_START_MAX)
+
+'''
+sinceIsExact function
+
+@input parameter:
+    - since: unixtime or None
+@return:
+    - bool: True when typeStartRange(taskType, since) holds no task started
+            before since (since is None or a whole second)
+'''
+def sinceIsExact(since):
+    return since is None or Decimal(str(since)) % 1 == 0
+
+'''
+createTaskId function
+
+@input parameter:
+    - email: PK of the user
+    - startTime: unixtime of the task
+    - serverTime: unixtime of the write (int)
+    - suffix: string or int (optional)
+@return:
+    - string: taskId
+'''
+def createTaskId(email, startTime, serverTime, suffix=None):
+    userName = email.split("@")[0]
+    startDate = int(datetime.datetime.fromtimestamp(startTime).strftime("%Y%m%d"))
+    taskId = "%s-%d-%d" % (userName, startDate, serverTime)
+    if suffix is not None:
+        taskId += "_%s" % suffix
+    return taskId
+
+'''
+taskItem function
+
+@input parameter:
+    - email: PK of the user
+    - taskId: see createTaskId
+    - params: validated task fields (taskType, startTime, elapsedTime)
+@return:
+    - dict: task item, with typeStart when taskType is set
+'''
+def taskItem(email, taskId, params):
+    item = {
+        "email": email,
+        "taskId": taskId,
+    }
+    for name, value in params.items():
+        # json numbers with a fraction come as float, which dynamodb refuses
+        item[name] = Decimal(str(value)) if isinstance(value, float) else value
+    if "taskType" in params:
+        item["typeStart"] = typeStartKey(params["taskType"], params["startTime"])
+    return item
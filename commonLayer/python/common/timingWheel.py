@@ -0,0 +1,144 @@
+import math, heapq, itertools
+
+'''
+timingWheel module
+
+Hierarchical timing wheel (Varghese & Lauck): LEVELS wheels of SLOTS slots,
+the slots of level n being SLOTS ** n ticks wide. A timer is added in O(1)
+to the lowest level whose span covers its delay, and moves down one level
+each time the wheel above reaches its slot (cascading); timers further away
+than the top level wait in an overflow heap. advance() walks the ticks
+elapsed since the last call, so a late wakeup (a frozen container, a long
+GC pause, a slow page load) returns every timer that expired meanwhile,
+each exactly once and never before its deadline. Empty stretches are
+jumped over a level at a time, so a wakeup hours late costs a few cascades,
+not one step per tick.
+
+Not thread safe: one owner adds and advances.
+
+Usage:
+    from common import timingWheel
+    wheel = timingWheel.TimingWheel(0.1, start=time.time())
+    wheel.add(deadline, payload)
+    for deadline, payload in wheel.advance(time.time()):
+        ...
+'''
+
+SLOTS = 64
+LEVELS = 3
+
+'''
+TimingWheel class
+
+@input parameter:
+    - tick: width of a level 0 slot, in the unit of the deadlines (seconds)
+    - start: current time (optional, default 0)
+    - slots, levels: geometry (optional)
+'''
+class TimingWheel(object):
+    def __init__(self, tick, start=0, slots=SLOTS, levels=LEVELS):
+        self.tick = float(tick)
+        self.slots = slots
+        self.levels = levels
+        self.spans = [slots ** level for level in range(levels + 1)]
+        self.wheels = [[[] for _ in range(slots)] for _ in range(levels)]
+        self.sizes = [0] * levels
+        self.overflow = []
+        self.expired = []
+        self.current = int(math.floor(start / self.tick))
+        self.count = 0
+        self._sequence = itertools.count()
+
+    def __len__(self):
+        return self.count
+
+    '''
+    add function
+
+    @input parameter:
+        - deadline: time the payload is due at (a past deadline is due at
+                    the next advance)
+        - payload: anything
+    @return:
+        - None
+    '''
+    def add(self, deadline, payload):
+        # the tick a deadline falls in is only over once the next one starts
+        self._place((self._tickOf(deadline), deadline, payload))
+        self.count += 1
+
+    '''
+    advance function
+
+    @input parameter:
+        - now: current time
+    @return:
+        - list: (deadline, payload) of every timer whose tick is over (a
+                deadline on a tick boundary fires at now >= deadline, one
+                inside a tick at the end of the tick), by tick of their
+                deadline (insertion order within a tick)
+    '''
+    def advance(self, now):
+        # same tolerance as _tickOf, or a deadline on a boundary waits a tick more
+        target = int(math.floor(now / self.tick + 1e-9))
+        fired = self._drain()
+        while self.current < target:
+            if self.count == len(fired) and not self.expired:
+                # nothing pending: jump instead of walking the empty slots
+                self.current = target
+                break
+            self.current = min(target, self._nextStop())
+            self._cascade()
+            slot = self.wheels[0][self.current % self.slots]
+            if slot:
+                self.wheels[0][self.current % self.slots] = []
+                self.sizes[0] -= len(slot)
+                self.expired += slot
+            fired += self._drain()
+        self.count -= len(fired)
+        return fired
+
+    def _tickOf(self, deadline):
+        # tolerate the float error of deadline / tick on exact multiples
+        return int(math.ceil(deadline / self.tick - 1e-9))
+
+    def _nextStop(self):
+        # below the lowest non empty level nothing fires before its next cascade
+        for level in range(self.levels):
+            if self.sizes[level]:
+                span = self.spans[level]
+                break
+        else:
+            span = self.spans[self.levels]
+        return (self.current // span + 1) * span
+
+    def _place(self, timer):
+        delay = timer[0] - self.current
+        if delay <= 0:
+            self.expired.append(timer)
+            return
+        for level in range(self.levels):
+            if delay < self.spans[level + 1]:
+                self.wheels[level][(timer[0] // self.spans[level]) % self.slots].append(timer)
+                self.sizes[level] += 1
+                return
+        heapq.heappush(self.overflow, (timer[0], next(self._sequence), timer))
+
+    def _cascade(self):
+        # from the top down, so a timer can fall through several levels at once
+        if self.current % self.spans[self.levels] == 0:
+            while self.overflow and self.overflow[0][0] - self.current < self.spans[self.levels]:
+                self._place(heapq.heappop(self.overflow)[2])
+        for level in range(self.levels - 1, 0, -1):
+            if self.current % self.spans[level] == 0:
+                index = (self.current // self.spans[level]) % self.slots
+                slot = self.wheels[level][index]
+                if slot:
+                    self.wheels[level][index] = []
+                    self.sizes[level] -= len(slot)
+                    for timer in slot:
+                        self._place(timer)
+
+    def _drain(self):
+        expired, self.expired = self.expired, []
+        return [(deadline, payload) for _, deadline, payload in expired]
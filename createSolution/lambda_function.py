@@ -1,21 +1,119 @@
-import json, os, logging
-import boto3
+import json, os
+from decimal import Decimal
+from common import db, bulk, metrics, log
 
+logger = log.getLogger(__name__)
+
+'''
+lambda_handler function
+
+@input parameter:
+    - event: SNS (createUserTopic) or SQS event with one or more records,
+             each message being the user item published by postUser
+@return:
+    - dict: status code, batchItemFailures (records to be delivered again)
+
+Description: every record is decoded, the items are deduplicated by email
+    (the last record wins) and written with BatchWriteItem.
+    - SQS: failed records are reported in batchItemFailures, so only they
+      are delivered again (ReportBatchItemFailures)
+    - SNS: an asynchronous invocation cannot be retried in part, so the
+      handler raises when a record failed; the writes are idempotent puts
+'''
+@log.handler
+@metrics.handler
 def lambda_handler(event, context):
-    # TODO implement
-    
-    records = event["Records"]
-    if records:
-        body = json.loads(records[0]['Sns']['Message'])
-        db = boto3.resource('dynamodb')
-        table = db.Table(os.environ['TABLE_NAME'])
-        
-        # table.put_item(
-        #     Item=body
-        # )
-        
-        ## Send it to S3
+    records = event.get('Records', [])
+
+    items, failures = decodeRecords(records)
+    failures += writeItems(os.environ['TABLE_NAME'], items)
+
+    logger.info("Processed %d record(s) for %d user(s), %d failed record(s).",
+        len(records), len(items), len(failures))
+
+    if failures and any(record.get('EventSource') == 'aws:sns' for record in records):
+        raise Exception(json.dumps({
+            'statusCode' : 500,
+            'message' : "Internal Server Error"
+        }))
+
     return {
         'statusCode': 200,
-        'event' : event
+        'batchItemFailures': [{'itemIdentifier': recordId} for recordId in failures]
     }
+
+'''
+decodeRecords function
+
+@input parameter:
+    - records: event records
+@return:
+    - dict: email -> (ids of its records, wire format item of the last one)
+    - list: ids of records that could not be decoded
+'''
+def decodeRecords(records):
+    serializer = db.TypeSerializer()
+    items = dict()
+    failures = []
+    for record in records:
+        recordId = getRecordId(record)
+        try:
+            item = decodeMessage(record)
+            recordIds = items[item['email']][0] if item['email'] in items else []
+            recordIds.append(recordId)
+            items[item['email']] = (recordIds, dict((k, serializer.serialize(v)) for k, v in item.items()))
+        except (ValueError, KeyError, TypeError) as e:
+            logger.error("Record %s is not a user item: %s", recordId, e)
+            failures.append(recordId)
+    return items, failures
+
+def getRecordId(record):
+    if 'Sns' in record:
+        return record['Sns']['MessageId']
+    return record['messageId']
+
+def decodeMessage(record):
+    if 'Sns' in record:
+        message = json.loads(record['Sns']['Message'], parse_float=Decimal)
+    else:
+        message = json.loads(record['body'], parse_float=Decimal)
+        # SQS subscription without raw message delivery keeps the SNS envelope
+        if message.get('Type') == 'Notification' and 'Message' in message:
+            message = json.loads(message['Message'], parse_float=Decimal)
+    if type(message) is not dict or type(message.get('email')) is not str:
+        raise ValueError("email is missing")
+    return message
+
+'''
+writeItems function
+
+@input parameter:
+    - tableName: string
+    - items: dict returned by decodeRecords
+@return:
+    - list: ids of records whose item was not written
+'''
+def writeItems(tableName, items):
+    entries = list(items.values())
+    if not entries:
+        return []
+
+    # build the shared client before fanning out to worker threads
+    db.getClient('dynamodb')
+    executor = bulk.getExecutor()
+    chunks = [entries[idx:idx + bulk.BATCH_SIZE] for idx in range(0, len(entries), bulk.BATCH_SIZE)]
+    futures = [executor.submit(bulk.tryBatchWrite, tableName,
+                               [{'PutRequest': {'Item': item}} for recordIds, item in chunk])
+               for chunk in chunks]
+
+    failures = []
+    for chunk, future in zip(chunks, futures):
+        try:
+            left = set(request['PutRequest']['Item']['email']['S'] for request in future.result())
+        except Exception as e:
+            logger.error("BatchWriteItem failed: %s", e)
+            left = set(item['email']['S'] for recordIds, item in chunk)
+        for recordIds, item in chunk:
+            if item['email']['S'] in left:
+                failures += recordIds
+    return failures
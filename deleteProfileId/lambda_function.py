@@ -1,9 +1,7 @@
-import json, os, logging
-import boto3
-from botocore.exceptions import ClientError
+import json, os
+from common import db, cache, plans, metrics, log
 
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
+logger = log.getLogger(__name__)
 
 '''
 lambda_handler function
@@ -16,62 +14,56 @@ lambda_handler function
 
 Description: DELETE operation for /user/profile api
 '''
+@log.handler
+@metrics.handler
 def lambda_handler(event, context):
     emailFromToken = event.get('email', None)
     profileId = event.get('profileId', None)
     
-    db = boto3.resource('dynamodb')
-    table = db.Table(os.environ['TABLE_NAME'])
+    table = db.getTable('TABLE_NAME')
     
-    # try 1: Read DB
+    # try 1: Update DB (only when the user has a profile section)
     try:
-        res = table.get_item(Key={
+        updateVals = dict()
+        updateVals[":i"] = dict()
+        # every write bumps the item version read by the item cache
+        updateExpression, updateNames, updateVals = cache.addVersion("set profile = :i", None, updateVals)
+        cache.invalidate(table, {'email' : emailFromToken})
+        
+        res = table.update_item(Key={
             'email' : emailFromToken,
-        })
+        },
+        # UpdateExpression="remove profile")
+        UpdateExpression=updateExpression,
+        ConditionExpression=db.Attr('profile').exists(),
+        ExpressionAttributeNames=updateNames,
+        ExpressionAttributeValues=updateVals,
+        ReturnValuesOnConditionCheckFailure='ALL_OLD')
+        plans.invalidate(emailFromToken, plans.window())
         
-        # Return: User not found
-        if 'Item' not in res.keys():
-            logger.error("User (" + emailFromToken + ")not found.")
-            raise Exception(json.dumps({
-                'statusCode' : 400,
-                'message': "User Not Found"
-            }))
+        # Return: Operation success
+        return {
+            'statusCode' : 200
+        }
         
-        # Return: profiles section not found
-        if 'profile' not in res['Item'].keys():
+    # try 1: Update DB
+    except db.ClientError as e:
+        if db.isConditionFailed(e):
+            # the failed write returns the old item, if there is one
+            if 'Item' not in e.response:
+                # Return: User not found
+                logger.error("User not found.")
+                raise Exception(json.dumps({
+                    'statusCode' : 400,
+                    'message': "User Not Found"
+                }))
+            
+            # Return: profiles section not found
             logger.error("profiles section does not exist.")
             raise Exception(json.dumps({
                 'statusCode' : 400,
                 'message': "Bad Request"
             }))
-        
-        # try 3: Update DB
-        try:
-            updateVals = dict()
-            updateVals[":i"] = dict()
-            
-            res = table.update_item(Key={
-                'email' : emailFromToken,
-            },
-            # UpdateExpression="remove profile")
-            UpdateExpression="set profile = :i",
-            ExpressionAttributeValues=updateVals)
-            
-            # Return: Operation success
-            return {
-                'statusCode' : 200
-            }
-            
-        # try 3: Update DB
-        except ClientError as e:
-            logger.error(e.response['Error']['Message'])
-            raise Exception(json.dumps({
-                'statusCode' : 500,
-                'message': "Internal Server Error"
-            }))
-            
-    # try 1: Read DB
-    except ClientError as e:
         logger.error(e.response['Error']['Message'])
         raise Exception(json.dumps({
             'statusCode' : 500,
@@ -101,7 +93,7 @@ def deleteProfiles(table, emailFromToken, profileId, profileIds):
             }
             
         # try 2: Update DB
-        except ClientError as e:
+        except db.ClientError as e:
             logger.error(e.response['Error']['Message'])
             raise Exception(json.dumps({
                 'statusCode' : 500,
@@ -131,7 +123,7 @@ def deleteProfiles(table, emailFromToken, profileId, profileIds):
             }
             
         # try 3: Update DB
-        except ClientError as e:
+        except db.ClientError as e:
             logger.error(e.response['Error']['Message'])
             raise Exception(json.dumps({
                 'statusCode' : 500,
@@ -1,73 +1,103 @@
-import os, datetime, logging
-import boto3
-from boto3.dynamodb.conditions import Key
-from botocore.exceptions import ClientError
+import os, datetime, json
+from common import db, bulk, cursor, metrics, log
 
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
+logger = log.getLogger(__name__)
 
+# stop starting new pages when less than this is left of the lambda timeout
+RESERVE_MS = 3000
+PAGE_SIZE = 1000
+
+'''
+lambda_handler function
+
+@input parameter:
+    - emailFromToken: PK of database
+    - diaryDate: 'yyyyMMdd' sort key, or "*" for every diary of the user
+    - nextToken: continuation token of a previous "*" call (optional)
+@return:
+    - dict: status code, body (deletedCount, nextToken)
+            nextToken is set when the purge ran out of time; call again with it
+'''
+@log.handler
+@metrics.handler
 def lambda_handler(event, context):
     emailFromToken = event.get('email', None)
     date = event.get("diaryDate", None)
-    sortKeyArray = []
-    
-    dynamodb = boto3.resource("dynamodb")
-    table = dynamodb.Table(os.environ["TABLE_NAME"])
-    
-    if date == "*":
-        keyCondition = Key("email").eq(emailFromToken)
-        sortKeyArray = getSortKeys(table, keyCondition)
-        if len(sortKeyArray) == 0:
-            logger.error("No data exists to delete.")
-            raise Exception(json.dumps({
-                'statusCode' : 400,
-                'message' : "Bad Request"
-             }))
-    else:
+
+    if date != "*":
         parameterCheck(date)
-        sortKeyArray.append(date)
 
     try:
-        for sortKey in sortKeyArray:
-            deleteResponse = table.delete_item(
-                Key = {
-                    "email":emailFromToken,
-                    "diaryDate" : int(sortKey)
-                },
-                ReturnValues = "ALL_OLD"
-            )
-        responseBody = { "statusCode": 200 }
-        if "Attributes" in deleteResponse.keys():
-            logger.info("%d item(s) delete operation successful. Return 200." % len(sortKeyArray))
-        else:
+        if date == "*":
+            startKey = cursor.decodeToken(event.get("nextToken", None), "email", emailFromToken)
+            ret = purgeDiaries(emailFromToken, startKey, context)
+            if ret["deleted"] == 0 and startKey is None:
+                logger.error("No data exists to delete.")
+                raise Exception(json.dumps({
+                    'statusCode' : 400,
+                    'message' : "Bad Request"
+                }))
+            logger.info("%d item(s) delete operation successful. Return 200.", ret["deleted"])
+            return {
+                "statusCode": 200,
+                "body": {
+                    "deletedCount": ret["deleted"],
+                    "nextToken": cursor.encodeToken(ret["nextKey"])
+                }
+            }
+
+        table = db.getTable("TABLE_NAME")
+        deleteResponse = table.delete_item(
+            Key = {
+                "email":emailFromToken,
+                "diaryDate" : int(date)
+            },
+            ReturnValues = "ALL_OLD"
+        )
+        if "Attributes" not in deleteResponse.keys():
             logger.error("No data exists to delete.")
             raise Exception(json.dumps({
                 'statusCode' : 400,
                 'message' : "Bad Request"
-             }))
-        return responseBody
-            
-    except ClientError as e:
+            }))
+        logger.debug("1 item(s) delete operation successful. Return 200.")
+        return {
+            "statusCode": 200,
+            "body": {
+                "deletedCount": 1,
+                "nextToken": None
+            }
+        }
+
+    except db.ClientError as e:
         logger.error(e.response["Error"]["Message"])
         raise Exception(json.dumps({
             'statusCode' : 500,
             'message' : "Internal Server Error"
         }))
-        
-def getSortKeys(table, keyCondition):
-    sortKeyArray = []
-    queryResponse = table.query(
-        KeyConditionExpression=keyCondition
-    )
-    for sleepDiary in queryResponse["Items"]:
-        sortKeyArray.append(sleepDiary["date"])
-    return sortKeyArray
-    
+
+'''
+purgeDiaries function
+
+@input parameter:
+    - emailFromToken: PK of database
+    - startKey: wire format key to resume from, or None
+    - context: lambda context (None when run locally: no time budget)
+@return:
+    - dict: deleted, pages, elapsedMs, nextKey
+'''
+def purgeDiaries(emailFromToken, startKey, context):
+    hasTime = None
+    if context is not None:
+        hasTime = lambda: context.get_remaining_time_in_millis() > RESERVE_MS
+    return bulk.purgePartition(os.environ["TABLE_NAME"], ["email", "diaryDate"], emailFromToken,
+                               startKey=startKey, hasTime=hasTime, pageSize=PAGE_SIZE)
+
 def parameterCheck(date):
     try:
         datetime.datetime.strptime(date, '%Y%m%d')
-    except ValueError:
+    except (ValueError, TypeError):
         raise Exception(json.dumps({
             'statusCode' : 400,
             'message' : "Bad Request"
-        }))
\ No newline at end of file
+        }))
@@ -1,61 +1,96 @@
-import os, logging, json
-import boto3
-from boto3.dynamodb.conditions import Key
-from botocore.exceptions import ClientError
+import os, json
+from common import db, bulk, cursor, plans, scores, metrics, log
 
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
+logger = log.getLogger(__name__)
 
+# stop starting new pages when less than this is left of the lambda timeout
+RESERVE_MS = 3000
+PAGE_SIZE = 1000
+
+'''
+lambda_handler function
+
+@input parameter:
+    - emailFromToken: PK of database
+    - taskId: sort key of the task, or "*" for every task of the user
+    - nextToken: continuation token of a previous "*" call (optional)
+@return:
+    - dict: status code, body (deletedCount, nextToken)
+            nextToken is set when the purge ran out of time; call again with it
+'''
+@log.handler
+@metrics.handler
 def lambda_handler(event, context):
     emailFromToken = event.get("email", None)
-    emailFromToken = "hero@luple.co.kr"
     taskId = event.get("taskId", None)
-    sortKeyArray = []
-    
-    dynamodb = boto3.resource("dynamodb")
-    table = dynamodb.Table(os.environ["TABLE_NAME"])
-    
-    if taskId == "*":
-        keyCondition = Key("email").eq(emailFromToken)
-        queryResponse = table.query(
-                KeyConditionExpression=keyCondition
-            )
-        if queryResponse["Count"] == 0:
-            logger.error("No data exists to delete.")
-            raise Exception(json.dumps({
-                "statusCode": 400,
-                "message": "No data exists to delete"
-            }))
-        else:
-            for task in queryResponse["Items"]:
-                sortKeyArray.append(task["taskId"])
-    else:
-        sortKeyArray.append(taskId)
-        
+
     try:
-        for sortKey in sortKeyArray:
-            deleteResponse = table.delete_item(
-                Key = {
-                    "email":emailFromToken,
-                    "taskId" : sortKey
-                },
-                ReturnValues = "ALL_OLD"
-            )
-        responseBody = { "statusCode": 200 }
-        if "Attributes" in deleteResponse.keys():
-            logger.info("%d item(s) delete operation successful. Return 200." % len(sortKeyArray))
-        else:
+        if taskId == "*":
+            startKey = cursor.decodeToken(event.get("nextToken", None), "email", emailFromToken)
+            ret = purgeTasks(emailFromToken, startKey, context)
+            if ret["deleted"] == 0 and startKey is None:
+                logger.error("No data exists to delete.")
+                raise Exception(json.dumps({
+                    "statusCode": 400,
+                    "message": "No data exists to delete"
+                }))
+            if ret["nextKey"] is None:
+                scores.purge(emailFromToken)
+            plans.invalidateTask(emailFromToken, None)
+            logger.info("%d item(s) delete operation successful. Return 200.", ret["deleted"])
+            return {
+                "statusCode": 200,
+                "body": {
+                    "deletedCount": ret["deleted"],
+                    "nextToken": cursor.encodeToken(ret["nextKey"])
+                }
+            }
+
+        table = db.getTable("TABLE_NAME")
+        deleteResponse = table.delete_item(
+            Key = {
+                "email":emailFromToken,
+                "taskId" : taskId
+            },
+            ReturnValues = "ALL_OLD"
+        )
+        if "Attributes" not in deleteResponse.keys():
             logger.error("No data exists to delete.")
             raise Exception(json.dumps({
                 "statusCode": 400,
                 "message": "No data exists to delete"
             }))
-        
-        return responseBody
-        
-    except ClientError as e:
+        scores.record(emailFromToken, old=deleteResponse["Attributes"])
+        plans.invalidateTask(emailFromToken, plans.taskDate(taskId))
+        logger.debug("1 item(s) delete operation successful. Return 200.")
+        return {
+            "statusCode": 200,
+            "body": {
+                "deletedCount": 1,
+                "nextToken": None
+            }
+        }
+
+    except db.ClientError as e:
         logger.error(e.response["Error"]["Message"])
         raise Exception(json.dumps({
             "statusCode": 500,
             "message": "%s :%s" % (e.response["Error"]["Code"], e.response["Error"]["Message"])
-        }))
\ No newline at end of file
+        }))
+
+'''
+purgeTasks function
+
+@input parameter:
+    - emailFromToken: PK of database
+    - startKey: wire format key to resume from, or None
+    - context: lambda context (None when run locally: no time budget)
+@return:
+    - dict: deleted, pages, elapsedMs, nextKey
+'''
+def purgeTasks(emailFromToken, startKey, context):
+    hasTime = None
+    if context is not None:
+        hasTime = lambda: context.get_remaining_time_in_millis() > RESERVE_MS
+    return bulk.purgePartition(os.environ["TABLE_NAME"], ["email", "taskId"], emailFromToken,
+                               startKey=startKey, hasTime=hasTime, pageSize=PAGE_SIZE)
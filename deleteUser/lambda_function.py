@@ -1,13 +1,21 @@
-import json, os, logging, asyncio, time
-import boto3
-from boto3.dynamodb.conditions import Key
-from botocore.exceptions import ClientError
+import json, os, time
+from concurrent.futures import ThreadPoolExecutor
+from common import db, bulk, cache, alarms, metrics, log
 
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
+logger = log.getLogger(__name__)
 
-SLEEP_TABLE = "dynamodb.Table(name='Sleep-Dev')"
-RECORDS_TABLE = "dynamodb.Table(name='Records-Dev')"
+# environment variable of each table -> sort key name (None: email only)
+TABLES = {
+    'USER_TABLE': None,
+    'SLEEP_TABLE': 'diaryDate',
+    'SETTINGS_TABLE': None,
+    'RECORDS_TABLE': 'taskId',
+}
+# materialized daily plans (common.plans), once the table is configured
+if 'PLAN_TABLE' in os.environ:
+    TABLES['PLAN_TABLE'] = 'planDate'
+if 'SCORE_TABLE' in os.environ:
+    TABLES['SCORE_TABLE'] = 'scoreDate'
 
 '''
 lambda_handler function
@@ -17,160 +25,128 @@ lambda_handler function
              PK of database
     - userNameFromToken: get name of userName from Auth Token
 @return:
-    - dict: status code
+    - dict: status code, body (per table report)
 
+Description: DELETE operation for /user api (invoked by deleteUserGateway)
+    - every table and the cognito user are deleted concurrently
+    - raises when a table could not be emptied, so the asynchronous
+      invocation is retried; every step is idempotent
 '''
+@log.handler
+@metrics.handler
 def lambda_handler(event, context):
     emailFromToken = event.get('email', None)
     userNameFromToken = event.get('userName', None)
-    
-    logger.info("Lambda Handler for [/user] DELETE has been called.")
-    logger.info("Process DELETE Method.")
-    
-    db = boto3.resource('dynamodb')
-    userTable = db.Table(os.environ['USER_TABLE'])
-    sleepTable = db.Table(os.environ['SLEEP_TABLE'])
-    settingsTable = db.Table(os.environ['SETTINGS_TABLE'])
-    recordsTable = db.Table(os.environ['RECORDS_TABLE'])
-    
-    tables = [userTable, sleepTable, settingsTable, recordsTable]
-    rets = []
-
-    # asyncio.run(deleteTable(table, emailFromToken))
-    for table in tables:
-        rets.append(deleteTable(table, emailFromToken))
-        #rets.append(asyncio.run(deleteTable(table, emailFromToken)))
-    
-    for ret in rets:
-        logger.info("!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!")
-        logger.info(ret)
-    
-    try:    
-        cognitoClient = boto3.client('cognito-idp')
-        
-        response = cognitoClient.admin_delete_user(
-             UserPoolId=os.environ['COGNITIVE_USER_POOL'],
-             Username=userNameFromToken
-        )
-        
-        logger.info(response)
-    except:
-        logger.info("Cognitive Failed...")
-    
+
+    logger.debug("Lambda Handler for [/user] DELETE has been called.")
+
+    # build shared clients before fanning out to worker threads
+    db.getClient('dynamodb')
+    db.getClient('cognito-idp')
+
+    with ThreadPoolExecutor(max_workers=len(TABLES) + 2) as executor:
+        futures = dict()
+        for envName, sortKey in TABLES.items():
+            futures[envName] = executor.submit(deleteTable, envName, sortKey, emailFromToken)
+        # alarms go with their bucket entries (common.alarms)
+        if alarms.ALARM_ENV in os.environ:
+            futures[alarms.ALARM_ENV] = executor.submit(deleteAlarms, emailFromToken)
+        cognitoFuture = executor.submit(deleteCognitoUser, userNameFromToken)
+
+    report = dict()
+    failed = False
+    for envName, future in futures.items():
+        try:
+            report[envName] = future.result()
+        except Exception as e:
+            logger.error("Delete %s failed: %s", envName, e)
+            report[envName] = {'error': str(e)}
+            failed = True
+    report['COGNITO'] = cognitoFuture.result()
+
+    logger.info("Deleted user data.", extra={'fields': report})
+
+    if failed:
+        raise Exception(json.dumps({
+            'statusCode' : 500,
+            'message' : "Internal Server Error"
+        }))
+
     return {
-        'statusCode' : 200
+        'statusCode' : 200,
+        'body' : report
     }
-        
-def deleteTable(table, emailFromToken):
-    logger.info("Delete " + str(table) + " process.")
-        
-    if str(table) == SLEEP_TABLE or str(table) == RECORDS_TABLE:
-        ret = deleteTableWithSubkeys(table, emailFromToken)
-        return ret
-    else:
-        ret = deleteTableWithoutSubkeys(table, emailFromToken)
+
+'''
+deleteTable function
+
+@input parameter:
+    - envName: environment variable holding the table name
+    - sortKey: sort key name, or None when the table is keyed by email only
+    - emailFromToken: PK of database
+@return:
+    - dict: deleted, pages, elapsedMs
+'''
+def deleteTable(envName, sortKey, emailFromToken):
+    tableName = os.environ[envName]
+
+    if sortKey is not None:
+        ret = bulk.purgePartition(tableName, ['email', sortKey], emailFromToken)
+        del ret['nextKey']
         return ret
-        
+
+    start = time.perf_counter()
+    cache.invalidate(tableName, {'email': emailFromToken})
+    res = db.getClient('dynamodb').delete_item(
+        TableName=tableName,
+        Key={'email': {'S': emailFromToken}},
+        ReturnValues='ALL_OLD'
+    )
+    return {
+        'deleted': 1 if 'Attributes' in res else 0,
+        'pages': 0,
+        'elapsedMs': int((time.perf_counter() - start) * 1000),
+    }
+
 '''
-deleteTableWithSubkeys function
+deleteAlarms function
 
 @input parameter:
-    - table: dynamodb table object
-    - emailFromToken: get user's e-mail address from Auth Token
-             PK of database
+    - emailFromToken: PK of database
 @return:
-    - dict: status code
+    - dict: deleted, elapsedMs
+'''
+def deleteAlarms(emailFromToken):
+    start = time.perf_counter()
+    deleted = alarms.purge(emailFromToken)
+    return {
+        'deleted': deleted,
+        'elapsedMs': int((time.perf_counter() - start) * 1000),
+    }
 
-Description: DELETE operation for /user api
 '''
-def deleteTableWithSubkeys(table, emailFromToken):
-    keyCondition = Key("email").eq(emailFromToken)
-    sortKeyArray = []
-    
-    try:
-        queryResponse = table.query(
-            KeyConditionExpression=keyCondition
-        )
-    except:
-        return {
-            "statusCode": 200
-        }
-        
-    if queryResponse["Count"] == 0:
-        logger.info("No item to delete: " + str(table))
-        return {
-                "statusCode": 200
-            }
-    else:
-        sortKeyName = ""
-        if str(table) == SLEEP_TABLE:
-            sortKeyName = "date"
-        elif str(table) == RECORDS_TABLE:
-            sortKeyName = "taskId"
-        else:
-            logger.error("Unknown table name. Exit")
-            raise Exception(json.dumps({
-                'statusCode' : 500,
-                'message' : "Internal Server Error"
-            }))
-        
-        try:
-            for item in queryResponse["Items"]:
-                sortKeyArray.append(item[sortKeyName])
-            logger.info(sortKeyArray)
-        except:
-            return {
-                'statusCode': 200
-            }
-        
-        try:
-            for sortKey in sortKeyArray:
-                if str(table) == SLEEP_TABLE:
-                    deleteResponse = table.delete_item(
-                        Key = {
-                            "email":emailFromToken,
-                            "date" : int(sortKey)
-                        },
-                        ReturnValues = "ALL_OLD"
-                    )
-                elif str(table) == RECORDS_TABLE:
-                    deleteResponse = table.delete_item(
-                        Key = {
-                            "email":emailFromToken,
-                            "taskId" : str(sortKey)
-                        },
-                        ReturnValues = "ALL_OLD"
-                    )
-                
-            if "Attributes" in deleteResponse.keys():
-                logger.info("%d item(s) delete operation successful. Return 200." % len(sortKeyArray))
-                return {
-                    "statusCode": 200
-                }
-            else:
-                logger.error("No data exists to delete.")
-                return {
-                    "statusCode": 200
-                }
-        except ClientError as e:
-            logger.error(e.response["Error"]["Message"])
-            raise Exception(json.dumps({
-                'statusCode' : 500,
-                'message': "Internal Server Error"
-            }))
-            
-def deleteTableWithoutSubkeys(table, emailFromToken):
+deleteCognitoUser function
+
+@input parameter:
+    - userNameFromToken: cognito user name
+@return:
+    - dict: deleted (bool), elapsedMs
+
+Description: a missing cognito user must not block the data cleanup,
+             so failures are only logged.
+'''
+def deleteCognitoUser(userNameFromToken):
+    start = time.perf_counter()
+    deleted = False
     try:
-        response = table.delete_item(
-            Key={
-                'email': emailFromToken,
-            },
+        db.getClient('cognito-idp').admin_delete_user(
+            UserPoolId=os.environ['COGNITIVE_USER_POOL'],
+            Username=userNameFromToken
         )
-        return response
-        
-    except ClientError as e:
-        logger.error(e.response['Error']['Message'])
-        raise Exception(json.dumps({
-            'statusCode' : 500,
-            'message' : "Internal Server Error"
-        }))
\ No newline at end of file
+        deleted = True
+    except db.ClientError as e:
+        logger.info("Cognitive Failed... %s", e.response['Error']['Message'])
+    return {
+        'deleted': deleted,
+        'elapsedMs': int((time.perf_counter() - start) * 1000),
+    }
@@ -1,24 +1,23 @@
-import json, os, logging, asyncio, time
-import boto3
-from boto3.dynamodb.conditions import Key
-from botocore.exceptions import ClientError
+import json, os
+from common import db, metrics, log
 
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
+logger = log.getLogger(__name__)
 
+@log.handler
+@metrics.handler
 def lambda_handler(event, context):
 	emailFromToken = event.get('email', None)
 	userNameFromToken = event.get('userName', None)
 	
 	try:
-		cognitoClient = boto3.client(os.environ['COGNITO'])
+		cognitoClient = db.getClient(os.environ['COGNITO'])
         
 		response = cognitoClient.admin_get_user(
 		 	UserPoolId=os.environ['COGNITIVE_USER_POOL'],
 		 	Username=userNameFromToken
 		)
         
-		logger.info(response)
+		logger.debug("%s", response)
 	except:
 		raise Exception({
 			'statusCode' : 400,
@@ -29,18 +28,17 @@ def lambda_handler(event, context):
 		'email': emailFromToken,
 		'userName': userNameFromToken
 	}
-	lambdaClient = boto3.client('lambda')
+	lambdaClient = db.getClient('lambda')
 	responseFromLambda = lambdaClient.invoke(
 		FunctionName=os.environ['LAMBDA_ARN'],
 		LogType='Tail',
 		InvocationType='Event',
 		Payload=json.dumps(payload))
 	
-	logger.info("Got response from lambda function: /user DELETE")
-	logger.info(responseFromLambda)
+	logger.debug("Got response from lambda function: /user DELETE: %s", responseFromLambda)
 	
 	# Return (Success)
-	logger.info("Operation successful. Return 202.")
+	logger.debug("Operation successful. Return 202.")
 	
 	return {
 	    'statusCode': 202,
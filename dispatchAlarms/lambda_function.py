@@ -0,0 +1,29 @@
+import os
+from common import dispatch, metrics, log
+
+logger = log.getLogger(__name__)
+
+'''
+lambda_handler function
+
+@input parameter:
+    - event: EventBridge scheduled event (rate 1 minute), not used
+@return:
+    - dict: status code, counts of the run (claimed / skipped slots, pages,
+            fired / failed / dropped alarms)
+
+Description: fires the alarms due since DISPATCH_MAX_LATENESS seconds and
+    in the next DISPATCH_LOOKAHEAD minutes to ALARM_TOPIC_ARN (see dispatch
+    module)
+    - the next minute is loaded ahead and fired at its deadline, so the
+      invocation lasts about a minute: the function timeout must leave
+      room for it and the sending (2 minutes or more)
+    - overlapping or retried invocations skip the slots another one holds
+'''
+@log.handler
+@metrics.handler
+def lambda_handler(event, context):
+    notifier = dispatch.SnsNotifier(os.environ['ALARM_TOPIC_ARN'])
+    stats = dispatch.Dispatcher(notifier).run()
+    logger.info("Dispatch: %s", stats)
+    return dict(stats, statusCode=200)
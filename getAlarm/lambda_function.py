@@ -1,8 +1,47 @@
 import json
+from common import db, alarms, metrics, log
 
+logger = log.getLogger(__name__)
+
+'''
+lambda_handler function
+
+@input parameter:
+    - emailFromToken: PK of database
+    - alarmId: sort key of one alarm (optional, default: every alarm)
+@return:
+    - dict: status code, body ({"alarms": [alarm, ...]})
+
+Description: GET operation for /alarm api, one query on ALARM_TABLE
+'''
+@log.handler
+@metrics.handler
 def lambda_handler(event, context):
-    # TODO implement
-    return {
-        'statusCode': 200,
-        'body': json.dumps('Hello from Lambda!')
-    }
+    emailFromToken = event.get('email', None)
+    alarmId = event.get('alarmId', None)
+
+    try:
+        if alarmId:
+            alarm = alarms.getAlarm(emailFromToken, alarmId)
+            if alarm is None:
+                logger.error("Alarm not found.")
+                raise Exception(json.dumps({
+                    'statusCode' : 400,
+                    'message' : "Alarm Not Found"
+                }))
+            items = [alarm]
+        else:
+            items = alarms.listAlarms(emailFromToken)
+        for item in items:
+            item.pop('email', None)
+        logger.debug("Operation successful. Returning information.")
+        return {
+            'statusCode': 200,
+            'body': {'alarms': items}
+        }
+    except db.ClientError as e:
+        logger.error(e.response['Error']['Message'])
+        raise Exception(json.dumps({
+            'statusCode' : 500,
+            'message' : "Internal Server Error"
+        }))
@@ -1,46 +1,49 @@
-import json, os, logging, asyncio, time
-import boto3
-from boto3.dynamodb.conditions import Key
-from botocore.exceptions import ClientError
+import json, os
+from common import db, cache, etag, metrics, log
 
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
+logger = log.getLogger(__name__)
 
+@log.handler
+@metrics.handler
 def lambda_handler(event, context):
     emailFromToken = event.get('email', None)
     #emailFromToken = event.get('emailFake', None)
     
-    db = boto3.resource('dynamodb')
-    table = db.Table(os.environ['TABLE_NAME'])
+    table = db.getTable('TABLE_NAME')
     
     # try 1: Read DB
     try:
-        res = table.get_item(Key={
+        res = cache.getItem(table, {
             'email' : emailFromToken,
         })
+        logger.debug("Item cache: %s", cache.stats())
         
         # Return: User not found
         if 'Item' not in res.keys():
-            logger.info("User (" + emailFromToken + ") has not been found" )
+            logger.info("User has not been found.")
             return {
                 'statusCode' : 200,
                 'body' : dict()
             }
         
-        logger.info("Operation successful. Returning information.")
+        # Return: 304 when the client copy is current, before building the body
+        headers = etag.check(event, etag.forItem('device', emailFromToken, res['Item']))
+        
+        logger.debug("Operation successful. Returning information.")
         
         returnDict = dict()
         for item in res['Item'].keys():
-            if item != "email":
+            if item != "email" and item != cache.VERSION:
                 returnDict[item] = res['Item'][item]
         
         return {
             'statusCode' : 200,
             'body' : returnDict,
+            'headers' : headers,
         }
         
     # try 1: Read DB
-    except ClientError as e:
+    except db.ClientError as e:
         logger.error(e.response['Error']['Message'])
         raise Exception(json.dumps({
             'statusCode' : 500,
@@ -1,10 +1,14 @@
-import json, os, logging, asyncio, time
-import boto3
-from boto3.dynamodb.conditions import Key
-from botocore.exceptions import ClientError
+import json, os
+from common import etag, log
 
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
+logger = log.getLogger(__name__)
+
+# static: built and tagged once per container
+LANGUAGE_CAPS = [0, 1, 2]
+BODY = {
+    "langCap": LANGUAGE_CAPS,
+}
+TAG = etag.forBody(BODY)
 
 '''
 lambda_handler function
@@ -17,13 +21,14 @@ lambda_handler function
         0: EN
         1: KR
         2: JP
+    - headers: ETag, long-lived Cache-Control (304 on If-None-Match)
 '''
+@log.handler
 def lambda_handler(event, context):
-    languageCaps = [0, 1, 2]
+    headers = etag.check(event, TAG, etag.STATIC)
     
     return {
         'statusCode': 200,
-        'body': {
-            "langCap": languageCaps,
-        }
+        'body': BODY,
+        'headers': headers
     }
@@ -1,9 +1,7 @@
-import json, os, logging
-import boto3
-from botocore.exceptions import ClientError
+import json, os
+from common import db, etag, metrics, log
 
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
+logger = log.getLogger(__name__)
 
 '''
 lambda_handler function
@@ -16,12 +14,13 @@ lambda_handler function
 
 Description: GET operation for /user/numberOfProfiles api
 '''
+@log.handler
+@metrics.handler
 def lambda_handler(event, context):
     # emailFromToken = event.get('email', None)
     emailFromToken = event.get('emailFake', None)
     
-    db = boto3.resource('dynamodb')
-    table = db.Table(os.environ['TABLE_NAME'])
+    table = db.getTable('TABLE_NAME')
     
     # try 1: Read DB
     try:
@@ -31,22 +30,26 @@ def lambda_handler(event, context):
         
         # Return: User not found
         if 'Item' not in res.keys():
-            logger.error("User (" + emailFromToken + ")not found.")
+            logger.error("User not found.")
             return {
                 'statusCode' : 200,
                 'message' : "User Not Found"
             }
         
+        # Return: 304 when the client copy is current
+        headers = etag.check(event, etag.forItem('numberOfProfiles', emailFromToken, res['Item']))
+        
         # Return: No profile exists
         if 'profiles' not in res['Item'].keys():
-            logger.error("Found user (" + emailFromToken + "), but no profile exists.")
+            logger.error("Found user, but no profile exists.")
             return {
                 'statusCode' : 200,
                 'message' : None,
                 'body' : {
                     "countOfProfiles" : 0,
                     "profileId" : [],
-                }
+                },
+                'headers' : headers
             }
         
         # Collect profile['id'] for return
@@ -55,17 +58,18 @@ def lambda_handler(event, context):
             profileIds.append(item['id'])
         
         # Return: Operation Success
-        logger.info("Operation success.")
+        logger.debug("Operation success.")
         return {
             'statusCode' : 200,
             'message' : None,
             'body' : {
                 "countOfProfiles": len(res['Item']['profiles']),
                 "profileId": profileIds,
-            }
+            },
+            'headers' : headers
         }
     # try 1: Read DB
-    except ClientError as e:
+    except db.ClientError as e:
         logger.error(e.response['Error']['Message'])
         raise Exception({
             'statusCode' : 500,
@@ -1,17 +1,23 @@
-import os, logging
+import os
+from common import etag, log
 
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
+logger = log.getLogger(__name__)
 
+#taskType = ["sunshine", "caffeine", "olly", "eating", "exercise"]
+taskType = [0, 1, 2, 3, 4]
+
+# static: built and tagged once per container
+RESULT = {"countOfTasks": len(taskType), "taskType" : taskType}
+TAG = etag.forBody(RESULT)
+
+@log.handler
 def lambda_handler(event, context):
     emailFromToken = event.get('email', None)
     
-    #taskType = ["sunshine", "caffeine", "olly", "eating", "exercise"]
-    taskType = [0, 1, 2, 3, 4]
-    
-    result = {"countOfTasks": len(taskType), "taskType" : taskType}
+    headers = etag.check(event, TAG, etag.STATIC)
     
     return {
         "statusCode": 200,
-        "body": result
-    }
\ No newline at end of file
+        "body": RESULT,
+        "headers": headers
+    }
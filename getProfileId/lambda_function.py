@@ -1,9 +1,7 @@
-import json, os, logging
-import boto3
-from botocore.exceptions import ClientError
+import json, os
+from common import db, cache, etag, metrics, log
 
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
+logger = log.getLogger(__name__)
 
 '''
 lambda_handler function
@@ -16,21 +14,23 @@ lambda_handler function
 
 Description: GET operation for /user/profile api
 '''
+@log.handler
+@metrics.handler
 def lambda_handler(event, context):
     emailFromToken = event.get('email', None)
     
-    db = boto3.resource('dynamodb')
-    table = db.Table(os.environ['TABLE_NAME'])
+    table = db.getTable('TABLE_NAME')
     
     # try 1: Read DB
     try:
-        res = table.get_item(Key={
+        res = cache.getItem(table, {
             'email' : emailFromToken,
         })
+        logger.debug("Item cache: %s", cache.stats())
         
         # Return: User not found
         if 'Item' not in res.keys():
-            logger.error("User (" + emailFromToken + ")not found.")
+            logger.error("User not found.")
             raise Exception(json.dumps({
                 'statusCode' : 400,
                 'message': "User Not Found"
@@ -38,23 +38,27 @@ def lambda_handler(event, context):
         
         # Return: No profile exists
         if 'profile' not in res['Item'].keys():
-            logger.error("Found user (" + emailFromToken + "), but no profile exists.")
+            logger.error("Found user, but no profile exists.")
             raise Exception(json.dumps({
                 'statusCode' : 400,
                 'message': "Bad Request"
             }))
         
+        # Return: 304 when the client copy is current
+        headers = etag.check(event, etag.forItem('profile', emailFromToken, res['Item']))
+        
         profile = res['Item']['profile']
         
         # Return: Operation Success
-        logger.info("Operation success.")
+        logger.debug("Operation success.")
         return {
             'statusCode' : 200,
-            'body' : profile
+            'body' : profile,
+            'headers' : headers
         }
         
     # try 1: Read DB
-    except ClientError as e:
+    except db.ClientError as e:
         logger.error(e.response['Error']['Message'])
         raise Exception(json.dumps({
             'statusCode' : 500,
@@ -1,46 +1,92 @@
-import os, time, datetime, logging, json
-import boto3
-from boto3.dynamodb.conditions import Key
-from botocore.exceptions import ClientError
+import os, time, datetime, json
+from common import db, cursor, sleepStats, metrics, log
 
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
+logger = log.getLogger(__name__)
 
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 500
+
+'''
+lambda_handler function
+
+@input parameter:
+    - emailFromToken: PK of database
+    - since: unixtime, diaries from that day on are returned
+    - limit: maximum number of diaries to return (optional, default 100)
+    - nextToken: token returned by the previous page (optional)
+    - stats: true for the trends of the range instead of the diaries
+             (optional, see sleepStats module; at most sleepStats.MAX_DAYS
+             days back)
+@return:
+    - dict: status code, body (list of diaries), nextToken (None on last page)
+            with stats: status code, body (since, until, diaries, dates,
+            trend, latest, weekOverWeek, disturbance)
+'''
+@log.handler
+@metrics.handler
 def lambda_handler(event, context):
     emailFromToken = event.get("email", None)
     since = event.get("since", None)
     parameterCheck(since)
+    if event.get("stats", None) in (True, "true"):
+        return statsHandler(emailFromToken, since)
     sinceFormat = convertDate(since)
+    limit = cursor.parseLimit(event.get("limit", None), DEFAULT_LIMIT, MAX_LIMIT)
+    startKey = cursor.decodeKey(event.get("nextToken", None), "email", emailFromToken)
     
-    dynamodb = boto3.resource("dynamodb")
-    table = dynamodb.Table(os.environ["TABLE_NAME"])
+    table = db.getTable("TABLE_NAME")
     
     try:
-        keyCondition = Key("email").eq(emailFromToken) & Key("diaryDate").gte(sinceFormat)
-        res = table.query(
+        keyCondition = db.Key("email").eq(emailFromToken) & db.Key("diaryDate").gte(sinceFormat)
+        resultArray, lastKey = cursor.queryPage(table, limit, startKey,
                 ProjectionExpression="diaryDate, sleepScore, textMessage, timeToSleep, differenceTime, disturbance",
                 KeyConditionExpression=keyCondition
             )
-            
-        jsonArray = res["Items"]
-        resultArray = []
-        for sleepDiary in jsonArray:
-            resultArray.append(sleepDiary)
         
-        logger.info("Operation successful. Returning information.")
+        logger.debug("Operation successful. Returning information.")
         return {
             "statusCode": 200,
-            "body": resultArray
+            "body": resultArray,
+            "nextToken": cursor.encodeKey(lastKey)
         }
-    except ClientError as e:
+    except db.ClientError as e:
         logger.error(e.response['Error']['Message'])
         raise Exception(json.dumps({
             'statusCode' : 400,
             'message' : "Bad Request"
         }))
         
+'''
+statsHandler function
+
+@input parameter:
+    - emailFromToken: PK of database
+    - since: unixtime, first day of the trends
+@return:
+    - dict: status code, body (see sleepStats.sleepSummary)
+
+Description: one key-range query projecting the numbers only, summarized
+             on columns, so the body is a few hundred bytes whatever the
+             number of diaries
+'''
+def statsHandler(emailFromToken, since):
+    try:
+        summary = sleepStats.sleepSummary(emailFromToken, since)
+        logger.debug("Operation successful. Returning sleep trends.")
+        return {
+            "statusCode": 200,
+            "body": summary
+        }
+    except db.ClientError as e:
+        logger.error(e.response['Error']['Message'])
+        raise Exception(json.dumps({
+            'statusCode' : 500,
+            'message' : "Internal Server Error"
+        }))
+
 def parameterCheck(since):
-    if since > time.time():
+    # since is a unixtime: missing, not a number or in the future is a 400
+    if type(since) == type(True) or not isinstance(since, (int, float)) or since > time.time():
         raise Exception(json.dumps({
             'statusCode' : 400,
             'message' : "Bad Request"
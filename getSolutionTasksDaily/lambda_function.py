@@ -1,8 +1,62 @@
 import json
+from common import db, plans, metrics, log
 
+logger = log.getLogger(__name__)
+
+'''
+lambda_handler function
+
+@input parameter:
+    - emailFromToken: PK of database
+    - date: day of the plan, yyyymmdd (optional, default today)
+            only yesterday, today and tomorrow are served
+@return:
+    - dict: status code, body (daily plan, see plans.buildPlan)
+
+Description: GET operation for /solution/tasks/daily api
+    - one get_item on PLAN_TABLE while the materialized plan is current
+    - rebuilt from the user item and the recent task records after
+      putUser / postTask / putTask invalidated it
+'''
+@log.handler
+@metrics.handler
 def lambda_handler(event, context):
-    # TODO implement
-    return {
-        'statusCode': 200,
-        'body': json.dumps('Hello from Lambda!')
-    }
+    emailFromToken = event.get('email', None)
+    planDate = parameterCheck(event.get('date', None))
+
+    try:
+        plan = plans.getPlan(emailFromToken, planDate)
+        logger.debug("Operation successful. Returning information.")
+        return {
+            'statusCode': 200,
+            'body': plan
+        }
+    except db.ClientError as e:
+        logger.error(e.response['Error']['Message'])
+        raise Exception(json.dumps({
+            'statusCode' : 500,
+            'message' : "Internal Server Error"
+        }))
+
+'''
+parameterCheck function
+
+@input parameter:
+    - date: yyyymmdd string or int, or None
+@return:
+    - int: planDate, one of plans.window()
+'''
+def parameterCheck(date):
+    served = plans.window()
+    if date is None or date == "":
+        return served[len(served) // 2]
+    try:
+        planDate = int(date)
+    except (TypeError, ValueError):
+        planDate = None
+    if planDate not in served:
+        raise Exception(json.dumps({
+            'statusCode' : 400,
+            'message' : "Bad Request"
+        }))
+    return planDate
@@ -1,8 +1,60 @@
-import json
+import json, time
+from common import db, plans, scores, metrics, log
 
+logger = log.getLogger(__name__)
+
+'''
+lambda_handler function
+
+@input parameter:
+    - emailFromToken: PK of database
+    - date: day of the score, yyyymmdd (optional, default today)
+@return:
+    - dict: status code, body (daily score, see scores.summarize)
+
+Description: GET operation for /solution/tasks/daily/score api
+    - one get_item on SCORE_TABLE: the aggregates are kept up to date by
+      postTask / putTask / deleteTask
+'''
+@log.handler
+@metrics.handler
 def lambda_handler(event, context):
-    # TODO implement
-    return {
-        'statusCode': 200,
-        'body': json.dumps('Hello from Lambda!')
-    }
+    emailFromToken = event.get('email', None)
+    scoreDate = parameterCheck(event.get('date', None))
+
+    try:
+        score = scores.getScore(emailFromToken, scoreDate)
+        logger.debug("Operation successful. Returning information.")
+        return {
+            'statusCode': 200,
+            'body': score
+        }
+    except db.ClientError as e:
+        logger.error(e.response['Error']['Message'])
+        raise Exception(json.dumps({
+            'statusCode' : 500,
+            'message' : "Internal Server Error"
+        }))
+
+'''
+parameterCheck function
+
+@input parameter:
+    - date: yyyymmdd string or int, or None
+@return:
+    - int: scoreDate
+'''
+def parameterCheck(date):
+    if date is None or date == "":
+        return plans.dateOf(time.time())
+    try:
+        scoreDate = int(date)
+        if len(str(scoreDate)) != 8:
+            raise ValueError(date)
+        time.strptime(str(scoreDate), '%Y%m%d')
+    except (TypeError, ValueError):
+        raise Exception(json.dumps({
+            'statusCode' : 400,
+            'message' : "Bad Request"
+        }))
+    return scoreDate
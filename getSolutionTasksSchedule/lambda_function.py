@@ -1,8 +1,98 @@
-import json
+import json, time, datetime, itertools
+from common import db, cache, etag, plans, schedule, metrics, log
 
+logger = log.getLogger(__name__)
+
+DEFAULT_DAYS = 7
+MAX_DAYS = 12 * 7
+PAGE_DAYS = 28
+
+'''
+lambda_handler function
+
+@input parameter:
+    - emailFromToken: PK of database
+    - since: first day, yyyymmdd (optional, default today)
+    - until: last day, yyyymmdd (optional, default since + 6 days)
+             at most MAX_DAYS days
+@return:
+    - dict: status code, body (profileHash, days [{date, activeDay, tasks}],
+            nextDate), headers
+            one call returns at most PAGE_DAYS days: nextDate is the since
+            of the next call, or None when the range is complete
+
+Description: GET operation for /solution/tasks/schedule api
+    - the week of slots is cached per profile (schedule.profileHash), the
+      days of the page are generated from it lazily
+'''
+@log.handler
+@metrics.handler
 def lambda_handler(event, context):
-    # TODO implement
+    emailFromToken = event.get('email', None)
+    since, until = parameterCheck(event.get('since', None), event.get('until', None))
+
+    table = db.getTable('TABLE_NAME')
+    try:
+        res = cache.getItem(table, {
+            'email' : emailFromToken,
+        })
+    except db.ClientError as e:
+        logger.error(e.response['Error']['Message'])
+        raise Exception(json.dumps({
+            'statusCode' : 500,
+            'message' : "Internal Server Error"
+        }))
+
+    if 'Item' not in res.keys():
+        logger.error("User not found.")
+        raise Exception(json.dumps({
+            'statusCode' : 400,
+            'message': "User Not Found"
+        }))
+
+    profile = res['Item'].get('profile', None)
+    profileHash = schedule.profileHash(profile)
+    # the body only depends on the profile and the range
+    headers = etag.check(event, '"%s-%d-%d"' % (profileHash, since, until))
+
+    days = list(itertools.islice(schedule.iterSchedule(profile, since, until), PAGE_DAYS + 1))
+    nextDate = days.pop()['date'] if len(days) > PAGE_DAYS else None
+    logger.debug("Schedule cache: %s", schedule.stats())
     return {
         'statusCode': 200,
-        'body': json.dumps('Hello from Lambda!')
+        'body': {
+            'profileHash': profileHash,
+            'days': days,
+            'nextDate': nextDate
+        },
+        'headers': headers
     }
+
+'''
+parameterCheck function
+
+@input parameter:
+    - since, until: yyyymmdd strings or ints, or None
+@return:
+    - (since, until): int yyyymmdd, since <= until, at most MAX_DAYS days
+'''
+def parameterCheck(since, until):
+    try:
+        first = parseDate(since) or datetime.date.fromtimestamp(time.time())
+        last = parseDate(until) or first + datetime.timedelta(days=DEFAULT_DAYS - 1)
+    except (TypeError, ValueError):
+        first = last = None
+    if first is None or not 0 <= (last - first).days < MAX_DAYS:
+        raise Exception(json.dumps({
+            'statusCode' : 400,
+            'message' : "Bad Request"
+        }))
+    return int(first.strftime('%Y%m%d')), int(last.strftime('%Y%m%d'))
+
+def parseDate(value):
+    if value is None or value == "":
+        return None
+    value = str(int(value))
+    if len(value) != 8:
+        raise ValueError(value)
+    return datetime.datetime.strptime(value, '%Y%m%d').date()
@@ -1,8 +1,62 @@
 import json
+from common import db, columns, metrics, log
 
+logger = log.getLogger(__name__)
+
+DEFAULT_WEEKS = 4
+
+'''
+lambda_handler function
+
+@input parameter:
+    - emailFromToken: PK of database
+    - weeks: number of 7-day periods to summarize, the last one ending
+             today (optional, default 4, at most columns.MAX_WEEKS)
+@return:
+    - dict: status code, body (see columns.weeklySummary)
+
+Description: GET operation for /solution/tasks/weekly api
+    - the records of the period are read with one paginated key-range
+      query and rolled up on columns (see columns module)
+'''
+@log.handler
+@metrics.handler
 def lambda_handler(event, context):
-    # TODO implement
-    return {
-        'statusCode': 200,
-        'body': json.dumps('Hello from Lambda!')
-    }
+    emailFromToken = event.get('email', None)
+    weeks = parameterCheck(event.get('weeks', None))
+
+    try:
+        summary = columns.weeklySummary(emailFromToken, weeks)
+        logger.debug("Operation successful. Returning information.")
+        return {
+            'statusCode': 200,
+            'body': summary
+        }
+    except db.ClientError as e:
+        logger.error(e.response['Error']['Message'])
+        raise Exception(json.dumps({
+            'statusCode' : 500,
+            'message' : "Internal Server Error"
+        }))
+
+'''
+parameterCheck function
+
+@input parameter:
+    - weeks: string or int, or None
+@return:
+    - int: weeks, 1 to columns.MAX_WEEKS
+'''
+def parameterCheck(weeks):
+    if weeks is None or weeks == "":
+        return DEFAULT_WEEKS
+    try:
+        weeks = int(weeks)
+    except (TypeError, ValueError):
+        weeks = 0
+    if not 1 <= weeks <= columns.MAX_WEEKS:
+        raise Exception(json.dumps({
+            'statusCode' : 400,
+            'message' : "Bad Request"
+        }))
+    return weeks
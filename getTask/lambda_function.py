@@ -1,12 +1,28 @@
-import os, logging, json
-import boto3
-import datetime
-from boto3.dynamodb.conditions import Key, Attr
-from botocore.exceptions import ClientError
+import os, json
+from decimal import Decimal
+from common import db, cursor, tasks, metrics, log
 
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
+logger = log.getLogger(__name__)
 taskTypeList = [0, 1, 2, 3, 4]
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 500
+
+PROJECTION = "taskType, taskId, startTime, elapsedTime"
+
+'''
+lambda_handler function
+
+@input parameter:
+    - emailFromToken: PK of database
+    - all / taskId / taskType / since: filters (see parameterCheck)
+    - limit: maximum number of tasks to return (optional, default 100)
+    - nextToken: token returned by the previous page (optional)
+@return:
+    - dict: status code, body (list of tasks), nextToken (None on last page)
+'''
+@log.handler
+@metrics.handler
 def lambda_handler(event, context):
     emailFromToken = event.get("email", None)
     all = event.get("all", None)
@@ -15,44 +31,97 @@ def lambda_handler(event, context):
     since = event.get("since", None)
     
     parameterCheck(all, taskId, taskType, since)
+    limit = cursor.parseLimit(event.get("limit", None), DEFAULT_LIMIT, MAX_LIMIT)
+    params = planQuery(emailFromToken, all, taskId, taskType, since)
+    # a token only pages the query it was made for
+    scope = queryScope(params, all, taskId, taskType, since)
+    startKey = cursor.decodeKey(event.get("nextToken", None), "email", emailFromToken, scope)
     
-    dynamodb = boto3.resource("dynamodb")
-    table = dynamodb.Table(os.environ["TABLE_NAME"])
+    table = db.getTable("TABLE_NAME")
     
     try:
-        keyCondition = Key("email").eq(emailFromToken)
-        expression = None
-        if not all:
-            if taskId != "":
-                keyCondition &= Key("taskId").eq(taskId)
-            if taskType != None or since is not None:
-                expression = createExpression(taskType, since)
-
-        if expression is None:
-            response = table.query(
-                ProjectionExpression = "taskType, taskId, startTime, elapsedTime",
-                KeyConditionExpression = keyCondition
-            )
-        else:
-            response = table.query(
-                ProjectionExpression = "taskType, taskId, startTime, elapsedTime",
-                KeyConditionExpression = keyCondition,
-                FilterExpression = expression["expression"][:-5],
-                ExpressionAttributeValues = expression["values"]
-            )
+        items, lastKey = cursor.queryPage(table, limit, startKey, **params)
             
-        logger.info("Operation successful. Returning information.")
+        logger.debug("Operation successful. Returning information.")
         return {
             "statusCode": 200,
-            "body": response["Items"]
+            "body": items,
+            "nextToken": cursor.encodeKey(lastKey, scope)
         }
-    except ClientError as e:
-        logger.error(e.response)
+    except db.ClientError as e:
+        logger.error("%s", e.response)
         raise Exception(json.dumps({
             'statusCode' : 500,
             'message' : "Internal Server Error"
         }))
         
+'''
+planQuery function
+
+@input parameter:
+    - emailFromToken: PK of database
+    - all, taskId, taskType, since: request filters
+@return:
+    - dict: Table.query arguments
+
+Description: picks the narrowest key condition for the filter combination
+    - all                : whole partition
+    - taskId             : one item (taskType / since checked as a filter)
+    - taskType (+ since) : TYPE_START_INDEX range on "<taskType>#<startTime>"
+                           (+ startTime filter when since is fractional)
+    - since              : START_TIME_INDEX range on startTime
+    Whatever the key condition does not cover stays a FilterExpression.
+    Without the index environment variables (before the backfill in
+    tools/migrateTaskIndex.py has run) every filter is a FilterExpression.
+'''
+def planQuery(emailFromToken, all, taskId, taskType, since):
+    params = {"ProjectionExpression": PROJECTION}
+    keyCondition = db.Key("email").eq(emailFromToken)
+    if all:
+        params["KeyConditionExpression"] = keyCondition
+        return params
+
+    typeStartIndex = os.environ.get("TYPE_START_INDEX", None)
+    startTimeIndex = os.environ.get("START_TIME_INDEX", None)
+    filterType, filterSince = taskType, since
+
+    if taskId:
+        keyCondition &= db.Key("taskId").eq(taskId)
+    elif taskType is not None and typeStartIndex:
+        low, high = tasks.typeStartRange(taskType, since)
+        keyCondition &= db.Key("typeStart").between(low, high)
+        params["IndexName"] = typeStartIndex
+        # the range starts at the whole second: a fractional since stays a filter
+        filterType = None
+        filterSince = None if tasks.sinceIsExact(since) else since
+    elif since is not None and startTimeIndex:
+        keyCondition &= db.Key("startTime").gte(Decimal(str(since)))
+        params["IndexName"] = startTimeIndex
+        filterSince = None
+
+    params["KeyConditionExpression"] = keyCondition
+    if filterType is not None or filterSince is not None:
+        expression = createExpression(filterType, filterSince)
+        params["FilterExpression"] = expression["expression"][:-5]
+        params["ExpressionAttributeValues"] = expression["values"]
+    return params
+
+'''
+queryScope function
+
+@input parameter:
+    - params: Table.query arguments made by planQuery
+    - all, taskId, taskType, since: request filters
+@return:
+    - string: scope of the nextToken (index and filters of the query)
+
+Description: the start key of a page has the key attributes of the index
+             the query ran on, and must lie in its key condition range.
+'''
+def queryScope(params, all, taskId, taskType, since):
+    return json.dumps([params.get("IndexName", None), bool(all), taskId, taskType, since],
+                      separators=(",", ":"), default=str)
+
 def createExpression(taskType, since):
     expression = {
         "expression" : "",
@@ -63,7 +132,8 @@ def createExpression(taskType, since):
         expression["values"][":taskType"] = taskType
     if since is not None:
         expression["expression"] += "startTime>=:since and "
-        expression["values"][":since"] = since
+        # boto3 refuses floats: a fractional since goes as a Decimal
+        expression["values"][":since"] = Decimal(str(since))
     return expression
     
 def parameterCheck(all, taskId, taskType, since):
@@ -73,6 +143,11 @@ def parameterCheck(all, taskId, taskType, since):
             "statusCode": 400,
             "message": "Bad Request"
         }
+    if since is not None and (type(since) == type(True) or not isinstance(since, (int, float, Decimal))):
+        errorMsg = {
+            "statusCode": 400,
+            "message": "Bad Request"
+        }
     if type(all) != type(True):
         errorMsg = {
             "statusCode": 400,
@@ -0,0 +1,59 @@
+import io, json, datetime
+from common import diaryImport, metrics, log
+
+logger = log.getLogger(__name__)
+
+# stop starting new chunks when less than this is left of the lambda timeout
+RESERVE_MS = 3000
+
+'''
+lambda_handler function
+
+@input parameter:
+    - emailFromToken: PK of database
+    - body: newline-delimited JSON, one postSleepDiary body per line, by
+            increasing diaryDate (raw request body, application/x-ndjson)
+    - checkpoint: 'yyyyMMdd' returned by a previous call (optional): lines
+                  up to this date are skipped
+@return:
+    - dict: status code, body (see diaryImport.importDiaries)
+            complete is False when the import stopped early (timeout, write
+            failure): send the same lines again with the checkpoint
+
+Description: a history larger than the request limit of API Gateway is sent
+             in several requests, each one in date order after the last.
+'''
+@log.handler
+@metrics.handler
+def lambda_handler(event, context):
+    emailFromToken = event.get('email', None)
+    body = event.get("body", None)
+    checkpoint = parameterCheck(body, event.get("checkpoint", None))
+
+    hasTime = None
+    if context is not None:
+        hasTime = lambda: context.get_remaining_time_in_millis() > RESERVE_MS
+    result = diaryImport.importDiaries(emailFromToken, io.StringIO(body), checkpoint=checkpoint, hasTime=hasTime)
+    logger.info("Import sleepDiary: %d imported, %d rejected, %d failed, checkpoint %s, %d/s.",
+                result["imported"], result["rejected"], result["failed"], result["checkpoint"], result["perSecond"])
+    return {
+        "statusCode": 200,
+        "body": result
+    }
+
+def parameterCheck(body, checkpoint):
+    if not isinstance(body, str) or not body.strip():
+        raise Exception(json.dumps({
+            'statusCode' : 400,
+            'message' : "Invalid Input: body must be newline-delimited JSON diaries"
+        }))
+    if checkpoint is None:
+        return None
+    try:
+        datetime.datetime.strptime(checkpoint, '%Y%m%d')
+    except (ValueError, TypeError):
+        raise Exception(json.dumps({
+            'statusCode' : 400,
+            'message' : "Invalid value error: 'checkpoint'(query) must be 'yyyyMMdd' date format, input 'checkpoint': %s" % checkpoint
+        }))
+    return int(checkpoint)
@@ -1,61 +1,178 @@
-import os, logging, json
-import datetime, time
-import boto3
-from boto3.dynamodb.conditions import Key, Attr
-from botocore.exceptions import ClientError
+import os, json
+import time, uuid
+from common import db, schema, bulk, tasks, plans, scores, metrics, log
 
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
+logger = log.getLogger(__name__)
 
-taskType = [0, 1, 2, 3, 4]
+ITEMS = ["taskType", "startTime", "elapsedTime"]
+MAX_ATTEMPTS = 3
 
+@log.handler
+@metrics.handler
 def lambda_handler(event, context):
     emailFromToken = event.get("email", None)
     body = event.get("body-json", None)
-    items = ["taskType", "startTime", "elapsedTime"]
-    if body is not None:
-        checkNonExistCapability(body, items)
-        
-
-    params = parseBodyparams(items, body)
-    
-    dynamodb = boto3.resource("dynamodb")
-    table = dynamodb.Table(os.environ["TABLE_NAME"])
-    
-    # taskId format: userName-startDate-currentServerTime
-    taskId = createTaskId(emailFromToken, params["startTime"])
-    
-    inputItem = {
-        "email" : emailFromToken,
-        "taskId" : taskId
-    }
-    inputItem.update(params)
-    
+    if isinstance(body, dict) and "tasks" in body:
+        return batchHandler(emailFromToken, body)
+    # the same checks as every task of a batch
+    message = validateTask(body)
+    if message is not None:
+        raise Exception(json.dumps({
+            'statusCode' : 400,
+            'message' : message
+        }))
+
+    params = parseBodyparams(ITEMS, body)
+
+    table = db.getTable("TABLE_NAME")
+
+    # taskId format: userName-startDate-currentServerTime[_suffix]
+    serverTime = int(time.time())
+    suffix = None
+    attempts = 0
+
     try:
-        table.put_item(
-            Item = inputItem
-        )
-        logger.info("Post task successful.")
+        while True:
+            taskId = tasks.createTaskId(emailFromToken, params["startTime"], serverTime, suffix)
+            inputItem = tasks.taskItem(emailFromToken, taskId, params)
+            try:
+                table.put_item(
+                    Item = inputItem,
+                    ConditionExpression = "attribute_not_exists(taskId)"
+                )
+                break
+            except db.ClientError as e:
+                if not db.isConditionFailed(e):
+                    raise
+                # a task of the same day was posted in the same second
+                attempts += 1
+                if attempts >= MAX_ATTEMPTS:
+                    raise Exception(json.dumps({
+                        'statusCode' : 409,
+                        'message' : "Conflict"
+                    }))
+                suffix = uuid.uuid4().hex[:8]
+        scores.record(emailFromToken, new=inputItem)
+        plans.invalidateTask(emailFromToken, plans.taskDate(taskId))
+        logger.debug("Post task successful.")
         return {
             "statusCode": 200
         }
-        
-    except ClientError as e:
+
+    except db.ClientError as e:
         logger.error(e.response["Error"]["Message"])
         raise Exception(json.dumps({
             'statusCode' : 500,
             'message' : "Internal Server Error"
         }))
-    
-def createTaskId(email, startTime):
-    userName = email.split("@")[0]
-    startDate = convertDatetime(startTime)
-    currentServerTime = int(time.time())
-    return "%s-%d-%d" % (userName, startDate, currentServerTime)
-    
-def convertDatetime(unixtime):
-    date = datetime.datetime.fromtimestamp(unixtime).strftime("%Y%m%d")
-    return int(date)
+
+'''
+batchHandler function
+
+@input parameter:
+    - email: PK of the user
+    - body: {"tasks": [task, ...]}, at most schema.MAX_TASK_BATCH tasks
+@return:
+    - dict: statusCode 200 and body {results, written, failed}
+            results has one entry per task, in order: {index, statusCode,
+            taskId} or {index, statusCode, message}
+
+Description: every task is validated before anything is written; the valid
+             ones are written with BatchWriteItem (25 per call, in parallel,
+             unprocessed items retried by bulk.tryBatchWrite). A task still
+             unprocessed after the retries gets a 503 and can be posted
+             again. The taskIds share the server time and a batch id, so
+             they never collide with each other nor with a single post.
+'''
+def batchHandler(email, body):
+    schema.check("taskBatch", body)
+    if not body["tasks"]:
+        raise Exception(json.dumps({
+            'statusCode' : 400,
+            'message' : "Invalid Input: tasks -> empty list"
+        }))
+
+    serverTime = int(time.time())
+    batchId = uuid.uuid4().hex[:8]
+    results = []
+    written = []
+    for index, task in enumerate(body["tasks"]):
+        message = validateTask(task)
+        if message is not None:
+            results.append({"index": index, "statusCode": 400, "message": message})
+            continue
+        taskId = tasks.createTaskId(email, task["startTime"], serverTime, "%s%02d" % (batchId, index))
+        written.append((index, tasks.taskItem(email, taskId, parseBodyparams(ITEMS, task))))
+        results.append({"index": index, "statusCode": 200, "taskId": taskId})
+
+    failed = writeTasks(written)
+    for index, statusCode in failed.items():
+        results[index] = {"index": index, "statusCode": statusCode,
+                          "message": "Service Unavailable" if statusCode == 503 else "Internal Server Error"}
+    stored = [item for index, item in written if index not in failed]
+    if stored:
+        scores.recordMany(email, stored)
+        plans.invalidateTask(email, min(plans.taskDate(item["taskId"]) for item in stored))
+    logger.debug("Post %d task(s), %d failed.", len(stored), len(results) - len(stored))
+    return {
+        "statusCode": 200,
+        "body": {
+            "results": results,
+            "written": len(stored),
+            "failed": len(results) - len(stored),
+        }
+    }
+
+'''
+validateTask function
+
+@input parameter:
+    - task: body of a single post, or one task of a batch
+@return:
+    - string: message of the first problem, None when the task is valid
+'''
+def validateTask(task):
+    try:
+        schema.validate("task", task)
+    except schema.ValidationError as e:
+        return e.message
+    if task.get("startTime", None) is None:
+        return "Invalid Input: startTime is required"
+    return None
+
+'''
+writeTasks function
+
+@input parameter:
+    - written: list of (index, task item)
+@return:
+    - dict: index -> statusCode of the tasks that were not written
+'''
+def writeTasks(written):
+    serializer = db.TypeSerializer()
+    tableName = os.environ["TABLE_NAME"]
+    chunks = [written[idx:idx + bulk.BATCH_SIZE] for idx in range(0, len(written), bulk.BATCH_SIZE)]
+    requests = [[{"PutRequest": {"Item": dict((name, serializer.serialize(value)) for name, value in item.items())}}
+                 for _, item in chunk] for chunk in chunks]
+    if len(chunks) == 1:
+        futures = None
+    else:
+        executor = bulk.getExecutor()
+        futures = [executor.submit(bulk.tryBatchWrite, tableName, chunk) for chunk in requests]
+    failed = dict()
+    for idx, chunk in enumerate(chunks):
+        try:
+            if futures is None:
+                pending = bulk.tryBatchWrite(tableName, requests[idx])
+            else:
+                pending = futures[idx].result()
+        except db.ClientError as e:
+            logger.error(e.response["Error"]["Message"])
+            failed.update((index, 500) for index, _ in chunk)
+            continue
+        pendingIds = set(request["PutRequest"]["Item"]["taskId"]["S"] for request in pending)
+        failed.update((index, 503) for index, item in chunk if item["taskId"] in pendingIds)
+    return failed
 
 def parseBodyparams(items, body):
     params = {}
@@ -63,48 +180,4 @@ def parseBodyparams(items, body):
         param = body.get(item, None)
         if param is not None:
             params[item] = param
-    parameterCheck(params)
     return params
-    
-def parameterCheck(bodyParams):
-    errorMsg = {}
-    if bodyParams.get("taskType") is not None:
-        if bodyParams["taskType"] >= len(taskType):
-            logger.info("error.")
-            errorMsg = {
-                "statusCode": 400,
-                "message": "Bad Request"
-            }
-    if bodyParams.get("elapsedTime") is not None:
-        if bodyParams["elapsedTime"] < 0:
-            errorMsg = {
-                "statusCode": 400,
-                "message": "Bad Request"
-            }
-    
-    if errorMsg != {}:
-        raise Exception(json.dumps({
-            "statusCode" : errorMsg['statusCode'],
-            "message" : errorMsg['message']
-        }))
-        
-def checkNonExistCapability(body, items):
-    visited = []
-    checkItems(body, visited, items)
-    
-    return True
-
-def checkItems(body, visited, taskItems):
-    for key in body.keys():
-        if key not in visited:
-            logger.info(key)
-            if key not in taskItems:
-                raise Exception(json.dumps({
-                    "statusCode": 400,
-                    "message": "Bad Request"
-                }))
-
-            visited.append(key)
-            checkItems(body, visited, taskItems)
-        
-    return True
\ No newline at end of file
@@ -1,10 +1,8 @@
-import json, os, logging
-import boto3
-from botocore.exceptions import ClientError
+import json, os
+from common import db, schema, outbox, cache, metrics, log
 from decimal import Decimal
 
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
+logger = log.getLogger(__name__)
 
 '''
 lambda_handler function
@@ -25,18 +23,14 @@ lambda_handler function
 
 Description: POST operation for /user api
 '''
+@log.handler
+@metrics.handler
 def lambda_handler(event, context):
     emailFromToken = event.get('email', None)
     body = event.get('body-json', None)
-    if body is not None:
-        checkReturn = checkCapability(body)
+    schema.check('user', body)
     
-    checkNonExistCapability(body, "user")
-    
-    db = boto3.resource('dynamodb')
-    table = db.Table(os.environ['TABLE_NAME'])
-    
-    checkPresent(table, emailFromToken)
+    table = db.getTable('TABLE_NAME')
     
     items = ["userName", "problems", "age", "gps", "sex", "profile"]
     
@@ -57,205 +51,61 @@ def lambda_handler(event, context):
             else:
                 postItem[item] = body[item]
     
-    table.put_item(
-        Item=postItem
-    )
+    putUser(table, postItem)
     
-    logger.info("Post user successful.")
-    logger.info("Sending notification to SNS")
-    
-    sns = boto3.resource('sns')
-    topic = sns.Topic(os.environ['SNS_ARN'])
-
-    list_topic = list_topics(sns)
-    logger.info(list_topic)
-    for item in list_topic:
-        print(item)
+    logger.debug("Post user successful. Sending notification to SNS")
     
     postItem['gps']['longitude'] = body['gps']['longitude']
     postItem['gps']['latitude'] = body['gps']['latitude']
     
-    messageId = publishMessage(topic, postItem, 'createUserTopic')
-    
-    logger.info(messageId)
+    # sent by the outbox worker; the response waits for it, at most
+    # SNS_FLUSH_TIMEOUT seconds (default 5), so the container is not frozen
+    # or reclaimed with the notification still queued
+    outbox.publish(os.environ['SNS_ARN'], postItem)
+    pending = outbox.flush(float(os.environ.get('SNS_FLUSH_TIMEOUT', 5)))
+    if pending:
+        logger.error("Notification not sent in time (%d pending).", pending)
+        raise Exception(json.dumps({
+            'statusCode' : 503,
+            'message' : "Notification Not Sent"
+        }))
+    logger.debug("Notification sent.")
 
     raise Exception(json.dumps({
         'statusCode' : 202,
         'message' : "Progressing"
     }))
-
-"""
-Lists topics for the current account.
-
-:return: An iterator that yields the topics.
-"""
-def list_topics(sns):
-    try:
-        topics_iter = sns.topics.all()
-        logger.info("Got topics.")
-    except ClientError:
-        logger.exception("Couldn't get topics.")
-        raise Exception(json.dumps({
-            'statusCode' : 400,
-            'message': "Bad Request"
-        }))
-    else:
-        return topics_iter
-
-"""
-publishMessage function
-
-@input parameter:
-    - topic: sns.topic object
-    - message: dict (required)
-    - subject: string (optional)
-@return:
-    - message id
-"""
-def publishMessage(topic, message, subject=""):
-    try:
-        response = topic.publish(
-            Message=json.dumps(message))#, Subject=subject)
-        logger.info(json.dumps(message))
-        messageId = response['MessageId']
-        logger.info("Published a message to topic %s.", topic.arn)
-    except ClientError:
-        logger.exception("Couldn't publish message to topic %s.", topic.arn)
-        raise Exception(json.dumps({
-            'statusCode' : 400,
-            'message': "Bad Request"
-        }))
-    else:
-        return messageId
         
 '''
-checkCapability function
+putUser function
 
 @input parameter:
-
+    - table: dynamodb Table object
+    - postItem: user item to create
 @return:
-'''
-def checkCapability(body):
-    items = ["userName", "age", "problems", "profile", "sex", "language"]
-    subItems = ["wakeUpTime", "sleepTime"]
-    
-    for item in items:
-        if item in body:
-            try:
-                if item == 'userName':
-                    assert type(body[item]) is str
-                    assert 1 <= len(body[item]) <= 255
-                elif item == 'age':
-                    assert type(body[item]) is int
-                    assert 0 <= body[item] <= 150
-                elif item == 'problems':
-                    checkPriority = False
-                    for problem in body[item]:
-                        assert type(problem['problem']) is int
-                        assert problem['problem'] in [0, 1, 2, 3, 4, 5, 6, 7]
-                        
-                        if problem['priority'] == 1:
-                            checkPriority = True
-                    assert checkPriority is True
-                elif item == 'profile':
-                    if 'wakeUpTime' in body[item]:
-                        assert type(body[item]['wakeUpTime']['hh']) is int
-                        assert 0 <= body[item]['wakeUpTime']['hh'] < 24
-                        assert type(body[item]['wakeUpTime']['mm']) is int
-                        assert 0 <= body[item]['wakeUpTime']['mm'] < 60
-                    if 'sleepTime' in body[item]:
-                        assert type(body[item]['sleepTime']['hh']) is int
-                        assert 0 <= body[item]['sleepTime']['hh'] < 24
-                        assert type(body[item]['sleepTime']['mm']) is int
-                        assert 0 <= body[item]['sleepTime']['mm'] < 60
-                elif item == 'sex':
-                    assert type(body[item]) is int
-                    assert body[item] in [0, 1, 2]
-                elif item == 'language':
-                    assert type(body[item]) is int
-                    assert body[item] in [0, 1, 2]
-                else:
-                    raise Exception(json.dumps({
-                        'statusCode' : 400,
-                        'message': "Bad Request"
-                    }))
-            except:
-                raise Exception(json.dumps({
-                    'statusCode': 400,
-                    'message': 'Invalid Input: ' + item + " -> " + str(body[item])
-                }))
-        else:
-            continue
-    
-    return True
-    
-def checkNonExistCapability(body, mode):
-    userItems = ["userName", "problems", "problem", "priority", "age", "gps", "latitude", "longitude", "sex", "profile", "wakeUpTime", "hh", "mm", "sleepTime", "effectiveDays"]
-    profileItems = ["wakeUpTime", "hh", "mm", "sleepTime", "effectiveDays"]
-    deviceItems = ["lang", "agreement", "termsAndCondition", "userInfoPrivacy", "userInfoCollectPrivacy", "gpsService", "marketingPolicy"]
+    - None
 
-    visited = []
-    
-    checkItemsDfs(body, visited, userItems, profileItems, deviceItems, mode)
-    
-    return True
-
-def checkItemsDfs(body, visited, userItems, profileItems, deviceItems, mode):
-    for key in body.keys():
-        if key not in visited:
-            logger.info(key)
-            if mode == "user":
-                if key not in userItems:
-                    raise Exception(json.dumps({
-                        'statusCode' : 400,
-                        'message': "Bad Request"
-                    }))
-            elif mode == "profile":
-                if key not in profileItems:
-                    raise Exception(json.dumps({
-                        'statusCode' : 400,
-                        'message': "Bad Request"
-                    }))
-            elif mode == "device":
-                if key not in deviceItems:
-                    raise Exception(json.dumps({
-                        'statusCode' : 400,
-                        'message': "Bad Request"
-                    }))
-                    
-            visited.append(key)
-            if type(body[key]) == dict:
-                checkItemsDfs(body[key], visited, userItems, profileItems, deviceItems, mode)
-            elif type(body[key]) == list:
-                for item in body[key]:
-                    if type(item) == dict:
-                        checkItemsDfs(item, visited, userItems, profileItems, deviceItems, mode)
-    return True
-    
-def checkPresent(table, emailFromToken):
-    # try 1: Read DB
+Description: creates the user only when the e-mail is not taken yet,
+             in a single conditional write.
+'''
+def putUser(table, postItem):
+    # try 1: Write DB
     try:
-        res = table.get_item(Key={
-            'email' : emailFromToken,
-        })
+        table.put_item(
+            Item=dict(postItem, **{cache.VERSION: cache.newVersion()}),
+            ConditionExpression=db.Attr('email').not_exists()
+        )
         
-        # Return: User not found
-        if 'Item' not in res.keys():
-            logger.info("User (" + emailFromToken + ") has not been found. Progress creating.")
-            return {
-                'statusCode': 202
-            }
-        else:
-            logger.info("User (" + emailFromToken + ") is already present. Use PUT method.")
+    # try 1: Write DB
+    except db.ClientError as e:
+        if db.isConditionFailed(e):
+            logger.info("User is already present. Use PUT method.")
             raise Exception(json.dumps({
                 'statusCode' : 400,
                 'message': 'User Already Exist'
             }))
-        
-    # try 1: Read DB
-    except ClientError as e:
         logger.error(e.response['Error']['Message'])
         raise Exception(json.dumps({
             'statusCode' : 500,
             'message' : "Internal Server Error",
-        }))
\ No newline at end of file
+        }))
@@ -1,8 +1,72 @@
 import json
+from common import db, schema, alarms, metrics, log
 
+logger = log.getLogger(__name__)
+
+'''
+lambda_handler function
+
+@input parameter:
+    - emailFromToken: PK of database
+    - alarmId: sort key of the alarm (created when it does not exist)
+    - body: alarm (schema 'alarm')
+        {
+            "taskType": 0,
+            "time": {"hh": 7, "mm": 30},
+            "days": [1, 2, 3, 4, 5],
+            "enabled": 1,
+            "utcOffset": 540
+        }
+        or, ringing at the wakeUpTime of the profile on its effectiveDays
+        (kept in sync when the profile changes):
+        {
+            "followProfile": 1,
+            "utcOffset": 540
+        }
+@return:
+    - dict: status code, body (stored alarm)
+
+Description: PUT operation for /alarm api
+    - the alarm item and its minute-of-week bucket entries are written in
+      one transaction (see alarms module)
+'''
+@log.handler
+@metrics.handler
 def lambda_handler(event, context):
-    # TODO implement
-    return {
-        'statusCode': 200,
-        'body': json.dumps('Hello from Lambda!')
-    }
+    emailFromToken = event.get('email', None)
+    alarmId = event.get('alarmId', None)
+    body = event.get('body-json', None)
+
+    if not isinstance(alarmId, str) or not 0 < len(alarmId) <= 64 or '#' in alarmId:
+        logger.error("Invalid alarmId.")
+        raise Exception(json.dumps({
+            'statusCode' : 400,
+            'message' : "Bad Request"
+        }))
+    schema.check("alarm", body)
+    # time and days come either from the body or from the profile
+    followProfile = body.get('followProfile', 0) == 1
+    given = [name for name in ('time', 'days') if name in body]
+    if given != ([] if followProfile else ['time', 'days']):
+        logger.error("Invalid alarm time.")
+        raise Exception(json.dumps({
+            'statusCode' : 400,
+            'message' : "Bad Request"
+        }))
+
+    try:
+        if followProfile:
+            body = dict(body, **alarms.profileFields(alarms.loadProfile(emailFromToken)))
+        alarm = alarms.putAlarm(emailFromToken, alarmId, body)
+        logger.debug("Put alarm successful.")
+        del alarm['email']
+        return {
+            'statusCode': 200,
+            'body': alarm
+        }
+    except db.ClientError as e:
+        logger.error(e.response['Error']['Message'])
+        raise Exception(json.dumps({
+            'statusCode' : 500,
+            'message' : "Internal Server Error"
+        }))
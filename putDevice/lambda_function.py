@@ -1,59 +1,58 @@
-import json, os, logging, asyncio, time
-import boto3
-from boto3.dynamodb.conditions import Key
-from botocore.exceptions import ClientError
+import json, os
+from common import db, schema, cache, metrics, log
 
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
+logger = log.getLogger(__name__)
 
 categories = ['lang', 'agreement']
 validItems = ["termsAndCondition", "userInfoPrivacy", "userInfoCollectPrivacy", "gpsService", "marketingPolicy"]
 
+@log.handler
+@metrics.handler
 def lambda_handler(event, context):
     emailFromToken = event.get('email', None)
     body = event.get('body-json', None)
     
-    if 'lang' in body:
-        if body['lang'] not in [0, 1, 2]:
-            raise Exception(json.dumps({
-                'statusCode': 400,
-                'message': "Bad Request"
-            }))
+    schema.check('device', body)
     
-    checkNonExistCapability(body, "device")
+    table = db.getTable('TABLE_NAME')
     
-    db = boto3.resource('dynamodb')
-    table = db.Table(os.environ['TABLE_NAME'])
-    
-    # try 1: Read DB
+    # try 1: Write DB
+    # update the existing row; create it when there is none yet
     try:
-        res = table.get_item(Key={
-            'email' : emailFromToken,
-        })
-        
-        # Return: User not found
-        if 'Item' not in res.keys():
-            logger.info("User (" + emailFromToken + ") has not been found. Creating new row." )
+        ret = updateSettings(table, emailFromToken, body)
+        if ret is None:
+            logger.info("User has not been found. Creating new row.")
             ret = createSettings(table, emailFromToken, body)
-        else:
-            logger.info("Found user. Updating info." )
+        if ret is None:
+            # created concurrently by another request in the meantime
             ret = updateSettings(table, emailFromToken, body)
         
-        logger.info("Operation successful. Returning information.")
+        logger.debug("Operation successful. Returning information.")
         
         return ret
         
-    # try 1: Read DB
-    except ClientError as e:
+    # try 1: Write DB
+    except db.ClientError as e:
         logger.error(e.response['Error']['Message'])
         raise Exception(json.dumps({
             'statusCode' : 500,
             'message' : "Internal Server Error"
         }))
 
+'''
+createSettings function
+
+@input parameter:
+    - table: dynamodb Table object
+    - emailFromToken: PK of database
+    - body: request body
+@return:
+    - dict: status code, or None when the row already exists
+'''
 def createSettings(table, emailFromToken, body):
     postItem = dict()
     postItem['email'] = emailFromToken
+    postItem[cache.VERSION] = cache.newVersion()
     postItem['lang'] = None
     postItem['agreement'] = dict()
     
@@ -82,16 +81,32 @@ def createSettings(table, emailFromToken, body):
                 except:
                     continue
                 
-    table.put_item(
-        Item=postItem
-        )
+    try:
+        table.put_item(
+            Item=postItem,
+            ConditionExpression=db.Attr('email').not_exists()
+            )
+    except db.ClientError as e:
+        if db.isConditionFailed(e):
+            return None
+        raise
     
-    logger.info("Post settings successful.")
+    logger.debug("Post settings successful.")
     
     return {
         'statusCode': 200,
     }
     
+'''
+updateSettings function
+
+@input parameter:
+    - table: dynamodb Table object
+    - emailFromToken: PK of database
+    - body: request body
+@return:
+    - dict: status code, or None when there is no row to update
+'''
 def updateSettings(table, emailFromToken, body):
     updateExpression = "set"
     updateVals = dict()
@@ -104,6 +119,9 @@ def updateSettings(table, emailFromToken, body):
             updateExpression += " " + str(item) + " = :" + str(item) + ","
             updateVals[":"+str(item)] = body[item]
     updateExpression = updateExpression[:-1]
+    # every write bumps the item version read by the item cache
+    updateExpression, updateNames, updateVals = cache.addVersion(updateExpression, None, updateVals)
+    cache.invalidate(table, {'email' : emailFromToken})
     
     # try 1: Update DB
     try:
@@ -111,6 +129,8 @@ def updateSettings(table, emailFromToken, body):
             'email' : emailFromToken,
         },
         UpdateExpression=updateExpression,
+        ConditionExpression=db.Attr('email').exists(),
+        ExpressionAttributeNames=updateNames,
         ExpressionAttributeValues=updateVals)
         
         return {
@@ -118,52 +138,11 @@ def updateSettings(table, emailFromToken, body):
         }
     
     # try 1: Update DB
-    except ClientError as e:
+    except db.ClientError as e:
+        if db.isConditionFailed(e):
+            return None
         logger.error(e.response['Error']['Message'])
         raise Exception(json.dumps({
             'statusCode' : 500,
             'message': "Internal Server Error"
         }))
-        
-def checkNonExistCapability(body, mode):
-    userItems = ["userName", "problems", "problem", "priority", "age", "gps", "latitude", "longitude", "sex", "profile", "wakeUpTime", "hh", "mm", "sleepTime", "effectiveDays"]
-    profileItems = ["wakeUpTime", "hh", "mm", "sleepTime", "effectiveDays"]
-    deviceItems = ["lang", "agreement", "termsAndCondition", "userInfoPrivacy", "userInfoCollectPrivacy", "gpsService", "marketingPolicy"]
-
-    visited = []
-    
-    checkItemsDfs(body, visited, userItems, profileItems, deviceItems, mode)
-    
-    return True
-
-def checkItemsDfs(body, visited, userItems, profileItems, deviceItems, mode):
-    for key in body.keys():
-        if key not in visited:
-            logger.info(key)
-            if mode == "user":
-                if key not in userItems:
-                    raise Exception(json.dumps({
-                        'statusCode': 400,
-                        'message': "Bad Request"
-                    }))
-            elif mode == "profile":
-                if key not in profileItems:
-                    raise Exception(json.dumps({
-                        'statusCode': 400,
-                        'message': "Bad Request"
-                    }))
-            elif mode == "device":
-                if key not in deviceItems:
-                    raise Exception(json.dumps({
-                        'statusCode': 400,
-                        'message': "Bad Request"
-                    }))
-                    
-            visited.append(key)
-            if type(body[key]) == dict:
-                checkItemsDfs(body[key], visited, userItems, profileItems, deviceItems, mode)
-            elif type(body[key]) == list:
-                for item in body[key]:
-                    if type(item) == dict:
-                        checkItemsDfs(item, visited, userItems, profileItems, deviceItems, mode)
-    return True
\ No newline at end of file
@@ -1,14 +1,11 @@
-import os, logging, json
+import os, json
 import datetime, time
-import boto3
-from boto3.dynamodb.conditions import Key
-from botocore.exceptions import ClientError
+from common import db, schema, tasks, plans, scores, metrics, log
 
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
-
-taskType = [0, 1, 2, 3, 4]
+logger = log.getLogger(__name__)
 
+@log.handler
+@metrics.handler
 def lambda_handler(event, context):
     emailFromToken = event.get('email', None)
     
@@ -16,41 +13,41 @@ def lambda_handler(event, context):
     body = event.get("body-json", None)
 
     items = ["taskType", "startTime", "elapsedTime"]
-    if body is not None:
-        checkNonExistCapability(body, items)
+    schema.check("task", body)
         
     expression = createExpression(body, items, taskId)
 
-    dynamodb = boto3.resource("dynamodb")
-    table = dynamodb.Table(os.environ["TABLE_NAME"])
+    table = db.getTable("TABLE_NAME")
         
     try:
-        keyCondition = Key("email").eq(emailFromToken) & Key("taskId").eq(taskId)
-        queryResponse = table.query(
-                KeyConditionExpression=keyCondition
-            )
-        if queryResponse['Count'] == 0:
-            logger.error("User (" + emailFromToken + ")'s task is not found.")
-            raise Exception(json.dumps({
-                'statusCode' : 400,
-                'message' : "Bad Request"
-            }))
-        
         updateResponse = table.update_item(
             Key={
                 "email": emailFromToken,
                 "taskId": taskId
             },
             UpdateExpression=expression["expression"][:-1],
+            ConditionExpression=db.Attr("taskId").exists(),
             ExpressionAttributeValues=expression["values"],
-            ReturnValues="UPDATED_NEW"
+            ReturnValues="ALL_OLD"
         )
-        logger.info("Operation successful. Return 200.")
+        oldTask = updateResponse["Attributes"]
+        newTask = dict(oldTask, **expression["params"])
+        if expression["partialTypeStart"]:
+            syncTypeStart(table, emailFromToken, taskId, newTask)
+        scores.record(emailFromToken, old=oldTask, new=newTask)
+        plans.invalidateTask(emailFromToken, plans.taskDate(taskId))
+        logger.debug("Operation successful. Return 200.")
         return {
             "statusCode": 200
         }
         
-    except ClientError as e:
+    except db.ClientError as e:
+        if db.isConditionFailed(e):
+            logger.error("User's task is not found.")
+            raise Exception(json.dumps({
+                'statusCode' : 400,
+                'message' : "Bad Request"
+            }))
         logger.error(e.response["Error"]["Message"])
         raise Exception(json.dumps({
                 "statusCode": 500,
@@ -67,8 +64,42 @@ def createExpression(body, items, taskId):
             expression["expression"] += "%s=:%s," % (item, item)
             expressionKey = ":"+item
             expression["values"][expressionKey] = param
+    # keep the TYPE_START_INDEX sort key in step with taskType / startTime
+    if "taskType" in bodyParams and "startTime" in bodyParams:
+        expression["expression"] += "typeStart=:typeStart,"
+        expression["values"][":typeStart"] = tasks.typeStartKey(bodyParams["taskType"], bodyParams["startTime"])
+    expression["partialTypeStart"] = ("taskType" in bodyParams) != ("startTime" in bodyParams)
+    expression["params"] = bodyParams
     parameterCheck(bodyParams, taskId.split("-")[1])
     return expression
+
+'''
+syncTypeStart function
+
+@input parameter:
+    - table: dynamodb Table object
+    - emailFromToken, taskId: key of the task
+    - task: task attributes after the update
+@return:
+    - None
+
+Description: when only one of taskType / startTime was updated, typeStart
+             is recomputed from the stored task in a second write.
+'''
+def syncTypeStart(table, emailFromToken, taskId, task):
+    if "taskType" not in task or "startTime" not in task:
+        return
+    typeStart = tasks.typeStartKey(task["taskType"], task["startTime"])
+    if task.get("typeStart") == typeStart:
+        return
+    table.update_item(
+        Key={
+            "email": emailFromToken,
+            "taskId": taskId
+        },
+        UpdateExpression="set typeStart=:typeStart",
+        ExpressionAttributeValues={":typeStart": typeStart}
+    )
         
 def parameterCheck(bodyParams, date):
     errorMsg = {}
@@ -80,18 +111,6 @@ def parameterCheck(bodyParams, date):
                 "statusCode": 400,
                 "message": "Bad Request"
             }
-    if bodyParams.get("taskType") is not None:
-        if bodyParams["taskType"] not in taskType:
-            errorMsg = {
-                "statusCode": 400,
-                "message": "Bad Request"
-            }
-    if bodyParams.get("elapsedTime") is not None:
-        if bodyParams["elapsedTime"] < 0:
-            errorMsg = {
-                "statusCode": 400,
-                "message": "Bad Request"
-            }
     
     if errorMsg != {}:
         raise Exception(json.dumps({
@@ -103,24 +122,3 @@ def parameterCheck(bodyParams, date):
 def convertUnixtime(dateTime):
     unixtime = int(datetime.datetime.strptime(dateTime, '%Y%m%d').timestamp())
     return unixtime
-    
-def checkNonExistCapability(body, items):
-    visited = []
-    checkItems(body, visited, items)
-    
-    return True
-
-def checkItems(body, visited, taskItems):
-    for key in body.keys():
-        if key not in visited:
-            logger.info(key)
-            if key not in taskItems:
-                raise Exception(json.dumps({
-                    "statusCode": 400,
-                    "message": "Bad Request"
-                }))
-
-            visited.append(key)
-            checkItems(body, visited, taskItems)
-        
-    return True
\ No newline at end of file
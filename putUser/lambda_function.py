@@ -1,10 +1,8 @@
-import json, os, logging
-import boto3
-from botocore.exceptions import ClientError
+import json, os
+from common import db, schema, cache, plans, alarms, metrics, log
 from decimal import Decimal
 
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
+logger = log.getLogger(__name__)
 
 profileItems = ["wakeUpTime", "sleepTime", "effectiveDays"]
 
@@ -20,11 +18,14 @@ lambda_handler function
                     - age: int
                     - gps: dict
                     - sex: int
+                    - profile: dict (patched per sub-attribute)
 @return:
     - dict: status code
 
 Description: PUT operation for /user api
 '''
+@log.handler
+@metrics.handler
 def lambda_handler(event, context):
     emailFromToken = event.get('email', None)
     body = event.get('body-json', None)
@@ -36,14 +37,13 @@ def lambda_handler(event, context):
             'message': "Bad Request"
         }))
     
-    logger.info(os.environ['URI_USER'])
-    logger.info(urlFromRequest)
+    logger.debug("url: %s (user: %s)", urlFromRequest, os.environ['URI_USER'])
     
     if urlFromRequest == os.environ['URI_USER']:
-        checkNonExistCapability(body, "user")
+        schema.check('user', body)
         ret = putUserHandler(emailFromToken, body)
     elif urlFromRequest == os.environ['URI_PROFILE']:
-        checkNonExistCapability(body, "profile")
+        schema.check('profile', body)
         ret = putProfileHandler(emailFromToken, body)
     else:
         raise Exception(json.dumps({
@@ -57,96 +57,39 @@ def lambda_handler(event, context):
 putUserHandler function
 
 @input parameter:
-
+    - emailFromToken: PK of database
+    - body: validated user body, may contain 'profile'
 @return:
+    - dict: status code
+
+Description: top-level fields and profile.* sub-attributes are patched by
+             one conditional update_item.
 '''
 def putUserHandler(emailFromToken, body):
-    if body is not None:
-        checkReturn = checkCapability(body)
-    
-    items = ["userName", "problems", "age", "gps", "sex"]
+    table = db.getTable('TABLE_NAME')
     
     '''
-    Make update expression & update values for aws dynamoDB first
-        * update expression must be string
-        * update values must be dict (json style)
+    Make update expression, names & values for aws dynamoDB first
     Only contains items that will be updated in this process
     '''
-    updateExpression = "set"
-    updateVals = dict()
-    for item in body.keys():
-        # gather values
-        if item == 'gps':
-            updateVals[":"+str(item)] = {
-                'latitude' : Decimal(str(body[item]['latitude'])),
-                'longitude' : Decimal(str(body[item]['longitude']))
-            }
-        else:
-            updateVals[":"+str(item)] = body[item]
-        
-        # gather update expression
-        # if item == "problems":
-        #     updateExpression += " " + str(item) + " = list_append(" + str(item) + ", :" + str(item) + "),"
-        # else:
-        updateExpression += " " + str(item) + " = :" + str(item) + ","
-    updateExpression = updateExpression[:-1]
+    update = createUpdate(body)
     
-    db = boto3.resource('dynamodb')
-    table = db.Table(os.environ['TABLE_NAME'])
+    if 'profile' in body:
+        logger.debug("Profile update needed.")
     
-    # try 1: Read DB
-    try:
-        res = table.get_item(Key={
-            'email' : emailFromToken,
-        })
-        
-        # Return: if Item element is not found (DB error)
-        if 'Item' not in res.keys():
-            logger.error("User (" + emailFromToken + ") is not found.")
-            raise Exception(json.dumps({
-                'statusCode' : 400,
-                'message': "User Not Found"
-            }))
-        
-        # try 2: Update DB
-        try:
-            res = table.update_item(Key={
-                'email' : emailFromToken,
-            },
-            UpdateExpression=updateExpression,
-            ExpressionAttributeValues=updateVals)
-        
-        # try 2: Update DB
-        except ClientError as e:
-            logger.error(e.response['Error']['Message'])
-            raise Exception(json.dumps({
-                'statusCode' : 500,
-                'message': "Internal Server Error"
-            }))
-        
-        '''
-        if profiles is in input body (with user info),
-        handle with putProfileId too.
-        '''
-        if 'profile' in body:
-            logger.info("Profile update needed.")
-            response = putProfileHandler(emailFromToken, body['profile'])
-            
-            logger.info("Got response from: putProfileId")
-            logger.info(response)
-        
-        # Return (Success)
-        logger.info("Operation successful. Return 200.")
-        return {
-            'statusCode' : 200
-        }
-    # try 1: Read DB
-    except ClientError as e:
-        logger.error(e.response['Error']['Message'])
-        raise Exception(json.dumps({
-            'statusCode' : 500,
-            'message': "Internal Server Error"
-        }))
+    # an invalid merged profile is a 400 before anything is written
+    moves = planAlarms(emailFromToken, body['profile']) if 'profile' in body else None
+    
+    ret = updateDb(table, emailFromToken, update['expression'], update['values'], update['names'])
+    
+    # problems and profile are inputs of the daily plans
+    if 'problems' in body or 'profile' in body:
+        plans.invalidate(emailFromToken, plans.window())
+    syncAlarms(emailFromToken, moves)
+    
+    # Return (Success)
+    logger.debug("Operation successful. Return 200.")
+    return ret
    
 '''
 putProfileHandler function
@@ -161,46 +104,120 @@ putProfileHandler function
 Description: PUT operation for /user/profile api
 '''
 def putProfileHandler(emailFromToken, profile):
-    if profile is not None:
-        checkReturn = checkCapabilityForProfile(profile)
+    table = db.getTable('TABLE_NAME')
     
-    db = boto3.resource('dynamodb')
-    table = db.Table(os.environ['TABLE_NAME'])
+    update = createUpdate({'profile': profile})
     
-    # try 1: Read DB
-    try:
-        res = table.get_item(Key={
-            'email' : emailFromToken,
-        })
-        
-        # if User data is corrupted, or User Name is not in DB
-        if 'Item' not in res.keys():
-            logger.error("User (" + emailFromToken + ")not found.")
-            raise Exception(json.dumps({
-                'statusCode' : 400,
-                'message' : "User Not Found"
-            }))
-        
-        updateExpression = "set"
-        updateVals = dict()
-        
-        for item in profile:
-            updateExpression += " profile." + str(item) + " = :" + str(item) + ","
-            updateVals[":"+str(item)] = profile[item]
-            
-        updateExpression = updateExpression[:-1]
+    moves = planAlarms(emailFromToken, profile)
     
-        ret = updateDb(table, emailFromToken, updateExpression, updateVals)
-        
-        return ret
-        
-    # try 1: Read DB
-    except ClientError as e:
+    # updateDb answers 400 "User Not Found" when the user does not exist
+    ret = updateDb(table, emailFromToken, update['expression'], update['values'], update['names'])
+    plans.invalidate(emailFromToken, plans.window())
+    syncAlarms(emailFromToken, moves)
+    
+    return ret
+
+'''
+planAlarms function
+
+@input parameter:
+    - emailFromToken: PK of database
+    - profile: validated profile patch
+@return:
+    - tuple: alarms following the profile and the profileFields() they
+             move to, None when there is nothing to move
+
+Description: runs before the profile is written, so the stored profile
+             patched with the request that alarms could not follow (e.g. a
+             stored effectiveDays that is not isoweekdays) answers a 400
+             and nothing is written. Only reads USER_TABLE when the user
+             has alarms following the profile and ALARM_TABLE is set.
+'''
+def planAlarms(emailFromToken, profile):
+    if alarms.ALARM_ENV not in os.environ or not ('wakeUpTime' in profile or 'effectiveDays' in profile):
+        return None
+    try:
+        following = alarms.followingAlarms(emailFromToken)
+        if not following:
+            return None
+        merged = dict(alarms.loadProfile(emailFromToken) or {}, **profile)
+    except db.ClientError as e:
+        logger.error(e.response['Error']['Message'])
+        raise Exception(json.dumps({
+            'statusCode' : 500,
+            'message': "Internal Server Error"
+        }))
+    return following, alarms.profileFields(merged)
+
+'''
+syncAlarms function
+
+@input parameter:
+    - emailFromToken: PK of database
+    - moves: result of planAlarms()
+@return:
+    - None
+
+Description: the alarms following the profile move with its wakeUpTime
+             and effectiveDays (alarms.syncProfile), once it is written.
+'''
+def syncAlarms(emailFromToken, moves):
+    if not moves:
+        return
+    try:
+        changed = alarms.syncProfile(emailFromToken, *moves)
+        logger.debug("%d alarm(s) moved with the profile.", changed)
+    except db.ClientError as e:
         logger.error(e.response['Error']['Message'])
         raise Exception(json.dumps({
             'statusCode' : 500,
             'message': "Internal Server Error"
         }))
+
+'''
+createUpdate function
+
+@input parameter:
+    - body: validated user body
+@return:
+    - dict: expression (string, None when there is nothing to set),
+            names (dict), values (dict)
+
+Description: every attribute goes through a '#name' placeholder, so names
+             that are DynamoDB reserved words never fail the update.
+             'profile' is patched per sub-attribute, never replaced as a whole.
+'''
+def createUpdate(body):
+    actions = []
+    names = dict()
+    values = dict()
+    for item in body.keys():
+        if item == 'profile':
+            names['#profile'] = 'profile'
+            for subitem in body[item].keys():
+                names['#p_' + subitem] = subitem
+                values[':p_' + subitem] = body[item][subitem]
+                actions.append("#profile.#p_" + subitem + " = :p_" + subitem)
+            continue
+        
+        # gather values
+        if item == 'gps':
+            values[":"+str(item)] = {
+                'latitude' : Decimal(str(body[item]['latitude'])),
+                'longitude' : Decimal(str(body[item]['longitude']))
+            }
+        else:
+            values[":"+str(item)] = body[item]
+        names["#"+str(item)] = item
+        actions.append("#" + str(item) + " = :" + str(item))
+    
+    if not actions:
+        names = dict()
+    return {
+        'expression': ("set " + ", ".join(actions)) if actions else None,
+        'names': names,
+        'values': values
+    }
         
 '''
 ! DEPRECATED !
@@ -220,8 +237,7 @@ def putProfileIdHandler(emailFromToken, profileId):
     if profileId is not None:
         checkReturn = checkCapabilityForProfiles(profileId)
     
-    db = boto3.resource('dynamodb')
-    table = db.Table(os.environ['TABLE_NAME'])
+    table = db.getTable('TABLE_NAME')
     
     # List 'ids' will save all ids in profiles section
     ids = []
@@ -234,7 +250,7 @@ def putProfileIdHandler(emailFromToken, profileId):
         
         # if User data is corrupted, or User Name is not in DB
         if 'Item' not in res.keys():
-            logger.error("User (" + emailFromToken + ")not found.")
+            logger.error("User not found.")
             raise Exception(json.dumps({
                 'statusCode' : 400,
                 'message' : "User Not Found"
@@ -242,7 +258,7 @@ def putProfileIdHandler(emailFromToken, profileId):
         
         # if profiles section is not in DB
         if 'profiles' not in res['Item'].keys():
-            logger.info("profiles section does not exist. Creating new section.")
+            logger.debug("profiles section does not exist. Creating new section.")
             ret = handleNonExistence(table, profileId, emailFromToken)
             return ret
         
@@ -253,19 +269,18 @@ def putProfileIdHandler(emailFromToken, profileId):
         
         # if profile id is new
         if profileId['id'] not in ids:
-            logger.info("profile ID is new. Appending new profile.")
+            logger.debug("profile ID is new. Appending new profile.")
             ret = handleNewProfile(table, profileId, emailFromToken, res, ids)
             return ret
         
         # if profile id exists
         else:
-            logger.info("profile ID exists. Editing the profile.")
-            logger.info("collected ids: " + str(ids))
+            logger.debug("profile ID exists. Editing the profile. collected ids: %s", ids)
             ret = handleExistingProfile(table, profileId, emailFromToken, res, ids)
             return ret
         
     # try 1: Read DB
-    except ClientError as e:
+    except db.ClientError as e:
         logger.error(e.response['Error']['Message'])
         raise Exception(json.dumps({
             'statusCode' : 500,
@@ -382,7 +397,7 @@ def handleExistingProfile(table, profileId, emailFromToken, origin, ids):
     prefix = " profiles[" + str(idx) + "]."
     updateExpression = "set"
     updateVals = dict()
-    logger.info(str(profileObj))
+    logger.debug("%s", profileObj)
     for key, val in profileObj.items():
         updateExpression += prefix + key + " = :" + key + ","
         updateVals[":"+key] = val
@@ -400,8 +415,7 @@ def handleExistingProfile(table, profileId, emailFromToken, origin, ids):
                         off_key = ":selected" + str(i)
                         updateVals[off_key] = False
     updateExpression = updateExpression[:-1]
-    logger.info(updateExpression)
-    logger.info(str(updateVals))
+    logger.debug("%s %s", updateExpression, updateVals)
     
     # update DB
     ret = updateDb(table, emailFromToken, updateExpression, updateVals)
@@ -440,23 +454,45 @@ updateDb function
     - emailFromToken: string
     - updateExpression: string
     - updateVals: dict
+    - updateNames: dict of '#name' placeholders (optional)
 @return:
     - json response (dict)
+
+Description: the update only applies to an existing user, otherwise it
+             raises 400 "User Not Found".
 '''
-def updateDb(table, emailFromToken, updateExpression, updateVals):
+def updateDb(table, emailFromToken, updateExpression, updateVals, updateNames=None):
+    # nothing to patch (ex: empty profile)
+    if updateExpression is None:
+        return {
+            'statusCode' : 200
+        }
+    
+    # every write bumps the item version read by the item cache
+    updateExpression, updateNames, updateVals = cache.addVersion(updateExpression, updateNames, updateVals)
+    cache.invalidate(table, {'email' : emailFromToken})
+    
     # try 1: Update DB
     try:
         res = table.update_item(Key={
             'email' : emailFromToken,
         },
         UpdateExpression=updateExpression,
+        ConditionExpression=db.Attr('email').exists(),
+        ExpressionAttributeNames=updateNames,
         ExpressionAttributeValues=updateVals
         )
         return {
             'statusCode' : 200
         }
     # try 1: Update DB
-    except ClientError as e:
+    except db.ClientError as e:
+        if db.isConditionFailed(e):
+            logger.error("User not found.")
+            raise Exception(json.dumps({
+                'statusCode' : 400,
+                'message' : "User Not Found"
+            }))
         logger.error(e.response['Error']['Message'])
         raise Exception(json.dumps({
             'statusCode' : 500,
@@ -502,138 +538,3 @@ def checkCapabilityForProfiles(body):
             continue
     
     return True
-    
-'''
-checkCapabilityForProfile function
-
-@input parameter:
-
-@return:
-'''
-def checkCapabilityForProfile(profile):
-    items = ["wakeUpTime", "sleepTime"]
-    
-    for item in items:
-        if item in profile:
-            try:
-                assert type(profile[item]['hh']) is int
-                assert 0 <= profile[item]['hh'] < 24
-                assert type(profile[item]['mm']) is int
-                assert 0 <= profile[item]['mm'] < 60
-            except:
-                raise Exception(json.dumps({
-                    'statusCode': 400,
-                    'message': 'Invalid Input: ' + item + " -> " + str(profile[item])
-                }))
-        else:
-            continue
-    
-    return True
-        
-'''
-checkCapability function
-
-@input parameter:
-
-@return:
-'''
-def checkCapability(body):
-    items = ["userName", "age", "problems", "profile", "sex", "language"]
-    subItems = ["wakeUpTime", "sleepTime"]
-    
-    for item in items:
-        if item in body:
-            try:
-                if item == 'userName':
-                    assert type(body[item]) is str
-                    assert 1 <= len(body[item]) <= 255
-                elif item == 'age':
-                    assert type(body[item]) is int
-                    assert 0 <= body[item] <= 150
-                elif item == 'problems':
-                    checkPriority = False
-                    for problem in body[item]:
-                        assert type(problem['problem']) is int
-                        assert problem['problem'] in [0, 1, 2, 3, 4, 5, 6, 7]
-                        
-                        if problem['priority'] == 1:
-                            checkPriority = True
-                    assert checkPriority is True
-                elif item == 'profile':
-                    if 'wakeUpTime' in body[item]:
-                        logger.info(body[item])
-                        assert type(body[item]['wakeUpTime']['hh']) is int
-                        assert 0 <= body[item]['wakeUpTime']['hh'] < 24
-                        assert type(body[item]['wakeUpTime']['mm']) is int
-                        assert 0 <= body[item]['wakeUpTime']['mm'] < 60
-                    if 'sleepTime' in body[item]:
-                        assert type(body[item]['sleepTime']['hh']) is int
-                        assert 0 <= body[item]['sleepTime']['hh'] < 24
-                        assert type(body[item]['sleepTime']['mm']) is int
-                        assert 0 <= body[item]['sleepTime']['mm'] < 60
-                elif item == 'sex':
-                    assert type(body[item]) is int
-                    assert body[item] in [0, 1, 2]
-                elif item == 'language':
-                    assert type(body[item]) is int
-                    assert body[item] in [0, 1, 2]
-                else:
-                    raise Exception(json.dumps({
-                        'statusCode' : 400,
-                        'message' : "Bad request"
-                    }))
-            except:
-                raise Exception(json.dumps({
-                    'statusCode': 400,
-                    'message': 'Invalid Input: ' + item + " -> " + str(body[item])
-                }))
-        else:
-            continue
-    
-    return True
-
-'''
-
-'''
-def checkNonExistCapability(body, mode):
-    userItems = ["userName", "problems", "problem", "priority", "age", "gps", "latitude", "longitude", "sex", "profile", "wakeUpTime", "hh", "mm", "sleepTime", "effectiveDays"]
-    profileItems = ["wakeUpTime", "hh", "mm", "sleepTime", "effectiveDays"]
-    deviceItems = ["lang", "agreement", "termsAndCondition", "userInfoPrivacy", "userInfoCollectPrivacy", "gpsService", "marketingPolicy"]
-
-    visited = []
-    
-    checkItemsDfs(body, visited, userItems, profileItems, deviceItems, mode)
-    
-    return True
-
-def checkItemsDfs(body, visited, userItems, profileItems, deviceItems, mode):
-    for key in body.keys():
-        if key not in visited:
-            logger.info(key)
-            if mode == "user":
-                if key not in userItems:
-                    raise Exception(json.dumps({
-                        'statusCode': 400,
-                        'message': "Bad Request"
-                    }))
-            elif mode == "profile":
-                if key not in profileItems:
-                    raise Exception(json.dumps({
-                        'statusCode': 400,
-                        'message': "Bad Request"
-                    }))
-            elif mode == "device":
-                if key not in deviceItems:
-                    raise Exception(json.dumps({
-                        'statusCode': 400,
-                        'message': "Bad Request"
-                    }))
-                    
-            visited.append(key)
-            if type(body[key]) == dict:
-                checkItemsDfs(body[key], visited, userItems, profileItems, deviceItems, mode)
-            elif type(body[key]) == list:
-                for item in body[key]:
-                    if type(item) == dict:
-                        checkItemsDfs(item, visited, userItems, profileItems, deviceItems, mode)
-    return True
\ No newline at end of file
@@ -0,0 +1,48 @@
+import os, sys
+import pytest
+
+'''
+conftest
+
+Tests run from the repository root (python -m pytest) with the common layer
+and the benchmark helpers and stand-ins on the path, like the benchmarks do.
+'''
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, 'commonLayer', 'python'), os.path.join(ROOT, 'benchmarks')]
+
+import harness, localAws
+from common import db, cache
+
+'''
+isolate fixture
+
+The environment and the db clients are restored, and the item cache
+emptied, after every test.
+'''
+@pytest.fixture(autouse=True)
+def isolate():
+    environ = dict(os.environ)
+    yield
+    os.environ.clear()
+    os.environ.update(environ)
+    db.reset()
+    cache.clear()
+
+'''
+local fixture
+
+Installs the local DynamoDB stand-in (benchmarks/localAws.py); the test
+declares its tables with local.install({envName: (name, hash, range[, indexes])}).
+'''
+class Local(object):
+    def __init__(self):
+        self.store = None
+
+    def install(self, tables, latency=None):
+        self.store = localAws.install(tables, latency)
+        return self.store
+
+@pytest.fixture
+def local():
+    return Local()
@@ -0,0 +1,113 @@
+import json
+import pytest
+import harness, localAws
+from common import db, alarms
+
+TABLES = {
+    "ALARM_TABLE": ("Alarm-Test", "email", "alarmId"),
+    "ALARM_BUCKET_TABLE": ("AlarmBucket-Test", "bucket", "alarmKey"),
+}
+
+# Monday 07:00 UTC
+MONDAY_SEVEN = alarms.minuteOfWeek(1, 7, 0)
+
+def testStandInRejectsUnescapedReservedWords(local):
+    local.install(TABLES)
+    client = db.getClient('dynamodb')
+    with pytest.raises(db.ClientError) as info:
+        client.query(TableName="AlarmBucket-Test", KeyConditionExpression='bucket = :bucket',
+                     ExpressionAttributeValues={':bucket': {'S': '00420#00'}})
+    assert info.value.response['Error']['Code'] == 'ValidationException'
+    assert 'reserved keyword: bucket' in info.value.response['Error']['Message']
+
+def testStandInAcceptsPlaceholders(local):
+    local.install(TABLES)
+    res = db.getClient('dynamodb').query(
+        TableName="AlarmBucket-Test", KeyConditionExpression='#bucket = :bucket',
+        ExpressionAttributeNames={'#bucket': 'bucket'}, ExpressionAttributeValues={':bucket': {'S': '00420#00'}})
+    assert res['Items'] == []
+
+def testDueAlarmsFindsTheAlarmsOfTheMinuteOnEveryShard(local):
+    local.install(TABLES)
+    emails = ["user%02d@luple.co.kr" % idx for idx in range(40)]
+    for email in emails:
+        alarms.putAlarm(email, "wake", {"time": {"hh": 7, "mm": 0}, "days": [1, 3], "taskType": 2})
+    alarms.putAlarm("late@luple.co.kr", "wake", {"time": {"hh": 7, "mm": 1}, "days": [1]})
+    alarms.putAlarm("off@luple.co.kr", "wake", {"time": {"hh": 7, "mm": 0}, "days": [1], "enabled": 0})
+
+    assert len(set(alarms.shardOf(email) for email in emails)) > 1
+    due = alarms.dueAlarms(MONDAY_SEVEN)
+    assert sorted(item['email']['S'] for item in due) == sorted(emails)
+    assert all(item['alarmId']['S'] == "wake" and item['taskType']['N'] == "2" for item in due)
+
+    assert [item['email']['S'] for item in alarms.dueAlarms(MONDAY_SEVEN + 1)] == ["late@luple.co.kr"]
+    # Tuesday: none
+    assert alarms.dueAlarms(MONDAY_SEVEN + alarms.MINUTES_PER_DAY) == []
+
+def testDueAlarmsFollowsTheUtcOffset(local):
+    local.install(TABLES)
+    # 16:00 in UTC+9 is 07:00 UTC
+    alarms.putAlarm("seoul@luple.co.kr", "wake", {"time": {"hh": 16, "mm": 0}, "days": [1], "utcOffset": 9 * 60})
+    due = alarms.dueAlarms(MONDAY_SEVEN)
+    assert [item['email']['S'] for item in due] == ["seoul@luple.co.kr"]
+
+def testPutAndGetAlarmHandlers(local):
+    local.install(TABLES)
+    putAlarm = harness.loadHandler("putAlarm")
+    body = {"time": {"hh": 6, "mm": 30}, "days": [1, 2, 3, 4, 5], "taskType": 0}
+    assert putAlarm.lambda_handler({"email": "a@luple.co.kr", "alarmId": "wake", "body-json": body}, None)["statusCode"] == 200
+    getAlarm = harness.loadHandler("getAlarm")
+    (alarm,) = getAlarm.lambda_handler({"email": "a@luple.co.kr"}, None)["body"]["alarms"]
+    assert alarm["alarmId"] == "wake" and alarm["time"] == {"hh": 6, "mm": 30}
+    for event in ({"alarmId": "a#b", "body-json": body}, {"alarmId": "wake", "body-json": {"time": {"hh": 6}}}):
+        with pytest.raises(Exception) as info:
+            putAlarm.lambda_handler(dict(event, email="a@luple.co.kr"), None)
+        assert json.loads(str(info.value))["statusCode"] == 400
+    with pytest.raises(Exception) as info:
+        getAlarm.lambda_handler({"email": "a@luple.co.kr", "alarmId": "missing"}, None)
+    assert json.loads(str(info.value))["statusCode"] == 400
+
+def testFollowingAlarmsMoveWithTheProfile(local, monkeypatch):
+    store = local.install(dict(TABLES, TABLE_NAME=("User-Test", "email", None)))
+    for name, value in (("USER_TABLE", "User-Test"), ("URI_USER", "/user"), ("URI_PROFILE", "/user/profile")):
+        monkeypatch.setenv(name, value)
+    store.tables["User-Test"].put(localAws.normalize({"email": "a@luple.co.kr", "profile": {"wakeUpTime": {"hh": 7, "mm": 0}}}))
+    putAlarm = harness.loadHandler("putAlarm")
+    alarm = putAlarm.lambda_handler({"email": "a@luple.co.kr", "alarmId": "wake", "body-json": {"followProfile": 1}}, None)["body"]
+    assert alarm["time"] == {"hh": 7, "mm": 0} and alarm["days"] == [1, 2, 3, 4, 5, 6, 7]
+    with pytest.raises(Exception) as info:
+        putAlarm.lambda_handler({"email": "a@luple.co.kr", "alarmId": "wake",
+                                 "body-json": {"followProfile": 1, "time": {"hh": 6, "mm": 0}}}, None)
+    assert json.loads(str(info.value))["statusCode"] == 400
+
+    harness.loadHandler("putUser").lambda_handler({"email": "a@luple.co.kr", "url": "/user/profile",
+        "body-json": {"wakeUpTime": {"hh": 6, "mm": 15}, "effectiveDays": [1, 2]}}, None)
+    alarm = alarms.getAlarm("a@luple.co.kr", "wake")
+    assert alarm["time"] == {"hh": 6, "mm": 15} and alarm["days"] == [1, 2]
+    assert [item['email']['S'] for item in alarms.dueAlarms(alarms.minuteOfWeek(2, 6, 15))] == ["a@luple.co.kr"]
+    assert alarms.dueAlarms(alarms.minuteOfWeek(3, 6, 15)) == []
+
+@pytest.mark.parametrize("url, body", [
+    ("/user/profile", {"wakeUpTime": {"hh": 6, "mm": 15}}),
+    ("/user", {"profile": {"wakeUpTime": {"hh": 6, "mm": 15}}}),
+])
+def testBadStoredEffectiveDaysAreA400BeforeTheWrite(local, monkeypatch, url, body):
+    store = local.install(dict(TABLES, TABLE_NAME=("User-Test", "email", None)))
+    for name, value in (("USER_TABLE", "User-Test"), ("URI_USER", "/user"), ("URI_PROFILE", "/user/profile")):
+        monkeypatch.setenv(name, value)
+    store.tables["User-Test"].put(localAws.normalize({"email": "a@luple.co.kr", "profile": {"wakeUpTime": {"hh": 7, "mm": 0}}}))
+    harness.loadHandler("putAlarm").lambda_handler({"email": "a@luple.co.kr", "alarmId": "wake", "body-json": {"followProfile": 1}}, None)
+    # a profile stored before effectiveDays were validated
+    store.tables["User-Test"].put(localAws.normalize({"email": "a@luple.co.kr",
+        "profile": {"wakeUpTime": {"hh": 7, "mm": 0}, "effectiveDays": ["MON"]}}))
+    with pytest.raises(Exception) as info:
+        harness.loadHandler("putUser").lambda_handler({"email": "a@luple.co.kr", "url": url, "body-json": body}, None)
+    assert json.loads(str(info.value)) == {"statusCode": 400, "message": "Invalid Input: effectiveDays"}
+    assert store.tables["User-Test"].get({"email": "a@luple.co.kr"})["profile"]["wakeUpTime"] == {"hh": 7, "mm": 0}
+    assert alarms.getAlarm("a@luple.co.kr", "wake")["time"] == {"hh": 7, "mm": 0}
+
+    # fixing the days in the same request is accepted and moves the alarm
+    harness.loadHandler("putUser").lambda_handler({"email": "a@luple.co.kr", "url": "/user/profile",
+        "body-json": {"wakeUpTime": {"hh": 6, "mm": 15}, "effectiveDays": [1, 3]}}, None)
+    alarm = alarms.getAlarm("a@luple.co.kr", "wake")
+    assert alarm["time"] == {"hh": 6, "mm": 15} and alarm["days"] == [1, 3]
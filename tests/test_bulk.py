@@ -0,0 +1,178 @@
+import json
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+import harness
+from common import db, bulk, cursor
+
+'''
+FakeClient class
+
+Just enough of the dynamodb client for bulk: key-only pages of PAGE items,
+and batch writes leaving their first item unprocessed `stall` times.
+'''
+class FakeClient(object):
+    PAGE = 3
+
+    def __init__(self, tables, stall=0):
+        self.tables = tables
+        self.stall = stall
+        self.batches = []
+
+    def query(self, TableName, KeyConditionExpression, ProjectionExpression, ExpressionAttributeNames,
+              ExpressionAttributeValues, ExclusiveStartKey=None, Limit=None):
+        hashKey, rangeKey = ExpressionAttributeNames['#k0'], ExpressionAttributeNames['#k1']
+        items = sorted((item for item in self.tables[TableName] if item[hashKey] == ExpressionAttributeValues[':pk']),
+                       key=lambda item: item[rangeKey]['S'])
+        if ExclusiveStartKey is not None:
+            items = [item for item in items if item[rangeKey]['S'] > ExclusiveStartKey[rangeKey]['S']]
+        size = min(self.PAGE, Limit or self.PAGE)
+        page = [dict((name, item[name]) for name in (hashKey, rangeKey)) for item in items[:size]]
+        res = {'Items': page}
+        if len(items) > size:
+            res['LastEvaluatedKey'] = page[-1]
+        return res
+
+    def batch_write_item(self, RequestItems):
+        (tableName, requests), = RequestItems.items()
+        assert len(requests) <= bulk.BATCH_SIZE
+        self.batches.append(len(requests))
+        unprocessed = []
+        if self.stall > 0:
+            self.stall -= 1
+            requests, unprocessed = requests[1:], requests[:1]
+        for request in requests:
+            key = request['DeleteRequest']['Key']
+            self.tables[tableName] = [item for item in self.tables[tableName]
+                                      if any(item[name] != value for name, value in key.items())]
+        return {'UnprocessedItems': {tableName: unprocessed} if unprocessed else {}}
+
+    def delete_item(self, TableName, Key, ReturnValues):
+        old = [item for item in self.tables[TableName] if item['email'] == Key['email']]
+        self.tables[TableName] = [item for item in self.tables[TableName] if item['email'] != Key['email']]
+        return {'Attributes': old[0]} if old else {}
+
+def records(email, count):
+    return [{'email': {'S': email}, 'taskId': {'S': 't%04d' % idx}, 'elapsedTime': {'N': '60'}} for idx in range(count)]
+
+@pytest.fixture(autouse=True)
+def noBackoff(monkeypatch):
+    monkeypatch.setattr(bulk.time, "sleep", lambda seconds: None)
+
+def testPurgePartitionFollowsEveryPageAndKeepsOtherUsers():
+    client = FakeClient({'Records': records('a@luple.co.kr', 10) + records('b@luple.co.kr', 2)})
+    db.setClient('dynamodb', client)
+    ret = bulk.purgePartition('Records', ['email', 'taskId'], 'a@luple.co.kr')
+    assert (ret['deleted'], ret['pages'], ret['nextKey']) == (10, 4, None)
+    assert [item['email']['S'] for item in client.tables['Records']] == ['b@luple.co.kr'] * 2
+
+def testPurgePartitionStopsBetweenPagesWhenOutOfTime():
+    client = FakeClient({'Records': records('a@luple.co.kr', 10)})
+    db.setClient('dynamodb', client)
+    ret = bulk.purgePartition('Records', ['email', 'taskId'], 'a@luple.co.kr', hasTime=lambda: False)
+    assert ret['deleted'] == 3 and ret['nextKey'] == {'email': {'S': 'a@luple.co.kr'}, 'taskId': {'S': 't0002'}}
+    ret = bulk.purgePartition('Records', ['email', 'taskId'], 'a@luple.co.kr', startKey=ret['nextKey'])
+    assert ret['deleted'] == 7 and client.tables['Records'] == []
+
+def testBatchWriteAllSplitsAndRetriesUnprocessedItems():
+    client = FakeClient({'Records': records('a@luple.co.kr', 60)}, stall=2)
+    db.setClient('dynamodb', client)
+    keys = [dict((name, item[name]) for name in ('email', 'taskId')) for item in client.tables['Records']]
+    # one worker: the fake is not thread safe
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        assert bulk.deleteKeys('Records', keys, executor) == 60
+    assert client.tables['Records'] == []
+    assert sorted(client.batches) == [1, 1, 10, 25, 25]
+
+def testBatchWriteGivesUpAfterTheRetries():
+    client = FakeClient({'Records': records('a@luple.co.kr', 2)}, stall=bulk.MAX_RETRIES + 1)
+    db.setClient('dynamodb', client)
+    with pytest.raises(Exception) as info:
+        bulk.deleteKeys('Records', [{'email': {'S': 'a@luple.co.kr'}, 'taskId': {'S': 't0000'}}])
+    assert json.loads(str(info.value)) == {'statusCode': 503, 'message': "Service Unavailable"}
+
+def testWildcardDeleteAnswers503WhenThrottled(monkeypatch):
+    monkeypatch.setenv('TABLE_NAME', 'Records')
+    client = FakeClient({'Records': records('a@luple.co.kr', 2)}, stall=bulk.MAX_RETRIES + 1)
+    db.setClient('dynamodb', client)
+    monkeypatch.setattr(bulk, 'BACKOFF_BASE', 0)
+    with pytest.raises(Exception) as info:
+        harness.loadHandler("deleteTask").lambda_handler({'email': 'a@luple.co.kr', 'taskId': '*'}, None)
+    assert json.loads(str(info.value)) == {'statusCode': 503, 'message': "Service Unavailable"}
+    # the purge is idempotent: calling again deletes what was left
+    client.stall = 0
+    res = harness.loadHandler("deleteTask").lambda_handler({'email': 'a@luple.co.kr', 'taskId': '*'}, None)
+    assert res['body'] == {'deletedCount': 1, 'nextToken': None}
+    assert client.tables['Records'] == []
+
+class FakeCognito(object):
+    def __init__(self):
+        self.deleted = []
+
+    def admin_delete_user(self, UserPoolId, Username):
+        self.deleted.append((UserPoolId, Username))
+
+def testDeleteUserEmptiesEveryTable(monkeypatch):
+    for envName in ('USER_TABLE', 'SLEEP_TABLE', 'SETTINGS_TABLE', 'RECORDS_TABLE'):
+        monkeypatch.setenv(envName, envName.split('_')[0].title())
+    monkeypatch.setenv('COGNITIVE_USER_POOL', 'pool')
+    email = {'S': 'a@luple.co.kr'}
+    client = FakeClient({
+        'User': [{'email': email}],
+        'Sleep': [{'email': email, 'diaryDate': {'S': '2024010%d' % day}} for day in range(1, 8)],
+        'Settings': [],
+        'Records': records('a@luple.co.kr', 5) + records('b@luple.co.kr', 1),
+    })
+    cognito = FakeCognito()
+    db.setClient('dynamodb', client)
+    db.setClient('cognito-idp', cognito)
+
+    res = harness.loadHandler("deleteUser").lambda_handler({'email': 'a@luple.co.kr', 'userName': 'a'}, None)
+    assert res['statusCode'] == 200
+    assert [res['body'][name]['deleted'] for name in ('USER_TABLE', 'SLEEP_TABLE', 'SETTINGS_TABLE', 'RECORDS_TABLE')] \
+        == [1, 7, 0, 5]
+    assert res['body']['COGNITO']['deleted'] and cognito.deleted == [('pool', 'a')]
+    assert client.tables['User'] == [] and client.tables['Sleep'] == [] and len(client.tables['Records']) == 1
+
+def testDeleteUserRaisesWhenATableFails(monkeypatch):
+    for envName in ('USER_TABLE', 'SLEEP_TABLE', 'SETTINGS_TABLE', 'RECORDS_TABLE'):
+        monkeypatch.setenv(envName, envName.split('_')[0].title())
+    monkeypatch.setenv('COGNITIVE_USER_POOL', 'pool')
+    # no Records table: its purge fails, the other tables are still emptied
+    client = FakeClient({'User': [{'email': {'S': 'a@luple.co.kr'}}], 'Sleep': [], 'Settings': []})
+    db.setClient('dynamodb', client)
+    db.setClient('cognito-idp', FakeCognito())
+    with pytest.raises(Exception) as info:
+        harness.loadHandler("deleteUser").lambda_handler({'email': 'a@luple.co.kr', 'userName': 'a'}, None)
+    assert json.loads(str(info.value)) == {'statusCode': 500, 'message': "Internal Server Error"}
+    assert client.tables['User'] == []
+
+class Context(object):
+    def __init__(self, remaining):
+        self.remaining = list(remaining)
+
+    def get_remaining_time_in_millis(self):
+        return self.remaining.pop(0) if self.remaining else 60000
+
+def testWildcardDeleteResumesFromItsToken(monkeypatch):
+    monkeypatch.setenv('TABLE_NAME', 'Records')
+    client = FakeClient({'Records': records('a@luple.co.kr', 8) + records('b@luple.co.kr', 1)})
+    db.setClient('dynamodb', client)
+    handler = harness.loadHandler("deleteTask")
+
+    # time runs out after the first page
+    res = handler.lambda_handler({'email': 'a@luple.co.kr', 'taskId': '*'}, Context([1000]))
+    assert res['body']['deletedCount'] == 3
+    token = res['body']['nextToken']
+    assert cursor.decodeToken(token, 'email', 'a@luple.co.kr') == {'email': {'S': 'a@luple.co.kr'}, 'taskId': {'S': 't0002'}}
+
+    with pytest.raises(Exception) as info:
+        handler.lambda_handler({'email': 'b@luple.co.kr', 'taskId': '*', 'nextToken': token}, None)
+    assert json.loads(str(info.value)) == {'statusCode': 400, 'message': "Bad Request"}
+
+    res = handler.lambda_handler({'email': 'a@luple.co.kr', 'taskId': '*', 'nextToken': token}, Context([]))
+    assert res['body'] == {'deletedCount': 5, 'nextToken': None}
+    assert [item['email']['S'] for item in client.tables['Records']] == ['b@luple.co.kr']
+
+    with pytest.raises(Exception) as info:
+        handler.lambda_handler({'email': 'a@luple.co.kr', 'taskId': '*'}, None)
+    assert json.loads(str(info.value)) == {'statusCode': 400, 'message': "No data exists to delete"}
@@ -0,0 +1,63 @@
+import pytest
+import harness, localAws
+from common import cache
+
+EMAIL = "cached@luple.co.kr"
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def testEntriesExpireAndTheLeastRecentIsEvicted():
+    clock = Clock()
+    items = cache.ItemCache(ttl=10, maxEntries=2, clock=clock)
+    items.put("a", {"v": 1})
+    items.put("b", {"v": 2})
+    assert items.get("a") == {"v": 1}
+    items.put("c", {"v": 3})
+    assert items.get("b") is None and items.get("a") == {"v": 1}
+    clock.now = 10
+    assert items.get("a") is None and items.get("c") is None
+    assert items.stats() == {"hits": 2, "misses": 3, "evictions": 1, "size": 0}
+
+def testOlderVersionsNeverReplaceNewerOnes():
+    items = cache.ItemCache(ttl=10, maxEntries=4, clock=Clock())
+    items.put("a", {cache.VERSION: 3, "age": 33})
+    items.put("a", {cache.VERSION: 2, "age": 32})
+    assert items.get("a")["age"] == 33
+    items.invalidate("a")
+    assert items.get("a") is None
+
+def testAddVersionAppendsAnAddClause():
+    expression, names, values = cache.addVersion("set #age = :age", {"#age": "age"}, {":age": 31})
+    assert expression == "set #age = :age ADD #version :versionStep"
+    assert names == {"#age": "age", "#version": "version"} and values == {":age": 31, ":versionStep": 1}
+
+@pytest.fixture
+def store(local, monkeypatch):
+    monkeypatch.setenv("URI_USER", "/user")
+    monkeypatch.setenv("URI_PROFILE", "/user/profile")
+    store = local.install({"TABLE_NAME": ("User-Test", "email", None)})
+    store.tables["User-Test"].put(localAws.normalize({"email": EMAIL, "userName": "cached", "age": 30, "version": 1}))
+    return store
+
+def testReadsAreServedFromTheCacheUntilAWrite(store):
+    getUser = harness.loadHandler("getUser")
+    first = getUser.lambda_handler({"email": EMAIL}, None)
+    assert first["body"] == {"userName": "cached", "age": 30}
+    assert getUser.lambda_handler({"email": EMAIL}, None) == first
+    assert store.calls["GetItem"] == 1
+
+    harness.loadHandler("putUser").lambda_handler({"email": EMAIL, "url": "/user", "body-json": {"age": 31}}, None)
+    assert store.tables["User-Test"].get({"email": EMAIL})["version"] == 2
+    assert getUser.lambda_handler({"email": EMAIL}, None)["body"]["age"] == 31
+    assert store.calls["GetItem"] == 2
+
+def testMissingUsersAreNotCached(store):
+    getUser = harness.loadHandler("getUser")
+    assert getUser.lambda_handler({"email": "late@luple.co.kr"}, None)["body"] == {}
+    store.tables["User-Test"].put(localAws.normalize({"email": "late@luple.co.kr", "userName": "late"}))
+    assert getUser.lambda_handler({"email": "late@luple.co.kr"}, None)["body"] == {"userName": "late"}
@@ -0,0 +1,36 @@
+import os, sys, zipfile, subprocess
+import pytest
+import harness
+from common import db
+
+sys.path.insert(0, os.path.join(harness.ROOT, 'tools'))
+import buildBundles
+
+PROBE = '''
+import sys
+sys.path[:0] = [%r, %r]
+import lambda_function
+sys.stdout.write(" ".join(sorted(name for name in ("boto3", "botocore") if name in sys.modules)))
+'''
+
+@pytest.mark.parametrize("functionName", buildBundles.listFunctions())
+def testHandlersDoNotImportBoto3AtInit(functionName):
+    proc = subprocess.run(
+        [sys.executable, '-c', PROBE % (os.path.join(harness.ROOT, functionName), harness.LAYER)],
+        cwd=harness.ROOT, capture_output=True, text=True, check=True)
+    assert proc.stdout == ""
+
+def testLazyNamesResolveToTheBoto3Objects():
+    from boto3.dynamodb.conditions import Key
+    from botocore.exceptions import ClientError
+    assert db.Key is Key and db.ClientError is ClientError
+    with pytest.raises(AttributeError):
+        db.Missing
+
+def testBundlesShipOnlyWhatTheFunctionImports(tmp_path):
+    assert buildBundles.requiredModules("getNumberOfTasks") == ["cache", "etag", "log"]
+    path, modules, size = buildBundles.buildBundle("getNumberOfTasks", str(tmp_path))
+    with zipfile.ZipFile(path) as bundle:
+        assert sorted(bundle.namelist()) == [
+            "common/__init__.py", "common/cache.py", "common/etag.py", "common/log.py", "lambda_function.py"]
+    assert "db" in buildBundles.requiredModules("getTask")
@@ -0,0 +1,83 @@
+import json, random, datetime
+import pytest
+import harness, localAws
+from common import columns, plans
+
+EMAIL = "weekly@luple.co.kr"
+FIRST = int(datetime.datetime(2024, 1, 1).timestamp())
+DAY = plans.DAY
+
+def randomColumns(seed, weeks, size):
+    generator = random.Random(seed)
+    days = weeks * columns.WEEK_DAYS
+    taskTypes, startTimes, elapsedTimes = [], [], []
+    for _ in range(size):
+        # a few records fall outside the period or have no task type
+        taskTypes.append(str(generator.choice([-1, 0, 1, 2, 3, 4, 4, 9])))
+        startTimes.append(str(FIRST + generator.randint(-DAY, days * DAY)) + generator.choice(["", ".5"]))
+        elapsedTimes.append(generator.choice(["0", "30", "12.5", "600"]))
+    return {"taskType": taskTypes, "startTime": startTimes, "elapsedTime": elapsedTimes}
+
+def fallback(monkeypatch):
+    monkeypatch.setattr(columns, "_numpy", False)
+    assert columns.getNumpy() is None
+
+@pytest.mark.parametrize("seed, weeks, size", [(1, 1, 0), (2, 1, 40), (3, 4, 200), (4, 52, 3000)])
+def testNumpyAndListRollupsAgree(monkeypatch, seed, weeks, size):
+    data = randomColumns(seed, weeks, size)
+    pytest.importorskip("numpy")
+    vectorized = columns.rollup(data, FIRST, weeks)
+    fallback(monkeypatch)
+    assert columns.rollup(data, FIRST, weeks) == vectorized
+
+STREAKS = [
+    # active days of task type 0 in a 14-day period -> (current, longest)
+    ([], (0, 0)),
+    ([13], (1, 1)),
+    ([11, 12], (2, 2)),              # today has no task yet
+    ([0, 1, 2, 3, 10, 11, 12, 13], (4, 4)),
+    ([0, 1, 2, 3, 4, 12, 13], (2, 5)),
+    ([5, 6, 7, 11], (0, 3)),
+]
+
+@pytest.mark.parametrize("useNumpy", [True, False])
+@pytest.mark.parametrize("days, expected", STREAKS)
+def testStreaks(monkeypatch, useNumpy, days, expected):
+    if useNumpy:
+        pytest.importorskip("numpy")
+    else:
+        fallback(monkeypatch)
+    data = {"taskType": ["0"] * len(days), "startTime": [str(FIRST + day * DAY + 3600) for day in days],
+            "elapsedTime": ["10"] * len(days)}
+    entry = columns.rollup(data, FIRST, 2)[0]
+    assert (entry["currentStreak"], entry["longestStreak"]) == expected
+    assert sum(entry["counts"]) == len(days) and sum(entry["activeDays"]) == len(days)
+
+TABLES = {"TABLE_NAME": ("Records-Test", "email", "taskId", {"startTime-index": ("email", "startTime")})}
+
+@pytest.fixture
+def store(local):
+    store = local.install(TABLES)
+    now = FIRST + 20 * DAY + 12 * 3600
+    for idx in range(60):
+        startTime = now - idx * 8 * 3600
+        store.tables["Records-Test"].put(localAws.normalize({
+            "email": EMAIL, "taskId": "weekly-%d-%d" % (plans.dateOf(startTime), startTime),
+            "taskType": idx % 5, "startTime": startTime, "elapsedTime": 10 + idx}))
+    return store, now
+
+def testIndexAndTaskIdRangeGiveTheSameSummary(store, monkeypatch):
+    store, now = store
+    byTaskId = columns.weeklySummary(EMAIL, 3, now)
+    monkeypatch.setenv("START_TIME_INDEX", "startTime-index")
+    assert columns.weeklySummary(EMAIL, 3, now) == byTaskId
+    assert byTaskId["since"] == 20240101 and byTaskId["until"] == 20240121
+    assert sum(week["count"] for entry in byTaskId["tasks"] for week in entry["weeks"]) == 60
+
+def testWeeksAreBounded(store):
+    handler = harness.loadHandler("getSolutionTasksWeekly")
+    assert len(handler.lambda_handler({"email": EMAIL, "weeks": "2"}, None)["body"]["tasks"][0]["weeks"]) == 2
+    for weeks in ("0", "53", "many"):
+        with pytest.raises(Exception) as info:
+            handler.lambda_handler({"email": EMAIL, "weeks": weeks}, None)
+        assert json.loads(str(info.value))["statusCode"] == 400
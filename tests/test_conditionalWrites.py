@@ -0,0 +1,98 @@
+import json
+import pytest
+import harness, localAws
+
+EMAIL = "write@luple.co.kr"
+MISSING = "nobody@luple.co.kr"
+TASK_ID = "write-20201010-1602300000"
+
+USER = ("User-Test", "email", None)
+RECORDS = ("Records-Test", "email", "taskId")
+SETTINGS = ("Settings-Test", "email", None)
+SLEEP = ("Sleep-Test", "email", "diaryDate")
+
+SEED = {
+    "User-Test": {"email": EMAIL, "userName": "write", "age": 30, "profile": {"wakeUpTime": {"hh": 7, "mm": 0}}},
+    "Records-Test": {"email": EMAIL, "taskId": TASK_ID, "taskType": 1, "startTime": 1602300000, "elapsedTime": 60},
+    "Settings-Test": {"email": EMAIL, "lang": 0, "agreement": {}},
+    "Sleep-Test": {"email": EMAIL, "diaryDate": 20201010, "sleepScore": 3},
+}
+
+USER_BODY = {"userName": "write", "problems": [{"problem": 1, "priority": 1}], "age": 30,
+             "gps": {"latitude": 37.5, "longitude": 127.0}, "sex": 0, "profile": {}}
+
+def install(local, monkeypatch, table):
+    monkeypatch.setenv("URI_USER", "/user")
+    monkeypatch.setenv("URI_PROFILE", "/user/profile")
+    store = local.install({"TABLE_NAME": table})
+    store.tables[table[0]].put(localAws.normalize(SEED[table[0]]))
+    return store
+
+def call(store, functionName, event):
+    store.resetStats()
+    try:
+        status = harness.loadHandler(functionName).lambda_handler(event, None)["statusCode"]
+    except Exception as e:
+        status = json.loads(str(e))["statusCode"]
+    return status, store.totalCalls()
+
+# function, table, event, key, expected attribute after the write
+CASES = [
+    ("putUser", USER, {"url": "/user", "body-json": {"age": 31}}, {"email": EMAIL}, ("age", 31)),
+    ("putUser", USER, {"url": "/user/profile", "body-json": {"sleepTime": {"hh": 23, "mm": 0}}},
+     {"email": EMAIL}, ("profile", {"wakeUpTime": {"hh": 7, "mm": 0}, "sleepTime": {"hh": 23, "mm": 0}})),
+    ("deleteProfileId", USER, {}, {"email": EMAIL}, ("profile", {})),
+    ("putTask", RECORDS, {"taskId": TASK_ID, "body-json": {"elapsedTime": 120}},
+     {"email": EMAIL, "taskId": TASK_ID}, ("elapsedTime", 120)),
+    ("putDevice", SETTINGS, {"body-json": {"lang": 1}}, {"email": EMAIL}, ("lang", 1)),
+]
+
+@pytest.mark.parametrize("functionName, table, event, key, expected", CASES)
+def testExistingRowIsWrittenInOneCall(local, monkeypatch, functionName, table, event, key, expected):
+    store = install(local, monkeypatch, table)
+    assert call(store, functionName, dict(event, email=EMAIL)) == (200, 1)
+    name, value = expected
+    assert store.tables[table[0]].get(localAws.normalize(key))[name] == localAws.normalize(value)
+
+@pytest.mark.parametrize("functionName, table, event",
+    [(functionName, table, event) for functionName, table, event, _, _ in CASES if functionName != "putDevice"]
+    + [("putSleepDiary", SLEEP, {"diaryDate": "20201010", "body-json": {"sleepScore": 4}})])
+def testMissingRowIsA400InOneCall(local, monkeypatch, functionName, table, event):
+    store = install(local, monkeypatch, table)
+    before = store.tables[table[0]].count()
+    assert call(store, functionName, dict(event, email=MISSING)) == (400, 1)
+    # nothing is created by the failed condition
+    assert store.tables[table[0]].count() == before
+
+@pytest.mark.parametrize("dateName", ["diaryDate", "didaryDate"])
+def testSleepDiaryIsUpdatedByEitherDateName(local, monkeypatch, dateName):
+    store = install(local, monkeypatch, SLEEP)
+    event = {"email": EMAIL, dateName: "20201010", "body-json": {"sleepScore": 4}}
+    assert call(store, "putSleepDiary", event) == (200, 1)
+    assert store.tables["Sleep-Test"].get({"email": EMAIL, "diaryDate": 20201010})["sleepScore"] == 4
+
+@pytest.mark.parametrize("event", [{}, {"diaryDate": "2020-10-10"}])
+def testSleepDiaryWithoutAValidDateIsA400(local, monkeypatch, event):
+    install(local, monkeypatch, SLEEP)
+    with pytest.raises(Exception) as info:
+        harness.loadHandler("putSleepDiary").lambda_handler(dict(event, email=EMAIL, **{"body-json": {"sleepScore": 4}}), None)
+    assert json.loads(str(info.value)) == {"statusCode": 400, "message": "Bad Request"}
+
+def testDeleteProfileIdTellsAMissingUserFromAMissingProfile(local, monkeypatch):
+    store = install(local, monkeypatch, USER)
+    store.tables["User-Test"].put(localAws.normalize({"email": "bare@luple.co.kr", "userName": "bare"}))
+    handler = harness.loadHandler("deleteProfileId")
+    for email, message in ((MISSING, "User Not Found"), ("bare@luple.co.kr", "Bad Request")):
+        with pytest.raises(Exception) as info:
+            handler.lambda_handler({"email": email}, None)
+        assert json.loads(str(info.value)) == {"statusCode": 400, "message": message}
+
+def testPostUserConflictIsA400InOneCall(local, monkeypatch):
+    store = install(local, monkeypatch, USER)
+    assert call(store, "postUser", {"email": EMAIL, "body-json": USER_BODY}) == (400, 1)
+    assert store.tables["User-Test"].get({"email": EMAIL})["age"] == 30
+
+def testPutDeviceCreatesTheMissingRow(local, monkeypatch):
+    store = install(local, monkeypatch, SETTINGS)
+    assert call(store, "putDevice", {"email": MISSING, "body-json": {"lang": 2}}) == (200, 2)
+    assert store.tables["Settings-Test"].get({"email": MISSING})["lang"] == 2
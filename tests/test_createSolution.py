@@ -0,0 +1,65 @@
+import json
+from decimal import Decimal
+import pytest
+import harness
+from common import bulk
+
+def user(idx, age=30):
+    return {"email": "user-%d@luple.co.kr" % idx, "userName": "user-%d" % idx, "age": age,
+            "gps": {"latitude": 37.5, "longitude": 127.0}, "problems": [{"problem": 1, "priority": 1}]}
+
+def sqs(messageId, message):
+    return {"messageId": messageId, "eventSource": "aws:sqs", "body": json.dumps(message)}
+
+def sns(messageId, message):
+    return {"EventSource": "aws:sns", "Sns": {"MessageId": messageId, "Message": json.dumps(message)}}
+
+@pytest.fixture
+def store(local):
+    return local.install({"TABLE_NAME": ("Solution-Test", "email", None)})
+
+def testEveryRecordIsWrittenAndTheLastOneWins(store):
+    records = [sqs("m-%d" % idx, user(idx)) for idx in range(60)]
+    records.append(sqs("m-again", user(3, age=41)))
+    # SQS subscription without raw message delivery
+    records.append(sqs("m-envelope", {"Type": "Notification", "Message": json.dumps(user(99))}))
+    res = harness.loadHandler("createSolution").lambda_handler({"Records": records}, None)
+    assert res == {"statusCode": 200, "batchItemFailures": []}
+
+    table = store.tables["Solution-Test"]
+    assert table.count() == 61
+    assert table.get({"email": "user-3@luple.co.kr"})["age"] == 41
+    assert table.get({"email": "user-99@luple.co.kr"})["gps"]["latitude"] == Decimal("37.5")
+    # 61 users in 25-item batches
+    assert store.calls["BatchWriteItem"] == 3
+
+def testUndecodableRecordsAreReported(store):
+    records = [sqs("m-1", user(1)), {"messageId": "m-2", "body": "not json"}, sqs("m-3", {"userName": "nobody"})]
+    res = harness.loadHandler("createSolution").lambda_handler({"Records": records}, None)
+    assert res["batchItemFailures"] == [{"itemIdentifier": "m-2"}, {"itemIdentifier": "m-3"}]
+    assert store.tables["Solution-Test"].count() == 1
+
+def testOnlyTheRecordsNotWrittenAreReported(store, monkeypatch):
+    monkeypatch.setattr(bulk, "MAX_RETRIES", 0)
+    store.unprocessedEvery = 4
+    records = [sqs("m-%d" % idx, user(idx)) for idx in range(20)]
+    # both records of user 7 fail together
+    records.append(sqs("m-7-again", user(7)))
+    res = harness.loadHandler("createSolution").lambda_handler({"Records": records}, None)
+    failed = set(failure["itemIdentifier"] for failure in res["batchItemFailures"])
+    missing = set()
+    for record in records:
+        if store.tables["Solution-Test"].get({"email": json.loads(record["body"])["email"]}) is None:
+            missing.add(record["messageId"])
+    # every 4th of the 20 users: 5 users, 6 records
+    assert failed == missing and len(failed) == 6
+    assert {"m-7", "m-7-again"} <= failed
+
+def testSnsEventRaisesWhenARecordFailed(store, monkeypatch):
+    monkeypatch.setattr(bulk, "MAX_RETRIES", 0)
+    createSolution = harness.loadHandler("createSolution")
+    assert createSolution.lambda_handler({"Records": [sns("s-1", user(1))]}, None)["batchItemFailures"] == []
+    store.unprocessedEvery = 1
+    with pytest.raises(Exception) as info:
+        createSolution.lambda_handler({"Records": [sns("s-2", user(2))]}, None)
+    assert json.loads(str(info.value)) == {"statusCode": 500, "message": "Internal Server Error"}
@@ -0,0 +1,70 @@
+import json
+from decimal import Decimal
+import pytest
+from common import cursor
+
+EMAIL = "page@luple.co.kr"
+KEY = {"email": {"S": EMAIL}, "taskId": {"S": "page-20240101-1704067200_ab12"}}
+
+def isBadRequest(info):
+    return json.loads(str(info.value)) == {"statusCode": 400, "message": "Bad Request"}
+
+def testTokenRoundTripsTheKey():
+    token = cursor.encodeToken(KEY)
+    assert "=" not in token and "+" not in token and "/" not in token
+    assert cursor.decodeToken(token, "email", EMAIL) == KEY
+    assert cursor.encodeToken(None) is None
+    assert cursor.decodeToken(None, "email", EMAIL) is None
+
+def testTokenOfAnotherPartitionIsRejected():
+    token = cursor.encodeToken(KEY)
+    with pytest.raises(Exception) as info:
+        cursor.decodeToken(token, "email", "other@luple.co.kr")
+    assert isBadRequest(info)
+    with pytest.raises(Exception) as info:
+        cursor.decodeToken(token, "userId", EMAIL)
+    assert isBadRequest(info)
+    # same value, not a string attribute
+    with pytest.raises(Exception) as info:
+        cursor.decodeToken(cursor.encodeToken({"email": {"N": EMAIL}}), "email", EMAIL)
+    assert isBadRequest(info)
+
+@pytest.mark.parametrize("token", [
+    "not base64!",
+    cursor.encodeToken(["email"]),
+    cursor.encodeToken({"email": {"S": EMAIL}, "taskId": "raw"}),
+    cursor.encodeToken({"email": {"S": EMAIL}, "taskId": {"S": "a", "N": "1"}}),
+])
+def testMalformedTokensAreRejected(token):
+    with pytest.raises(Exception) as info:
+        cursor.decodeToken(token, "email", EMAIL)
+    assert isBadRequest(info)
+
+def testKeysInPythonTypesRoundTrip():
+    key = {"email": EMAIL, "diaryDate": Decimal(20240101)}
+    token = cursor.encodeKey(key)
+    assert cursor.decodeKey(token, "email", EMAIL) == key
+    assert cursor.decodeToken(token, "email", EMAIL) == {"email": {"S": EMAIL}, "diaryDate": {"N": "20240101"}}
+    with pytest.raises(Exception) as info:
+        cursor.decodeKey(token, "email", "other@luple.co.kr")
+    assert isBadRequest(info)
+
+def testScopedTokenOnlyDecodesForItsScope():
+    token = cursor.encodeToken(KEY, "typeStart-index")
+    assert cursor.decodeToken(token, "email", EMAIL, "typeStart-index") == KEY
+    for scope in (None, "startTime-index"):
+        with pytest.raises(Exception) as info:
+            cursor.decodeToken(token, "email", EMAIL, scope)
+        assert isBadRequest(info)
+    # an unscoped token is not accepted where a scope is expected
+    with pytest.raises(Exception) as info:
+        cursor.decodeToken(cursor.encodeToken(KEY), "email", EMAIL, "typeStart-index")
+    assert isBadRequest(info)
+
+def testParseLimitBounds():
+    assert cursor.parseLimit(None, 20, 100) == 20
+    assert cursor.parseLimit("100", 20, 100) == 100
+    for limit in (0, 101, "ten"):
+        with pytest.raises(Exception) as info:
+            cursor.parseLimit(limit, 20, 100)
+        assert isBadRequest(info)
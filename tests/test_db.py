@@ -0,0 +1,57 @@
+import harness
+from common import db
+
+class FakeTable(object):
+    def __init__(self, name):
+        self.name = name
+
+    def get_item(self, Key):
+        return {'Item': dict(Key, userName="luple")}
+
+class FakeResource(object):
+    def __init__(self):
+        self.built = []
+        self.meta = type('Meta', (), {'client': object()})()
+
+    def Table(self, name):
+        self.built.append(name)
+        return FakeTable(name)
+
+def testTablesAreBuiltOncePerEnvironmentVariable(monkeypatch):
+    monkeypatch.setenv("TABLE_NAME", "User-Test")
+    monkeypatch.setenv("DEVICE_TABLE", "Device-Test")
+    resource = FakeResource()
+    db.setResource('dynamodb', resource)
+
+    table = db.getTable()
+    assert db.getTable('TABLE_NAME') is table and table.name == "User-Test"
+    assert db.getTable('DEVICE_TABLE').name == "Device-Test"
+    assert resource.built == ["User-Test", "Device-Test"]
+    assert db.getClient('dynamodb') is resource.meta.client
+
+def testReplacingTheResourceDropsTheTables(monkeypatch):
+    monkeypatch.setenv("TABLE_NAME", "User-Test")
+    db.setResource('dynamodb', FakeResource())
+    first = db.getTable()
+    db.setResource('dynamodb', FakeResource())
+    assert db.getTable() is not first
+
+def testSessionAndResourcesAreSharedUntilReset():
+    session = db.getSession()
+    resource = db.getResource()
+    assert db.getSession() is session and db.getResource() is resource
+    assert db.getClient('dynamodb') is resource.meta.client
+    db.reset()
+    assert db.getSession() is not session
+
+def testHandlersBuildNothingAtImportAndReuseTheTable(monkeypatch):
+    handler = harness.loadHandler("getUser")
+    assert db._session is None and db._tables == {}
+
+    monkeypatch.setenv("TABLE_NAME", "User-Test")
+    resource = FakeResource()
+    db.setResource('dynamodb', resource)
+    for _ in range(3):
+        res = handler.lambda_handler({"email": "warm@luple.co.kr"}, None)
+        assert res["statusCode"] == 200
+    assert resource.built == ["User-Test"]
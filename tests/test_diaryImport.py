@@ -0,0 +1,89 @@
+import json, datetime
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import harness
+from common import bulk, diaryImport
+
+EMAIL = "import@luple.co.kr"
+TABLES = {"TABLE_NAME": ("Sleep-Test", "email", "diaryDate")}
+FIRST = datetime.date(2023, 1, 1)
+
+def dateOf(idx):
+    return (FIRST + datetime.timedelta(days=idx)).strftime("%Y%m%d")
+
+def lines(count):
+    return [json.dumps({"diaryDate": dateOf(idx), "sleepScore": idx % 5 + 0.5, "numOfWakeUp": 1,
+                        "timeToSleep": 2, "disturbance": [1, 2]}) for idx in range(count)]
+
+@pytest.fixture
+def store(local):
+    return local.install(TABLES)
+
+@pytest.fixture
+def executor():
+    with ThreadPoolExecutor(1) as executor:
+        yield executor
+
+class Budget(object):
+    # hasTime stand-in: True for the first n chunks
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def __call__(self):
+        self.chunks -= 1
+        return self.chunks >= 0
+
+def testDiariesAreStoredLikePostSleepDiary(store, executor):
+    result = diaryImport.importDiaries(EMAIL, lines(30), executor=executor)
+    assert (result["read"], result["imported"], result["complete"]) == (30, 30, True)
+    assert result["checkpoint"] == int(dateOf(29))
+    item = store.tables["Sleep-Test"].get({"email": EMAIL, "diaryDate": int(dateOf(3))})
+    assert str(item["sleepScore"]) == "3.5" and item["timeToSleep"] == 2 and item["disturbance"] == [1, 2]
+
+def testAStoppedImportResumesFromItsCheckpoint(store, executor):
+    first = diaryImport.importDiaries(EMAIL, lines(100), hasTime=Budget(2), executor=executor)
+    assert first["complete"] is False and first["imported"] == 50
+    assert first["checkpoint"] == int(dateOf(49))
+    second = diaryImport.importDiaries(EMAIL, lines(100), checkpoint=first["checkpoint"], executor=executor)
+    assert (second["skipped"], second["imported"], second["complete"]) == (50, 50, True)
+    assert store.tables["Sleep-Test"].count() == 100
+
+def testBadLinesAreRejectedByLineNumber(store, executor):
+    given = lines(3)
+    given[1:1] = [
+        "{not json",
+        json.dumps({"diaryDate": "2023-01-05", "sleepScore": 1}),
+        json.dumps({"diaryDate": dateOf(9)}),
+        json.dumps({"diaryDate": dateOf(0), "sleepScore": 1}),
+        "",
+        json.dumps({"diaryDate": dateOf(8), "sleepScore": 1, "numOfWakeUp": "x"}),
+    ]
+    result = diaryImport.importDiaries(EMAIL, given, executor=executor)
+    assert (result["read"], result["imported"], result["rejected"], result["complete"]) == (8, 3, 5, True)
+    assert [error["line"] for error in result["errors"]] == [2, 3, 4, 5, 7]
+    assert result["errors"][2]["message"] == "Invalid Input: sleepScore is required"
+    assert result["errors"][3]["message"] == "Invalid Input: diaryDate %s is not after %s" % (dateOf(0), dateOf(0))
+
+def testAFailedChunkStopsTheCheckpointBeforeIt(store, executor, monkeypatch):
+    monkeypatch.setattr(bulk, "MAX_RETRIES", 0)
+    # the 40th request is left unprocessed: the second chunk fails
+    store.unprocessedEvery = 40
+    first = diaryImport.importDiaries(EMAIL, lines(100), executor=executor)
+    assert first["complete"] is False and first["failed"] >= 25
+    assert first["imported"] == 25 and first["checkpoint"] == int(dateOf(24))
+
+    store.unprocessedEvery = 0
+    second = diaryImport.importDiaries(EMAIL, lines(100), checkpoint=first["checkpoint"], executor=executor)
+    assert second["complete"] is True and second["imported"] == 75
+    assert store.tables["Sleep-Test"].count() == 100
+
+def testHandlerChecksItsInputAndStopsAtTheTimeout(store):
+    handler = harness.loadHandler("importSleepDiary")
+    for event in ({"body": ""}, {"body": lines(1)[0], "checkpoint": "2023-01-01"}):
+        with pytest.raises(Exception) as info:
+            handler.lambda_handler(dict(event, email=EMAIL), None)
+        assert json.loads(str(info.value))["statusCode"] == 400
+    body = handler.lambda_handler({"email": EMAIL, "body": "\n".join(lines(60))}, harness.Context(timeoutMs=0))["body"]
+    assert body["complete"] is False and body["imported"] == 0
+    body = handler.lambda_handler({"email": EMAIL, "body": "\n".join(lines(60)), "checkpoint": dateOf(9)}, None)["body"]
+    assert (body["skipped"], body["imported"], body["complete"]) == (10, 50, True)
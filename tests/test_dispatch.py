@@ -0,0 +1,99 @@
+import localAws
+from concurrent.futures import ThreadPoolExecutor
+from common import alarms, dispatch, timingWheel
+
+TABLES = {
+    "ALARM_TABLE": ("Alarm-Test", "email", "alarmId"),
+    "ALARM_BUCKET_TABLE": ("AlarmBucket-Test", "bucket", "alarmKey"),
+    "DISPATCH_TABLE": ("Dispatch-Test", "slot", None),
+}
+
+UNIX_MINUTE = 1704092400 // 60
+
+class ListNotifier(object):
+    BATCH_SIZE = 10
+
+    def __init__(self):
+        self.sent = []
+
+    def send(self, entries):
+        self.sent += entries
+        return []
+
+def seed(store, shard, count):
+    table = store.tables["AlarmBucket-Test"]
+    bucket = alarms.bucketKey(alarms.weekMinuteOf(UNIX_MINUTE), shard)
+    emails = ["user%03d@shard%02d" % (idx, shard) for idx in range(count)]
+    for email in emails:
+        table.put(localAws.normalize({"bucket": bucket, "alarmKey": alarms.alarmKey(email, "wake"),
+                                      "email": email, "alarmId": "wake", "taskType": 1}))
+    return emails
+
+def dispatcher(notifier, now):
+    worker = ThreadPoolExecutor(max_workers=1)
+    loader = dispatch.Dispatcher(notifier, clock=lambda: now, sleep=lambda seconds: None, owner="test", executor=worker)
+    loader.wheel = timingWheel.TimingWheel(dispatch.TICK, now)
+    return loader, worker
+
+def drain(loader, worker):
+    worker.shutdown(wait=True)
+    loader.pump()
+
+def testLoadReadsEveryPageOfTheSlotIntoTheWheel(local, monkeypatch):
+    store = local.install(TABLES)
+    monkeypatch.setattr(dispatch, "PAGE_SIZE", 7)
+    emails = seed(store, 3, 30)
+    seed(store, 4, 5)
+    deadline = UNIX_MINUTE * 60
+
+    notifier = ListNotifier()
+    loader, worker = dispatcher(notifier, deadline - 30)
+    loader.load(UNIX_MINUTE, 3)
+    slot = loader.slots[0]
+    assert slot.loaded and len(slot.pages) == 5
+    # not due yet: waiting in the wheel
+    assert notifier.sent == [] and len(loader.wheel) == 5
+
+    fired = loader.wheel.advance(deadline)
+    assert [due for due, _ in fired] == [deadline] * 5
+    entries = [entry for _, (_, _, page) in fired for entry in page]
+    assert [entry["email"] for entry in entries] == sorted(emails)
+    assert all(entry["deadline"] == deadline and entry["taskType"] == 1 for entry in entries)
+    worker.shutdown()
+
+def testLoadFiresDueSlotsOnceAndMarksThemDone(local, monkeypatch):
+    store = local.install(TABLES)
+    monkeypatch.setattr(dispatch, "PAGE_SIZE", 4)
+    emails = seed(store, 0, 10)
+    deadline = UNIX_MINUTE * 60
+
+    notifier = ListNotifier()
+    loader, worker = dispatcher(notifier, deadline + 5)
+    loader.load(UNIX_MINUTE, 0)
+    loader.pump()
+    drain(loader, worker)
+    assert sorted(entry["email"] for entry in notifier.sent) == emails
+    claim = store.tables["Dispatch-Test"].get({"slot": dispatch.slotKey(UNIX_MINUTE, 0)})
+    assert claim["done"] == 1 and claim["cursor"] == alarms.alarmKey(emails[-1], "wake")
+
+    # a second dispatcher skips the slot
+    again = ListNotifier()
+    other, worker = dispatcher(again, deadline + 6)
+    other.load(UNIX_MINUTE, 0)
+    assert other.slots == [] and other.stats["skipped"] == 1
+    worker.shutdown()
+
+def testLoadResumesAfterTheCursorOfAnExpiredLease(local):
+    store = local.install(TABLES)
+    emails = seed(store, 1, 10)
+    deadline = UNIX_MINUTE * 60
+    store.tables["Dispatch-Test"].put(localAws.normalize({
+        "slot": dispatch.slotKey(UNIX_MINUTE, 1), "owner": "dead", "leaseUntil": deadline,
+        "cursor": alarms.alarmKey(emails[5], "wake")}))
+
+    notifier = ListNotifier()
+    loader, worker = dispatcher(notifier, deadline + 1)
+    loader.load(UNIX_MINUTE, 1)
+    loader.pump()
+    drain(loader, worker)
+    assert sorted(entry["email"] for entry in notifier.sent) == emails[6:]
@@ -0,0 +1,76 @@
+import json
+import pytest
+import harness, localAws
+from common import etag, outbox
+
+EMAIL = "etag@luple.co.kr"
+
+def conditional(tag, **event):
+    return dict(event, params={"header": {"if-none-match": tag}})
+
+def statusOf(error):
+    return json.loads(str(error.value))
+
+def testTagsFollowTheItemVersion():
+    first = etag.forItem("user", EMAIL, {"version": 1})
+    assert first == etag.forItem("user", EMAIL, {"version": 1})
+    assert first != etag.forItem("user", EMAIL, {"version": 2})
+    assert first != etag.forItem("profile", EMAIL, {"version": 1})
+    assert etag.forItem("user", EMAIL, {}) is None
+
+def testMatchingIgnoresWeakPrefixesAndAcceptsLists():
+    tag = etag.forBody({"a": 1})
+    assert etag.check({}, tag) == {"Cache-Control": etag.PRIVATE, "ETag": tag}
+    assert etag.check(conditional('"other"'), tag)["ETag"] == tag
+    for header in (tag, "W/" + tag, '"other", ' + tag, "*"):
+        with pytest.raises(Exception) as error:
+            etag.check(conditional(header), tag)
+        assert statusOf(error)["statusCode"] == 304
+    assert etag.check(conditional("*"), None) == {"Cache-Control": etag.PRIVATE}
+
+@pytest.fixture
+def store(local):
+    store = local.install({"TABLE_NAME": ("User-Test", "email", None)})
+    store.tables["User-Test"].put(localAws.normalize({
+        "email": EMAIL, "userName": "etag", "version": 5,
+        "profile": {"wakeUpTime": {"hh": 7, "mm": 0}},
+    }))
+    return store
+
+@pytest.mark.parametrize("name", ["getUser", "getProfileId"])
+def testCurrentCopiesGetA304(store, name):
+    handler = harness.loadHandler(name)
+    response = handler.lambda_handler({"email": EMAIL}, None)
+    tag = response["headers"]["ETag"]
+    with pytest.raises(Exception) as error:
+        handler.lambda_handler(conditional(tag, email=EMAIL), None)
+    assert statusOf(error) == {"statusCode": 304, "message": "Not Modified", "headers": response["headers"]}
+
+def testAWriteChangesTheTag(store, monkeypatch):
+    monkeypatch.setenv("URI_USER", "/user")
+    monkeypatch.setenv("URI_PROFILE", "/user/profile")
+    getUser = harness.loadHandler("getUser")
+    tag = getUser.lambda_handler({"email": EMAIL}, None)["headers"]["ETag"]
+    harness.loadHandler("putUser").lambda_handler({"email": EMAIL, "url": "/user", "body-json": {"age": 31}}, None)
+    response = getUser.lambda_handler(conditional(tag, email=EMAIL), None)
+    assert response["body"]["age"] == 31 and response["headers"]["ETag"] != tag
+
+def testCreatedItemsStartFromTheClock(store, monkeypatch):
+    monkeypatch.setenv("SNS_ARN", "arn:aws:sns:local:signup")
+    localAws.installSns(["arn:aws:sns:local:signup"])
+    body = {"userName": "new", "problems": [{"problem": 1, "priority": 1}], "age": 30,
+            "gps": {"latitude": 37.5, "longitude": 127.0}, "sex": 0, "profile": {}}
+    with pytest.raises(Exception) as error:
+        harness.loadHandler("postUser").lambda_handler({"email": "new@luple.co.kr", "body-json": body}, None)
+    assert statusOf(error)["statusCode"] == 202
+    assert outbox.flush(5) == 0
+    assert store.tables["User-Test"].get({"email": "new@luple.co.kr"})["version"] > 1600000000000
+
+@pytest.mark.parametrize("name", ["getDeviceCapabilities", "getNumberOfTasks"])
+def testStaticBodiesAreCachedPublicly(name):
+    handler = harness.loadHandler(name)
+    response = handler.lambda_handler({"email": EMAIL}, None)
+    assert response["headers"]["Cache-Control"] == etag.STATIC
+    with pytest.raises(Exception) as error:
+        handler.lambda_handler(conditional(response["headers"]["ETag"], email=EMAIL), None)
+    assert statusOf(error)["statusCode"] == 304
@@ -0,0 +1,60 @@
+import json, time
+import pytest
+import harness, localAws
+from botocore.exceptions import ClientError
+from common import db
+
+TOPIC = "arn:aws:sns:local:123456789012:topic-%03d"
+
+def testSnsResourceListsEveryPageAndPublishes():
+    sns = localAws.installSns([TOPIC % idx for idx in range(150)])
+    resource = db.getResource('sns')
+    arns = [topic.arn for topic in resource.topics.all()]
+    assert len(arns) == 150 and sns.calls["ListTopics"] == 2
+    resource.Topic(TOPIC % 7).publish(Message="hello")
+    assert sns.messages[TOPIC % 7] == ["hello"] and db.getClient('sns') is sns
+
+def testCognitoKeepsUsersUntilDeleted():
+    cognito = localAws.installCognito({"someone": {"email": "a@luple.co.kr"}})
+    user = db.getClient('cognito-idp').admin_get_user(UserPoolId="pool", Username="someone")
+    assert user["UserAttributes"] == [{"Name": "email", "Value": "a@luple.co.kr"}]
+    cognito.admin_delete_user(UserPoolId="pool", Username="someone")
+    with pytest.raises(ClientError) as info:
+        cognito.admin_get_user(UserPoolId="pool", Username="someone")
+    assert info.value.response["Error"]["Code"] == "UserNotFoundException"
+    assert cognito.calls == {"AdminGetUser": 2, "AdminDeleteUser": 1}
+
+def testLambdaRecordsEventsAndRunsRegisteredHandlers():
+    local = localAws.installLambda()
+    local.register("echo", lambda event, context: {"statusCode": 200, "body": event})
+    res = local.invoke(FunctionName="echo", Payload=json.dumps({"a": 1}))
+    assert json.loads(res["Payload"].read()) == {"statusCode": 200, "body": {"a": 1}}
+    assert local.invoke(FunctionName="missing", InvocationType="Event", Payload="{}")["StatusCode"] == 202
+    with pytest.raises(ClientError):
+        local.invoke(FunctionName="missing", Payload="{}")
+    assert [(name, kind) for name, kind, _ in local.invocations] == [
+        ("echo", "RequestResponse"), ("missing", "Event"), ("missing", "RequestResponse")]
+
+def testLatencyIsAddedPerOperation():
+    cognito = localAws.installCognito({"someone": {}}, latency={"AdminGetUser": 0.02})
+    started = time.monotonic()
+    cognito.admin_get_user(UserPoolId="pool", Username="someone")
+    assert time.monotonic() - started >= 0.02
+
+def testContextCountsDown():
+    context = harness.Context("f", timeoutMs=1000)
+    assert 0 < context.get_remaining_time_in_millis() <= 1000
+    assert harness.Context(timeoutMs=0).get_remaining_time_in_millis() == 0
+
+def testDeleteUserGatewayHandsOffToTheDeleteFunction(monkeypatch):
+    for name, value in (("COGNITO", "cognito-idp"), ("COGNITIVE_USER_POOL", "pool"), ("LAMBDA_ARN", "deleteUser")):
+        monkeypatch.setenv(name, value)
+    localAws.installCognito({"someone": {}})
+    local = localAws.installLambda()
+    handler = harness.loadHandler("deleteUserGateway")
+    res = handler.lambda_handler({"email": "a@luple.co.kr", "userName": "someone"}, None)
+    assert res["statusCode"] == 202
+    assert local.invocations == [("deleteUser", "Event", {"email": "a@luple.co.kr", "userName": "someone"})]
+    with pytest.raises(Exception):
+        handler.lambda_handler({"email": "b@luple.co.kr", "userName": "nobody"}, None)
+    assert len(local.invocations) == 1
@@ -0,0 +1,96 @@
+import json, logging
+import pytest
+import harness, localAws
+from common import log
+
+EMAIL = "log@luple.co.kr"
+logger = log.getLogger("tests")
+
+class Context(object):
+    aws_request_id = "req-1"
+    function_name = "getUser"
+
+class Random(object):
+    def __init__(self, value):
+        self.value = value
+
+    def random(self):
+        return self.value
+
+@pytest.fixture(autouse=True)
+def restore(monkeypatch):
+    yield
+    logging.disable(logging.NOTSET)
+    log.begin(None, None, None)
+
+def lines(capsys):
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+def testRequestRecordCarriesTheContextAndStatus(capsys):
+    @log.handler
+    def lambda_handler(event, context):
+        logger.info("deleted %d item(s)", 3)
+        raise Exception(json.dumps({"statusCode": 404, "message": "Not Found"}))
+
+    with pytest.raises(Exception):
+        lambda_handler({"email": EMAIL, "url": "/user/task"}, Context())
+    info, request = lines(capsys)
+    assert info["message"] == "deleted 3 item(s)" and info["logger"] == "tests"
+    assert (info["requestId"], info["emailHash"], info["route"]) == ("req-1", log.emailHash(EMAIL), "/user/task")
+    assert EMAIL not in json.dumps(info)
+    assert request["message"] == "request" and request["status"] == 404 and request["ms"] >= 0
+
+def testSamplingIsDrawnOncePerRequestAndLevel(capsys, monkeypatch):
+    monkeypatch.setitem(log.RATES, logging.INFO, 0.1)
+    monkeypatch.setattr(log, "REQUEST_RATE", 0.1)
+    monkeypatch.setattr(log, "_random", Random(0.5))
+
+    @log.handler
+    def lambda_handler(event, context):
+        logger.info("kept only for sampled requests")
+        logger.warning("always kept")
+        return {"statusCode": 200}
+
+    lambda_handler({"email": EMAIL}, Context())
+    assert [line["message"] for line in lines(capsys)] == ["always kept"]
+    assert not logger.isEnabledFor(logging.INFO)
+
+    monkeypatch.setattr(log, "_random", Random(0.05))
+    lambda_handler({"email": EMAIL}, Context())
+    assert [line["message"] for line in lines(capsys)] == ["kept only for sampled requests", "always kept", "request"]
+
+def testServerErrorsAreAlwaysRecorded(capsys, monkeypatch):
+    monkeypatch.setattr(log, "REQUEST_RATE", 0.0)
+
+    @log.handler
+    def lambda_handler(event, context):
+        raise KeyError("email")
+
+    with pytest.raises(KeyError):
+        lambda_handler({}, Context())
+    (request,) = lines(capsys)
+    assert request["status"] == 500 and request["route"] == "getUser"
+
+def testDebugUsersAreLoggedWithoutSampling(capsys, monkeypatch):
+    monkeypatch.setattr(log, "DEBUG_USERS", {log.emailHash(EMAIL)})
+    monkeypatch.setitem(log.RATES, logging.INFO, 0.0)
+    assert log.begin("req-2", EMAIL, "getUser")
+    logger.debug("item %s", {"age": 30})
+    assert lines(capsys)[0]["message"] == "item {'age': 30}"
+    assert not log.begin("req-3", "other@luple.co.kr", "getUser")
+    logger.debug("dropped")
+    logger.info("dropped")
+    assert lines(capsys) == []
+
+def testLoggingDisableSilencesTheRequestRecord(capsys):
+    logging.disable(logging.CRITICAL)
+    log.begin("req-4", EMAIL, "getUser")
+    log.end(200, 0.001)
+    assert capsys.readouterr().out == ""
+
+def testHandlersWriteOneLinePerRequest(local, capsys):
+    store = local.install({"TABLE_NAME": ("User-Test", "email", None)})
+    store.tables["User-Test"].put(localAws.normalize({"email": EMAIL, "userName": "log", "age": 30}))
+    harness.loadHandler("getUser").lambda_handler({"email": EMAIL}, Context())
+    (request,) = lines(capsys)
+    assert request["message"] == "request" and request["status"] == 200
@@ -0,0 +1,65 @@
+import io, json
+import pytest
+import harness, localAws
+from common import db, metrics
+
+EMAIL = "metrics@luple.co.kr"
+
+class Target(object):
+    name = "Records-Test"
+
+    def query(self, **kwargs):
+        self.request = kwargs
+        return {"Count": 2, "ScannedCount": 5, "ConsumedCapacity": {"CapacityUnits": 1.5}}
+
+    def batch_write_item(self, **kwargs):
+        return {"UnprocessedItems": {"Records-Test": [{}]}, "ConsumedCapacity": [{"CapacityUnits": 3.0}]}
+
+    def put_item(self, **kwargs):
+        raise ValueError("rejected")
+
+@pytest.fixture
+def enabled(monkeypatch):
+    monkeypatch.setattr(metrics, "ENABLED", True)
+    yield
+    metrics.flush("teardown", io.StringIO())
+
+def testDisabledLeavesEverythingUnwrapped():
+    target = Target()
+    func = lambda event, context: None
+    assert metrics.instrument(target, "dynamodb") is target and metrics.handler(func) is func
+
+def testCallsAreRecordedPerOperationAndTable(enabled):
+    target = Target()
+    table = metrics.instrument(target, "dynamodb")
+    assert metrics.instrument(table, "dynamodb") is table and table.name == "Records-Test"
+    table.query(KeyConditionExpression="x")
+    assert target.request["ReturnConsumedCapacity"] == "TOTAL"
+    table.batch_write_item(RequestItems={"Records-Test": [{}, {}, {}]})
+    with pytest.raises(ValueError):
+        table.put_item(Item={})
+    stats = metrics.snapshot()
+    query = stats[("Query", "Records-Test")]
+    assert (query["Calls"], query["ReadCapacityUnits"], query["Items"], query["ScannedItems"], query["Pages"]) == (1, 1.5, 2, 5, 1)
+    batch = stats[("BatchWriteItem", "Records-Test")]
+    assert (batch["WriteCapacityUnits"], batch["Items"]) == (3.0, 2)
+    assert stats[("PutItem", "Records-Test")]["Errors"] == 1
+
+def testFlushEmitsOneEmfLinePerOperation(enabled):
+    metrics.instrument(Target(), "dynamodb").query()
+    out = io.StringIO()
+    (document,) = metrics.flush("getTask", out)
+    assert json.loads(out.getvalue()) == document
+    assert document["Function"] == "getTask" and document["Operation"] == "Query"
+    assert document["_aws"]["CloudWatchMetrics"][0]["Dimensions"] == [["Function", "Operation"], ["Function"]]
+    assert metrics.snapshot() == {} and metrics.flush("getTask", out) == []
+
+def testHandlersEmitTheirCallsWhenTheyEnd(enabled, local, capsys):
+    store = local.install({"TABLE_NAME": ("User-Test", "email", None)})
+    store.tables["User-Test"].put(localAws.normalize({"email": EMAIL, "userName": "metrics"}))
+    handler = harness.loadHandler("getUser")
+    handler.lambda_handler({"email": EMAIL}, harness.Context("getUser"))
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines() if '"_aws"' in line]
+    assert [(line["Function"], line["Operation"], line["Calls"], line["Items"]) for line in lines] == [
+        ("getUser", "GetItem", 1, 1)]
+    assert lines[0]["ReadCapacityUnits"] > 0
@@ -0,0 +1,53 @@
+import json
+import pytest
+import harness, localAws
+from common import outbox
+
+TOPIC = "arn:aws:sns:ap-northeast-2:000000000000:createUserTopic"
+BODY = {"userName": "signup", "problems": [{"problem": 1, "priority": 1}], "age": 30,
+        "gps": {"latitude": 37.5, "longitude": 127.0}, "sex": 0, "profile": {}}
+
+@pytest.fixture(autouse=True)
+def fastRetries(monkeypatch):
+    monkeypatch.setattr(outbox, "BACKOFF_BASE", 0.001)
+    yield
+    # never leave the worker sending to a client the next test replaced
+    assert outbox.flush(5) == 0
+
+def testMessagesGoOutInBatchesOfTen():
+    sns = localAws.installSns([TOPIC])
+    for idx in range(25):
+        outbox.publish(TOPIC, {"idx": idx})
+    assert outbox.flush(5) == 0 and outbox.pending() == 0
+    assert sorted(json.loads(message)["idx"] for message in sns.messages[TOPIC]) == list(range(25))
+    assert sns.calls["PublishBatch"] >= 3 and "Publish" not in sns.calls
+
+def testFailedEntriesAreRetried():
+    sns = localAws.installSns([TOPIC], failEvery=3)
+    for idx in range(30):
+        outbox.publish(TOPIC, "message %d" % idx)
+    assert outbox.flush(5) == 0
+    assert sorted(sns.messages[TOPIC]) == sorted("message %d" % idx for idx in range(30))
+
+def testSignupIsPublished(local, monkeypatch):
+    monkeypatch.setenv("SNS_ARN", TOPIC)
+    store = local.install({"TABLE_NAME": ("User-Test", "email", None)})
+    sns = localAws.installSns([TOPIC])
+    with pytest.raises(Exception) as info:
+        harness.loadHandler("postUser").lambda_handler({"email": "new@luple.co.kr", "body-json": BODY}, None)
+    assert json.loads(str(info.value)) == {"statusCode": 202, "message": "Progressing"}
+    assert store.tables["User-Test"].get({"email": "new@luple.co.kr"})["userName"] == "signup"
+    # sent before the response, without an explicit flush
+    (message,) = sns.messages[TOPIC]
+    assert json.loads(message)["email"] == "new@luple.co.kr" and json.loads(message)["gps"]["latitude"] == 37.5
+
+def testSignupFailsWhenTheNotificationIsStillPending(local, monkeypatch):
+    monkeypatch.setenv("SNS_ARN", TOPIC)
+    monkeypatch.setenv("SNS_FLUSH_TIMEOUT", "0.05")
+    local.install({"TABLE_NAME": ("User-Test", "email", None)})
+    sns = localAws.installSns([TOPIC], latency={"PublishBatch": 0.3})
+    with pytest.raises(Exception) as info:
+        harness.loadHandler("postUser").lambda_handler({"email": "slow@luple.co.kr", "body-json": BODY}, None)
+    assert json.loads(str(info.value)) == {"statusCode": 503, "message": "Notification Not Sent"}
+    # still queued, not dropped: the worker sends it when it can
+    assert outbox.flush(5) == 0 and len(sns.messages[TOPIC]) == 1
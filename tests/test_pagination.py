@@ -0,0 +1,72 @@
+import json
+import pytest
+import harness, localAws
+
+TABLES = {
+    "TABLE_NAME": ("Records-Test", "email", "taskId"),
+}
+EMAIL = "page@luple.co.kr"
+START = 1704067200
+
+@pytest.fixture
+def getTask(local):
+    store = local.install(TABLES)
+    table = store.tables["Records-Test"]
+    for idx in range(250):
+        table.put(localAws.normalize({"email": EMAIL, "taskId": "page-20240101-%05d" % idx,
+                                      "taskType": idx % 5, "startTime": START + idx * 60, "elapsedTime": 60}))
+    table.put(localAws.normalize({"email": "other@luple.co.kr", "taskId": "other-20240101-1",
+                                  "taskType": 0, "startTime": START, "elapsedTime": 60}))
+    return harness.loadHandler("getTask")
+
+def walk(handler, event):
+    pages = []
+    token = None
+    while True:
+        res = handler.lambda_handler(dict(event, nextToken=token) if token else event, None)
+        pages.append(res["body"])
+        token = res["nextToken"]
+        if token is None:
+            return pages
+
+def errorOf(info):
+    return json.loads(str(info.value))
+
+def testEveryTaskIsReachablePageByPage(getTask):
+    pages = walk(getTask, {"email": EMAIL, "all": True, "taskId": "", "limit": 100})
+    assert [len(page) for page in pages] == [100, 100, 50]
+    taskIds = [task["taskId"] for page in pages for task in page]
+    assert taskIds == ["page-20240101-%05d" % idx for idx in range(250)]
+
+def testDefaultLimitIsAHundred(getTask):
+    res = getTask.lambda_handler({"email": EMAIL, "all": True, "taskId": ""}, None)
+    assert len(res["body"]) == 100 and res["nextToken"] is not None
+
+def testFilteredPagesStayBoundedAndMissNothing(getTask):
+    pages = walk(getTask, {"email": EMAIL, "all": False, "taskId": "", "taskType": 4, "limit": 10})
+    assert all(len(page) <= 10 for page in pages)
+    found = [task["taskId"] for page in pages for task in page]
+    assert found == ["page-20240101-%05d" % idx for idx in range(4, 250, 5)]
+
+@pytest.mark.parametrize("limit", [0, 501, "many"])
+def testLimitOutOfBoundsIsA400(getTask, limit):
+    with pytest.raises(Exception) as info:
+        getTask.lambda_handler({"email": EMAIL, "all": True, "taskId": "", "limit": limit}, None)
+    assert errorOf(info) == {"statusCode": 400, "message": "Bad Request"}
+
+def testTokenOfAnotherUserIsA400(getTask):
+    token = getTask.lambda_handler({"email": EMAIL, "all": True, "taskId": "", "limit": 10}, None)["nextToken"]
+    with pytest.raises(Exception) as info:
+        getTask.lambda_handler({"email": "other@luple.co.kr", "all": True, "taskId": "", "nextToken": token}, None)
+    assert errorOf(info) == {"statusCode": 400, "message": "Bad Request"}
+
+def testSleepDiariesArePaged(local):
+    store = local.install({"TABLE_NAME": ("Sleep-Test", "email", "diaryDate")})
+    table = store.tables["Sleep-Test"]
+    for day in range(1, 31):
+        table.put(localAws.normalize({"email": EMAIL, "diaryDate": 20240100 + day, "sleepScore": 3}))
+    getSleepDiary = harness.loadHandler("getSleepDiary")
+    since = START + 10 * 86400 + 43200
+    pages = walk(getSleepDiary, {"email": EMAIL, "since": since, "limit": 7})
+    assert [len(page) for page in pages] == [7, 7, 6]
+    assert [diary["diaryDate"] for page in pages for diary in page][0] == getSleepDiary.convertDate(since)
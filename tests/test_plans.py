@@ -0,0 +1,128 @@
+import json, time, datetime
+from decimal import Decimal
+import pytest
+import harness, localAws
+from common import plans
+
+PLAN_DATE = 20240101    # a Monday
+START = int(datetime.datetime(2024, 1, 1).timestamp())
+EMAIL = "plan@luple.co.kr"
+
+def at(daysBefore, hh, mm, taskType):
+    return {"taskType": taskType, "startTime": START - daysBefore * plans.DAY + hh * 3600 + mm * 60}
+
+def testDefaultPlanWithoutProfileOrProblems():
+    plan = plans.buildPlan({}, [], PLAN_DATE)
+    assert plan["activeDay"] is True
+    assert plan["wakeUpTime"] == {"hh": 7, "mm": 0} and plan["sleepTime"] == {"hh": 23, "mm": 0}
+    assert plan["tasks"] == [
+        {"taskType": 0, "priority": 1, "start": {"hh": 7, "mm": 30}, "duration": 30, "done": False, "recentDays": 0},
+        {"taskType": 4, "priority": 2, "start": {"hh": 18, "mm": 0}, "duration": 45, "done": False, "recentDays": 0},
+    ]
+
+def testProblemsOrderTheTasksByPriorityWithoutDuplicates():
+    user = {"problems": [{"problem": 2, "priority": 2}, {"problem": 1, "priority": 1}, {"problem": 7, "priority": 3}]}
+    tasks = plans.buildPlan(user, [], PLAN_DATE)["tasks"]
+    assert [(entry["taskType"], entry["priority"]) for entry in tasks] == [(1, 1), (0, 2), (3, 3), (2, 4)]
+
+def testSlotsFollowTheProfileAcrossMidnight():
+    user = {"profile": {"wakeUpTime": {"hh": 10, "mm": 0}, "sleepTime": {"hh": 2, "mm": 0}},
+            "problems": [{"problem": 1, "priority": 1}, {"problem": 4, "priority": 2}]}
+    plan = plans.buildPlan(user, [], PLAN_DATE)
+    assert plan["sleepTime"] == {"hh": 2, "mm": 0}
+    starts = dict((entry["taskType"], entry["start"]) for entry in plan["tasks"])
+    assert starts == {1: {"hh": 18, "mm": 0}, 0: {"hh": 10, "mm": 30}, 2: {"hh": 1, "mm": 0}, 3: {"hh": 23, "mm": 0}}
+
+def testInactiveDayHasNoTasks():
+    plan = plans.buildPlan({"profile": {"effectiveDays": [2, 3, 4]}}, [], PLAN_DATE)
+    assert plan["activeDay"] is False and plan["tasks"] == []
+    assert plans.buildPlan({"profile": {"effectiveDays": [1]}}, [], PLAN_DATE)["activeDay"] is True
+
+def testHistoryMarksDoneAndMovesToASteadyHabit():
+    records = [at(1, 19, 0, 4), at(2, 19, 10, 4), at(3, 18, 50, 4), at(9, 19, 0, 4), at(0, 7, 45, 0), at(1, 8, 0, 2)]
+    tasks = dict((entry["taskType"], entry) for entry in plans.buildPlan({}, records, PLAN_DATE)["tasks"])
+    assert tasks[4]["start"] == {"hh": 19, "mm": 0} and tasks[4]["recentDays"] == 3 and not tasks[4]["done"]
+    assert tasks[0]["done"] and tasks[0]["recentDays"] == 0 and tasks[0]["start"] == {"hh": 7, "mm": 30}
+
+def testHabitFarFromTheSlotIsIgnored():
+    records = [at(day, 12, 0, 4) for day in (1, 2, 3, 4)]
+    exercise = plans.buildPlan({}, records, PLAN_DATE)["tasks"][1]
+    assert exercise["recentDays"] == 4 and exercise["start"] == {"hh": 18, "mm": 0}
+
+def testTaskDateComesFromTheTaskId():
+    assert plans.taskDate("plan-20240101-1704067200") == 20240101
+    assert plans.taskDate("plan-2024-1704067200") is None and plans.taskDate(None) is None
+
+@pytest.fixture
+def store(local):
+    store = local.install({
+        "USER_TABLE": ("User-Test", "email", None),
+        "RECORDS_TABLE": ("Records-Test", "email", "taskId"),
+        "PLAN_TABLE": ("Plan-Test", "email", "planDate"),
+    })
+    store.tables["User-Test"].put(localAws.normalize({"email": EMAIL, "problems": [{"problem": 1, "priority": 1}]}))
+    return store
+
+def today():
+    return plans.window()[1]
+
+def get(store):
+    store.resetStats()
+    body = harness.loadHandler("getSolutionTasksDaily").lambda_handler({"email": EMAIL}, None)["body"]
+    return body, store.totalCalls()
+
+def testCurrentPlansAreServedWithOneRead(store):
+    plan, calls = get(store)
+    assert [entry["taskType"] for entry in plan["tasks"]] == [1, 0]
+    assert calls == 4
+    assert get(store) == (plan, 1)
+
+def testInvalidatedPlansAreRebuiltAndStoredOnceSettled(store):
+    get(store)
+    plans.invalidateTask(EMAIL, today())
+    item = store.tables["Plan-Test"].get({"email": EMAIL, "planDate": today()})
+    assert "tasks" not in item and set(plans.window()[1:]) == set(
+        entry["planDate"] for entry in store.tables["Plan-Test"].partitions[EMAIL].values() if "tasks" not in entry)
+    # a rebuild racing the invalidating write is served but not stored
+    assert get(store)[1] == 4 and get(store)[1] == 4
+    store.tables["Plan-Test"].put(dict(item, invalidatedAt=item["invalidatedAt"] - plans.SETTLE_MS - 1000))
+    assert get(store)[1] == 4 and get(store)[1] == 1
+
+def testOnlyTheServedWindowIsAccepted(store):
+    handler = harness.loadHandler("getSolutionTasksDaily")
+    assert handler.lambda_handler({"email": EMAIL, "date": str(plans.window()[0])}, None)["statusCode"] == 200
+    for date in (PLAN_DATE, "tomorrow", plans.dateOf(time.time() + 2 * plans.DAY)):
+        with pytest.raises(Exception) as info:
+            handler.lambda_handler({"email": EMAIL, "date": date}, None)
+        assert json.loads(str(info.value)) == {"statusCode": 400, "message": "Bad Request"}
+
+def testInvalidateIsANoOpWithoutThePlanTable(store, monkeypatch):
+    monkeypatch.delenv("PLAN_TABLE")
+    store.resetStats()
+    plans.invalidate(EMAIL, plans.window())
+    assert store.totalCalls() == 0
+
+def testProfileChangesInvalidateTheServedDays(store, monkeypatch):
+    monkeypatch.setenv("TABLE_NAME", "User-Test")
+    monkeypatch.setenv("URI_USER", "/user")
+    monkeypatch.setenv("URI_PROFILE", "/user/profile")
+    store.tables["User-Test"].put(localAws.normalize({"email": EMAIL, "profile": {}}))
+    get(store)
+    harness.loadHandler("putUser").lambda_handler(
+        {"email": EMAIL, "url": "/user/profile", "body-json": {"wakeUpTime": {"hh": 9, "mm": 0}}}, None)
+    assert all("tasks" not in store.tables["Plan-Test"].get({"email": EMAIL, "planDate": date}) for date in plans.window())
+    assert get(store)[0]["wakeUpTime"] == {"hh": 9, "mm": 0}
+
+def testStoredEffectiveDaysAreParsedDefensively():
+    assert plans.profileTimes({"effectiveDays": [Decimal(3), Decimal("1.0"), 3]})[2] == [1, 3]
+    assert plans.profileTimes({"effectiveDays": []})[2] == []
+    for days in (["MON"], [[1]], [True], [0], [Decimal("1.5")], [Decimal("NaN")], list(range(1, 9)), "1234567"):
+        with pytest.raises(Exception) as info:
+            plans.profileTimes({"effectiveDays": days})
+        assert json.loads(str(info.value)) == {"statusCode": 400, "message": "Invalid Input: effectiveDays"}
+
+def testAStoredBadProfileIsA400(store):
+    store.tables["User-Test"].put(localAws.normalize({"email": EMAIL, "profile": {"effectiveDays": ["MON"]}}))
+    with pytest.raises(Exception) as info:
+        harness.loadHandler("getSolutionTasksDaily").lambda_handler({"email": EMAIL}, None)
+    assert json.loads(str(info.value))["statusCode"] == 400
@@ -0,0 +1,72 @@
+import json, datetime
+import pytest
+import harness
+from common import bulk, plans, scores, tasks
+
+TABLES = {
+    "TABLE_NAME": ("Records-Test", "email", "taskId"),
+}
+EMAIL = "post@luple.co.kr"
+START = int(datetime.datetime(2024, 1, 1, 9).timestamp())
+
+@pytest.fixture
+def handler(local):
+    local.install(TABLES)
+    return harness.loadHandler("postTask")
+
+def errorOf(info):
+    return json.loads(str(info.value))
+
+def testSinglePostWithoutStartTimeIsA400(handler):
+    with pytest.raises(Exception) as info:
+        handler.lambda_handler({"email": EMAIL, "body-json": {"taskType": 1, "elapsedTime": 60}}, None)
+    assert errorOf(info) == {"statusCode": 400, "message": "Invalid Input: startTime is required"}
+
+def testSingleAndBatchReportTheSameMessage(handler):
+    res = handler.lambda_handler({"email": EMAIL, "body-json": {"tasks": [{"taskType": 1, "elapsedTime": 60}]}}, None)
+    assert res["body"]["results"] == [{"index": 0, "statusCode": 400, "message": "Invalid Input: startTime is required"}]
+    with pytest.raises(Exception) as info:
+        handler.lambda_handler({"email": EMAIL, "body-json": {"taskType": 9, "startTime": START}}, None)
+    assert errorOf(info) == {"statusCode": 400, "message": "Invalid Input: taskType -> 9"}
+
+def testSinglePostsOfTheSameSecondDoNotOverwrite(local, handler):
+    for elapsed in (60, 120, 180):
+        assert handler.lambda_handler({"email": EMAIL, "body-json": {
+            "taskType": 1, "startTime": START, "elapsedTime": elapsed}}, None) == {"statusCode": 200}
+    table = local.store.tables["Records-Test"]
+    assert table.count() == 3
+
+def testBatchWritesTheValidTasks(local, handler):
+    body = {"tasks": [{"taskType": 1, "startTime": START + idx, "elapsedTime": 60} for idx in range(30)] + ["x"]}
+    res = handler.lambda_handler({"email": EMAIL, "body-json": body}, None)["body"]
+    assert res["written"] == 30 and res["failed"] == 1
+    assert res["results"][-1]["statusCode"] == 400
+    taskIds = [result["taskId"] for result in res["results"][:30]]
+    assert len(set(taskIds)) == 30
+    assert local.store.tables["Records-Test"].count() == 30
+
+def testTaskIdsKeepTheirThreeParts():
+    taskId = tasks.createTaskId(EMAIL, START, 1704099999, "b7_3")
+    assert taskId == "post-20240101-1704099999_b7_3"
+    assert plans.taskDate(taskId) == 20240101
+    assert tasks.createTaskId(EMAIL, START, 1704099999) == "post-20240101-1704099999"
+
+def testLeftoversAreReportedAsA503PerTask(local, handler, monkeypatch):
+    monkeypatch.setattr(bulk, "MAX_RETRIES", 0)
+    local.store.unprocessedEvery = 4
+    body = {"tasks": [{"taskType": 1, "startTime": START + idx, "elapsedTime": 60} for idx in range(8)]}
+    res = handler.lambda_handler({"email": EMAIL, "body-json": body}, None)["body"]
+    failed = [result for result in res["results"] if result["statusCode"] == 503]
+    assert res["failed"] == len(failed) > 0 and res["written"] == 8 - len(failed)
+    assert local.store.tables["Records-Test"].count() == res["written"]
+
+def testBatchScoresAreAddedOncePerDay(local, monkeypatch):
+    store = local.install(dict(TABLES, SCORE_TABLE=("Score-Test", "email", "scoreDate")))
+    body = {"tasks": [{"taskType": idx % 2, "startTime": START + (idx // 3) * plans.DAY, "elapsedTime": 10}
+                      for idx in range(6)]}
+    store.resetStats()
+    harness.loadHandler("postTask").lambda_handler({"email": EMAIL, "body-json": body}, None)
+    assert store.calls["UpdateItem"] == 2
+    first = store.tables["Score-Test"].get({"email": EMAIL, "scoreDate": 20240101})
+    assert (first["completed"], first["elapsedTime"], first["completed0"], first["completed1"]) == (3, 30, 2, 1)
+    assert scores.getScore(EMAIL, 20240102)["completed"] == 3
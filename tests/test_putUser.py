@@ -0,0 +1,47 @@
+import json
+from decimal import Decimal
+import pytest
+import harness, localAws
+
+EMAIL = "patch@luple.co.kr"
+
+@pytest.fixture
+def store(local, monkeypatch):
+    monkeypatch.setenv("URI_USER", "/user")
+    monkeypatch.setenv("URI_PROFILE", "/user/profile")
+    store = local.install({"TABLE_NAME": ("User-Test", "email", None)})
+    store.tables["User-Test"].put(localAws.normalize({
+        "email": EMAIL, "userName": "patch", "age": 30,
+        "profile": {"wakeUpTime": {"hh": 7, "mm": 0}, "sleepTime": {"hh": 23, "mm": 0}}}))
+    store.resetStats()
+    return store
+
+def testCreateUpdatePatchesProfileFieldsBehindPlaceholders():
+    putUser = harness.loadHandler("putUser")
+    update = putUser.createUpdate({"age": 31, "profile": {"sleepTime": {"hh": 1, "mm": 0}}})
+    assert update["expression"] == "set #age = :age, #profile.#p_sleepTime = :p_sleepTime"
+    assert update["names"] == {"#age": "age", "#profile": "profile", "#p_sleepTime": "sleepTime"}
+    assert update["values"] == {":age": 31, ":p_sleepTime": {"hh": 1, "mm": 0}}
+    assert putUser.createUpdate({"profile": {}}) == {"expression": None, "names": {}, "values": {}}
+
+def testUserAndProfileArePatchedInOneCall(store):
+    res = harness.loadHandler("putUser").lambda_handler({"email": EMAIL, "url": "/user", "body-json": {
+        "age": 31, "gps": {"latitude": 37.5, "longitude": 127.25}, "profile": {"sleepTime": {"hh": 0, "mm": 30}}}}, None)
+    assert res == {"statusCode": 200}
+    assert store.totalCalls() == 1
+    user = store.tables["User-Test"].get({"email": EMAIL})
+    assert user["age"] == 31 and user["gps"] == {"latitude": Decimal("37.5"), "longitude": Decimal("127.25")}
+    # the other profile fields are kept
+    assert user["profile"] == localAws.normalize({"wakeUpTime": {"hh": 7, "mm": 0}, "sleepTime": {"hh": 0, "mm": 30}})
+
+def testProfilePutUsesTheSameUpdate(store):
+    putUser = harness.loadHandler("putUser")
+    res = putUser.lambda_handler({"email": EMAIL, "url": "/user/profile", "body-json": {"wakeUpTime": {"hh": 6, "mm": 15}}}, None)
+    assert res == {"statusCode": 200} and store.totalCalls() == 1
+    assert store.tables["User-Test"].get({"email": EMAIL})["profile"]["wakeUpTime"] == {"hh": 6, "mm": 15}
+
+def testEmptyBodyIsA400WithoutACall(store):
+    with pytest.raises(Exception) as info:
+        harness.loadHandler("putUser").lambda_handler({"email": EMAIL, "url": "/user/profile", "body-json": {}}, None)
+    assert json.loads(str(info.value)) == {"statusCode": 400, "message": "Bad Request"}
+    assert store.totalCalls() == 0
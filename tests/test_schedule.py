@@ -0,0 +1,76 @@
+import json, datetime
+from decimal import Decimal
+import pytest
+import harness, localAws
+from common import schedule
+
+EMAIL = "schedule@luple.co.kr"
+PROFILE = {"wakeUpTime": {"hh": 7, "mm": 0}, "sleepTime": {"hh": 23, "mm": 0}, "effectiveDays": [1, 2, 3, 4, 5]}
+
+@pytest.fixture(autouse=True)
+def templates():
+    schedule.clear()
+    yield
+    schedule.clear()
+
+def testHashIgnoresTypesAndOrder():
+    decimal = {"wakeUpTime": {"hh": Decimal(7), "mm": Decimal(0)}, "sleepTime": {"hh": Decimal(23), "mm": Decimal(0)},
+               "effectiveDays": [Decimal(5), Decimal(4), Decimal(3), Decimal(2), Decimal(1), Decimal(1)]}
+    assert schedule.profileHash(decimal) == schedule.profileHash(PROFILE)
+    assert schedule.profileHash(None) == schedule.profileHash({})
+    assert schedule.profileHash(dict(PROFILE, effectiveDays=[1])) != schedule.profileHash(PROFILE)
+
+def testWeekFollowsTheEffectiveDays():
+    week = schedule.buildWeek(PROFILE)
+    assert [bool(week[weekday]) for weekday in range(1, 8)] == [True] * 5 + [False] * 2
+    starts = [(slot["start"]["hh"], slot["start"]["mm"]) for slot in week[1]]
+    assert starts == sorted(starts) and len(starts) == 5
+    assert all(slot["end"]["hh"] * 60 + slot["end"]["mm"] <= 23 * 60 for slot in week[1])
+    assert all(schedule.buildWeek(None)[weekday] for weekday in range(1, 8))
+
+def testWeeksAreBuiltOncePerProfile():
+    first = schedule.getWeek(PROFILE)
+    assert schedule.getWeek(dict(PROFILE)) == first
+    assert schedule.stats() == {"hits": 1, "misses": 1, "size": 1}
+
+def testDaysAreGeneratedInOrder():
+    days = list(schedule.iterSchedule(PROFILE, 20240227, 20240302))
+    assert [day["date"] for day in days] == [20240227, 20240228, 20240229, 20240301, 20240302]
+    assert [day["activeDay"] for day in days] == [True, True, True, True, False]
+
+@pytest.fixture
+def handler(local):
+    store = local.install({"TABLE_NAME": ("User-Test", "email", None)})
+    store.tables["User-Test"].put(localAws.normalize({"email": EMAIL, "profile": PROFILE}))
+    return harness.loadHandler("getSolutionTasksSchedule")
+
+def testLongRangesAreServedInPages(handler):
+    body = handler.lambda_handler({"email": EMAIL, "since": "20240101", "until": "20240310"}, None)["body"]
+    assert len(body["days"]) == 28 and body["nextDate"] == 20240129
+    body = handler.lambda_handler({"email": EMAIL, "since": "20240226", "until": "20240310"}, None)["body"]
+    assert len(body["days"]) == 14 and body["nextDate"] is None
+    assert body["profileHash"] == schedule.profileHash(PROFILE)
+
+def testUnchangedSchedulesGetA304(handler):
+    event = {"email": EMAIL, "since": "20240101", "until": "20240107"}
+    tag = handler.lambda_handler(event, None)["headers"]["ETag"]
+    with pytest.raises(Exception) as info:
+        handler.lambda_handler(dict(event, params={"header": {"If-None-Match": tag}}), None)
+    assert json.loads(str(info.value))["statusCode"] == 304
+
+@pytest.mark.parametrize("since, until", [("20240108", "20240101"), ("20240101", "20240401"), ("2024011", None), ("x", None)])
+def testBadRangesAreA400(handler, since, until):
+    with pytest.raises(Exception) as info:
+        handler.lambda_handler({"email": EMAIL, "since": since, "until": until}, None)
+    assert json.loads(str(info.value)) == {"statusCode": 400, "message": "Bad Request"}
+
+@pytest.mark.parametrize("days", [["MON"], [[1, 2]], [True], [0, 1]])
+def testBadStoredEffectiveDaysAreA400(local, days):
+    store = local.install({"TABLE_NAME": ("User-Test", "email", None)})
+    store.tables["User-Test"].put(localAws.normalize({"email": EMAIL, "profile": dict(PROFILE, effectiveDays=days)}))
+    with pytest.raises(Exception) as info:
+        harness.loadHandler("getSolutionTasksSchedule").lambda_handler({"email": EMAIL}, None)
+    assert json.loads(str(info.value)) == {"statusCode": 400, "message": "Invalid Input: effectiveDays"}
+    with pytest.raises(Exception):
+        schedule.buildWeek({"effectiveDays": days})
+    assert schedule.stats()["size"] == 0
@@ -0,0 +1,66 @@
+import pytest
+from common import schema
+
+def messageOf(name, body):
+    with pytest.raises(schema.ValidationError) as info:
+        schema.validate(name, body)
+    return info.value.message
+
+def testValidBodiesPass():
+    schema.validate("task", {"taskType": 1, "startTime": 1704067200.5, "elapsedTime": 60})
+    schema.validate("device", {"lang": 2, "agreement": {"gpsService": True}})
+    schema.validate("alarm", {"time": {"hh": 7, "mm": 0}, "days": [1, 7], "utcOffset": -12 * 60})
+    assert schema.check("user", {"userName": "luple", "problems": [{"problem": 2, "priority": 1}]})
+
+def testFieldErrorsNameTheKeyAndValue():
+    assert messageOf("task", {"taskType": 9}) == "Invalid Input: taskType -> 9"
+    assert messageOf("user", {"age": "20"}) == "Invalid Input: age -> 20"
+    assert messageOf("profile", {"wakeUpTime": {"hh": 7}}) == "Invalid Input: wakeUpTime -> {'hh': 7}"
+    assert messageOf("profile", {"sleepTime": {"hh": 24, "mm": 0}}) == "Invalid Input: hh -> 24"
+    assert messageOf("alarm", {"time": {"hh": 7}}) == "Invalid Input: time -> {'hh': 7}"
+    # no first priority
+    assert messageOf("user", {"problems": [{"problem": 2, "priority": 2}]}) == \
+        "Invalid Input: problems -> [{'problem': 2, 'priority': 2}]"
+
+def testUnknownKeysAreRejectedUnlessTheSchemaIsLoose():
+    assert messageOf("task", {"taskType": 1, "note": "x"}) == schema.BAD_REQUEST
+    schema.validate("sleepDiary", {"diaryDate": "20240101", "note": "x"})
+
+def testSleepDiaryKeepsItsMessages():
+    assert messageOf("sleepDiary", {"timeToSleep": 5}) == "Invalid value error: 'timeToSleep'(body) must be 0 to 4"
+    assert messageOf("sleepDiary", {"sleepScore": 5.5}) == "Invalid value error: 'sleepScore'(body) must be 0 to 5"
+    assert messageOf("sleepDiary", {"disturbance": [1, 12]}) == \
+        "Invalid value error: 'disturbance'(body) must be 0 to 11 int array"
+    assert messageOf("sleepDiary", {"textMessage": "x" * 256}) == \
+        "Invalid value error: 'textMessage'(body) must not exceed 255 characters."
+
+def testListLengthIsCappedWithAShortPreview():
+    problems = [{"problem": 0, "priority": 1}] * (schema.MAX_LIST + 1)
+    assert messageOf("user", {"problems": problems}) == "Invalid Input: problems -> list of 65 items"
+    schema.validate("user", {"problems": problems[:schema.MAX_LIST]})
+
+def testOpaqueValuesCountAgainstTheDepthAndNodeCaps():
+    def agreement(value):
+        return {"agreement": {"gpsService": value}}
+
+    deep = "x"
+    for _ in range(schema.MAX_DEPTH - 1):
+        deep = [deep]
+    assert messageOf("device", agreement(deep)) == schema.BAD_REQUEST
+    schema.validate("device", agreement(deep[0]))
+
+    assert messageOf("device", agreement([[0] * 60] * 9)) == schema.BAD_REQUEST
+    schema.validate("device", agreement([[0] * 60] * 8))
+    assert messageOf("device", agreement(["x" * (schema.MAX_STRING + 1)])) == schema.BAD_REQUEST
+
+def testEffectiveDaysAreIsoweekdays():
+    schema.validate("profile", {"effectiveDays": [1, 7]})
+    schema.validate("profile", {"effectiveDays": []})
+    for days in (["MON"], [[1]], [True], [0], [8], [1.0], [1, 2, 3, 4, 5, 6, 7, 1], "1234567", {"1": 1}):
+        assert messageOf("profile", {"effectiveDays": days}).startswith("Invalid Input: ")
+    assert messageOf("user", {"profile": {"effectiveDays": ["MON"]}}) == "Invalid Input: effectiveDays -> MON"
+
+def testCheckRaisesTheHandlerError():
+    with pytest.raises(Exception) as info:
+        schema.check("task", {"elapsedTime": -1})
+    assert str(info.value) == '{"statusCode": 400, "message": "Invalid Input: elapsedTime -> -1"}'
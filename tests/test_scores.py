@@ -0,0 +1,107 @@
+import os, sys, json, datetime
+from decimal import Decimal
+import pytest
+import harness, localAws
+from common import scores
+
+sys.path.insert(0, os.path.join(harness.ROOT, 'tools'))
+import rebuildDailyScores
+
+TABLES = {
+    "SCORE_TABLE": ("Score-Test", "email", "scoreDate"),
+}
+HANDLER_TABLES = {
+    "TABLE_NAME": ("Records-Test", "email", "taskId"),
+    "SCORE_TABLE": ("Score-Test", "email", "scoreDate"),
+}
+EMAIL = "score@luple.co.kr"
+
+def task(day, taskType, elapsedTime, serverTime=1704067200):
+    return {"taskId": "score-%d-%d" % (day, serverTime), "taskType": taskType, "elapsedTime": elapsedTime}
+
+def testNewAndDeletedTasksAddAndRemoveTheirContribution():
+    new = task(20240101, 2, 60)
+    assert scores.delta(None, new) == {20240101: {
+        "completed": 1, "elapsedTime": 60, "completed2": 1, "elapsedTime2": 60}}
+    assert scores.delta(new, None) == {20240101: {
+        "completed": -1, "elapsedTime": -60, "completed2": -1, "elapsedTime2": -60}}
+
+def testUpdateCarriesOnlyTheDifference():
+    old = task(20240101, 2, Decimal(60))
+    assert scores.delta(old, task(20240101, 2, Decimal(90))) == {20240101: {"elapsedTime": 30, "elapsedTime2": 30}}
+    assert scores.delta(old, task(20240101, 4, Decimal(60))) == {20240101: {
+        "completed2": -1, "elapsedTime2": -60, "completed4": 1, "elapsedTime4": 60}}
+    assert scores.delta(old, dict(old)) == {}
+
+def testMovingATaskToAnotherDayTouchesBothDays():
+    assert scores.delta(task(20240101, 0, 30), task(20240102, 0, 30)) == {
+        20240101: {"completed": -1, "elapsedTime": -30, "completed0": -1, "elapsedTime0": -30},
+        20240102: {"completed": 1, "elapsedTime": 30, "completed0": 1, "elapsedTime0": 30},
+    }
+
+def testTaskWithoutTypeOrTimeCountsInTheTotalsOnly():
+    assert scores.delta(None, {"taskId": "score-20240101-1", "elapsedTime": None}) == {20240101: {"completed": 1}}
+
+def testRecordIsANoOpWithoutTheTable(local, monkeypatch):
+    store = local.install(TABLES)
+    monkeypatch.delenv("SCORE_TABLE")
+    scores.record(EMAIL, None, task(20240101, 1, 60))
+    assert store.totalCalls() == 0 and scores.purge(EMAIL) == 0
+
+def testRecordAddsUpOnTheTable(local):
+    store = local.install(TABLES)
+    for new in (task(20240101, 0, 30, 1), task(20240101, 0, 45, 2), task(20240102, 3, 20, 3)):
+        scores.record(EMAIL, None, new)
+    scores.record(EMAIL, task(20240101, 0, 30, 1), task(20240101, 4, 50, 1))
+    scores.record(EMAIL, task(20240102, 3, 20, 3), None)
+
+    table = store.tables["Score-Test"]
+    first = table.get({"email": EMAIL, "scoreDate": 20240101})
+    assert (first["completed"], first["elapsedTime"]) == (2, 95)
+    assert (first["completed0"], first["elapsedTime0"]) == (1, 45)
+    assert (first["completed4"], first["elapsedTime4"]) == (1, 50)
+    second = table.get({"email": EMAIL, "scoreDate": 20240102})
+    assert second["completed"] == 0 and second["completed3"] == 0
+
+    summary = scores.getScore(EMAIL, 20240101)
+    assert summary["completed"] == 2 and summary["score"] == 40
+    assert [entry["taskType"] for entry in summary["tasks"]] == [0, 4]
+    assert scores.getScore(EMAIL, 20240102)["tasks"] == []
+
+def testTaskWritesKeepTheScoreEndpointCurrent(local, monkeypatch):
+    store = local.install(HANDLER_TABLES)
+    startTime = int(datetime.datetime(2024, 1, 1, 8).timestamp())
+    harness.loadHandler("postTask").lambda_handler(
+        {"email": EMAIL, "body-json": {"taskType": 1, "startTime": startTime, "elapsedTime": 30}}, None)
+    (item,) = store.tables["Records-Test"].partitions[EMAIL].values()
+    harness.loadHandler("putTask").lambda_handler(
+        {"email": EMAIL, "taskId": item["taskId"], "body-json": {"elapsedTime": 50}}, None)
+
+    handler = harness.loadHandler("getSolutionTasksDailyScore")
+    store.resetStats()
+    score = handler.lambda_handler({"email": EMAIL, "date": "20240101"}, None)["body"]
+    assert store.totalCalls() == 1
+    assert score["completed"] == 1 and score["elapsedTime"] == 50
+
+    harness.loadHandler("deleteTask").lambda_handler({"email": EMAIL, "taskId": item["taskId"]}, None)
+    assert handler.lambda_handler({"email": EMAIL, "date": "20240101"}, None)["body"]["completed"] == 0
+    with pytest.raises(Exception) as info:
+        handler.lambda_handler({"email": EMAIL, "date": "20241301"}, None)
+    assert json.loads(str(info.value))["statusCode"] == 400
+
+def testRebuildRestoresDriftedAggregates(local, capsys):
+    store = local.install(HANDLER_TABLES)
+    for taskType, serverTime in ((0, 1), (2, 2)):
+        store.tables["Records-Test"].put(localAws.normalize({
+            "email": EMAIL, "taskId": "score-20240101-%d" % serverTime, "taskType": taskType, "elapsedTime": 10}))
+    store.tables["Score-Test"].put(localAws.normalize({"email": EMAIL, "scoreDate": 20240101, "completed": 7}))
+    store.tables["Score-Test"].put(localAws.normalize({"email": EMAIL, "scoreDate": 20231231, "completed": 1}))
+
+    rebuildDailyScores.main(["--records", "Records-Test", "--scores", "Score-Test", "--segments", "2"])
+    assert "days=1 written=1 deleted=1" in capsys.readouterr().out
+    rebuilt = store.tables["Score-Test"].get({"email": EMAIL, "scoreDate": 20240101})
+    assert (rebuilt["completed"], rebuilt["elapsedTime"], rebuilt["completed2"]) == (2, 20, 1)
+    assert store.tables["Score-Test"].get({"email": EMAIL, "scoreDate": 20231231}) is None
+
+    rebuildDailyScores.main(["--records", "Records-Test", "--scores", "Score-Test", "--email", EMAIL])
+    assert "written=0 deleted=0" in capsys.readouterr().out
@@ -0,0 +1,97 @@
+import json, random, datetime
+import pytest
+import harness, localAws
+from common import columns, sleepStats
+
+EMAIL = "sleep@luple.co.kr"
+FIRST = datetime.date(2024, 1, 1)
+METRICS = ("sleepScore", "timeToSleep", "numOfWakeUp")
+
+def diariesOf(rows):
+    # rows: (yyyymmdd, sleepScore, disturbance codes)
+    return {
+        "diaryDate": [date for date, score, codes in rows],
+        "sleepScore": [score for date, score, codes in rows],
+        "timeToSleep": [None for row in rows],
+        "numOfWakeUp": [1.0 for row in rows],
+        "disturbance": [codes for date, score, codes in rows],
+    }
+
+ROWS = ([(20240101 + day, 2.0, []) for day in range(7)] + [(20240108 + day, 4.0, []) for day in range(7)]
+        + [(20240110, 4.0, [1, 1, 3, 15])]
+        # inside the 29 lead days: counts in the 30-day means only
+        + [(20231220, 10.0, [5])]
+        # before the lead days: ignored
+        + [(20231201, 10.0, [6])])
+
+def withNumpy(useNumpy, monkeypatch):
+    if useNumpy:
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(columns, "_numpy", False)
+
+@pytest.mark.parametrize("useNumpy", [True, False])
+def testTrendMath(monkeypatch, useNumpy):
+    withNumpy(useNumpy, monkeypatch)
+    summary = sleepStats.summarize(diariesOf(ROWS), FIRST, 14)
+    assert summary["diaries"] == 15
+    assert summary["dates"] == [20240107, 20240114]
+    assert summary["trend"]["sleepScore"]["mean7"] == [2.0, 4.0]
+    # 7 x 2, 8 x 4 and the lead day
+    assert summary["latest"]["sleepScore"] == {"mean7": 4.0, "mean30": round((14 + 32 + 10) / 16.0, 2)}
+    assert summary["weekOverWeek"]["sleepScore"] == {"last7": 4.0, "previous7": 2.0, "delta": 2.0}
+    assert summary["latest"]["timeToSleep"] == {"mean7": None, "mean30": None}
+    assert summary["weekOverWeek"]["timeToSleep"] == {"last7": None, "previous7": None, "delta": None}
+    assert summary["disturbance"] == [0, 2, 0, 1] + [0] * 8
+
+@pytest.mark.parametrize("useNumpy", [True, False])
+def testEmptyInput(monkeypatch, useNumpy):
+    withNumpy(useNumpy, monkeypatch)
+    summary = sleepStats.summarize(diariesOf([]), FIRST, 1)
+    assert summary["diaries"] == 0 and summary["dates"] == [20240101]
+    assert summary["disturbance"] == [0] * sleepStats.DISTURBANCES
+    for name in METRICS:
+        assert summary["trend"][name] == {"mean7": [None], "mean30": [None]}
+        assert summary["weekOverWeek"][name] == {"last7": None, "previous7": None, "delta": None}
+
+@pytest.mark.parametrize("seed, days", [(1, 1), (2, 30), (3, 200), (4, 366)])
+def testNumpyAndListSummariesAgree(monkeypatch, seed, days):
+    pytest.importorskip("numpy")
+    generator = random.Random(seed)
+    start = FIRST - datetime.timedelta(days=40)
+    rows = []
+    for offset in range(days + 45):
+        if generator.random() < 0.7:
+            date = int((start + datetime.timedelta(days=offset)).strftime("%Y%m%d"))
+            rows.append((date, float(generator.randint(0, 10)),
+                         [generator.randint(-1, 13) for _ in range(generator.randint(0, 3))]))
+    diaries = diariesOf(rows)
+    diaries["timeToSleep"] = [generator.choice([None, 5.0, 12.5]) for row in rows]
+    vectorized = sleepStats.summarize(diaries, FIRST, days)
+    monkeypatch.setattr(columns, "_numpy", False)
+    assert sleepStats.summarize(diaries, FIRST, days) == vectorized
+
+def testStatsModeOfGetSleepDiary(local):
+    store = local.install({"TABLE_NAME": ("Sleep-Test", "email", "diaryDate")})
+    today = datetime.date.today()
+    for offset in range(10):
+        date = int((today - datetime.timedelta(days=offset)).strftime("%Y%m%d"))
+        store.tables["Sleep-Test"].put(localAws.normalize({
+            "email": EMAIL, "diaryDate": date, "sleepScore": 3, "numOfWakeUp": 1, "disturbance": [2]}))
+    since = datetime.datetime.combine(today - datetime.timedelta(days=6), datetime.time()).timestamp()
+    store.resetStats()
+    body = harness.loadHandler("getSleepDiary").lambda_handler({"email": EMAIL, "since": since, "stats": "true"}, None)["body"]
+    assert store.totalCalls() == 1
+    assert body["diaries"] == 7 and body["latest"]["sleepScore"] == {"mean7": 3.0, "mean30": 3.0}
+    assert body["disturbance"][2] == 7 and len(json.dumps(body)) < 2000
+
+@pytest.mark.parametrize("stats", [None, "true"])
+@pytest.mark.parametrize("since", [None, "yesterday", True, 4102444800])
+def testInvalidSinceIsA400(local, stats, since):
+    local.install({"TABLE_NAME": ("Sleep-Test", "email", "diaryDate")})
+    event = {"email": EMAIL, "stats": stats}
+    if since is not None:
+        event["since"] = since
+    with pytest.raises(Exception) as info:
+        harness.loadHandler("getSleepDiary").lambda_handler(event, None)
+    assert json.loads(str(info.value)) == {"statusCode": 400, "message": "Bad Request"}
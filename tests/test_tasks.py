@@ -0,0 +1,144 @@
+import os, sys, json, datetime, importlib
+from decimal import Decimal
+import pytest
+import harness, localAws
+from common import tasks
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tools'))
+migrateTaskIndex = importlib.import_module('migrateTaskIndex')
+
+TABLES = {
+    "TABLE_NAME": ("Records-Test", "email", "taskId", {
+        "typeStart-index": ("email", "typeStart"),
+        "startTime-index": ("email", "startTime"),
+    }),
+}
+EMAIL = "plan@luple.co.kr"
+# local midnight: task ids carry the date in the time of the functions
+START = int(datetime.datetime(2024, 1, 1).timestamp())
+
+def testTypeStartKeyAcceptsEveryNumberType():
+    assert tasks.typeStartKey(1, 1700000000) == "1#1700000000"
+    assert tasks.typeStartKey(1, 1700000000.5) == "1#1700000000"
+    assert tasks.typeStartKey(Decimal(2), Decimal("1700000000.5")) == "2#1700000000"
+    assert tasks.typeStartKey("3", "1700000000.5") == "3#1700000000"
+    assert tasks.typeStartKey(0, 42) == "0#0000000042"
+
+def testTypeStartRangeBoundsTheType():
+    low, high = tasks.typeStartRange(4, 1700000000.9)
+    assert (low, high) == ("4#1700000000", "4#9999999999")
+    assert tasks.typeStartRange(0) == ("0#0000000000", "0#9999999999")
+    assert tasks.sinceIsExact(None) and tasks.sinceIsExact(1700000000) and tasks.sinceIsExact(Decimal("1700000000.0"))
+    assert not tasks.sinceIsExact(1700000000.9) and not tasks.sinceIsExact(Decimal("1700000000.5"))
+
+@pytest.fixture
+def store(local):
+    store = local.install(TABLES)
+    table = store.tables["Records-Test"]
+    for idx in range(60):
+        taskType, startTime = idx % 3, START + idx * 600
+        table.put(localAws.normalize({"email": EMAIL, "taskId": "plan-20240101-%05d" % idx, "taskType": taskType,
+                                      "startTime": startTime, "elapsedTime": 60,
+                                      "typeStart": tasks.typeStartKey(taskType, startTime)}))
+    return store
+
+def walk(getTask, filters):
+    found, token = [], None
+    while True:
+        event = dict(filters, email=EMAIL, all=False, taskId="", limit=7)
+        if token:
+            event["nextToken"] = token
+        res = getTask.lambda_handler(event, None)
+        found += [task["taskId"] for task in res["body"]]
+        token = res["nextToken"]
+        if token is None:
+            return found
+
+@pytest.mark.parametrize("filters, index", [
+    ({"taskType": 2}, "typeStart-index"),
+    ({"taskType": 2, "since": START + 30 * 600}, "typeStart-index"),
+    ({"since": START + 45 * 600}, "startTime-index"),
+])
+def testIndexesAnswerLikeTheFilters(store, monkeypatch, filters, index):
+    getTask = harness.loadHandler("getTask")
+    before = walk(getTask, filters)
+    monkeypatch.setenv("TYPE_START_INDEX", "typeStart-index")
+    monkeypatch.setenv("START_TIME_INDEX", "startTime-index")
+    assert getTask.planQuery(EMAIL, False, "", filters.get("taskType"), filters.get("since"))["IndexName"] == index
+    assert sorted(walk(getTask, filters)) == sorted(before)
+    assert len(before) == len([idx for idx in range(60) if idx % 3 == filters.get("taskType", idx % 3)
+                               and START + idx * 600 >= filters.get("since", 0)])
+
+@pytest.mark.parametrize("first, second", [
+    ({"all": True}, {"taskType": 2}),
+    ({"taskType": 2}, {"since": START}),
+    ({"taskType": 1}, {"taskType": 2}),
+    ({"taskType": 2, "since": START}, {"taskType": 2, "since": START + 600}),
+])
+def testTokenOfAnotherQueryIsA400(store, monkeypatch, first, second):
+    monkeypatch.setenv("TYPE_START_INDEX", "typeStart-index")
+    monkeypatch.setenv("START_TIME_INDEX", "startTime-index")
+    getTask = harness.loadHandler("getTask")
+    token = getTask.lambda_handler(dict({"email": EMAIL, "all": False, "taskId": "", "limit": 3}, **first), None)["nextToken"]
+    assert token is not None
+    with pytest.raises(Exception) as info:
+        getTask.lambda_handler(dict({"email": EMAIL, "all": False, "taskId": "", "nextToken": token}, **second), None)
+    assert json.loads(str(info.value)) == {"statusCode": 400, "message": "Bad Request"}
+
+def testFractionalSinceKeepsTheStartTimeFilter(local, monkeypatch):
+    store = local.install(TABLES)
+    table = store.tables["Records-Test"]
+    for idx, startTime in enumerate((Decimal(START) + Decimal("0.2"), Decimal(START) + Decimal("0.7"), START + 1)):
+        table.put(localAws.normalize({"email": EMAIL, "taskId": "plan-20240101-%05d" % idx, "taskType": 2,
+                                      "startTime": startTime, "elapsedTime": 60,
+                                      "typeStart": tasks.typeStartKey(2, startTime)}))
+    monkeypatch.setenv("TYPE_START_INDEX", "typeStart-index")
+    getTask = harness.loadHandler("getTask")
+    assert "FilterExpression" not in getTask.planQuery(EMAIL, False, "", 2, START)
+    assert walk(getTask, {"taskType": 2, "since": START + 0.5}) == ["plan-20240101-00001", "plan-20240101-00002"]
+    assert len(walk(getTask, {"taskType": 2, "since": START})) == 3
+    for since in ("soon", True):
+        with pytest.raises(Exception) as info:
+            walk(getTask, {"taskType": 2, "since": since})
+        assert json.loads(str(info.value)) == {"statusCode": 400, "message": "Bad Request"}
+
+def testTaskIdStaysAKeyLookup(store, monkeypatch):
+    monkeypatch.setenv("TYPE_START_INDEX", "typeStart-index")
+    getTask = harness.loadHandler("getTask")
+    params = getTask.planQuery(EMAIL, False, "plan-20240101-00004", 1, None)
+    assert "IndexName" not in params and "FilterExpression" in params
+    res = getTask.lambda_handler({"email": EMAIL, "all": False, "taskId": "plan-20240101-00004", "taskType": 1}, None)
+    assert [task["taskId"] for task in res["body"]] == ["plan-20240101-00004"]
+
+def testWritesKeepTypeStartInStep(store):
+    table = store.tables["Records-Test"]
+    harness.loadHandler("postTask").lambda_handler({"email": "new@luple.co.kr", "body-json": {
+        "taskType": 4, "startTime": START + 60, "elapsedTime": 30}}, None)
+    (item,) = [item for item in table.partitions["new@luple.co.kr"].values()]
+    assert item["typeStart"] == "4#%010d" % (START + 60)
+
+    putTask = harness.loadHandler("putTask")
+    key = {"email": EMAIL, "taskId": "plan-20240101-00001"}
+    putTask.lambda_handler(dict(key, **{"body-json": {"taskType": 3}}), None)
+    assert table.get(key)["typeStart"] == "3#%010d" % (START + 600)
+    putTask.lambda_handler(dict(key, **{"body-json": {"startTime": START + 900}}), None)
+    assert table.get(key)["typeStart"] == "3#%010d" % (START + 900)
+    putTask.lambda_handler(dict(key, **{"body-json": {"taskType": 0, "startTime": START + 1200}}), None)
+    assert table.get(key)["typeStart"] == "0#%010d" % (START + 1200)
+
+def testBackfillHandlesFractionalStartTime(local):
+    store = local.install({"RECORDS_TABLE": ("Records-Test", "email", "taskId")})
+    table = store.tables["Records-Test"]
+    table.put(localAws.normalize({"email": "a@luple.co.kr", "taskId": "a-20231114-1", "taskType": 2,
+                                  "startTime": Decimal("1700000000.5"), "elapsedTime": 60}))
+    table.put(localAws.normalize({"email": "a@luple.co.kr", "taskId": "a-20231114-2", "taskType": 1,
+                                  "startTime": 1700000100, "elapsedTime": 60}))
+    table.put(localAws.normalize({"email": "a@luple.co.kr", "taskId": "a-20231114-3", "startTime": 1700000200}))
+
+    result = migrateTaskIndex.backfillSegment("Records-Test", 0, 1, False)
+    assert result == {"scanned": 3, "updated": 2}
+    assert table.get({"email": "a@luple.co.kr", "taskId": "a-20231114-1"})["typeStart"] == "2#1700000000"
+    assert table.get({"email": "a@luple.co.kr", "taskId": "a-20231114-2"})["typeStart"] == "1#1700000100"
+    assert "typeStart" not in table.get({"email": "a@luple.co.kr", "taskId": "a-20231114-3"})
+    # idempotent
+    assert migrateTaskIndex.backfillSegment("Records-Test", 0, 1, False)["updated"] == 0
@@ -0,0 +1,57 @@
+import random
+from common import timingWheel
+
+def testAdvanceFiresByDeadlineThenInsertionOrder():
+    wheel = timingWheel.TimingWheel(1.0, start=0)
+    wheel.add(5, "b")
+    wheel.add(3, "a")
+    wheel.add(5, "c")
+    wheel.add(9, "d")
+    assert wheel.advance(2) == []
+    assert wheel.advance(5) == [(3, "a"), (5, "b"), (5, "c")]
+    assert len(wheel) == 1
+    assert wheel.advance(9) == [(9, "d")]
+    assert len(wheel) == 0
+
+def testNothingFiresBeforeItsDeadline():
+    wheel = timingWheel.TimingWheel(0.05, start=100.0)
+    wheel.add(100.1, "edge")
+    wheel.add(100.12, "inside")
+    assert wheel.advance(100.099) == []
+    assert wheel.advance(100.1) == [(100.1, "edge")]
+    # a deadline inside a tick fires when the tick is over
+    assert wheel.advance(100.149) == []
+    assert wheel.advance(100.15) == [(100.12, "inside")]
+
+def testPastDeadlinesFireOnTheNextAdvance():
+    wheel = timingWheel.TimingWheel(1.0, start=50)
+    wheel.add(10, "late")
+    assert wheel.advance(50) == [(10, "late")]
+
+def testLateWakeupReturnsEveryTimerOnceAcrossLevelsAndOverflow():
+    wheel = timingWheel.TimingWheel(1.0, start=0, slots=8, levels=2)
+    rng = random.Random(3)
+    deadlines = [rng.randrange(1, 500) for _ in range(300)]
+    for idx, deadline in enumerate(deadlines):
+        wheel.add(deadline, idx)
+    fired = wheel.advance(250) + wheel.advance(600)
+    assert [payload for _, payload in fired] == sorted(range(len(deadlines)), key=lambda idx: (deadlines[idx], idx))
+    assert len(wheel) == 0
+
+def testRandomStepsMatchASortedReference():
+    rng = random.Random(11)
+    wheel = timingWheel.TimingWheel(0.1, start=0)
+    pending = []
+    now = 0.0
+    for step in range(200):
+        for _ in range(rng.randrange(4)):
+            deadline = round(now + rng.uniform(-1, 3000), 1)
+            wheel.add(deadline, (deadline, step, len(pending)))
+            pending.append((deadline, step, len(pending)))
+        now += rng.choice([0.05, 0.3, 7, 400])
+        fired = wheel.advance(now)
+        due = [timer for timer in pending if timer[0] <= now + 1e-9]
+        assert sorted(payload for _, payload in fired) == sorted(due)
+        assert all(deadline <= now + 1e-9 for deadline, _ in fired)
+        pending = [timer for timer in pending if timer not in due]
+    assert len(wheel) == len(pending)
@@ -0,0 +1,104 @@
+import os, sys, ast, argparse, zipfile
+
+'''
+buildBundles
+
+Builds one deployment zip per lambda function that ships only what the
+function imports:
+    - <function>/lambda_function.py
+    - the common modules it imports, directly or through other common
+      modules (common/__init__.py included whenever one is needed)
+Functions that import nothing from common get a zip with their handler
+only and do not need commonLayer attached. boto3 / botocore come from the
+lambda runtime and are never bundled.
+
+Usage (from the repository root):
+    python tools/buildBundles.py [--out dist] [--only getUser]
+'''
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COMMON = os.path.join(ROOT, 'commonLayer', 'python', 'common')
+HANDLER = 'lambda_function.py'
+
+'''
+commonImports function
+
+@input parameter:
+    - path: python source file
+@return:
+    - set: names of the common modules imported by the file
+'''
+def commonImports(path):
+    with open(path) as f:
+        tree = ast.parse(f.read(), path)
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ImportFrom) and node.module == 'common':
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and node.module.startswith('common.'):
+            names.add(node.module.split('.')[1])
+        elif isinstance(node, ast.Import):
+            names.update(alias.name.split('.')[1] for alias in node.names if alias.name.startswith('common.'))
+    return names
+
+'''
+requiredModules function
+
+@input parameter:
+    - functionName: directory name of the lambda function
+@return:
+    - list: sorted names of the common modules the function needs
+'''
+def requiredModules(functionName):
+    pending = list(commonImports(os.path.join(ROOT, functionName, HANDLER)))
+    required = set()
+    while pending:
+        name = pending.pop()
+        if name in required:
+            continue
+        path = os.path.join(COMMON, name + '.py')
+        if not os.path.exists(path):
+            raise Exception("%s imports common.%s, which does not exist" % (functionName, name))
+        required.add(name)
+        pending.extend(commonImports(path))
+    return sorted(required)
+
+def listFunctions():
+    return sorted(name for name in os.listdir(ROOT)
+                  if os.path.isfile(os.path.join(ROOT, name, HANDLER)))
+
+'''
+buildBundle function
+
+@input parameter:
+    - functionName: directory name of the lambda function
+    - outDir: directory the zip is written to
+@return:
+    - (zip path, list of common modules, size in bytes)
+'''
+def buildBundle(functionName, outDir):
+    modules = requiredModules(functionName)
+    path = os.path.join(outDir, functionName + '.zip')
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as bundle:
+        bundle.write(os.path.join(ROOT, functionName, HANDLER), HANDLER)
+        if modules:
+            bundle.write(os.path.join(COMMON, '__init__.py'), 'common/__init__.py')
+        for name in modules:
+            bundle.write(os.path.join(COMMON, name + '.py'), 'common/%s.py' % name)
+    return path, modules, os.path.getsize(path)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build per-function deployment zips")
+    parser.add_argument('--out', default=os.path.join(ROOT, 'dist'), help="output directory")
+    parser.add_argument('--only', default=None, help="build this function only")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.out, exist_ok=True)
+    for functionName in listFunctions():
+        if args.only and functionName != args.only:
+            continue
+        path, modules, size = buildBundle(functionName, args.out)
+        print("%-32s %7d bytes  common: %s" % (functionName, size, ", ".join(modules) or "-"))
+
+if __name__ == '__main__':
+    sys.exit(main())
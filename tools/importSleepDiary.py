@@ -0,0 +1,49 @@
+import os, sys, json, argparse
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'commonLayer', 'python'))
+
+from common import diaryImport
+
+'''
+importSleepDiary
+
+Loads the sleep diaries of one user from a newline-delimited JSON file (one
+postSleepDiary body per line, by increasing diaryDate) into the sleep diary
+table, for a migration from another app or a restore; see
+common/diaryImport.py. The file is streamed, never read as a whole.
+
+The last line printed is the result, with the checkpoint: when the import
+did not complete (a chunk could not be written), run the same command again
+with --checkpoint to carry on. The exit status is 1 in that case.
+
+Usage (from the repository root):
+    python tools/importSleepDiary.py --table Sleep-Dev --email user@luple.co.kr --file diaries.ndjson
+    python tools/importSleepDiary.py --table Sleep-Dev --email user@luple.co.kr --file diaries.ndjson --checkpoint 20190312
+'''
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import the sleep diaries of one user from newline-delimited JSON")
+    parser.add_argument('--table', required=True, help="sleep diary table name")
+    parser.add_argument('--email', required=True, help="user the diaries belong to")
+    parser.add_argument('--file', required=True, help="newline-delimited JSON file, - for stdin")
+    parser.add_argument('--checkpoint', type=int, default=None, help="yyyymmdd returned by a previous run")
+    parser.add_argument('--workers', type=int, default=8, help="BatchWriteItem calls in parallel")
+    args = parser.parse_args(argv)
+
+    os.environ['TABLE_NAME'] = args.table
+    diaryImport.WINDOW = 2 * args.workers
+    lines = sys.stdin if args.file == '-' else open(args.file)
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            result = diaryImport.importDiaries(args.email, lines, checkpoint=args.checkpoint, executor=executor)
+    finally:
+        if lines is not sys.stdin:
+            lines.close()
+    for error in result['errors']:
+        print("line %d: %s" % (error['line'], error['message']))
+    print(json.dumps(dict((name, value) for name, value in result.items() if name != 'errors'), sort_keys=True))
+    return 0 if result['complete'] else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,99 @@
+import os, sys, argparse, time
+from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'commonLayer', 'python'))
+
+from common import db, tasks
+from botocore.exceptions import ClientError
+
+'''
+migrateTaskIndex
+
+Backfills typeStart on existing task records so getTask can use key
+conditions instead of FilterExpression.
+
+Migration path:
+    1. deploy postTask / putTask (they write typeStart on every new or
+       edited task from now on)
+    2. add two global secondary indexes to the records table
+        - typeStart-index: email (HASH, S) + typeStart (RANGE, S)
+        - startTime-index: email (HASH, S) + startTime (RANGE, N)
+       both with projection INCLUDE taskType, startTime, elapsedTime
+    3. run this script (idempotent, safe to run while traffic is live)
+        python tools/migrateTaskIndex.py --table Records-Dev --segments 8
+    4. set TYPE_START_INDEX=typeStart-index and
+       START_TIME_INDEX=startTime-index on getTask
+Until step 4 getTask keeps using FilterExpression, so nothing breaks while
+the backfill is in progress.
+'''
+
+'''
+backfillSegment function
+
+@input parameter:
+    - tableName: string
+    - segment, totalSegments: parallel scan segment
+    - dryRun: bool
+@return:
+    - dict: scanned, updated
+'''
+def backfillSegment(tableName, segment, totalSegments, dryRun):
+    client = db.getClient('dynamodb')
+    params = {
+        'TableName': tableName,
+        'Segment': segment,
+        'TotalSegments': totalSegments,
+        'ProjectionExpression': 'email, taskId, taskType, startTime, typeStart',
+    }
+    scanned = 0
+    updated = 0
+    while True:
+        res = client.scan(**params)
+        for item in res['Items']:
+            scanned += 1
+            if 'typeStart' in item or 'taskType' not in item or 'startTime' not in item:
+                continue
+            # startTime may have a fraction ('1700000000.5')
+            typeStart = tasks.typeStartKey(Decimal(item['taskType']['N']), Decimal(item['startTime']['N']))
+            if dryRun:
+                updated += 1
+                continue
+            try:
+                # never resurrect a task deleted meanwhile, never overwrite a fresher value
+                client.update_item(
+                    TableName=tableName,
+                    Key={'email': item['email'], 'taskId': item['taskId']},
+                    UpdateExpression='SET typeStart = :t',
+                    ConditionExpression='attribute_exists(email) AND attribute_not_exists(typeStart)',
+                    ExpressionAttributeValues={':t': {'S': typeStart}}
+                )
+                updated += 1
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                    raise
+        if 'LastEvaluatedKey' not in res:
+            return {'scanned': scanned, 'updated': updated}
+        params['ExclusiveStartKey'] = res['LastEvaluatedKey']
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backfill typeStart on task records")
+    parser.add_argument('--table', required=True, help="records table name")
+    parser.add_argument('--segments', type=int, default=4, help="parallel scan segments")
+    parser.add_argument('--dry-run', action='store_true', help="count only, do not write")
+    args = parser.parse_args(argv)
+
+    start = time.time()
+    db.getClient('dynamodb')
+    with ThreadPoolExecutor(max_workers=args.segments) as executor:
+        results = list(executor.map(
+            lambda segment: backfillSegment(args.table, segment, args.segments, args.dry_run),
+            range(args.segments)))
+
+    scanned = sum(r['scanned'] for r in results)
+    updated = sum(r['updated'] for r in results)
+    print("scanned=%d updated=%d elapsed=%.1fs%s" % (scanned, updated, time.time() - start,
+                                                      " (dry run)" if args.dry_run else ""))
+
+if __name__ == '__main__':
+    main()
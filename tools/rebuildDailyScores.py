@@ -0,0 +1,177 @@
+import os, sys, argparse, time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'commonLayer', 'python'))
+
+from common import db, bulk, scores
+from boto3.dynamodb.types import TypeSerializer, TypeDeserializer
+
+'''
+rebuildDailyScores
+
+Recomputes the daily task aggregates of SCORE_TABLE from the records table
+(see common/scores.py), for every user or for one user:
+    - a parallel scan (or a query with --email) of the records table sums
+      every task into its day
+    - aggregates that differ are overwritten, aggregates of days without
+      tasks are deleted
+
+Run it once after creating the score table, before setting SCORE_TABLE on
+postTask / putTask / deleteTask, then whenever an aggregate is suspected
+to have drifted. Task writes of the rebuilt users made while it runs may
+be counted twice or not at all: rebuild those users again with --email.
+
+Usage (from the repository root):
+    python tools/rebuildDailyScores.py --records Records-Dev --scores Score-Dev [--segments 8]
+    python tools/rebuildDailyScores.py --records Records-Dev --scores Score-Dev --email user@luple.co.kr
+'''
+
+PROJECTION = 'email, taskId, taskType, startTime, elapsedTime'
+
+serializer = TypeSerializer()
+deserializer = TypeDeserializer()
+
+def fromWire(item):
+    return dict((name, deserializer.deserialize(value)) for name, value in item.items())
+
+'''
+aggregate function
+
+@input parameter:
+    - items: wire format task records
+    - totals: dict (email, scoreDate) -> dict attribute -> value, updated
+@return:
+    - int: number of records read
+'''
+def aggregate(items, totals):
+    count = 0
+    for item in items:
+        count += 1
+        task = fromWire(item)
+        email = task['email']
+        for scoreDate, values in scores.delta(None, task).items():
+            day = totals.setdefault((email, scoreDate), dict())
+            for name, value in values.items():
+                day[name] = day.get(name, 0) + value
+    return count
+
+def scanSegment(tableName, segment, totalSegments):
+    client = db.getClient('dynamodb')
+    params = {
+        'TableName': tableName,
+        'Segment': segment,
+        'TotalSegments': totalSegments,
+        'ProjectionExpression': PROJECTION,
+    }
+    totals = dict()
+    scanned = 0
+    while True:
+        res = client.scan(**params)
+        scanned += aggregate(res['Items'], totals)
+        if 'LastEvaluatedKey' not in res:
+            return scanned, totals
+        params['ExclusiveStartKey'] = res['LastEvaluatedKey']
+
+def queryUser(tableName, email):
+    client = db.getClient('dynamodb')
+    params = {
+        'TableName': tableName,
+        'KeyConditionExpression': 'email = :email',
+        'ExpressionAttributeValues': {':email': {'S': email}},
+        'ProjectionExpression': PROJECTION,
+        'ConsistentRead': True,
+    }
+    totals = dict()
+    scanned = 0
+    while True:
+        res = client.query(**params)
+        scanned += aggregate(res['Items'], totals)
+        if 'LastEvaluatedKey' not in res:
+            return scanned, totals
+        params['ExclusiveStartKey'] = res['LastEvaluatedKey']
+
+'''
+existingScores function
+
+@input parameter:
+    - tableName: score table name
+    - email: only this user (optional)
+@return:
+    - dict: (email, scoreDate) -> stored attributes
+'''
+def existingScores(tableName, email=None):
+    client = db.getClient('dynamodb')
+    if email is None:
+        call, params = client.scan, {'TableName': tableName}
+    else:
+        call, params = client.query, {
+            'TableName': tableName,
+            'KeyConditionExpression': 'email = :email',
+            'ExpressionAttributeValues': {':email': {'S': email}},
+            'ConsistentRead': True,
+        }
+    stored = dict()
+    while True:
+        res = call(**params)
+        for item in res['Items']:
+            item = fromWire(item)
+            stored[(item['email'], int(item['scoreDate']))] = item
+        if 'LastEvaluatedKey' not in res:
+            return stored
+        params['ExclusiveStartKey'] = res['LastEvaluatedKey']
+
+def isCurrent(stored, values):
+    if stored is None:
+        return False
+    names = set(name for name in stored if name not in ('email', 'scoreDate', 'updatedAt'))
+    present = set(name for name, value in values.items() if value != 0)
+    return all(stored.get(name, 0) == values.get(name, 0) for name in names | present)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recompute the daily task aggregates from the records table")
+    parser.add_argument('--records', required=True, help="records table name")
+    parser.add_argument('--scores', required=True, help="score table name")
+    parser.add_argument('--segments', type=int, default=4, help="parallel scan segments")
+    parser.add_argument('--email', default=None, help="rebuild this user only")
+    parser.add_argument('--dry-run', action='store_true', help="count only, do not write")
+    args = parser.parse_args(argv)
+
+    start = time.time()
+    if args.email is not None:
+        scanned, totals = queryUser(args.records, args.email)
+    else:
+        db.getClient('dynamodb')
+        totals = dict()
+        scanned = 0
+        with ThreadPoolExecutor(max_workers=args.segments) as executor:
+            for segmentScanned, segmentTotals in executor.map(
+                    lambda segment: scanSegment(args.records, segment, args.segments), range(args.segments)):
+                scanned += segmentScanned
+                # a user's records can be spread over several segments
+                for key, values in segmentTotals.items():
+                    day = totals.setdefault(key, dict())
+                    for name, value in values.items():
+                        day[name] = day.get(name, 0) + value
+    stored = existingScores(args.scores, args.email)
+
+    now = int(time.time())
+    requests = []
+    written = 0
+    for (email, scoreDate), values in sorted(totals.items()):
+        if isCurrent(stored.get((email, scoreDate)), values):
+            continue
+        item = dict((name, value) for name, value in values.items() if value != 0)
+        item.update({'email': email, 'scoreDate': scoreDate, 'updatedAt': now})
+        requests.append({'PutRequest': {'Item': dict((name, serializer.serialize(value)) for name, value in item.items())}})
+        written += 1
+    stale = [key for key in stored if key not in totals]
+    for email, scoreDate in stale:
+        requests.append({'DeleteRequest': {'Key': {'email': {'S': email}, 'scoreDate': {'N': str(scoreDate)}}}})
+
+    if not args.dry_run and requests:
+        bulk.batchWriteAll(args.scores, requests)
+    print("records=%d days=%d written=%d deleted=%d elapsed=%.1fs%s" % (
+        scanned, len(totals), written, len(stale), time.time() - start, " (dry run)" if args.dry_run else ""))
+
+if __name__ == '__main__':
+    main()